@@ -0,0 +1,20 @@
+"""Add source_time to route_snapshots
+
+Revision ID: add_source_time_to_route_snapshots
+Revises: create_looking_glass_queries
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_source_time_to_route_snapshots'
+down_revision = 'create_looking_glass_queries'
+depends_on = None
+
+def upgrade():
+    op.add_column('route_snapshots', sa.Column('source_time', sa.DateTime(), nullable=True))
+
+def downgrade():
+    op.drop_column('route_snapshots', 'source_time')
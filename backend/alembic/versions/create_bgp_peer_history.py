@@ -0,0 +1,40 @@
+"""Add bgp_peer_history table
+
+Revision ID: create_bgp_peer_history
+Revises: create_ssh_host_keys
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_bgp_peer_history'
+down_revision = 'create_ssh_host_keys'
+depends_on = None
+
+def upgrade():
+    op.create_table('bgp_peer_history',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('peering_id', sa.Integer(), nullable=False),
+        sa.Column('resolution', sa.Integer(), nullable=False),
+        sa.Column('bucket_start', sa.DateTime(), nullable=False),
+        sa.Column('samples', sa.Integer(), nullable=False),
+        sa.Column('up_samples', sa.Integer(), nullable=False),
+        sa.Column('flaps', sa.Integer(), nullable=False),
+        sa.Column('state_last', sa.String(length=20), nullable=False),
+        sa.Column('prefixes_min', sa.Integer(), nullable=True),
+        sa.Column('prefixes_max', sa.Integer(), nullable=True),
+        sa.Column('prefixes_last', sa.Integer(), nullable=True),
+        sa.Column('advertised_last', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['peering_id'], ['peerings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('peering_id', 'resolution', 'bucket_start', name='uq_bgp_peer_history_bucket')
+    )
+    op.create_index(op.f('ix_bgp_peer_history_id'), 'bgp_peer_history', ['id'], unique=False)
+    op.create_index('ix_bgp_peer_history_resolution_bucket', 'bgp_peer_history', ['resolution', 'bucket_start'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_bgp_peer_history_resolution_bucket', table_name='bgp_peer_history')
+    op.drop_index(op.f('ix_bgp_peer_history_id'), table_name='bgp_peer_history')
+    op.drop_table('bgp_peer_history')
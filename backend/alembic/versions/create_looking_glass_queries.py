@@ -0,0 +1,48 @@
+"""Add looking_glass_queries and looking_glass_query_lines tables
+
+Revision ID: create_looking_glass_queries
+Revises: create_route_snapshots
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_looking_glass_queries'
+down_revision = 'create_route_snapshots'
+depends_on = None
+
+def upgrade():
+    op.create_table('looking_glass_queries',
+        sa.Column('id', sa.String(length=36), nullable=False),
+        sa.Column('stream_id', sa.String(length=36), nullable=False),
+        sa.Column('type', sa.String(length=16), nullable=False),
+        sa.Column('target', sa.String(length=255), nullable=False),
+        sa.Column('router', sa.String(length=255), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('output', sa.Text(), nullable=True),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('cached_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('owner', sa.String(length=128), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_looking_glass_queries_stream_id'), 'looking_glass_queries', ['stream_id'], unique=False)
+    op.create_index(op.f('ix_looking_glass_queries_updated_at'), 'looking_glass_queries', ['updated_at'], unique=False)
+    op.create_table('looking_glass_query_lines',
+        sa.Column('stream_id', sa.String(length=36), nullable=False),
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('lines', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('stream_id', 'seq')
+    )
+    op.create_index(op.f('ix_looking_glass_query_lines_created_at'), 'looking_glass_query_lines', ['created_at'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_looking_glass_query_lines_created_at'), table_name='looking_glass_query_lines')
+    op.drop_table('looking_glass_query_lines')
+    op.drop_index(op.f('ix_looking_glass_queries_updated_at'), table_name='looking_glass_queries')
+    op.drop_index(op.f('ix_looking_glass_queries_stream_id'), table_name='looking_glass_queries')
+    op.drop_table('looking_glass_queries')
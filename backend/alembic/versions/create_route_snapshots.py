@@ -0,0 +1,38 @@
+"""Add route_snapshots table
+
+Revision ID: create_route_snapshots
+Revises: create_bgp_peer_history
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_route_snapshots'
+down_revision = 'create_bgp_peer_history'
+depends_on = None
+
+def upgrade():
+    op.create_table('route_snapshots',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('peering_id', sa.Integer(), nullable=False),
+        sa.Column('direction', sa.String(length=16), nullable=False),
+        sa.Column('taken_at', sa.DateTime(), nullable=False),
+        sa.Column('trigger', sa.String(length=16), nullable=False),
+        sa.Column('route_count', sa.Integer(), nullable=False),
+        sa.Column('added', sa.Integer(), nullable=False),
+        sa.Column('withdrawn', sa.Integer(), nullable=False),
+        sa.Column('changed', sa.Integer(), nullable=False),
+        sa.Column('delta', sa.LargeBinary(), nullable=False),
+        sa.Column('keyframe', sa.LargeBinary(), nullable=True),
+        sa.ForeignKeyConstraint(['peering_id'], ['peerings.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_route_snapshots_id'), 'route_snapshots', ['id'], unique=False)
+    op.create_index('ix_route_snapshots_peering_direction_taken', 'route_snapshots', ['peering_id', 'direction', 'taken_at'], unique=False)
+
+def downgrade():
+    op.drop_index('ix_route_snapshots_peering_direction_taken', table_name='route_snapshots')
+    op.drop_index(op.f('ix_route_snapshots_id'), table_name='route_snapshots')
+    op.drop_table('route_snapshots')
@@ -0,0 +1,34 @@
+"""Add ssh_host_keys table
+
+Revision ID: create_ssh_host_keys
+Revises: allow_nullable_user_id
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'create_ssh_host_keys'
+down_revision = 'allow_nullable_user_id'
+depends_on = None
+
+def upgrade():
+    op.create_table('ssh_host_keys',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('hostname', sa.String(length=255), nullable=False),
+        sa.Column('key_type', sa.String(length=50), nullable=False),
+        sa.Column('key_data', sa.Text(), nullable=False),
+        sa.Column('fingerprint', sa.String(length=128), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('hostname', 'key_type', name='uq_ssh_host_keys_hostname_key_type')
+    )
+    op.create_index(op.f('ix_ssh_host_keys_id'), 'ssh_host_keys', ['id'], unique=False)
+    op.create_index(op.f('ix_ssh_host_keys_hostname'), 'ssh_host_keys', ['hostname'], unique=False)
+
+def downgrade():
+    op.drop_index(op.f('ix_ssh_host_keys_hostname'), table_name='ssh_host_keys')
+    op.drop_index(op.f('ix_ssh_host_keys_id'), table_name='ssh_host_keys')
+    op.drop_table('ssh_host_keys')
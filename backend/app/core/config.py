@@ -9,3 +9,114 @@ DATABASE_URL = os.getenv("DATABASE_URL", "postgresql+asyncpg://bgpcontrol:Vls%40
 
 engine = create_async_engine(DATABASE_URL, echo=True)
 SessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+# Conexões SSH com os roteadores
+SSH_CONNECT_TIMEOUT = int(os.getenv("SSH_CONNECT_TIMEOUT", "10"))
+SSH_KEEPALIVE_INTERVAL = int(os.getenv("SSH_KEEPALIVE_INTERVAL", "30"))
+SSH_POOL_MAX_SESSIONS = int(os.getenv("SSH_POOL_MAX_SESSIONS", "4"))  # Canais simultâneos por roteador
+SSH_POOL_IDLE_TIMEOUT = int(os.getenv("SSH_POOL_IDLE_TIMEOUT", "300"))  # Segundos até fechar conexão ociosa
+SSH_POOL_ACQUIRE_TIMEOUT = int(os.getenv("SSH_POOL_ACQUIRE_TIMEOUT", "30"))
+SSH_EXECUTOR_MAX_WORKERS = int(os.getenv("SSH_EXECUTOR_MAX_WORKERS", "32"))  # Threads dedicadas ao paramiko
+SSH_ROUTER_MAX_SLOTS = int(os.getenv("SSH_ROUTER_MAX_SLOTS", str(SSH_POOL_MAX_SESSIONS)))  # Sessões VTY por roteador
+SSH_ROUTER_SLOT_OVERRIDES = os.getenv("SSH_ROUTER_SLOT_OVERRIDES", "")  # Ex.: "3:2,7:6" (router_id:slots)
+SSH_SLOT_WAIT_TIMEOUT = float(os.getenv("SSH_SLOT_WAIT_TIMEOUT", "30"))  # Espera máxima na fila do roteador
+SSH_SLOT_AGING_SECONDS = float(os.getenv("SSH_SLOT_AGING_SECONDS", "10"))  # Promove uma classe a cada N s de espera
+SSH_CHANNEL_RETRIES = int(os.getenv("SSH_CHANNEL_RETRIES", "2"))  # Novas tentativas quando o roteador recusa o canal
+SSH_SHELL_COMMAND_TIMEOUT = float(os.getenv("SSH_SHELL_COMMAND_TIMEOUT", "30"))  # Espera pelo prompt após cada comando
+SSH_SHELL_MAX_BUFFER = int(os.getenv("SSH_SHELL_MAX_BUFFER", str(4 * 1024 * 1024)))  # Bytes guardados por comando
+SSH_PIPELINE_WINDOW = int(os.getenv("SSH_PIPELINE_WINDOW", "8"))  # Comandos enviados sem esperar resposta em um lote
+SSH_PIPELINE_MAX_COMMANDS = int(os.getenv("SSH_PIPELINE_MAX_COMMANDS", "200"))  # Comandos aceitos por lote
+
+# Streams SSE de comandos SSH
+SSE_HEARTBEAT_INTERVAL = float(os.getenv("SSE_HEARTBEAT_INTERVAL", "15"))  # Comentário keep-alive quando não há saída
+SSE_MAX_PENDING_LINES = int(os.getenv("SSE_MAX_PENDING_LINES", "1000"))  # Linhas em espera antes de frear o SSH
+
+# Operações em grupo
+SSH_GROUP_MAX_PARALLEL_ROUTERS = int(os.getenv("SSH_GROUP_MAX_PARALLEL_ROUTERS", "8"))  # Roteadores atendidos ao mesmo tempo
+
+# Saúde dos roteadores (circuit breaker)
+ROUTER_BREAKER_FAILURE_THRESHOLD = int(os.getenv("ROUTER_BREAKER_FAILURE_THRESHOLD", "3"))  # Falhas seguidas para abrir o circuito
+ROUTER_BREAKER_OPEN_SECONDS = float(os.getenv("ROUTER_BREAKER_OPEN_SECONDS", "30"))  # Tempo inicial com o circuito aberto
+ROUTER_BREAKER_MAX_OPEN_SECONDS = float(os.getenv("ROUTER_BREAKER_MAX_OPEN_SECONDS", "300"))  # Teto do backoff exponencial
+ROUTER_PROBE_TIMEOUT = float(os.getenv("ROUTER_PROBE_TIMEOUT", "5"))  # Timeout do teste TCP em segundo plano
+
+# Chaves de host SSH
+SSH_STRICT_HOST_KEYS = os.getenv("SSH_STRICT_HOST_KEYS", "false").lower() == "true"  # Recusar roteador cuja chave mudou
+SSH_KNOWN_HOSTS_FILE = os.getenv("SSH_KNOWN_HOSTS_FILE", os.path.expanduser("~/.ssh/known_hosts"))  # Importado uma vez na inicialização
+
+# Coleta periódica do estado BGP (dashboard e status sem SSH)
+BGP_POLL_ENABLED = os.getenv("BGP_POLL_ENABLED", "true").lower() == "true"  # Com vários workers, habilite em apenas um
+BGP_POLL_INTERVAL = float(os.getenv("BGP_POLL_INTERVAL", "60"))  # Segundos entre duas coletas do mesmo roteador
+BGP_POLL_MAX_CONCURRENT = int(os.getenv("BGP_POLL_MAX_CONCURRENT", "4"))  # Roteadores coletados ao mesmo tempo
+BGP_POLL_TIMEOUT = int(os.getenv("BGP_POLL_TIMEOUT", "30"))  # Timeout do summary em cada roteador
+
+# Histórico de estado BGP por peering
+BGP_HISTORY_RING_SIZE = int(os.getenv("BGP_HISTORY_RING_SIZE", "360"))  # Coletas guardadas em memória por peering
+BGP_HISTORY_MINUTE_RETENTION_DAYS = int(os.getenv("BGP_HISTORY_MINUTE_RETENTION_DAYS", "7"))  # Resumos de 1 min no banco
+BGP_HISTORY_HOUR_RETENTION_DAYS = int(os.getenv("BGP_HISTORY_HOUR_RETENTION_DAYS", "180"))  # Resumos de 1 h (os diários não expiram)
+
+# Snapshots das rotas anunciadas/recebidas por peering (guardados como diferenças)
+ROUTE_SNAPSHOT_ENABLED = os.getenv("ROUTE_SNAPSHOT_ENABLED", "false").lower() == "true"  # Captura periódica (a captura manual funciona sempre)
+ROUTE_SNAPSHOT_INTERVAL = float(os.getenv("ROUTE_SNAPSHOT_INTERVAL", "21600"))  # Segundos entre duas capturas do mesmo peering
+ROUTE_SNAPSHOT_DIRECTIONS = [d.strip() for d in os.getenv("ROUTE_SNAPSHOT_DIRECTIONS", "advertised,received").split(",") if d.strip()]  # Tabelas capturadas
+ROUTE_SNAPSHOT_MAX_CONCURRENT = int(os.getenv("ROUTE_SNAPSHOT_MAX_CONCURRENT", "2"))  # Capturas simultâneas
+ROUTE_SNAPSHOT_KEYFRAME_RATIO = float(os.getenv("ROUTE_SNAPSHOT_KEYFRAME_RATIO", "1.0"))  # Nova cópia completa quando as diferenças acumuladas passam desta fração da tabela
+ROUTE_SNAPSHOT_RETENTION_DAYS = int(os.getenv("ROUTE_SNAPSHOT_RETENTION_DAYS", "30"))  # Snapshots mais antigos são consolidados e removidos
+
+# RIB em memória (consultas BGP do Looking Glass sem SSH)
+RIB_ENABLED = os.getenv("RIB_ENABLED", "true").lower() == "true"  # Carrega os snapshots de rotas recebidas na inicialização
+RIB_MAX_AGE = float(os.getenv("RIB_MAX_AGE", "86400"))  # Segundos; caminhos de peers sem atualização há mais tempo são ignorados (0 = sem limite)
+
+# Coletor BMP (estado BGP e rotas empurrados pelos roteadores)
+BMP_ENABLED = os.getenv("BMP_ENABLED", "false").lower() == "true"  # Com vários workers, habilite em apenas um
+BMP_HOST = os.getenv("BMP_HOST", "127.0.0.1")  # Escute no IP da rede de gerência, não em 0.0.0.0
+BMP_SOURCES = [item.split("=", 1) for item in os.getenv("BMP_SOURCES", "").split(",") if "=" in item]  # IPs de origem extras "IP=NOME-DO-ROTEADOR,..." (BMP saindo por outra interface que não o Router.ip)
+BMP_PORT = int(os.getenv("BMP_PORT", "11019"))
+BMP_POLICY = os.getenv("BMP_POLICY", "auto")  # pre, post ou auto (a primeira visão recebida de cada peer)
+BMP_MAX_BUFFER = int(os.getenv("BMP_MAX_BUFFER", str(8 * 1024 * 1024)))  # Bytes pendentes por sessão antes de parar de ler do socket
+BMP_BATCH_MESSAGES = int(os.getenv("BMP_BATCH_MESSAGES", "2000"))  # Mensagens processadas por volta do event loop
+
+# Importação de arquivos MRT (TABLE_DUMP_V2 / BGP4MP) para a RIB em memória
+MRT_IMPORT_DIR = os.getenv("MRT_IMPORT_DIR", "/var/lib/bgpcontrol/mrt")  # A API só importa arquivos deste diretório
+MRT_IMPORT_WORKERS = int(os.getenv("MRT_IMPORT_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))  # Processos de parsing
+MRT_IMPORT_CHUNK_MB = int(os.getenv("MRT_IMPORT_CHUNK_MB", "16"))  # Tamanho de cada bloco entregue a um processo
+
+# Cache de resultados do Looking Glass (consultas idênticas compartilham a execução SSH)
+LG_CACHE_TTL_PING = float(os.getenv("LG_CACHE_TTL_PING", "10"))  # Segundos; 0 desliga o cache do tipo
+LG_CACHE_TTL_TRACEROUTE = float(os.getenv("LG_CACHE_TTL_TRACEROUTE", "30"))
+LG_CACHE_TTL_BGP = float(os.getenv("LG_CACHE_TTL_BGP", "60"))  # bgp e bgp-summary
+LG_CACHE_MAX_ENTRIES = int(os.getenv("LG_CACHE_MAX_ENTRIES", "2000"))
+
+# Consultas do Looking Glass guardadas em memória (saída disponível para GET/stream)
+LG_QUERY_MAX_ENTRIES = int(os.getenv("LG_QUERY_MAX_ENTRIES", "5000"))
+LG_QUERY_MAX_BYTES = int(os.getenv("LG_QUERY_MAX_BYTES", str(64 * 1024 * 1024)))  # Total das saídas guardadas
+LG_QUERY_MAX_AGE = float(os.getenv("LG_QUERY_MAX_AGE", "900"))  # Segundos desde o último acesso a uma consulta concluída
+LG_STREAM_REPLAY_LINES = int(os.getenv("LG_STREAM_REPLAY_LINES", "20000"))  # Linhas guardadas por execução para quem assina o stream depois
+LG_BATCH_MAX_QUERIES = int(os.getenv("LG_BATCH_MAX_QUERIES", "200"))  # Roteadores x destinos por consulta em lote
+LG_BATCH_MAX_STORED = int(os.getenv("LG_BATCH_MAX_STORED", "500"))  # Lotes recentes guardados para GET/stream
+
+# Limites de requisições (token bucket) e admissão das rotas que usam SSH
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"  # Usa X-Real-IP ou o último item do X-Forwarded-For (só atrás de proxy confiável)
+LG_RATE_PER_IP = float(os.getenv("LG_RATE_PER_IP", "30"))  # Consultas do Looking Glass por minuto por IP (0 = sem limite)
+LG_BURST_PER_IP = float(os.getenv("LG_BURST_PER_IP", "10"))
+LG_RATE_PER_USER = float(os.getenv("LG_RATE_PER_USER", "120"))  # Por usuário autenticado
+LG_BURST_PER_USER = float(os.getenv("LG_BURST_PER_USER", "30"))
+LG_RATE_PER_ROUTER = float(os.getenv("LG_RATE_PER_ROUTER", "60"))  # Execuções SSH por minuto por roteador (cache e execuções compartilhadas não contam)
+LG_BURST_PER_ROUTER = float(os.getenv("LG_BURST_PER_ROUTER", "20"))
+LG_BATCH_RATE_PER_IP = float(os.getenv("LG_BATCH_RATE_PER_IP", "200"))  # Consultas em lote (roteadores x destinos) por minuto por IP, orçamento à parte
+LG_BATCH_BURST_PER_IP = float(os.getenv("LG_BATCH_BURST_PER_IP", str(LG_BATCH_MAX_QUERIES)))  # Rajada >= LG_BATCH_MAX_QUERIES, senão um lote cheio nunca passa
+LG_BATCH_RATE_PER_USER = float(os.getenv("LG_BATCH_RATE_PER_USER", "600"))
+LG_BATCH_BURST_PER_USER = float(os.getenv("LG_BATCH_BURST_PER_USER", str(LG_BATCH_MAX_QUERIES)))
+SSH_RATE_PER_IP = float(os.getenv("SSH_RATE_PER_IP", "120"))  # Demais rotas com SSH (status BGP, ping, ações em peerings)
+SSH_BURST_PER_IP = float(os.getenv("SSH_BURST_PER_IP", "30"))
+SSH_RATE_PER_USER = float(os.getenv("SSH_RATE_PER_USER", "120"))
+SSH_BURST_PER_USER = float(os.getenv("SSH_BURST_PER_USER", "30"))
+LG_MAX_RUNNING = int(os.getenv("LG_MAX_RUNNING", "32"))  # Execuções do Looking Glass simultâneas (todos os roteadores)
+LG_MAX_WAITING = int(os.getenv("LG_MAX_WAITING", "64"))  # Na fila além dessas; acima disso 429
+LG_BATCH_MAX_ADMISSION = int(os.getenv("LG_BATCH_MAX_ADMISSION", str(max(1, LG_MAX_WAITING // 2))))  # Execuções novas que um único lote pode reservar
+
+# Estado das consultas do Looking Glass compartilhado entre workers/nós
+LG_STATE_BACKEND = os.getenv("LG_STATE_BACKEND", "memory")  # memory (um único worker) ou postgres (tabelas + LISTEN/NOTIFY no banco da aplicação)
+LG_STATE_MAX_PENDING = int(os.getenv("LG_STATE_MAX_PENDING", "10000"))  # Escritas aguardando o banco; acima disso são descartadas
+LG_STATE_STALE_AFTER = float(os.getenv("LG_STATE_STALE_AFTER", "60"))  # Segundos sem sinal do worker dono para dar a execução como interrompida
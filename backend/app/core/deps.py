@@ -1,4 +1,4 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from app.models.user import User
@@ -6,10 +6,14 @@ from app.core.config import SessionLocal
 from sqlalchemy.future import select
 from sqlalchemy.ext.asyncio import AsyncSession
 import os
+from typing import List, Optional, Tuple
+from app.schemas.looking_glass import BatchQueryRequest
+from app.services.rate_limit import rate_limiter, client_ip, CostExceeded
 
 from app.core.config import SECRET_KEY, ALGORITHM
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login", auto_error=False)
 
 async def get_db():
     async with SessionLocal() as session:
@@ -43,3 +47,38 @@ def is_operator_or_admin(current_user: User = Depends(get_current_user)):
     if current_user.profile not in ("Administrador", "Operador"):
         raise HTTPException(status_code=403, detail="Acesso restrito a operadores ou administradores.")
     return current_user
+
+def token_subject(token: Optional[str]) -> Optional[str]:
+    """Usuário do token sem consultar o banco (só para limites; a autenticação continua em get_current_user)"""
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+    except JWTError:
+        return None
+
+def rate_limit_keys(prefix: str, request: Request, token: Optional[str]) -> List[Tuple[str, str]]:
+    # Autenticado: bucket do usuário (vários operadores atrás do mesmo NAT); senão, do IP
+    # Streams SSE mandam o token na query string (EventSource não envia cabeçalhos)
+    username = token_subject(token or request.query_params.get("token"))
+    if username:
+        return [(f"{prefix}_user", username)]
+    return [(f"{prefix}_ip", client_ip(request))]
+
+async def limit_looking_glass(request: Request, token: Optional[str] = Depends(optional_oauth2_scheme)):
+    rate_limiter.acquire(rate_limit_keys("lg", request, token))
+
+async def limit_looking_glass_batch(
+    http_request: Request,
+    request: BatchQueryRequest,
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+):
+    # Orçamento próprio dos lotes (o mesmo corpo da rota): cada par (roteador, destino) conta uma consulta
+    cost = len(set(request.routerIds)) * len({t.strip() for t in request.targets if t.strip()})
+    try:
+        rate_limiter.acquire(rate_limit_keys("lg_batch", http_request, token), cost=max(1, cost))
+    except CostExceeded as e:
+        raise HTTPException(status_code=400, detail=f"Lote com {cost} consultas excede o limite de {e.capacity:g} por cliente")
+
+async def limit_ssh_requests(request: Request, token: Optional[str] = Depends(optional_oauth2_scheme)):
+    rate_limiter.acquire(rate_limit_keys("ssh", request, token))
@@ -1,6 +1,18 @@
-from fastapi import FastAPI
-from app.routers import user, router, peering, peering_group, ssh, ssh_bgp, ssh_bgp_group, peering_group_stream, peering_stream, dashboard, looking_glass, audit, asn_lookup, database_backup, audit_cleanup
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.routers import user, router, peering, peering_group, ssh, ssh_bgp, ssh_bgp_group, peering_group_stream, peering_stream, dashboard, looking_glass, audit, asn_lookup, database_backup, audit_cleanup, bgp_history, route_snapshots, mrt
 from app.middleware.audit import AuditMiddleware
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_executor import ssh_executor
+from app.services.router_health import router_health, RouterUnavailable
+from app.services.rate_limit import RateLimited, retry_after_header
+from app.services.ssh_host_keys import host_key_store
+from app.services.bgp_poller import bgp_poller
+from app.services.route_snapshots import route_snapshots as route_snapshot_service
+from app.services.rib import rib_store
+from app.services.bmp import bmp_collector
+from app.services.looking_glass import looking_glass_service
+from app.core.config import BGP_POLL_ENABLED, ROUTE_SNAPSHOT_ENABLED, RIB_ENABLED, BMP_ENABLED
 
 app = FastAPI()
 
@@ -37,6 +49,84 @@ app.include_router(peering_group_stream.router, prefix="/api/peering-groups", ta
 app.include_router(peering_stream.router, prefix="/api/peerings", tags=["peerings"])
 app.include_router(database_backup.router, prefix="/api/database-backup", tags=["database-backup"])
 app.include_router(audit_cleanup.router, prefix="/api/audit-cleanup", tags=["audit-cleanup"])
+app.include_router(bgp_history.router, prefix="/api/bgp-history", tags=["bgp-history"])
+app.include_router(route_snapshots.router, prefix="/api/route-snapshots", tags=["route-snapshots"])
+app.include_router(mrt.router, prefix="/api/mrt", tags=["mrt"])
+
+@app.exception_handler(RouterUnavailable)
+async def router_unavailable_handler(request: Request, exc: RouterUnavailable):
+    # Roteador com circuito aberto: falha rápida, sem esperar timeouts SSH
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    # Recusa antes de qualquer sessão SSH ou consulta ao banco
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+@app.on_event("startup")
+async def load_ssh_host_keys():
+    # Chaves de host conhecidas ficam em memória; novas são gravadas no banco
+    await host_key_store.load()
+
+@app.on_event("startup")
+async def start_bgp_poller():
+    # Snapshot do estado BGP de todos os roteadores, usado pelo dashboard
+    if BGP_POLL_ENABLED:
+        bgp_poller.start()
+
+@app.on_event("shutdown")
+async def stop_bgp_poller():
+    await bgp_poller.stop()
+
+@app.on_event("startup")
+async def start_route_snapshots():
+    # Captura periódica das tabelas de rotas dos peerings (gravadas como diferenças)
+    if ROUTE_SNAPSHOT_ENABLED:
+        route_snapshot_service.start()
+
+@app.on_event("shutdown")
+async def stop_route_snapshots():
+    await route_snapshot_service.stop()
+
+@app.on_event("startup")
+async def load_rib():
+    # RIB em memória a partir dos últimos snapshots de rotas recebidas (Looking Glass sem SSH)
+    if RIB_ENABLED:
+        rib_store.start()
+
+@app.on_event("startup")
+async def start_bmp_collector():
+    # Sessões BMP dos roteadores: estado dos peers e rotas empurrados em tempo real
+    if BMP_ENABLED:
+        await bmp_collector.start()
+
+@app.on_event("shutdown")
+async def stop_bmp_collector():
+    await bmp_collector.stop()
+
+@app.on_event("startup")
+async def start_looking_glass_state():
+    # Consultas visíveis a todos os workers (LG_STATE_BACKEND=postgres)
+    await looking_glass_service.state.start()
+
+@app.on_event("shutdown")
+async def stop_looking_glass_state():
+    await looking_glass_service.state.stop()
+
+@app.on_event("shutdown")
+def close_ssh_connections():
+    # Encerra as threads SSH e fecha os transportes persistentes do pool
+    router_health.shutdown()
+    ssh_executor.shutdown()
+    ssh_pool.close_all()
 
 @app.get("/")
 def read_root():
@@ -2,4 +2,8 @@ from .user import User
 from .router import Router
 from .peering import Peering
 from .peering_group import PeeringGroup
-from .audit_log import AuditLog
\ No newline at end of file
+from .audit_log import AuditLog
+from .ssh_host_key import SSHHostKey
+from .bgp_peer_history import BGPPeerHistory
+from .route_snapshot import RouteSnapshot
+from .looking_glass_query import LookingGlassQueryState, LookingGlassQueryLines
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint, Index
+from app.models.user import Base
+
+class BGPPeerHistory(Base):
+    """Resumo do estado BGP de um peering em um intervalo (1 min, 1 h ou 1 dia)"""
+    __tablename__ = "bgp_peer_history"
+    __table_args__ = (
+        UniqueConstraint("peering_id", "resolution", "bucket_start", name="uq_bgp_peer_history_bucket"),
+        Index("ix_bgp_peer_history_resolution_bucket", "resolution", "bucket_start"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    peering_id = Column(Integer, ForeignKey("peerings.id", ondelete="CASCADE"), nullable=False)
+    resolution = Column(Integer, nullable=False)  # Tamanho do intervalo em segundos: 60, 3600 ou 86400
+    bucket_start = Column(DateTime, nullable=False)  # Início do intervalo (UTC)
+    samples = Column(Integer, nullable=False)  # Coletas no intervalo
+    up_samples = Column(Integer, nullable=False)  # Coletas com a sessão Established
+    flaps = Column(Integer, nullable=False, default=0)  # Quedas da sessão (saída de Established ou uptime zerado)
+    state_last = Column(String(20), nullable=False)  # Estado na última coleta
+    prefixes_min = Column(Integer, nullable=True)
+    prefixes_max = Column(Integer, nullable=True)
+    prefixes_last = Column(Integer, nullable=True)
+    advertised_last = Column(Integer, nullable=True)
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.models.user import Base
+
+class LookingGlassQueryState(Base):
+    """
+    Estado de uma consulta do Looking Glass visível a todos os workers
+    (LG_STATE_BACKEND=postgres). O worker que executa a consulta é o dono da
+    linha; os outros a leem para GET /query e /stream.
+    """
+    __tablename__ = "looking_glass_queries"
+
+    id = Column(String(36), primary_key=True)
+    stream_id = Column(String(36), nullable=False, index=True)  # Execução (id da primeira consulta); consultas idênticas compartilham a saída
+    type = Column(String(16), nullable=False)
+    target = Column(String(255), nullable=False)
+    router = Column(String(255), nullable=False)
+    status = Column(String(16), nullable=False)  # pending, running, completed ou error
+    output = Column(Text, nullable=True)
+    error = Column(Text, nullable=True)
+    cached_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, nullable=False)  # Horário da consulta (mesmo relógio de LookingGlassQuery.timestamp)
+    updated_at = Column(DateTime, nullable=False, index=True)  # UTC; renovado pelo dono enquanto a execução dura
+    owner = Column(String(128), nullable=False)  # host:pid do worker que executa
+
+class LookingGlassQueryLines(Base):
+    """Saída de uma execução em blocos numerados, para o replay de quem assina o stream em outro worker"""
+    __tablename__ = "looking_glass_query_lines"
+
+    stream_id = Column(String(36), primary_key=True)
+    seq = Column(Integer, primary_key=True)
+    lines = Column(Text, nullable=False)  # Lista JSON de linhas
+    created_at = Column(DateTime, nullable=False, index=True)  # UTC
@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, LargeBinary, Index
+from app.models.user import Base
+
+class RouteSnapshot(Base):
+    """
+    Tabela de rotas de um peering em um instante, guardada como diferença em
+    relação ao snapshot anterior (delta). Alguns snapshots também guardam a
+    tabela completa (keyframe), ponto de partida para reconstruir os seguintes.
+    """
+    __tablename__ = "route_snapshots"
+    __table_args__ = (
+        Index("ix_route_snapshots_peering_direction_taken", "peering_id", "direction", "taken_at"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    peering_id = Column(Integer, ForeignKey("peerings.id", ondelete="CASCADE"), nullable=False)
+    direction = Column(String(16), nullable=False)  # 'advertised' ou 'received'
+    taken_at = Column(DateTime, nullable=False)  # UTC
+    trigger = Column(String(16), nullable=False, default="manual")  # 'scheduled', 'manual' ou 'mrt' (importação de arquivo)
+    source_time = Column(DateTime, nullable=True)  # UTC; horário do próprio dump na importação MRT (taken_at é o da gravação)
+    route_count = Column(Integer, nullable=False)
+    added = Column(Integer, nullable=False, default=0)
+    withdrawn = Column(Integer, nullable=False, default=0)
+    changed = Column(Integer, nullable=False, default=0)  # Mesmo prefixo com atributos diferentes
+    delta = Column(LargeBinary, nullable=False)  # JSON comprimido: rotas novas/alteradas e prefixos retirados
+    keyframe = Column(LargeBinary, nullable=True)  # JSON comprimido da tabela completa
@@ -0,0 +1,15 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, UniqueConstraint
+from datetime import datetime
+from app.models.user import Base
+
+class SSHHostKey(Base):
+    __tablename__ = "ssh_host_keys"
+    __table_args__ = (UniqueConstraint("hostname", "key_type", name="uq_ssh_host_keys_hostname_key_type"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    hostname = Column(String(255), nullable=False, index=True)  # "ip" ou "[ip]:porta", como no known_hosts
+    key_type = Column(String(50), nullable=False)  # ssh-rsa, ecdsa-sha2-nistp256, ssh-ed25519...
+    key_data = Column(Text, nullable=False)  # Chave pública em base64
+    fingerprint = Column(String(128), nullable=False)  # SHA256 da chave, para exibição
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
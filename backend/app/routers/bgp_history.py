@@ -0,0 +1,85 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.peering import Peering
+from app.core.config import SessionLocal
+from app.core.deps import get_current_user
+from app.models.user import User
+from app.services.bgp_history import bgp_history, RESOLUTION_NAMES
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+router = APIRouter()
+
+# Janela padrão e máximo de pontos por série
+JANELA_PADRAO = {"1m": timedelta(hours=6), "1h": timedelta(days=7), "1d": timedelta(days=90)}
+MAX_PONTOS = 5000
+
+async def get_db():
+    async with SessionLocal() as session:
+        yield session
+
+def _utc(value: datetime) -> datetime:
+    # Como nas respostas (e nos snapshots de rotas): sem fuso é UTC; sempre devolvido com fuso
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+@router.get("/peerings/{peering_id}")
+async def get_peering_history(
+    peering_id: int,
+    resolution: str = Query("1m", description="raw (coletas em memória), 1m, 1h ou 1d"),
+    since: Optional[datetime] = Query(None),
+    until: Optional[datetime] = Query(None),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Série temporal do peering em colunas (pronta para sparkline): estado,
+    disponibilidade, quedas e prefixos recebidos/anunciados.
+    """
+    peering = await db.get(Peering, peering_id)
+    if not peering:
+        raise HTTPException(status_code=404, detail="Peering não encontrado")
+    since = _utc(since) if since else None
+    if resolution == "raw":
+        series = bgp_history.raw_series(peering_id, since)
+        if series is None:
+            raise HTTPException(status_code=404, detail="Sem coletas em memória para este peering")
+        return {"peering_id": peering_id, "resolution": "raw", **series}
+    if resolution not in RESOLUTION_NAMES:
+        raise HTTPException(status_code=400, detail="Resolução inválida (use raw, 1m, 1h ou 1d)")
+    step = RESOLUTION_NAMES[resolution]
+    until = _utc(until) if until else datetime.now(timezone.utc)
+    since = since or until - JANELA_PADRAO[resolution]
+    if since >= until:
+        raise HTTPException(status_code=400, detail="'since' deve ser anterior a 'until'")
+    if (until - since).total_seconds() / step > MAX_PONTOS:
+        raise HTTPException(status_code=400, detail=f"Período longo demais para {resolution} (máximo {MAX_PONTOS} pontos)")
+    series = await bgp_history.series(db, peering_id, step, since, until)
+    return {"peering_id": peering_id, "resolution": resolution, **series}
+
+@router.get("/flaps")
+async def get_flapping_peerings(
+    window_minutes: int = Query(60, ge=1, le=24 * 60),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Peerings com quedas de sessão ou perda de prefixos na janela (coletas em memória).
+    """
+    report = bgp_history.flaps_report(window_minutes * 60, limit)
+    if report:
+        ids = [r["peering_id"] for r in report]
+        result = await db.execute(select(Peering.id, Peering.name, Peering.ip, Peering.router_id).where(Peering.id.in_(ids)))
+        info = {row.id: row for row in result}
+        for r in report:
+            row = info.get(r["peering_id"])
+            r["name"] = row.name if row else None
+            r["ip"] = row.ip if row else None
+            r["router_id"] = row.router_id if row else None
+    return {"window_minutes": window_minutes, "peerings": report}
+
+@router.get("/stats")
+async def get_history_stats(current_user: User = Depends(get_current_user)):
+    """Uso de memória e gravação do histórico"""
+    return bgp_history.stats()
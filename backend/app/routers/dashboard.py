@@ -7,6 +7,7 @@ from app.models.router import Router
 from app.core.config import SessionLocal
 from app.core.deps import get_current_user
 from app.models.user import User
+from app.services.bgp_poller import bgp_poller
 
 router = APIRouter()
 
@@ -49,9 +50,6 @@ async def dashboard_status(db: AsyncSession = Depends(get_db), current_user: Use
         "groups": {
             "total": total_grupos
         },
-        "sessions": {
-            "total": 0,  # Placeholder - implementar posteriormente
-            "up": 0,
-            "down": 0
-        }
+        # Estado das sessões vindo da coleta periódica (sem SSH aqui)
+        "sessions": bgp_poller.sessions([p.id for p in peerings if p.is_active])
     }
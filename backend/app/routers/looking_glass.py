@@ -1,14 +1,21 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from fastapi.responses import StreamingResponse
 import asyncio
+import json
 import logging
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.router import Router
-from app.schemas.looking_glass import QueryRequest, QueryResponse, LookingGlassQuery
+from app.schemas.looking_glass import QueryRequest, QueryResponse, LookingGlassQuery, BatchQueryRequest, BatchQueryResponse
 from app.services.looking_glass import looking_glass_service
-from app.core.deps import get_db
+from app.services.rib import rib_store
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_host_keys import host_key_store
+from app.services.ssh_stream import sse_data, sse_heartbeat, SSE_HEADERS
+from app.core.config import SSE_HEARTBEAT_INTERVAL
+from app.core.deps import get_db, limit_looking_glass, limit_looking_glass_batch
+from app.services.rate_limit import RateLimited
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -18,7 +25,7 @@ async def get_routers(db: AsyncSession = Depends(get_db)):
     """Retorna lista de roteadores disponíveis para Looking Glass"""
     return await looking_glass_service.get_available_routers(db)
 
-@router.post("/query", response_model=QueryResponse)
+@router.post("/query", response_model=QueryResponse, dependencies=[Depends(limit_looking_glass)])
 async def execute_query(request: QueryRequest, db: AsyncSession = Depends(get_db)):
     """Executa uma consulta de Looking Glass"""
     try:
@@ -32,6 +39,8 @@ async def execute_query(request: QueryRequest, db: AsyncSession = Depends(get_db
         
         logger.info(f"Query Looking Glass iniciada com sucesso: {result.id}")
         return result
+    except RateLimited:
+        raise
     except asyncio.TimeoutError:
         error_msg = "Timeout ao iniciar consulta Looking Glass"
         logger.error(error_msg)
@@ -44,110 +53,153 @@ async def execute_query(request: QueryRequest, db: AsyncSession = Depends(get_db
 async def get_query(query_id: str):
     """Retorna detalhes de uma query específica"""
     try:
-        return looking_glass_service.get_query(query_id)
+        return await looking_glass_service.find_query(query_id)
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
 @router.get("/stream/{query_id}")
 async def stream_query_output(query_id: str):
-    """Stream de saída de uma query em tempo real"""
+    """Stream de saída de uma query em tempo real (linhas publicadas pela execução SSH)"""
     
     logger.info(f"Iniciando stream para query {query_id}")
     
     async def generate():
+        pinned = False
         try:
-            # Aguardar um pouco para que a query seja criada
-            retry_count = 0
-            max_retries = 10
-            
-            while retry_count < max_retries:
-                try:
-                    query = looking_glass_service.get_query(query_id)
-                    break
-                except ValueError:
-                    # Query ainda não existe, aguardar um pouco
-                    await asyncio.sleep(0.1)
-                    retry_count += 1
-            else:
-                yield f"data: Erro: Query {query_id} não encontrada após aguardar\n\n"
-                yield "data: [FIM]\n\n"
-                return
-            
-            # Se a query já está completa, enviar resultado imediatamente
-            if query.status in ["completed", "error"]:
-                logger.info(f"Query {query_id} já completa, enviando resultado imediatamente")
-                if query.output:
-                    logger.info(f"Enviando output com {len(query.output)} caracteres")
-                    # Enviar linha por linha para melhor processamento no frontend
-                    for line in query.output.split('\n'):
-                        if line.strip():  # Só enviar linhas não vazias
-                            yield f"data: {line}\n\n"
-                elif query.error:
-                    logger.info(f"Enviando erro: {query.error}")
-                    yield f"data: Erro: {query.error}\n\n"
-                yield "data: [FIM]\n\n"
+            try:
+                query = await looking_glass_service.find_query(query_id)
+            except ValueError:
+                yield sse_data(f"Erro: Query {query_id} não encontrada")
+                yield sse_data("[FIM]")
                 return
             
-            # Para queries em execução, fazer polling dos resultados
-            previous_output = ""
-            max_wait_time = 120  # 2 minutos máximo
-            wait_time = 0
-            
-            while query.status in ["pending", "running"] and wait_time < max_wait_time:
-                await asyncio.sleep(0.5)  # Polling interval
-                wait_time += 0.5
-                
-                try:
-                    current_query = looking_glass_service.get_query(query_id)
-                    
-                    if current_query.output and current_query.output != previous_output:
-                        # Enviar apenas a diferença
-                        new_content = current_query.output[len(previous_output):]
-                        for line in new_content.split('\n'):
-                            if line.strip():
-                                yield f"data: {line}\n\n"
-                        previous_output = current_query.output
-                    
-                    query = current_query
-                except ValueError:
-                    # Query pode ter sido removida
-                    break
-            
-            # Verificar se houve timeout
-            if wait_time >= max_wait_time and query.status in ["pending", "running"]:
-                yield f"data: Timeout aguardando resultado da consulta\n\n"
-                yield "data: [FIM]\n\n"
-                return
+            # A consulta não é removida do armazenamento enquanto este stream estiver aberto
+            looking_glass_service.queries.pin(query_id)
+            pinned = True
             
-            # Query finalizada
-            if query.status == "completed" and query.output:
-                final_content = query.output[len(previous_output):]
-                if final_content:
-                    for line in final_content.split('\n'):
-                        if line.strip():
-                            yield f"data: {line}\n\n"
-            elif query.status == "error":
-                yield f"data: Erro: {query.error}\n\n"
+            # Em execução: assina o canal (replay do que já saiu, depois as linhas novas)
+            channel = looking_glass_service.channels.get(query_id)
+            if channel is not None:
+                async for line in channel.subscribe(heartbeat=SSE_HEARTBEAT_INTERVAL):
+                    if line is None:
+                        yield sse_heartbeat()
+                    elif line.strip():  # Só enviar linhas não vazias
+                        yield sse_data(line)
+            elif query.status in ("pending", "running"):
+                # Executada por outro worker: replay e linhas novas pelo estado compartilhado
+                async for line in looking_glass_service.state.follow(query_id, heartbeat=SSE_HEARTBEAT_INTERVAL):
+                    if line is None:
+                        yield sse_heartbeat()
+                    elif line.strip():
+                        yield sse_data(line)
+                query = await looking_glass_service.find_query(query_id)
+                if query.status in ("pending", "running"):
+                    query.status, query.error = "error", "Stream da execução interrompido"
+            elif query.output:
+                # Já concluída: envia o resultado guardado de uma vez
+                logger.info(f"Query {query_id} já completa, enviando {len(query.output)} caracteres")
+                for line in query.output.split('\n'):
+                    if line.strip():
+                        yield sse_data(line)
             
-            yield "data: [FIM]\n\n"
+            if query.status == "error":
+                yield sse_data(f"Erro: {query.error}")
+            yield sse_data("[FIM]")
             
         except Exception as e:
             logger.error(f"Erro no stream da query {query_id}: {e}")
-            yield f"data: Erro interno: {str(e)}\n\n"
-            yield "data: [FIM]\n\n"
+            yield sse_data(f"Erro interno: {str(e)}")
+            yield sse_data("[FIM]")
+        finally:
+            if pinned:
+                looking_glass_service.queries.unpin(query_id)
     
     return StreamingResponse(
         generate(),
         media_type="text/event-stream",
         headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
+            **SSE_HEADERS,
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Headers": "*",
         }
     )
 
-@router.post("/test-connection/{router_id}")
+@router.post(
+    "/batch",
+    response_model=BatchQueryResponse,
+    dependencies=[Depends(limit_looking_glass), Depends(limit_looking_glass_batch)],
+)
+async def execute_batch_query(request: BatchQueryRequest, db: AsyncSession = Depends(get_db)):
+    """Executa a mesma consulta em vários roteadores e destinos; a saída sai por /batch/{id}/stream"""
+    try:
+        return await looking_glass_service.execute_batch(request, db)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/batch/{batch_id}")
+async def get_batch(batch_id: str):
+    """Situação e resumo agregado de uma consulta em lote"""
+    batch = looking_glass_service.batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Lote {batch_id} não encontrado")
+    return looking_glass_service.batch_summary(batch)
+
+@router.get("/batch/{batch_id}/stream")
+async def stream_batch_output(batch_id: str):
+    """
+    Stream único do lote: eventos JSON "line" (linha de saída com roteador e
+    destino), "result" (cada consulta ao terminar) e "summary" no fim
+    """
+    batch = looking_glass_service.batches.get(batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail=f"Lote {batch_id} não encontrado")
+    
+    async def generate():
+        try:
+            async for event in looking_glass_service.stream_batch(batch, heartbeat=SSE_HEARTBEAT_INTERVAL):
+                yield sse_heartbeat() if event is None else sse_data(json.dumps(event, default=str))
+            yield sse_data("[FIM]")
+        except Exception as e:
+            logger.error(f"Erro no stream do lote {batch_id}: {e}")
+            yield sse_data(f"Erro interno: {str(e)}")
+            yield sse_data("[FIM]")
+    
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={
+            **SSE_HEADERS,
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Headers": "*",
+        }
+    )
+
+@router.get("/rib/{router_id}")
+async def query_rib(
+    router_id: int,
+    target: str = Query(..., description="Endereço (longest-prefix-match) ou prefixo"),
+    mode: str = Query("match", description="match, covering (menos específicos) ou covered (mais específicos)"),
+    limit: int = Query(100, ge=1, le=10000),
+):
+    """Consulta a RIB em memória do roteador, sem SSH"""
+    if not rib_store.has_router(router_id):
+        raise HTTPException(status_code=404, detail="Roteador sem RIB em memória")
+    rib = rib_store.rib(router_id)
+    try:
+        if mode == "match":
+            entry = rib.lookup(target, rib_store.max_age)
+            routes = [entry] if entry else []
+        elif mode == "covering":
+            routes = rib.covering(target, rib_store.max_age)
+        elif mode == "covered":
+            routes = rib.covered(target, limit, rib_store.max_age)
+        else:
+            raise HTTPException(status_code=400, detail="Modo inválido (use match, covering ou covered)")
+    except (ValueError, OSError):
+        raise HTTPException(status_code=400, detail=f"Destino inválido: {target}")
+    return {"router_id": router_id, "target": target, "mode": mode, "routes": routes[:limit]}
+
+@router.post("/test-connection/{router_id}", dependencies=[Depends(limit_looking_glass)])
 async def test_router_connection(router_id: int, db: AsyncSession = Depends(get_db)):
     """Testa a conectividade SSH com o roteador"""
     try:
@@ -170,10 +222,9 @@ async def test_router_connection(router_id: int, db: AsyncSession = Depends(get_
         password = base64.b64decode(router.ssh_password.encode()).decode()
         
         # Conectar via SSH com timeout menor para teste
-        client = paramiko.SSHClient()
-        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client = host_key_store.configure(paramiko.SSHClient())
         
-        try:
+        def probe():
             client.connect(
                 hostname=router.ip,
                 port=router.ssh_port,
@@ -192,6 +243,11 @@ async def test_router_connection(router_id: int, db: AsyncSession = Depends(get_
             command_time = time.time() - command_start
             
             client.close()
+            return connection_time, output, error, command_time
+        
+        try:
+            # Conexão nova de propósito (mede o handshake), mas fora do event loop
+            connection_time, output, error, command_time = await ssh_executor.run(probe)
             
             result_data = {
                 "status": "success",
@@ -247,7 +303,7 @@ async def test_router_connection(router_id: int, db: AsyncSession = Depends(get_
         logger.error(f"Erro ao testar conectividade: {e}")
         raise HTTPException(status_code=500, detail=f"Erro ao testar conectividade: {str(e)}")
 
-@router.post("/debug-ping")
+@router.post("/debug-ping", dependencies=[Depends(limit_looking_glass)])
 async def debug_ping_execution(request: QueryRequest, db: AsyncSession = Depends(get_db)):
     """Debug detalhado da execução de ping para identificar problemas"""
     try:
@@ -317,11 +373,11 @@ async def debug_ping_execution(request: QueryRequest, db: AsyncSession = Depends
         try:
             password = base64.b64decode(router.ssh_password.encode()).decode()
             
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+            client = host_key_store.configure(paramiko.SSHClient())
             
             connect_start = time.time()
-            client.connect(
+            await ssh_executor.run(
+                client.connect,
                 hostname=router.ip,
                 port=router.ssh_port,
                 username=router.ssh_user,
@@ -353,20 +409,19 @@ async def debug_ping_execution(request: QueryRequest, db: AsyncSession = Depends
             })
             
             command_start = time.time()
-            stdin, stdout, stderr = client.exec_command(command, timeout=60)
             
-            # Ler output progressivamente para debug
-            output_lines = []
-            error_lines = []
+            def run_ping():
+                stdin, stdout, stderr = client.exec_command(command, timeout=60)
+                # Ler com timeout para evitar travamento
+                output = stdout.read().decode('utf-8', errors='ignore')
+                error = stderr.read().decode('utf-8', errors='ignore')
+                client.close()
+                return output, error
             
-            # Ler com timeout para evitar travamento
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
+            output, error = await ssh_executor.run(run_ping)
             
             command_time = time.time() - command_start
             
-            client.close()
-            
             debug_info["steps"].append({
                 "step": 4, 
                 "status": "completed",
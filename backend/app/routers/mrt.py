@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models.router import Router
+from app.core.config import SessionLocal, MRT_IMPORT_DIR
+from app.core.deps import get_current_user, is_admin
+from app.models.user import User
+from app.schemas.mrt import MRTImportRequest
+from app.services.mrt import mrt_importer
+from pathlib import Path
+
+router = APIRouter()
+
+async def get_db():
+    async with SessionLocal() as session:
+        yield session
+
+def _import_path(name: str) -> Path:
+    # Só arquivos dentro de MRT_IMPORT_DIR (sem caminhos absolutos nem "..")
+    base = Path(MRT_IMPORT_DIR).resolve()
+    path = (base / name).resolve()
+    if base not in path.parents or not path.is_file():
+        raise HTTPException(status_code=404, detail="Arquivo MRT não encontrado")
+    return path
+
+@router.get("/files")
+async def list_mrt_files(current_user: User = Depends(get_current_user)):
+    """Arquivos disponíveis para importação em MRT_IMPORT_DIR"""
+    base = Path(MRT_IMPORT_DIR)
+    if not base.is_dir():
+        return {"directory": str(base), "files": []}
+    files = [
+        {"file": str(path.relative_to(base)), "size": path.stat().st_size}
+        for path in sorted(base.rglob("*")) if path.is_file()
+    ]
+    return {"directory": str(base), "files": files}
+
+@router.post("/imports", status_code=202)
+async def start_mrt_import(
+    data: MRTImportRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(is_admin),
+):
+    """Importa um dump TABLE_DUMP_V2/BGP4MP em segundo plano; o progresso sai em GET /imports/{id}"""
+    path = _import_path(data.file)
+    if data.router_id is not None and not await db.get(Router, data.router_id):
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    if mrt_importer.running:
+        raise HTTPException(status_code=409, detail="Já existe uma importação MRT em andamento")
+    job = mrt_importer.start(str(path), data.router_id, data.snapshots)
+    return job.to_dict()
+
+@router.get("/imports")
+async def list_mrt_imports(current_user: User = Depends(get_current_user)):
+    return mrt_importer.stats()
+
+@router.get("/imports/{import_id}")
+async def get_mrt_import(import_id: int, current_user: User = Depends(get_current_user)):
+    job = mrt_importer.imports.get(import_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return job.to_dict()
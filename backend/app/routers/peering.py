@@ -6,10 +6,15 @@ from app.models.peering_group import PeeringGroup
 from app.models.router import Router
 from app.schemas.peering import PeeringCreate, PeeringRead, PeeringUpdate
 from app.core.config import SessionLocal
-from app.core.deps import get_current_user, is_operator_or_admin
+from app.core.deps import get_current_user, is_operator_or_admin, limit_ssh_requests
 from app.models.user import User
 from typing import List
-import paramiko
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_executor import ssh_executor
+from app.services.router_health import RouterUnavailable
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import InteractiveShell
+from app.services.bgp_poller import bgp_poller
 import traceback
 
 router = APIRouter()
@@ -89,18 +94,15 @@ async def enable_peering(peering_id: int, db: AsyncSession = Depends(get_db), cu
     await db.commit()
     return {"ok": True}
 
-def run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action):
+def run_bgp_commands_via_shell(router, asn, peer_ips, action):
     """
     Executa comandos BGP em sessão shell interativa (Huawei/H3C).
     action: 'enable' (undo peer ... ignore) ou 'disable' (peer ... ignore)
     """
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    output = ""
-    try:
-        client.connect(hostname, port=port, username=username, password=password, look_for_keys=False, allow_agent=False, timeout=10)
-        shell = client.invoke_shell()
-        shell.settimeout(5)
+    with ssh_pool.shell(router) as channel:
+        shell = InteractiveShell(channel)
+        # Banner e prompt inicial
+        output = shell.read_until_prompt()
         cmds = [
             "system-view",
             f"bgp {asn}",
@@ -113,96 +115,69 @@ def run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips
         cmds.append("commit")
         cmds.append("return")
         for cmd in cmds:
-            shell.send(cmd + "\n")
-            buff = ""
-            # Aguarda prompt de finalização
-            while not buff.endswith("> ") and not buff.endswith("# "):
-                try:
-                    resp = shell.recv(4096).decode("utf-8")
-                    buff += resp
-                except Exception:
-                    break
-            output += f"{buff}\n"
-        shell.close()
-        client.close()
-        return output
-    except Exception as e:
-        client.close()
-        raise HTTPException(status_code=500, detail=f"Erro SSH: {str(e)}")
+            # Retorna assim que o prompt aparece
+            output += shell.send_command(cmd) + "\n"
+    return output
 
-@router.post("/{peering_id}/bgp-enable")
-async def bgp_enable(peering_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/{peering_id}/bgp-enable", dependencies=[Depends(limit_ssh_requests)])
+async def bgp_enable(peering_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(is_operator_or_admin)):
     peering = await db.get(Peering, peering_id)
     if not peering:
         raise HTTPException(status_code=404, detail="Peering não encontrado")
     router = await db.get(Router, peering.router_id)
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
-    
-    import base64
-    
-    # Decodificar senha
-    try:
-        password = base64.b64decode(router.ssh_password.encode()).decode()
-    except:
-        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-        password = router.ssh_password
-    
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    asn = router.asn
     peer_ips = [peering.ip]
     try:
-        output = run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action="enable")
+        output = await ssh_executor.run_on_router(router, run_bgp_commands_via_shell, router.asn, peer_ips, action="enable", priority=Priority.INTERACTIVE)
         return {"output": output}
+    except RouterUnavailable:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao executar comandos BGP: {e}\n{tb}")
 
-@router.post("/{peering_id}/bgp-disable")
-async def bgp_disable(peering_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/{peering_id}/bgp-disable", dependencies=[Depends(limit_ssh_requests)])
+async def bgp_disable(peering_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(is_operator_or_admin)):
     peering = await db.get(Peering, peering_id)
     if not peering:
         raise HTTPException(status_code=404, detail="Peering não encontrado")
     router = await db.get(Router, peering.router_id)
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
-    
-    import base64
-    
-    # Decodificar senha
-    try:
-        password = base64.b64decode(router.ssh_password.encode()).decode()
-    except:
-        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-        password = router.ssh_password
-    
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    asn = router.asn
     peer_ips = [peering.ip]
     try:
-        output = run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action="disable")
-        return {"output": output}
-    except Exception as e:
-        tb = traceback.format_exc()
-        raise HTTPException(status_code=500, detail=f"Erro ao executar comandos BGP: {e}\n{tb}")
-        raise HTTPException(status_code=404, detail="Roteador não encontrado")
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    password = router.ssh_password
-    asn = router.asn
-    peer_ips = [peering.ip]
-    try:
-        output = run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action="disable")
+        output = await ssh_executor.run_on_router(router, run_bgp_commands_via_shell, router.asn, peer_ips, action="disable", priority=Priority.INTERACTIVE)
         return {"output": output}
+    except RouterUnavailable:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao executar comandos BGP: {e}\n{tb}")
 
+@router.get("/{peering_id}/bgp-state")
+async def get_peering_bgp_state(peering_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Estado BGP do peering segundo a última coleta periódica do roteador (sem SSH).
+    """
+    peering = await db.get(Peering, peering_id)
+    if not peering:
+        raise HTTPException(status_code=404, detail="Peering não encontrado")
+    snapshot = bgp_poller.router_snapshot(peering.router_id)
+    if snapshot is None or snapshot.collected_at is None:
+        raise HTTPException(status_code=404, detail="Roteador ainda não coletado; tente novamente em instantes")
+    peer = bgp_poller.peer_state(peering.router_id, peering.ip)
+    return {
+        "peering_id": peering.id,
+        "router_id": peering.router_id,
+        "ip": peering.ip,
+        "collected_at": snapshot.collected_at,
+        "stale": not bgp_poller.is_fresh(snapshot),
+        "router_error": snapshot.error,
+        # None quando o peer não aparece no summary do roteador
+        "status": peer.to_dict() if peer else None,
+    }
+
 @router.get("/dashboard/summary")
 async def dashboard_summary(db=Depends(get_db), current_user: User = Depends(get_current_user)):
     # Conta peerings IPv4 e IPv6
@@ -1,15 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.peering_group import PeeringGroup, peering_group_association
 from app.models.peering import Peering
 from app.schemas.peering_group import PeeringGroupCreate, PeeringGroupRead, PeeringGroupUpdate
 from app.core.config import SessionLocal
-from app.core.deps import get_current_user, is_operator_or_admin
+from app.core.deps import get_current_user, is_operator_or_admin, limit_ssh_requests
 from app.models.user import User
 from typing import List
 from app.models.router import Router
-import paramiko
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import InteractiveShell
+from app.services.bgp_summary import fetch_bgp_summary, normalize_ip
+from app.services.bgp_poller import bgp_poller
+from app.services.router_health import RouterUnavailable
 import traceback
 
 router = APIRouter()
@@ -146,18 +152,16 @@ async def enable_group(group_id: int, db: AsyncSession = Depends(get_db)):
     await db.commit()
     return {"ok": True}
 
-def run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action):
+def run_bgp_commands_via_shell(router, asn, peer_ips, action):
     """
     Executa comandos BGP em sessão shell interativa (Huawei/H3C).
     action: 'enable' (undo peer ... ignore) ou 'disable' (peer ... ignore)
     """
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    output = ""
-    try:
-        client.connect(hostname, port=port, username=username, password=password, look_for_keys=False, allow_agent=False, timeout=10)
-        shell = client.invoke_shell()
-        shell.settimeout(5)
+    # Erros sobem para o executor (saúde do roteador) e para o handler de 503/Retry-After
+    with ssh_pool.shell(router) as channel:
+        shell = InteractiveShell(channel)
+        # Banner e prompt inicial
+        output = shell.read_until_prompt()
         cmds = [
             "system-view",
             f"bgp {asn}",
@@ -170,28 +174,11 @@ def run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips
         cmds.append("commit")
         cmds.append("return")
         for cmd in cmds:
-            shell.send(cmd + "\n")
-            buff = ""
-            while not buff.endswith("> ") and not buff.endswith("# "):
-                try:
-                    resp = shell.recv(4096).decode("utf-8")
-                    buff += resp
-                except Exception:
-                    break
-            output += f"{buff}\n"
-        shell.close()
-        client.close()
-        return output
-    except Exception as e:
-        try:
-            client.close()
-        except Exception:
-            pass
-        # Não lança HTTPException, retorna erro como string
-        return f"Erro SSH: {str(e)}"
+            output += shell.send_command(cmd) + "\n"
+    return output
 
-@router.post("/{group_id}/bgp-enable")
-async def bgp_enable_group(group_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/{group_id}/bgp-enable", dependencies=[Depends(limit_ssh_requests)])
+async def bgp_enable_group(group_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(is_operator_or_admin)):
     group = await db.get(PeeringGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
@@ -199,37 +186,22 @@ async def bgp_enable_group(group_id: int, db: AsyncSession = Depends(get_db)):
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
     
-    import base64
-    
-    # Decodificar senha
-    try:
-        password = base64.b64decode(router.ssh_password.encode()).decode()
-    except:
-        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-        password = router.ssh_password
-    
     # Busca todos os peerings ativos do grupo
     peerings = (await db.execute(select(Peering).join(peering_group_association, Peering.id == peering_group_association.c.peering_id).where(peering_group_association.c.group_id == group_id))).scalars().all()
     peer_ips = [p.ip for p in peerings]
     if not peer_ips:
         raise HTTPException(status_code=404, detail="Nenhum peering encontrado no grupo.")
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    asn = router.asn
     try:
-        output = run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action="enable")
+        output = await ssh_executor.run_on_router(router, run_bgp_commands_via_shell, router.asn, peer_ips, action="enable", priority=Priority.INTERACTIVE)
         return {"output": output}
-    except HTTPException as e:
-        # Se for HTTPException, repasse para o FastAPI
-        raise e
+    except RouterUnavailable:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
-        # Retorne o output parcial, se existir, mesmo em caso de erro
-        return {"output": str(e) + "\n" + tb, "error": True}
+        raise HTTPException(status_code=500, detail=f"Erro ao executar comandos BGP: {e}\n{tb}")
 
-@router.post("/{group_id}/bgp-disable")
-async def bgp_disable_group(group_id: int, db: AsyncSession = Depends(get_db)):
+@router.post("/{group_id}/bgp-disable", dependencies=[Depends(limit_ssh_requests)])
+async def bgp_disable_group(group_id: int, db: AsyncSession = Depends(get_db), current_user: User = Depends(is_operator_or_admin)):
     group = await db.get(PeeringGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
@@ -237,28 +209,68 @@ async def bgp_disable_group(group_id: int, db: AsyncSession = Depends(get_db)):
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
     
-    import base64
-    
-    # Decodificar senha
-    try:
-        password = base64.b64decode(router.ssh_password.encode()).decode()
-    except:
-        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-        password = router.ssh_password
-    
     peerings = (await db.execute(select(Peering).join(peering_group_association, Peering.id == peering_group_association.c.peering_id).where(peering_group_association.c.group_id == group_id))).scalars().all()
     peer_ips = [p.ip for p in peerings]
     if not peer_ips:
         raise HTTPException(status_code=404, detail="Nenhum peering encontrado no grupo.")
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    asn = router.asn
     try:
-        output = run_bgp_commands_via_shell(hostname, port, username, password, asn, peer_ips, action="disable")
+        output = await ssh_executor.run_on_router(router, run_bgp_commands_via_shell, router.asn, peer_ips, action="disable", priority=Priority.INTERACTIVE)
         return {"output": output}
-    except HTTPException as e:
-        raise e
+    except RouterUnavailable:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
-        return {"output": str(e) + "\n" + tb, "error": True}
+        raise HTTPException(status_code=500, detail=f"Erro ao executar comandos BGP: {e}\n{tb}")
+
+@router.get("/{group_id}/bgp-status", dependencies=[Depends(limit_ssh_requests)])
+async def bgp_status_group(
+    group_id: int,
+    live: bool = Query(False),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Estado BGP interpretado de cada peering do grupo. Usa o snapshot da coleta
+    periódica quando recente; senão (ou com live=true) um único summary no roteador.
+    """
+    group = await db.get(PeeringGroup, group_id)
+    if not group:
+        raise HTTPException(status_code=404, detail="Grupo não encontrado")
+    router = await db.get(Router, group.router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+
+    peerings = (await db.execute(select(Peering).join(peering_group_association, Peering.id == peering_group_association.c.peering_id).where(peering_group_association.c.group_id == group_id))).scalars().all()
+    if not peerings:
+        raise HTTPException(status_code=404, detail="Nenhum peering encontrado no grupo.")
+    snapshot = bgp_poller.router_snapshot(router.id)
+    if not live and bgp_poller.is_fresh(snapshot):
+        por_ip = snapshot.peers
+        collected_at = snapshot.collected_at
+    else:
+        try:
+            summary = await fetch_bgp_summary(router, [p.ip for p in peerings])
+        except RouterUnavailable:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao executar comando SSH: {e}")
+        por_ip = {normalize_ip(peer.peer_ip): peer for peer in summary.peers}
+        collected_at = None
+    resultados = []
+    for p in peerings:
+        peer = por_ip.get(normalize_ip(p.ip))
+        resultados.append({
+            "peering_id": p.id,
+            "name": p.name,
+            "ip": p.ip,
+            # None quando o peer não aparece no summary do roteador
+            "status": peer.to_dict() if peer else None,
+        })
+    return {
+        "group_id": group_id,
+        "router_id": router.id,
+        "cached": collected_at is not None,
+        "collected_at": collected_at,
+        "established": sum(1 for r in resultados if r["status"] and r["status"]["established"]),
+        "peerings": resultados,
+    }
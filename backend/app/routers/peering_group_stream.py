@@ -8,8 +8,11 @@ from app.models.peering_group import PeeringGroup, peering_group_association
 from app.models.peering import Peering
 from app.core.config import SessionLocal
 from app.models.router import Router
-import paramiko
-import asyncio
+from app.services.ssh_pool import ssh_pool, as_credentials
+from app.services.ssh_stream import stream_ssh_output, SSE_HEADERS
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import InteractiveShell
+from app.core.deps import limit_ssh_requests
 
 router = APIRouter()
 
@@ -17,13 +20,12 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-def run_bgp_commands_stream(hostname, port, username, password, asn, peer_ips, action, yield_func):
-    client = paramiko.SSHClient()
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    try:
-        client.connect(hostname, port=port, username=username, password=password, look_for_keys=False, allow_agent=False, timeout=10)
-        shell = client.invoke_shell()
-        shell.settimeout(5)
+def run_bgp_commands_stream(router, asn, peer_ips, action, yield_func, cancel_event=None):
+    # Erros sobem para o executor (saúde do roteador) e chegam ao cliente como "Erro SSH: ..."
+    with ssh_pool.shell(router) as channel:
+        # Cada linha é entregue ao callback assim que chega do roteador
+        shell = InteractiveShell(channel, on_line=yield_func, cancel_event=cancel_event)
+        shell.read_until_prompt()
         cmds = [
             "system-view",
             f"bgp {asn}",
@@ -36,32 +38,10 @@ def run_bgp_commands_stream(hostname, port, username, password, asn, peer_ips, a
         cmds.append("commit")
         cmds.append("return")
         for cmd in cmds:
-            shell.send(cmd + "\n")
             yield_func(f"$ {cmd}")
-            buff = ""
-            while True:
-                try:
-                    resp = shell.recv(4096).decode("utf-8")
-                    if not resp:
-                        break
-                    buff += resp
-                    for line in resp.splitlines():
-                        yield_func(line)
-                    if buff.strip().endswith(">") or buff.strip().endswith("#"):
-                        break
-                except Exception:
-                    break
-            asyncio.sleep(0.2)
-        shell.close()
-        client.close()
-    except Exception as e:
-        try:
-            client.close()
-        except Exception:
-            pass
-        yield_func(f"Erro SSH: {str(e)}")
+            shell.send_command(cmd)
 
-@router.get("/{group_id}/bgp-{action}-stream")
+@router.get("/{group_id}/bgp-{action}-stream", dependencies=[Depends(limit_ssh_requests)])
 async def bgp_group_stream(group_id: int, action: str, request: Request, token: str = Query(...), db: AsyncSession = Depends(get_db)):
     # Validação manual do JWT
     try:
@@ -80,25 +60,18 @@ async def bgp_group_stream(group_id: int, action: str, request: Request, token:
     peer_ips = [p.ip for p in peerings]
     if not peer_ips:
         raise HTTPException(status_code=404, detail="Nenhum peering encontrado no grupo.")
-    hostname = router.ip
-    port = router.ssh_port
-    username = router.ssh_user
-    password = router.ssh_password
+    credentials = as_credentials(router)
     asn = router.asn
     async def event_generator():
-        queue = asyncio.Queue()
-        def yield_func(line):
-            queue.put_nowait(line)
         try:
             yield "data: Iniciando execução...\n\n"
-            run_bgp_commands_stream(hostname, port, username, password, asn, peer_ips, action, yield_func)
-            while not queue.empty():
-                line = await queue.get()
-                yield f"data: {line}\n\n"
-                if await request.is_disconnected():
-                    break
+            # Cada linha do roteador vai para o cliente assim que chega
+            async for event in stream_ssh_output(
+                credentials, run_bgp_commands_stream, asn, peer_ips, action,
+                request=request, priority=Priority.INTERACTIVE
+            ):
+                yield event
         except Exception as e:
             yield f"data: Erro no streaming: {str(e)}\n\n"
-        finally:
-            yield "data: [FIM]\n\n"
-    return StreamingResponse(event_generator(), media_type="text/event-stream")
+        yield "data: [FIM]\n\n"
+    return StreamingResponse(event_generator(), media_type="text/event-stream", headers=SSE_HEADERS)
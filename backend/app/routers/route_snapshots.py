@@ -0,0 +1,152 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.peering import Peering
+from app.models.router import Router
+from app.models.route_snapshot import RouteSnapshot
+from app.core.config import SessionLocal
+from app.core.deps import get_current_user, is_operator_or_admin, limit_ssh_requests
+from app.models.user import User
+from app.services.bgp_routes import DIRECTIONS
+from app.services.router_health import RouterUnavailable
+from app.services.route_snapshots import route_snapshots, RouteSnapshotError, route_dict, snapshot_dict, prefix_key
+from datetime import datetime, timezone
+from typing import Optional
+
+router = APIRouter()
+
+async def get_db():
+    async with SessionLocal() as session:
+        yield session
+
+def _check_direction(direction: str):
+    if direction not in DIRECTIONS:
+        raise HTTPException(status_code=400, detail="Direção inválida (use advertised ou received)")
+
+def _utc(value: datetime) -> datetime:
+    # Snapshots são gravados em UTC sem fuso
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+async def _get_peering(db: AsyncSession, peering_id: int) -> Peering:
+    peering = await db.get(Peering, peering_id)
+    if not peering:
+        raise HTTPException(status_code=404, detail="Peering não encontrado")
+    return peering
+
+async def _get_snapshot(db: AsyncSession, snapshot_id: int) -> RouteSnapshot:
+    snapshot = await db.get(RouteSnapshot, snapshot_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail=f"Snapshot {snapshot_id} não encontrado")
+    return snapshot
+
+@router.get("/peerings/{peering_id}")
+async def list_route_snapshots(
+    peering_id: int,
+    direction: str = Query("advertised"),
+    limit: int = Query(100, ge=1, le=1000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Snapshots do peering, do mais recente para o mais antigo, com o resumo das mudanças"""
+    _check_direction(direction)
+    await _get_peering(db, peering_id)
+    result = await db.execute(
+        select(RouteSnapshot)
+        .where(RouteSnapshot.peering_id == peering_id, RouteSnapshot.direction == direction)
+        .order_by(RouteSnapshot.id.desc())
+        .limit(limit)
+    )
+    return {"peering_id": peering_id, "direction": direction, "snapshots": [snapshot_dict(s) for s in result.scalars()]}
+
+@router.post("/peerings/{peering_id}", dependencies=[Depends(limit_ssh_requests)])
+async def capture_route_snapshot(
+    peering_id: int,
+    direction: str = Query("advertised"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(is_operator_or_admin),
+):
+    """Captura agora a tabela do peering e grava um novo snapshot"""
+    _check_direction(direction)
+    peering = await _get_peering(db, peering_id)
+    router_obj = await db.get(Router, peering.router_id)
+    if not router_obj:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    try:
+        snapshot = await route_snapshots.capture(peering, router_obj, direction)
+    except RouterUnavailable:
+        raise
+    except RouteSnapshotError as e:
+        raise HTTPException(status_code=400, detail=f"Roteador não devolveu a tabela: {e}")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao capturar rotas: {e}")
+    return snapshot_dict(snapshot)
+
+@router.get("/peerings/{peering_id}/diff")
+async def diff_route_snapshots(
+    peering_id: int,
+    direction: str = Query("advertised"),
+    from_id: Optional[int] = Query(None, description="Snapshot de origem"),
+    to_id: Optional[int] = Query(None, description="Snapshot de destino (padrão: o mais recente)"),
+    since: Optional[datetime] = Query(None, description="Sem from_id: último snapshot até este instante"),
+    limit: int = Query(1000, ge=1, le=10000, description="Máximo de rotas em cada lista"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    O que mudou nas rotas do peering entre dois snapshots: prefixos adicionados,
+    retirados e com atributos alterados (next-hop, MED, local-pref, AS-path...).
+    Ex.: ?since=<ontem> compara o estado de ontem com o snapshot mais recente.
+    """
+    _check_direction(direction)
+    await _get_peering(db, peering_id)
+    scope = (RouteSnapshot.peering_id == peering_id, RouteSnapshot.direction == direction)
+    if to_id is not None:
+        newer = await _get_snapshot(db, to_id)
+    else:
+        newer = (await db.execute(select(RouteSnapshot).where(*scope).order_by(RouteSnapshot.id.desc()).limit(1))).scalars().first()
+        if newer is None:
+            raise HTTPException(status_code=404, detail="Peering sem snapshots nesta direção")
+    if from_id is not None:
+        older = await _get_snapshot(db, from_id)
+    elif since is not None:
+        older = (await db.execute(
+            select(RouteSnapshot).where(*scope, RouteSnapshot.taken_at <= _utc(since)).order_by(RouteSnapshot.id.desc()).limit(1)
+        )).scalars().first()
+        if older is None:
+            # Nada antes do instante pedido: compara com o primeiro snapshot disponível
+            older = (await db.execute(select(RouteSnapshot).where(*scope).order_by(RouteSnapshot.id).limit(1))).scalars().first()
+    else:
+        raise HTTPException(status_code=400, detail="Informe from_id ou since")
+    for snapshot in (older, newer):
+        if snapshot.peering_id != peering_id or snapshot.direction != direction:
+            raise HTTPException(status_code=400, detail=f"Snapshot {snapshot.id} não pertence a este peering/direção")
+    try:
+        return await route_snapshots.diff(db, older, newer, limit=limit)
+    except RouteSnapshotError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{snapshot_id}/routes")
+async def get_snapshot_routes(
+    snapshot_id: int,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Tabela completa reconstruída de um snapshot, ordenada por prefixo"""
+    snapshot = await _get_snapshot(db, snapshot_id)
+    try:
+        table = await route_snapshots.table_at(db, snapshot)
+    except RouteSnapshotError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    prefixes = sorted(table, key=prefix_key)[offset:offset + limit]
+    return {
+        **snapshot_dict(snapshot),
+        "offset": offset,
+        "routes": [route_dict(prefix, table[prefix]) for prefix in prefixes],
+    }
+
+@router.get("/stats")
+async def get_route_snapshot_stats(current_user: User = Depends(get_current_user)):
+    """Capturas feitas, falhas e bytes gravados"""
+    return route_snapshots.stats()
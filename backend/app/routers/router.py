@@ -1,66 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Body, Query
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from app.models.router import Router
-from app.schemas.router import RouterCreate, RouterRead, RouterUpdate
-from app.core.config import SessionLocal
-from app.core.deps import get_current_user, is_operator_or_admin
+from app.schemas.router import RouterCreate, RouterRead, RouterUpdate, BGPSummaryRead
+from app.core.config import SessionLocal, SSH_PIPELINE_MAX_COMMANDS
+from app.core.deps import get_current_user, is_operator_or_admin, limit_ssh_requests
 from app.models.user import User
-from typing import List
+from app.services.ssh_pool import SSHPoolExhausted
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_host_keys import host_key_store
+from app.services.router_health import router_health, RouterUnavailable
+from app.services.ssh_shell import InteractiveShell
+from app.services.ssh import run_ssh_commands_async, stream_ssh_commands
+from app.services.ssh_pool import as_credentials
+from app.services.bgp_summary import BGPState, fetch_bgp_summary
+from app.services.bgp_poller import bgp_poller
+from app.services.bgp_routes import RouteFilter, compile_as_path, decode_cursor, iter_peer_routes
+from typing import List, Optional
+import ipaddress
+import json
 import paramiko
 import traceback
 import logging
-import os
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
 def setup_ssh_client():
     """
-    Configura um cliente SSH com políticas adequadas para aceitar chaves de host automaticamente.
+    Cria um cliente SSH que verifica chaves de host pelo armazenamento em memória
+    (ver app.services.ssh_host_keys), sem ler known_hosts a cada conexão.
     """
-    client = paramiko.SSHClient()
-    
-    # Política para aceitar automaticamente chaves de host desconhecidas
-    client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    
-    # Garantir que o diretório SSH existe
-    ssh_dir = os.path.expanduser('~/.ssh')
-    if not os.path.exists(ssh_dir):
-        try:
-            os.makedirs(ssh_dir, mode=0o700)
-            logger.debug(f"Diretório SSH criado: {ssh_dir}")
-        except Exception as e:
-            logger.debug(f"Erro ao criar diretório SSH: {e}")
-    
-    # Tentar carregar chaves de host conhecidas, se existirem
-    try:
-        client.load_system_host_keys()
-        # Carrega do arquivo padrão do usuário SSH
-        known_hosts_file = os.path.join(ssh_dir, 'known_hosts')
-        if os.path.exists(known_hosts_file):
-            client.load_host_keys(known_hosts_file)
-        else:
-            # Criar arquivo known_hosts vazio se não existir
-            try:
-                with open(known_hosts_file, 'a'):
-                    pass
-                os.chmod(known_hosts_file, 0o644)
-                logger.debug(f"Arquivo known_hosts criado: {known_hosts_file}")
-            except Exception as e:
-                logger.debug(f"Erro ao criar known_hosts: {e}")
-    except Exception as e:
-        # Ignora erros ao carregar chaves de host
-        logger.debug(f"Aviso ao carregar chaves de host: {e}")
-        pass
-    
-    return client
+    return host_key_store.configure(paramiko.SSHClient())
 
 async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.get("/{router_id}/bgp-advertised-prefixes")
+@router.get("/{router_id}/bgp-advertised-prefixes", dependencies=[Depends(limit_ssh_requests)])
 async def get_bgp_advertised_prefixes(router_id: int, peer_ip: str = Query(...), version: int = Query(4), db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
     """
     Executa o comando para obter os prefixos anunciados para o peer informado.
@@ -70,43 +48,144 @@ async def get_bgp_advertised_prefixes(router_id: int, peer_ip: str = Query(...),
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
     try:
-        import base64
-        
-        # Decodificar senha
-        try:
-            password = base64.b64decode(router.ssh_password.encode()).decode()
-        except:
-            # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-            password = router.ssh_password
-        
-        ssh = setup_ssh_client()
-        ssh.connect(
-            hostname=router.ip,
-            port=router.ssh_port,
-            username=router.ssh_user,
-            password=password,
-            look_for_keys=False,
-            allow_agent=False,
-            timeout=10,
-            gss_auth=False,
-            gss_kex=False
-        )
         if version == 6:
             comando = f"display bgp ipv6 routing-table peer {peer_ip} advertised-routes | no-more"
         else:
             comando = f"display bgp routing-table peer {peer_ip} advertised-routes | no-more"
-        stdin, stdout, stderr = ssh.exec_command(comando, timeout=30)
-        saida = stdout.read().decode(errors="ignore")
-        err = stderr.read().decode(errors="ignore")
-        ssh.close()
-        logging.info(f"BGP ADVERTISED PREFIXES: {comando}\nOutput: {saida}\nError: {err}")
+        saida, err, _ = await ssh_executor.exec_command(router, comando, timeout=30)
+        # Tabelas de trânsito têm centenas de milhares de linhas: registra só o tamanho
+        logger.info(f"BGP ADVERTISED PREFIXES: {comando} ({len(saida)} bytes, {saida.count(chr(10))} linhas)")
+        if err:
+            logger.warning(f"BGP ADVERTISED PREFIXES {comando}: {err.strip()}")
         if not saida.strip():
             raise HTTPException(status_code=404, detail="Nenhum prefixo anunciado encontrado ou sem resposta do roteador.")
         return {"output": saida}
+    except RouterUnavailable:
+        # Circuito aberto: 503 com Retry-After (handler em app.main)
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao executar comando SSH: {e}\n{tb}")
 
+def _advertised_routes_params(
+    peer_ip: str,
+    version: int,
+    prefix: Optional[str],
+    exact: bool,
+    min_length: Optional[int],
+    max_length: Optional[int],
+    as_path: Optional[str],
+    cursor: Optional[str],
+):
+    """Valida os parâmetros comuns de /routes e /stream; devolve (filtro, cursor decodificado)"""
+    try:
+        ipaddress.ip_address(peer_ip)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"IP de peer inválido: {peer_ip}")
+    if version not in (4, 6):
+        raise HTTPException(status_code=400, detail="Versão inválida (use 4 ou 6)")
+    route_filter = RouteFilter(exact=exact, min_length=min_length, max_length=max_length)
+    if prefix:
+        try:
+            route_filter.prefix = ipaddress.ip_network(prefix, strict=False)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Prefixo inválido: {prefix}")
+        if route_filter.prefix.version != version:
+            raise HTTPException(status_code=400, detail="Prefixo de família diferente da versão consultada")
+    if as_path:
+        try:
+            route_filter.as_path = compile_as_path(as_path)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Expressão de AS-path inválida: {e}")
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Cursor inválido")
+    return route_filter, after
+
+@router.get("/{router_id}/bgp-advertised-prefixes/routes", dependencies=[Depends(limit_ssh_requests)])
+async def list_bgp_advertised_routes(
+    router_id: int,
+    request: Request,
+    peer_ip: str = Query(...),
+    version: int = Query(4),
+    prefix: Optional[str] = Query(None, description="Só rotas contidas neste prefixo"),
+    exact: bool = Query(False, description="Com 'prefix': só o prefixo exato"),
+    min_length: Optional[int] = Query(None, ge=0, le=128),
+    max_length: Optional[int] = Query(None, ge=0, le=128),
+    as_path: Optional[str] = Query(None, description="Expressão de AS-path do roteador ('_' casa início, fim ou espaço; dígitos, '.', [0-9], '*', '+', '?', '|', grupos)"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Prefixos anunciados ao peer, já interpretados e filtrados no servidor, em páginas.
+    A leitura SSH é interrompida assim que a página fica completa.
+    """
+    route_filter, after = _advertised_routes_params(peer_ip, version, prefix, exact, min_length, max_length, as_path, cursor)
+    router = await db.get(Router, router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    routes = []
+    stats = {}
+    try:
+        async for item in iter_peer_routes(router, peer_ip, version, route_filter, after, limit, request=request):
+            if isinstance(item, dict):
+                stats = item
+            else:
+                routes.append(item.to_dict())
+    except RouterUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao executar comando SSH: {e}")
+    return {"peer_ip": peer_ip, "version": version, "routes": routes, **stats}
+
+@router.get("/{router_id}/bgp-advertised-prefixes/stream", dependencies=[Depends(limit_ssh_requests)])
+async def stream_bgp_advertised_routes(
+    router_id: int,
+    request: Request,
+    peer_ip: str = Query(...),
+    version: int = Query(4),
+    prefix: Optional[str] = Query(None, description="Só rotas contidas neste prefixo"),
+    exact: bool = Query(False, description="Com 'prefix': só o prefixo exato"),
+    min_length: Optional[int] = Query(None, ge=0, le=128),
+    max_length: Optional[int] = Query(None, ge=0, le=128),
+    as_path: Optional[str] = Query(None, description="Expressão de AS-path do roteador ('_' casa início, fim ou espaço; dígitos, '.', [0-9], '*', '+', '?', '|', grupos)"),
+    cursor: Optional[str] = Query(None, description="next_cursor de uma página anterior"),
+    limit: Optional[int] = Query(None, ge=1, description="Sem limite: a tabela inteira"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Prefixos anunciados ao peer em NDJSON (uma rota por linha), enviados à medida
+    que a saída do roteador chega. A última linha traz {"done": true, ...} com
+    totais e next_cursor; em caso de falha, {"error": ...}.
+    """
+    route_filter, after = _advertised_routes_params(peer_ip, version, prefix, exact, min_length, max_length, as_path, cursor)
+    router = await db.get(Router, router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+
+    async def gerar():
+        try:
+            async for item in iter_peer_routes(router, peer_ip, version, route_filter, after, limit, request=request):
+                if isinstance(item, dict):
+                    yield json.dumps({"done": True, **item}) + "\n"
+                else:
+                    yield json.dumps(item.to_dict()) + "\n"
+        except Exception as e:
+            logger.warning(f"Stream de prefixos anunciados ({router.name}, {peer_ip}) falhou: {e}")
+            yield json.dumps({"error": str(e) or type(e).__name__}) + "\n"
+
+    return StreamingResponse(
+        gerar(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
 @router.post("/", response_model=RouterRead)
 async def create_router(router: RouterCreate, db: AsyncSession = Depends(get_db), current_user: User = Depends(is_operator_or_admin)):
@@ -144,7 +223,8 @@ async def list_routers(db: AsyncSession = Depends(get_db), current_user: User =
             "asn": router.asn,
             "note": router.note,
             "is_active": router.is_active,
-            "ip_origens": router.ip_origens or []
+            "ip_origens": router.ip_origens or [],
+            "health": router_health.status(router.id)
         }
         router_list.append(RouterRead(**router_dict))
     
@@ -240,10 +320,14 @@ async def enable_router(router_id: int, db: AsyncSession = Depends(get_db)):
     await db.commit()
     return {"ok": True}
 
-@router.post("/test-connection")
+@router.post("/test-connection", dependencies=[Depends(limit_ssh_requests)])
 async def test_connection(
     data: dict = Body(...)
 ):
+    # O teste usa sleeps e leituras bloqueantes: roda em uma thread SSH
+    return await ssh_executor.run(run_connection_test, data)
+
+def run_connection_test(data: dict) -> dict:
     paramiko.util.log_to_file('/tmp/paramiko.log', level=logging.DEBUG)
     ip = data.get("ip")
     ssh_port = data.get("ssh_port")
@@ -257,7 +341,7 @@ async def test_connection(
     try:
         ssh = setup_ssh_client()
         output_buffer += f"Tentando conectar em {ip}:{ssh_port} com usuário '{ssh_user}'...\n"
-        output_buffer += "Política de chave de host: AutoAddPolicy (aceita automaticamente chaves desconhecidas)\n"
+        output_buffer += "Política de chave de host: chaves conhecidas do banco (chaves novas são registradas automaticamente)\n"
         debug_log.append(f"Iniciando conexão SSH para {ip}:{ssh_port}")
         
         try:
@@ -281,7 +365,7 @@ async def test_connection(
             )
             debug_log.append("ssh.connect() completou sem exceção")
             output_buffer += "Conexão SSH estabelecida com sucesso!\n"
-            output_buffer += "Chave de host aceita automaticamente (se necessário)\n"
+            output_buffer += "Chave de host verificada (ou registrada, se for a primeira conexão)\n"
         except paramiko.ssh_exception.AuthenticationException as e:
             debug_log.append(f"AuthenticationException: {str(e)}")
             output_buffer += f"Falha de autenticação: {str(e)}\n"
@@ -368,22 +452,10 @@ async def test_connection(
             debug_log.append("Shell interativo criado")
             output_buffer += "Shell interativo criado com sucesso!\n"
             
-            # Aguarda um pouco para qualquer prompt inicial aparecer
-            import time
-            debug_log.append("Aguardando estabilização da conexão...")
-            time.sleep(3)
-            
-            # Lê e descarta qualquer dados iniciais (prompts, avisos, etc.)
-            initial_data = ""
-            attempts = 0
-            while attempts < 10:
-                if channel.recv_ready():
-                    data = channel.recv(4096).decode(errors="ignore")
-                    initial_data += data
-                    debug_log.append(f"Dados iniciais descartados ({len(data)} chars)")
-                else:
-                    time.sleep(0.2)
-                attempts += 1
+            # Lê banner/avisos até o primeiro prompt (retorna assim que ele aparece)
+            shell = InteractiveShell(channel)
+            debug_log.append("Aguardando prompt inicial...")
+            initial_data = shell.read_until_prompt(timeout=10, raise_on_timeout=False)
             
             debug_log.append(f"Total de dados iniciais ignorados: {len(initial_data)} caracteres")
             output_buffer += f"Dados iniciais (avisos/prompts) ignorados: {len(initial_data)} caracteres\n"
@@ -393,32 +465,12 @@ async def test_connection(
             debug_log.append(f"Enviando comando: {command}")
             output_buffer += f"Enviando comando: {command}\n"
             
-            # Enviar Enter algumas vezes para garantir que saia de qualquer diálogo
-            channel.send('\n\n')
-            time.sleep(0.5)
+            # Enviar Enter para garantir que saia de qualquer diálogo
+            shell.send_command("", timeout=2, raise_on_timeout=False)
             
-            # Enviar o comando
-            channel.send(f"{command}\n")
-            time.sleep(4)  # Aguarda a execução
-            
-            # Lê a saída do comando
-            command_output = ""
-            max_attempts = 30
-            attempts = 0
+            # Enviar o comando e ler a resposta até o próximo prompt
             debug_log.append("Lendo resposta do comando...")
-            
-            while attempts < max_attempts:
-                if channel.recv_ready():
-                    data = channel.recv(4096).decode(errors="ignore")
-                    command_output += data
-                    debug_log.append(f"Dados do comando recebidos ({len(data)} chars)")
-                    if not channel.recv_ready():
-                        time.sleep(0.3)
-                        if not channel.recv_ready():
-                            break
-                else:
-                    time.sleep(0.2)
-                attempts += 1
+            command_output = shell.send_command(command, timeout=15, raise_on_timeout=False)
             
             debug_log.append(f"Total dados do comando: {len(command_output)} caracteres")
             channel.close()
@@ -450,67 +502,6 @@ async def test_connection(
                     "output": output_buffer + "\n\nDebug Log:\n" + "\n".join(debug_log),
                     "error": "No command output"
                 }
-            debug_log.append("Tentando executar comando de teste...")
-            
-            # Tentar executar comando de teste
-            command = "display version | no-more"
-            debug_log.append(f"Enviando comando: {command}")
-            output_buffer += f"Enviando comando: {command}\n"
-            channel.send(f"{command}\n")
-            time.sleep(3)  # Aguarda a execução
-            
-            # Lê a saída do comando
-            command_output = ""
-            max_attempts = 30
-            attempts = 0
-            debug_log.append("Lendo resposta do comando...")
-            
-            while attempts < max_attempts:
-                if channel.recv_ready():
-                    data = channel.recv(4096).decode(errors="ignore")
-                    command_output += data
-                    debug_log.append(f"Dados do comando ({len(data)} chars): {repr(data[:100])}")
-                    if not channel.recv_ready():
-                        time.sleep(0.2)  # Pequena pausa para garantir que não há mais dados
-                        if not channel.recv_ready():
-                            break
-                else:
-                    time.sleep(0.1)
-                attempts += 1
-            
-            debug_log.append(f"Total dados do comando: {len(command_output)} caracteres")
-            channel.close()
-            ssh.close()
-            
-            # Combinar saída inicial + comando
-            full_output = initial_output + command_output
-            
-            output_buffer += f"Saída completa do shell ({len(full_output)} caracteres):\n"
-            output_buffer += "="*50 + "\n"
-            output_buffer += full_output
-            output_buffer += "\n" + "="*50 + "\n"
-            
-            # Limpeza da saída do comando (apenas a parte do comando)
-            lines = command_output.split('\n')
-            clean_lines = []
-            skip_first = True
-            for line in lines:
-                if skip_first and command in line:
-                    skip_first = False
-                    continue
-                if line.strip() and not line.strip().startswith('[') and not line.strip().endswith(']>'):
-                    clean_lines.append(line)
-            
-            clean_output = '\n'.join(clean_lines).strip()
-            
-            debug_log.append(f"Comando executado com sucesso, saída limpa: {len(clean_output)} chars")
-            logging.info(f"Teste SSH via shell interativo bem-sucedido")
-            return {
-                "ok": True,
-                "message": "Autenticação SSH bem-sucedida! Comando executado via shell interativo.",
-                "output": output_buffer + f"\nSaída limpa do comando:\n{clean_output}\n\nDebug Log:\n" + "\n".join(debug_log),
-                "error": ""
-            }
             
         except Exception as e:
             debug_log.append(f"Falha no shell interativo: {str(e)}")
@@ -572,7 +563,7 @@ async def test_connection(
             "error": tb
         }
 
-@router.get("/{router_id}/bgp-status")
+@router.get("/{router_id}/bgp-status", dependencies=[Depends(limit_ssh_requests)])
 async def get_bgp_status(router_id: int, peer_ip: str = Query(...), db: AsyncSession = Depends(get_db)):
     """
     Executa o comando BGP no roteador via SSH e retorna o output bruto.
@@ -582,42 +573,114 @@ async def get_bgp_status(router_id: int, peer_ip: str = Query(...), db: AsyncSes
     if not router:
         raise HTTPException(status_code=404, detail="Roteador não encontrado")
     try:
-        import base64
-        
-        # Decodificar senha
-        try:
-            password = base64.b64decode(router.ssh_password.encode()).decode()
-        except:
-            # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-            password = router.ssh_password
-        
-        ssh = setup_ssh_client()
-        ssh.connect(
-            hostname=router.ip,
-            port=router.ssh_port,
-            username=router.ssh_user,
-            password=password,
-            look_for_keys=False,
-            allow_agent=False,
-            timeout=10,
-            gss_auth=False,
-            gss_kex=False
-        )
         # Permite múltiplos IPs separados por |
         comando = f"display bgp all summary | inc {peer_ip}"
-        stdin, stdout, stderr = ssh.exec_command(comando, timeout=20)
-        saida = stdout.read().decode(errors="ignore")
-        err = stderr.read().decode(errors="ignore")
-        ssh.close()
+        saida, err, _ = await ssh_executor.exec_command(router, comando, timeout=20)
         logging.info(f"BGP STATUS: {comando}\nOutput: {saida}\nError: {err}")
         if not saida.strip():
             raise HTTPException(status_code=404, detail="Peer(s) não encontrado(s) ou sem resposta do roteador.")
         return {"output": saida}
+    except RouterUnavailable:
+        raise
     except Exception as e:
         tb = traceback.format_exc()
         raise HTTPException(status_code=500, detail=f"Erro ao executar comando SSH: {e}\n{tb}")
 
-@router.get("/{router_id}/ping")
+def bgp_status_commands(peer_ips: List[str]) -> List[str]:
+    if not peer_ips:
+        raise HTTPException(status_code=400, detail="Informe ao menos um peer_ip")
+    if len(peer_ips) > SSH_PIPELINE_MAX_COMMANDS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {SSH_PIPELINE_MAX_COMMANDS} peers por requisição")
+    # Os comandos vão para um shell interativo: só IPs válidos (nada de quebras de linha ou outros comandos)
+    comandos = []
+    for ip in peer_ips:
+        try:
+            comandos.append(f"display bgp all summary | inc {ipaddress.ip_address(ip.strip())}")
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"IP de peer inválido: {ip}")
+    return comandos
+
+@router.get("/{router_id}/bgp-status/batch", dependencies=[Depends(limit_ssh_requests)])
+async def get_bgp_status_batch(router_id: int, peer_ip: List[str] = Query(...), db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Status BGP de vários peers em uma única sessão SSH (comandos em pipeline).
+    """
+    router = await db.get(Router, router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    comandos = bgp_status_commands(peer_ip)
+    try:
+        resultados = await run_ssh_commands_async(router, comandos)
+    except RouterUnavailable:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao executar comandos SSH: {e}")
+    return {"results": [{"peer_ip": ip, "output": saida} for ip, (_, saida) in zip(peer_ip, resultados)]}
+
+@router.get("/{router_id}/bgp-status/stream", dependencies=[Depends(limit_ssh_requests)])
+async def stream_bgp_status_batch(router_id: int, peer_ip: List[str] = Query(...), db: AsyncSession = Depends(get_db), current_user: User = Depends(get_current_user)):
+    """
+    Igual a /bgp-status/batch, mas em NDJSON: uma linha por peer assim que sua saída fica completa.
+    """
+    router = await db.get(Router, router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    comandos = bgp_status_commands(peer_ip)
+    credentials = as_credentials(router)
+
+    async def gerar():
+        try:
+            async for index, _, saida in stream_ssh_commands(credentials, comandos):
+                yield json.dumps({"peer_ip": peer_ip[index], "output": saida}) + "\n"
+        except Exception as e:
+            yield json.dumps({"error": f"Erro SSH: {e}"}) + "\n"
+
+    return StreamingResponse(gerar(), media_type="application/x-ndjson")
+
+@router.get("/{router_id}/bgp-summary", response_model=BGPSummaryRead, dependencies=[Depends(limit_ssh_requests)])
+async def get_bgp_summary(
+    router_id: int,
+    peer_ip: Optional[List[str]] = Query(None),
+    family: Optional[int] = Query(None, description="4 ou 6"),
+    state: Optional[BGPState] = Query(None),
+    live: bool = Query(False, description="Consultar o roteador em vez do snapshot da coleta periódica"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Summary BGP já interpretado: um registro por peer (AS, estado, uptime, prefixos).
+    Sem peer_ip traz todos os peers; aceita vários peer_ip ou IPs separados por '|'.
+    Responde do snapshot da coleta periódica quando ele é recente; live=true força SSH.
+    """
+    router = await db.get(Router, router_id)
+    if not router:
+        raise HTTPException(status_code=404, detail="Roteador não encontrado")
+    ips = [ip.strip() for value in (peer_ip or []) for ip in value.split("|") if ip.strip()]
+    for ip in ips:
+        try:
+            ipaddress.ip_address(ip)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"IP de peer inválido: {ip}")
+    snapshot = bgp_poller.router_snapshot(router_id)
+    if not live and bgp_poller.is_fresh(snapshot):
+        summary = snapshot.summary.filter(ips) if ips else snapshot.summary
+        cached, collected_at = True, snapshot.collected_at
+    else:
+        try:
+            summary = await fetch_bgp_summary(router, ips)
+        except RouterUnavailable:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Erro ao executar comando SSH: {e}")
+        if not ips:
+            # Summary completo: aproveita para atualizar o snapshot
+            bgp_poller.store(router_id, summary)
+        cached, collected_at = False, None
+    if family is not None or state is not None:
+        summary = summary.filter(family=family, state=state)
+    return {"router_id": router_id, "cached": cached, "collected_at": collected_at, **summary.to_dict()}
+
+@router.get("/{router_id}/ping", dependencies=[Depends(limit_ssh_requests)])
 async def ping_from_router(
     router_id: int, 
     source_ip_id: int, 
@@ -653,31 +716,7 @@ async def ping_from_router(
         raise HTTPException(status_code=404, detail=error_msg)
     
     try:
-        import paramiko
-        import base64
-        
-        # Decodificar senha
-        try:
-            password = base64.b64decode(router_obj.ssh_password.encode()).decode()
-        except:
-            # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-            password = router_obj.ssh_password
-        
-        logger.info(f"Conectando via SSH ao roteador {router_obj.ip}:{router_obj.ssh_port}")
-        
-        # Conectar via SSH
-        client = setup_ssh_client()
-        client.connect(
-            hostname=router_obj.ip,
-            port=router_obj.ssh_port,
-            username=router_obj.ssh_user,
-            password=password,
-            timeout=10,
-            look_for_keys=False,
-            allow_agent=False,
-            gss_auth=False,
-            gss_kex=False
-        )
+        logger.info(f"Usando conexão SSH persistente com o roteador {router_obj.ip}:{router_obj.ssh_port}")
         
         # Comando ping com os parâmetros fixos:
         # Para IPv4: ping -c 30 -m 1 -a <ip_de_origem> <ip_de_peering>
@@ -689,20 +728,8 @@ async def ping_from_router(
         
         logger.info(f"Executando comando: {command}")
         
-        # Executar comando diretamente
-        stdin, stdout, stderr = client.exec_command(command, timeout=90)
-        
-        # Configurar timeout nos canais para evitar travamento
-        stdout.channel.settimeout(90.0)
-        stderr.channel.settimeout(90.0)
-        
-        output = stdout.read().decode('utf-8', errors='ignore')
-        error = stderr.read().decode('utf-8', errors='ignore')
-        
-        # Aguardar o comando terminar para evitar problemas de conexão
-        exit_status = stdout.channel.recv_exit_status()
-        
-        client.close()
+        # Executar comando em um novo canal (timeout no canal evita travamento)
+        output, error, exit_status = await ssh_executor.exec_command(router_obj, command, timeout=90)
         
         # Incluir erro na saída se houver
         if error:
@@ -712,7 +739,9 @@ async def ping_from_router(
         logger.info(f"Comando ping executado com sucesso (exit: {exit_status})")
         return {"output": output}
         
-    except paramiko.ChannelException as e:
+    except RouterUnavailable:
+        raise
+    except (paramiko.ChannelException, SSHPoolExhausted) as e:
         error_msg = f"Erro de canal SSH (roteador pode estar limitando sessões): {str(e)}"
         logger.error(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
@@ -4,7 +4,19 @@ from sqlalchemy.future import select
 from app.models.peering import Peering
 from app.models.router import Router
 from app.core.config import SessionLocal
-from app.services.ssh import run_ssh_command
+from app.services.ssh import run_ssh_command_async
+from app.services.router_health import router_health, RouterUnavailable
+from app.services.ssh_host_keys import host_key_store
+from app.services.bgp_poller import bgp_poller
+from app.services.rib import rib_store
+from app.services.bmp import bmp_collector
+from app.services.looking_glass import looking_glass_service
+from app.services.rate_limit import rate_limiter
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_scheduler import ssh_scheduler
+from app.core.deps import get_current_user, limit_ssh_requests
+from app.models.user import User
 
 router = APIRouter()
 
@@ -12,7 +24,7 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.get("/peerings/{peering_id}/bgp-status")
+@router.get("/peerings/{peering_id}/bgp-status", dependencies=[Depends(limit_ssh_requests)])
 async def get_bgp_status(peering_id: int, db: AsyncSession = Depends(get_db)):
     peering = await db.get(Peering, peering_id)
     if not peering:
@@ -23,7 +35,25 @@ async def get_bgp_status(peering_id: int, db: AsyncSession = Depends(get_db)):
     # Exemplo de comando para Cisco IOS, ajuste conforme necessário
     command = f"show bgp neighbor {peering.ip} summary"
     try:
-        output = run_ssh_command(router, command)
+        output = await run_ssh_command_async(router, command)
+    except RouterUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro SSH: {e}")
     return {"output": output}
+
+@router.get("/ssh/stats")
+async def get_ssh_stats(current_user: User = Depends(get_current_user)):
+    """Métricas do executor SSH (fila/threads), das filas por roteador, do pool de conexões, da saúde dos roteadores, do Looking Glass e dos limites de requisições"""
+    return {
+        "executor": ssh_executor.stats(),
+        "scheduler": ssh_scheduler.stats(),
+        "pool": ssh_pool.stats(),
+        "health": router_health.stats(),
+        "host_keys": host_key_store.stats(),
+        "bgp_poller": bgp_poller.stats(),
+        "rib": rib_store.stats(),
+        "bmp": bmp_collector.stats(),
+        "looking_glass": looking_glass_service.stats(),
+        "rate_limit": rate_limiter.stats(),
+    }
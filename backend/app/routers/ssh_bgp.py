@@ -4,8 +4,10 @@ from sqlalchemy.future import select
 from app.models.peering import Peering
 from app.models.router import Router
 from app.core.config import SessionLocal
-from app.services.ssh import run_ssh_command
-from app.core.deps import is_operator_or_admin
+from app.services.ssh import run_ssh_command_async
+from app.services.router_health import RouterUnavailable
+from app.services.ssh_scheduler import Priority
+from app.core.deps import is_operator_or_admin, limit_ssh_requests
 
 router = APIRouter()
 
@@ -13,7 +15,7 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.post("/peerings/{peering_id}/bgp-enable", dependencies=[Depends(is_operator_or_admin)])
+@router.post("/peerings/{peering_id}/bgp-enable", dependencies=[Depends(is_operator_or_admin), Depends(limit_ssh_requests)])
 async def enable_bgp_peering(peering_id: int, db: AsyncSession = Depends(get_db)):
     peering = await db.get(Peering, peering_id)
     if not peering:
@@ -24,12 +26,14 @@ async def enable_bgp_peering(peering_id: int, db: AsyncSession = Depends(get_db)
     # Exemplo Cisco IOS: no neighbor <ip> shutdown
     command = f"configure terminal\nrouter bgp {router.asn}\nno neighbor {peering.ip} shutdown\nend\nwrite memory"
     try:
-        output = run_ssh_command(router, command)
+        output = await run_ssh_command_async(router, command, priority=Priority.INTERACTIVE)
+    except RouterUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro SSH: {e}")
     return {"output": output}
 
-@router.post("/peerings/{peering_id}/bgp-disable", dependencies=[Depends(is_operator_or_admin)])
+@router.post("/peerings/{peering_id}/bgp-disable", dependencies=[Depends(is_operator_or_admin), Depends(limit_ssh_requests)])
 async def disable_bgp_peering(peering_id: int, db: AsyncSession = Depends(get_db)):
     peering = await db.get(Peering, peering_id)
     if not peering:
@@ -40,7 +44,9 @@ async def disable_bgp_peering(peering_id: int, db: AsyncSession = Depends(get_db
     # Exemplo Cisco IOS: neighbor <ip> shutdown
     command = f"configure terminal\nrouter bgp {router.asn}\nneighbor {peering.ip} shutdown\nend\nwrite memory"
     try:
-        output = run_ssh_command(router, command)
+        output = await run_ssh_command_async(router, command, priority=Priority.INTERACTIVE)
+    except RouterUnavailable:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro SSH: {e}")
     return {"output": output}
@@ -4,9 +4,14 @@ from sqlalchemy.future import select
 from app.models.peering_group import PeeringGroup, peering_group_association
 from app.models.peering import Peering
 from app.models.router import Router
-from app.core.config import SessionLocal
-from app.services.ssh import run_ssh_command
-from app.core.deps import is_operator_or_admin
+from app.core.config import SessionLocal, SSH_GROUP_MAX_PARALLEL_ROUTERS
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import InteractiveShell
+from app.core.deps import is_operator_or_admin, limit_ssh_requests
+from collections import defaultdict
+import asyncio
 
 router = APIRouter()
 
@@ -14,42 +19,95 @@ async def get_db():
     async with SessionLocal() as session:
         yield session
 
-@router.post("/peering-groups/{group_id}/bgp-enable", dependencies=[Depends(is_operator_or_admin)])
-async def enable_bgp_group(group_id: int, db: AsyncSession = Depends(get_db)):
+def run_neighbor_commands(router, asn, peer_ips, action, progress):
+    """
+    Aplica todas as alterações de neighbor de um roteador em uma única sessão,
+    com um único write memory. Registra o avanço em `progress` (saída de cada
+    peer aplicado, peer em andamento e saída do commit) para que uma falha no
+    meio diga o que já foi feito.
+    """
+    prefix = "no " if action == "enable" else ""
+    with ssh_pool.shell(router) as channel:
+        shell = InteractiveShell(channel)
+        shell.read_until_prompt()
+        # Exemplo Cisco IOS: [no] neighbor <ip> shutdown
+        shell.send_command("configure terminal")
+        shell.send_command(f"router bgp {asn}")
+        for ip in peer_ips:
+            progress["current"] = ip
+            progress["applied"][ip] = shell.send_command(f"{prefix}neighbor {ip} shutdown")
+        progress["current"] = None
+        shell.send_command("end")
+        progress["commit_started"] = True
+        progress["commit"] = shell.send_command("write memory")
+
+def peer_result(peering, progress, error=None):
+    """
+    Situação de um peer depois da sessão no roteador: "applied" (comando
+    aceito), "failed" (a sessão caiu neste peer) ou "not_attempted"; committed
+    diz se o write memory do roteador terminou
+    """
+    if peering.ip in progress["applied"]:
+        status = "applied"
+    elif error and progress["current"] == peering.ip:
+        status = "failed"
+    else:
+        status = "not_attempted"
+    result = {
+        "peering_id": peering.id,
+        "status": status,
+        "commit_started": progress["commit_started"],
+        "committed": progress["commit"] is not None,
+    }
+    if status == "applied":
+        result["output"] = progress["applied"][peering.ip] + "\n" + (progress["commit"] or "")
+    if error:
+        result["error"] = error
+    return result
+
+async def run_group_action(group_id: int, action: str, db: AsyncSession):
     group = await db.get(PeeringGroup, group_id)
     if not group:
         raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    peerings = (await db.execute(select(Peering).where(Peering.id.in_([p.id for p in group.peerings])))).scalars().all()
-    results = []
+    peerings = (await db.execute(select(Peering).join(peering_group_association, Peering.id == peering_group_association.c.peering_id).where(peering_group_association.c.group_id == group_id))).scalars().all()
+    # Um único SELECT para todos os roteadores envolvidos
+    router_ids = {p.router_id for p in peerings}
+    routers = {r.id: r for r in (await db.execute(select(Router).where(Router.id.in_(router_ids)))).scalars().all()} if router_ids else {}
+
+    by_router = defaultdict(list)
     for peering in peerings:
-        router = await db.get(Router, peering.router_id)
+        by_router[peering.router_id].append(peering)
+
+    results = {}
+    semaphore = asyncio.Semaphore(SSH_GROUP_MAX_PARALLEL_ROUTERS)
+
+    async def apply_on_router(router_id, router_peerings):
+        progress = {"applied": {}, "current": None, "commit_started": False, "commit": None}
+        router = routers.get(router_id)
         if not router:
-            results.append({"peering_id": peering.id, "error": "Roteador não encontrado"})
-            continue
-        command = f"configure terminal\nrouter bgp {router.asn}\nno neighbor {peering.ip} shutdown\nend\nwrite memory"
-        try:
-            output = run_ssh_command(router, command)
-            results.append({"peering_id": peering.id, "output": output})
-        except Exception as e:
-            results.append({"peering_id": peering.id, "error": str(e)})
-    return {"results": results}
-
-@router.post("/peering-groups/{group_id}/bgp-disable", dependencies=[Depends(is_operator_or_admin)])
+            for peering in router_peerings:
+                results[peering.id] = peer_result(peering, progress, "Roteador não encontrado")
+            return
+        error = None
+        async with semaphore:
+            try:
+                await ssh_executor.run_on_router(
+                    router, run_neighbor_commands, router.asn, [p.ip for p in router_peerings], action, progress,
+                    priority=Priority.INTERACTIVE
+                )
+            except Exception as e:
+                error = str(e)
+        for peering in router_peerings:
+            results[peering.id] = peer_result(peering, progress, error)
+
+    # Roteadores diferentes em paralelo, cada um em uma única sessão
+    await asyncio.gather(*(apply_on_router(router_id, items) for router_id, items in by_router.items()))
+    return {"results": [results[p.id] for p in peerings]}
+
+@router.post("/peering-groups/{group_id}/bgp-enable", dependencies=[Depends(is_operator_or_admin), Depends(limit_ssh_requests)])
+async def enable_bgp_group(group_id: int, db: AsyncSession = Depends(get_db)):
+    return await run_group_action(group_id, "enable", db)
+
+@router.post("/peering-groups/{group_id}/bgp-disable", dependencies=[Depends(is_operator_or_admin), Depends(limit_ssh_requests)])
 async def disable_bgp_group(group_id: int, db: AsyncSession = Depends(get_db)):
-    group = await db.get(PeeringGroup, group_id)
-    if not group:
-        raise HTTPException(status_code=404, detail="Grupo não encontrado")
-    peerings = (await db.execute(select(Peering).where(Peering.id.in_([p.id for p in group.peerings])))).scalars().all()
-    results = []
-    for peering in peerings:
-        router = await db.get(Router, peering.router_id)
-        if not router:
-            results.append({"peering_id": peering.id, "error": "Roteador não encontrado"})
-            continue
-        command = f"configure terminal\nrouter bgp {router.asn}\nneighbor {peering.ip} shutdown\nend\nwrite memory"
-        try:
-            output = run_ssh_command(router, command)
-            results.append({"peering_id": peering.id, "output": output})
-        except Exception as e:
-            results.append({"peering_id": peering.id, "error": str(e)})
-    return {"results": results}
+    return await run_group_action(group_id, "disable", db)
@@ -15,6 +15,24 @@ class QueryResponse(BaseModel):
     error: Optional[str] = None
     execution_time: Optional[float] = None
 
+class BatchQueryRequest(BaseModel):
+    type: Literal["ping", "traceroute", "bgp", "bgp-summary"]
+    targets: List[str]
+    routerIds: List[int]
+    options: Optional[dict] = {}  # Como em QueryRequest, mais sourceIps: {routerId: id ou IP de origem}
+
+class BatchQueryItem(BaseModel):
+    id: Optional[str] = None  # Consulta criada para o par (None quando não foi possível criar)
+    routerId: int
+    router: Optional[str] = None
+    target: str
+    error: Optional[str] = None
+
+class BatchQueryResponse(BaseModel):
+    id: str
+    type: Literal["ping", "traceroute", "bgp", "bgp-summary"]
+    queries: List[BatchQueryItem]
+
 class LookingGlassQuery(BaseModel):
     id: Optional[str] = None
     type: Literal["ping", "traceroute", "bgp", "bgp-summary"]
@@ -24,6 +42,8 @@ class LookingGlassQuery(BaseModel):
     status: Literal["pending", "running", "completed", "error"]
     output: Optional[str] = None
     error: Optional[str] = None
+    queue_position: Optional[int] = None  # Posição na fila de sessões SSH do roteador (0 = executando)
+    cached_at: Optional[datetime] = None  # Resultado reaproveitado do cache: quando a consulta idêntica foi executada
 
 class IpOrigem(BaseModel):
     id: int
@@ -38,3 +58,4 @@ class RouterInfo(BaseModel):
     location: str
     status: Literal["online", "offline"]
     ip_origens: Optional[List[IpOrigem]] = []
+    health: Optional[dict] = None  # Estado do circuit breaker (ver app.services.router_health)
@@ -0,0 +1,11 @@
+"""
+Schemas para importação de arquivos MRT na RIB em memória
+"""
+from pydantic import BaseModel
+from typing import Optional
+
+class MRTImportRequest(BaseModel):
+    """Requisição de importação de um arquivo de MRT_IMPORT_DIR"""
+    file: str
+    router_id: Optional[int] = None  # Sem roteador: cada peer do dump é associado pelo IP cadastrado
+    snapshots: bool = False  # Grava também snapshots de rotas recebidas dos peerings reconhecidos
@@ -1,3 +1,4 @@
+from datetime import datetime
 from pydantic import BaseModel
 
 class IpOrigem(BaseModel):
@@ -30,10 +31,46 @@ class RouterUpdate(BaseModel):
     ip_origens: list[IpOrigem] | None = None
 
 
+class RouterHealth(BaseModel):
+    state: str  # closed, open ou half_open
+    consecutive_failures: int = 0
+    last_error: str | None = None
+    last_error_kind: str | None = None
+    last_failure_at: datetime | None = None
+    last_success_at: datetime | None = None
+    retry_after: float | None = None
+
+class BGPPeerStatus(BaseModel):
+    peer_ip: str
+    ip_version: int
+    address_family: str
+    remote_as: int | None = None
+    state: str  # Idle, Connect, Active, OpenSent, OpenConfirm, Established ou Unknown
+    admin_down: bool = False
+    established: bool = False
+    uptime: str | None = None
+    uptime_seconds: int | None = None
+    msg_received: int | None = None
+    msg_sent: int | None = None
+    out_queue: int | None = None
+    prefixes_received: int | None = None
+    prefixes_advertised: int | None = None
+
+class BGPSummaryRead(BaseModel):
+    router_id: int
+    local_router_id: str | None = None
+    local_as: int | None = None
+    total: int
+    established: int
+    cached: bool = False  # True quando veio do snapshot da coleta periódica
+    collected_at: datetime | None = None
+    peers: list[BGPPeerStatus] = []
+
 class RouterRead(RouterBase):
     id: int
     is_active: bool
     ssh_password: str = ""  # Não retornar a senha real por segurança
+    health: RouterHealth | None = None  # Preenchido na listagem
 
     class Config:
         orm_mode = True
@@ -46,5 +83,5 @@ class RouterRead(RouterBase):
             if field == 'ssh_password':
                 data[field] = ""  # Sempre retornar vazio
             else:
-                data[field] = getattr(obj, field)
+                data[field] = getattr(obj, field, None)
         return cls(**data)
@@ -0,0 +1,474 @@
+"""
+Histórico do estado BGP por peering
+
+Cada coleta do bgp_poller vira uma amostra por peering (estado, queda da
+sessão, prefixos recebidos/anunciados) guardada em buffers circulares de
+array — alguns bytes por amostra, tamanho fixo por peering. Em paralelo as
+amostras são resumidas em intervalos de 1 minuto, 1 hora e 1 dia; cada
+intervalo fechado vira uma linha em bgp_peer_history. Minutos sem novidade
+(mesmo estado e contagem, sem quedas) não são gravados: a série é completada
+repetindo o último valor na leitura.
+"""
+import asyncio
+import bisect
+from array import array
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import (
+    SessionLocal,
+    BGP_HISTORY_RING_SIZE,
+    BGP_HISTORY_MINUTE_RETENTION_DAYS,
+    BGP_HISTORY_HOUR_RETENTION_DAYS,
+)
+from app.models.bgp_peer_history import BGPPeerHistory
+from app.services.bgp_summary import BGPPeerSummary, BGPState
+import logging
+
+logger = logging.getLogger(__name__)
+
+MINUTE, HOUR, DAY = 60, 3600, 86400
+RESOLUTIONS = (MINUTE, HOUR, DAY)
+RESOLUTION_NAMES = {"1m": MINUTE, "1h": HOUR, "1d": DAY}
+
+# Estados em um byte; "Idle(Admin)" tem código próprio
+_STATE_LIST = list(BGPState)
+ADMIN_DOWN_CODE = len(_STATE_LIST)
+STATE_LABELS = [state.value for state in _STATE_LIST] + ["Idle(Admin)"]
+_STATE_CODES = {state: i for i, state in enumerate(_STATE_LIST)}
+_ESTABLISHED_CODE = _STATE_CODES[BGPState.ESTABLISHED]
+_UNKNOWN_CODE = _STATE_CODES[BGPState.UNKNOWN]
+
+# Contagem ausente (peer fora do summary) nos arrays de inteiros
+_MISSING = -1
+
+_ROW_FIELDS = ("samples", "up_samples", "flaps", "state_last", "prefixes_min", "prefixes_max", "prefixes_last", "advertised_last")
+
+# Linhas aguardando gravação; acima disso as mais antigas são descartadas
+_MAX_PENDING_ROWS = 200_000
+
+
+def _opt(value: int) -> Optional[int]:
+    return None if value == _MISSING else value
+
+
+class PeerRing:
+    """Últimas N amostras de um peering em arrays de tamanho fixo"""
+    __slots__ = ("capacity", "head", "size", "timestamps", "states", "flaps", "received", "advertised")
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.head = 0
+        self.size = 0
+        self.timestamps = array("I", bytes(4 * capacity))
+        self.states = array("B", bytes(capacity))
+        self.flaps = array("B", bytes(capacity))
+        self.received = array("i", bytes(4 * capacity))
+        self.advertised = array("i", bytes(4 * capacity))
+
+    def append(self, ts: int, state: int, flap: int, received: int, advertised: int):
+        i = self.head
+        self.timestamps[i] = ts
+        self.states[i] = state
+        self.flaps[i] = flap
+        self.received[i] = received
+        self.advertised[i] = advertised
+        self.head = (i + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def ordered(self, values: array) -> array:
+        """Cópia do array em ordem cronológica"""
+        start = (self.head - self.size) % self.capacity
+        if start + self.size <= self.capacity:
+            return values[start:start + self.size]
+        return values[start:] + values[:self.head]
+
+    def window(self, since_ts: int = 0) -> Dict[str, array]:
+        timestamps = self.ordered(self.timestamps)
+        first = bisect.bisect_left(timestamps, since_ts) if since_ts else 0
+        return {
+            "timestamps": timestamps[first:],
+            "states": self.ordered(self.states)[first:],
+            "flaps": self.ordered(self.flaps)[first:],
+            "received": self.ordered(self.received)[first:],
+            "advertised": self.ordered(self.advertised)[first:],
+        }
+
+
+class _Bucket:
+    """Resumo de um intervalo ainda aberto"""
+    __slots__ = ("start", "samples", "up_samples", "flaps", "state_last", "pmin", "pmax", "plast", "adv_last")
+
+    def __init__(self, start: int):
+        self.start = start
+        self.samples = 0
+        self.up_samples = 0
+        self.flaps = 0
+        self.state_last = _UNKNOWN_CODE
+        self.pmin = self.pmax = self.plast = self.adv_last = _MISSING
+
+    def add(self, state: int, flap: int, received: int, advertised: int):
+        self.samples += 1
+        if state == _ESTABLISHED_CODE:
+            self.up_samples += 1
+        self.flaps += flap
+        self.state_last = state
+        if received != _MISSING:
+            self.pmin = received if self.pmin == _MISSING else min(self.pmin, received)
+            self.pmax = max(self.pmax, received)
+        self.plast = received
+        self.adv_last = advertised
+
+    def to_row(self, peering_id: int, resolution: int) -> dict:
+        return {
+            "peering_id": peering_id,
+            "resolution": resolution,
+            "bucket_start": datetime.utcfromtimestamp(self.start),
+            "samples": self.samples,
+            "up_samples": self.up_samples,
+            "flaps": self.flaps,
+            "state_last": STATE_LABELS[self.state_last],
+            "prefixes_min": _opt(self.pmin),
+            "prefixes_max": _opt(self.pmax),
+            "prefixes_last": _opt(self.plast),
+            "advertised_last": _opt(self.adv_last),
+        }
+
+
+class PeerHistory:
+    __slots__ = ("ring", "buckets", "last_state", "last_uptime", "last_minute")
+
+    def __init__(self, capacity: int):
+        self.ring = PeerRing(capacity)
+        self.buckets: Dict[int, _Bucket] = {}
+        self.last_state: Optional[int] = None
+        self.last_uptime: Optional[int] = None
+        # (estado, prefixos, anunciados) do último minuto gravado
+        self.last_minute: Optional[Tuple[int, int, int]] = None
+
+
+class BGPHistoryService:
+    def __init__(self, capacity: int = BGP_HISTORY_RING_SIZE):
+        self.capacity = capacity
+        self._peers: Dict[int, PeerHistory] = {}
+        self._pending: List[dict] = []
+        self._flush_lock = asyncio.Lock()
+        self._last_cleanup: Optional[datetime] = None
+        self.rows_written = 0
+        self.minutes_skipped = 0
+
+    # Coleta --------------------------------------------------------------
+
+    def observe(self, collected_at: datetime, peers: Dict[str, BGPPeerSummary], peerings: Iterable[Tuple[int, str]]):
+        """
+        Registra uma coleta de um roteador.
+        peers: IP normalizado -> registro do summary; peerings: (peering_id, IP normalizado) do roteador.
+        """
+        ts = int(collected_at.timestamp())
+        for peering_id, ip in peerings:
+            peer = peers.get(ip)
+            if peer is None:
+                state, uptime, received, advertised = _UNKNOWN_CODE, None, _MISSING, _MISSING
+            else:
+                state = ADMIN_DOWN_CODE if peer.admin_down else _STATE_CODES[peer.state]
+                uptime = peer.uptime_seconds
+                received = _MISSING if peer.prefixes_received is None else peer.prefixes_received
+                advertised = _MISSING if peer.prefixes_advertised is None else peer.prefixes_advertised
+            self._record(peering_id, ts, state, uptime, received, advertised)
+
+    def _record(self, peering_id: int, ts: int, state: int, uptime: Optional[int], received: int, advertised: int):
+        history = self._peers.get(peering_id)
+        if history is None:
+            history = self._peers[peering_id] = PeerHistory(self.capacity)
+        # Queda: saiu de Established, ou continua Established mas o uptime zerou entre duas coletas
+        flap = 0
+        if history.last_state == _ESTABLISHED_CODE:
+            if state != _ESTABLISHED_CODE:
+                flap = 1
+            elif uptime is not None and history.last_uptime is not None and uptime < history.last_uptime:
+                flap = 1
+        history.last_state = state
+        history.last_uptime = uptime
+        history.ring.append(ts, state, flap, received, advertised)
+
+        for resolution in RESOLUTIONS:
+            start = ts - ts % resolution
+            bucket = history.buckets.get(resolution)
+            if bucket is None or bucket.start != start:
+                if bucket is not None:
+                    self._close(peering_id, history, resolution, bucket)
+                bucket = history.buckets[resolution] = _Bucket(start)
+            bucket.add(state, flap, received, advertised)
+
+    def _close(self, peering_id: int, history: PeerHistory, resolution: int, bucket: _Bucket):
+        if resolution == MINUTE:
+            signature = (bucket.state_last, bucket.plast, bucket.adv_last)
+            stable = bucket.flaps == 0 and bucket.up_samples in (0, bucket.samples)
+            if stable and signature == history.last_minute:
+                self.minutes_skipped += 1
+                return
+            history.last_minute = signature
+        self._pending.append(bucket.to_row(peering_id, resolution))
+        if len(self._pending) > _MAX_PENDING_ROWS:
+            logger.warning("Histórico BGP: fila de gravação cheia, descartando resumos antigos")
+            del self._pending[:len(self._pending) - _MAX_PENDING_ROWS]
+
+    def forget(self, active_peering_ids: Iterable[int]):
+        """Descarta da memória peerings que não existem mais"""
+        active = set(active_peering_ids)
+        for peering_id in [pid for pid in self._peers if pid not in active]:
+            del self._peers[peering_id]
+
+    # Gravação ------------------------------------------------------------
+
+    async def flush(self, include_open: bool = False):
+        """
+        Grava os intervalos fechados. include_open grava também os abertos
+        (no desligamento); se o intervalo continuar depois, as linhas são somadas.
+        """
+        async with self._flush_lock:
+            rows, self._pending = self._pending, []
+            if include_open:
+                for peering_id, history in self._peers.items():
+                    for resolution, bucket in history.buckets.items():
+                        rows.append(bucket.to_row(peering_id, resolution))
+                    history.buckets.clear()
+            if rows:
+                try:
+                    async with SessionLocal() as db:
+                        for i in range(0, len(rows), 1000):
+                            await db.execute(_upsert(rows[i:i + 1000]))
+                        await db.commit()
+                    self.rows_written += len(rows)
+                except Exception as e:
+                    logger.error(f"Histórico BGP: erro ao gravar {len(rows)} resumos: {e}")
+                    # Tenta de novo na próxima coleta
+                    self._pending = rows + self._pending
+                    return
+            await self._cleanup()
+
+    async def _cleanup(self):
+        now = datetime.utcnow()
+        if self._last_cleanup and now - self._last_cleanup < timedelta(hours=1):
+            return
+        self._last_cleanup = now
+        try:
+            async with SessionLocal() as db:
+                for resolution, days in ((MINUTE, BGP_HISTORY_MINUTE_RETENTION_DAYS), (HOUR, BGP_HISTORY_HOUR_RETENTION_DAYS)):
+                    await db.execute(delete(BGPPeerHistory).where(
+                        BGPPeerHistory.resolution == resolution,
+                        BGPPeerHistory.bucket_start < now - timedelta(days=days),
+                    ))
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Histórico BGP: erro na limpeza de resumos antigos: {e}")
+
+    # Consultas -----------------------------------------------------------
+
+    def raw_series(self, peering_id: int, since: Optional[datetime] = None) -> Optional[dict]:
+        """Amostras em memória, em colunas (prontas para sparkline)"""
+        history = self._peers.get(peering_id)
+        if history is None:
+            return None
+        data = history.ring.window(int(since.timestamp()) if since else 0)
+        return {
+            "timestamps": [datetime.utcfromtimestamp(ts).isoformat() + "Z" for ts in data["timestamps"]],
+            "state": [STATE_LABELS[code] for code in data["states"]],
+            "established": [code == _ESTABLISHED_CODE for code in data["states"]],
+            "flaps": data["flaps"].tolist(),
+            "prefixes_received": [_opt(v) for v in data["received"]],
+            "prefixes_advertised": [_opt(v) for v in data["advertised"]],
+        }
+
+    async def series(self, db: AsyncSession, peering_id: int, resolution: int, since: datetime, until: datetime) -> dict:
+        """
+        Série em intervalos regulares (UTC) a partir dos resumos gravados e dos
+        que ainda estão em memória. Intervalos sem dado ficam None; em 1 min o
+        último valor é repetido (minutos sem novidade não são gravados).
+        """
+        start = int(since.timestamp()) // resolution * resolution
+        end = int(until.timestamp())
+        rows = (await db.execute(
+            select(BGPPeerHistory).where(
+                BGPPeerHistory.peering_id == peering_id,
+                BGPPeerHistory.resolution == resolution,
+                BGPPeerHistory.bucket_start >= datetime.utcfromtimestamp(start),
+                BGPPeerHistory.bucket_start <= datetime.utcfromtimestamp(end),
+            ).order_by(BGPPeerHistory.bucket_start)
+        )).scalars().all()
+        by_start: Dict[int, dict] = {}
+        for row in rows:
+            key = int((row.bucket_start - datetime(1970, 1, 1)).total_seconds())
+            by_start[key] = {c: getattr(row, c) for c in _ROW_FIELDS}
+        # Ainda não gravados: fila e intervalos abertos (somam com o que já está no banco)
+        memory = [r for r in self._pending if r["peering_id"] == peering_id and r["resolution"] == resolution]
+        history = self._peers.get(peering_id)
+        if history is not None and resolution in history.buckets:
+            memory.append(history.buckets[resolution].to_row(peering_id, resolution))
+        for row in memory:
+            key = int((row["bucket_start"] - datetime(1970, 1, 1)).total_seconds())
+            by_start[key] = _merge(by_start.get(key), row)
+
+        series = {name: [] for name in (
+            "timestamps", "state", "availability", "flaps", "prefixes_min", "prefixes_max", "prefixes_last", "advertised_last")}
+        previous = None
+        if resolution == MINUTE:
+            # Último minuto gravado antes do início: ponto de partida para repetir valores
+            row = (await db.execute(
+                select(BGPPeerHistory).where(
+                    BGPPeerHistory.peering_id == peering_id,
+                    BGPPeerHistory.resolution == MINUTE,
+                    BGPPeerHistory.bucket_start < datetime.utcfromtimestamp(start),
+                ).order_by(BGPPeerHistory.bucket_start.desc()).limit(1)
+            )).scalars().first()
+            if row is not None:
+                previous = {c: getattr(row, c) for c in _ROW_FIELDS}
+            covered_until, hours = await self._coverage(db, peering_id, history, start, end, by_start)
+        for key in range(start, end + 1, resolution):
+            row = by_start.get(key)
+            if row is None and previous is not None and resolution == MINUTE and key <= covered_until and key - key % HOUR in hours:
+                row = {**previous, "samples": 0, "flaps": 0, "prefixes_min": previous["prefixes_last"], "prefixes_max": previous["prefixes_last"]}
+            series["timestamps"].append(datetime.utcfromtimestamp(key).isoformat() + "Z")
+            if row is None:
+                for name in ("state", "availability", "flaps", "prefixes_min", "prefixes_max", "prefixes_last", "advertised_last"):
+                    series[name].append(None)
+                continue
+            previous = row
+            series["state"].append(row["state_last"])
+            series["availability"].append(
+                round(row["up_samples"] / row["samples"], 3) if row["samples"] else (1.0 if row["state_last"] == "Established" else 0.0)
+            )
+            series["flaps"].append(row["flaps"])
+            for name in ("prefixes_min", "prefixes_max", "prefixes_last", "advertised_last"):
+                series[name].append(row[name])
+        return series
+
+    async def _coverage(
+        self, db: AsyncSession, peering_id: int, history: Optional[PeerHistory], start: int, end: int, minutes: Dict[int, dict],
+    ) -> Tuple[int, set]:
+        """
+        Até onde (e em que horas) um minuto sem linha pode repetir o valor
+        anterior: não inventa dados depois que o coletor parou nem no período
+        em que esteve fora. O limite é a última coleta em memória ou, depois de
+        um restart, o último minuto gravado (o desligamento grava o minuto
+        aberto); as horas são as que têm resumo de 1 h com coletas.
+        """
+        covered_until = max(minutes, default=0)
+        if history is not None and history.ring.size:
+            covered_until = max(covered_until, history.ring.timestamps[(history.ring.head - 1) % history.ring.capacity])
+        latest = (await db.execute(
+            select(func.max(BGPPeerHistory.bucket_start)).where(
+                BGPPeerHistory.peering_id == peering_id,
+                BGPPeerHistory.resolution == MINUTE,
+            )
+        )).scalar()
+        if latest is not None:
+            covered_until = max(covered_until, int((latest - datetime(1970, 1, 1)).total_seconds()))
+        hours = {
+            int((bucket_start - datetime(1970, 1, 1)).total_seconds())
+            for bucket_start in (await db.execute(
+                select(BGPPeerHistory.bucket_start).where(
+                    BGPPeerHistory.peering_id == peering_id,
+                    BGPPeerHistory.resolution == HOUR,
+                    BGPPeerHistory.samples > 0,
+                    BGPPeerHistory.bucket_start >= datetime.utcfromtimestamp(start - start % HOUR),
+                    BGPPeerHistory.bucket_start <= datetime.utcfromtimestamp(end),
+                )
+            )).scalars()
+        }
+        # Horas ainda não gravadas: fila e intervalo aberto
+        hours.update(
+            int((r["bucket_start"] - datetime(1970, 1, 1)).total_seconds())
+            for r in self._pending if r["peering_id"] == peering_id and r["resolution"] == HOUR
+        )
+        if history is not None and HOUR in history.buckets:
+            hours.add(history.buckets[HOUR].start)
+        return covered_until, hours
+
+    def flaps_report(self, window_seconds: int, limit: int = 100) -> List[dict]:
+        """
+        Peerings com quedas ou perda de prefixos na janela, a partir das amostras
+        em memória. Ordenado por quedas e depois pela maior queda de prefixos.
+        """
+        since_ts = int(datetime.now().timestamp()) - window_seconds
+        report = []
+        for peering_id, history in self._peers.items():
+            data = history.ring.window(since_ts)
+            if not data["timestamps"]:
+                continue
+            flaps = sum(data["flaps"])
+            received = [v for v in data["received"] if v != _MISSING]
+            peak = max(received) if received else None
+            last = _opt(data["received"][-1])
+            drop = peak - last if peak is not None and last is not None else 0
+            if not flaps and drop <= 0:
+                continue
+            report.append({
+                "peering_id": peering_id,
+                "flaps": flaps,
+                "state": STATE_LABELS[data["states"][-1]],
+                "prefixes_peak": peak,
+                "prefixes_last": last,
+                "prefixes_drop": drop,
+                "prefixes_drop_pct": round(100.0 * drop / peak, 1) if peak else 0.0,
+            })
+        report.sort(key=lambda r: (r["flaps"], r["prefixes_drop_pct"]), reverse=True)
+        return report[:limit]
+
+    def stats(self) -> dict:
+        samples = sum(h.ring.size for h in self._peers.values())
+        return {
+            "peerings": len(self._peers),
+            "samples_in_memory": samples,
+            "ring_size": self.capacity,
+            "memory_bytes": len(self._peers) * self.capacity * 14,
+            "pending_rows": len(self._pending),
+            "rows_written": self.rows_written,
+            "minutes_skipped": self.minutes_skipped,
+        }
+
+
+def _merge(stored: Optional[dict], row: dict) -> dict:
+    """Soma um resumo em memória com o que já foi gravado do mesmo intervalo"""
+    if stored is None:
+        return row
+    mins = [v for v in (stored["prefixes_min"], row["prefixes_min"]) if v is not None]
+    maxs = [v for v in (stored["prefixes_max"], row["prefixes_max"]) if v is not None]
+    return {
+        **row,
+        "samples": stored["samples"] + row["samples"],
+        "up_samples": stored["up_samples"] + row["up_samples"],
+        "flaps": stored["flaps"] + row["flaps"],
+        "prefixes_min": min(mins) if mins else None,
+        "prefixes_max": max(maxs) if maxs else None,
+    }
+
+
+def _upsert(rows: List[dict]):
+    stmt = insert(BGPPeerHistory).values(rows)
+    excluded = stmt.excluded
+    table = BGPPeerHistory.__table__.c
+    return stmt.on_conflict_do_update(
+        constraint="uq_bgp_peer_history_bucket",
+        set_={
+            "samples": table.samples + excluded.samples,
+            "up_samples": table.up_samples + excluded.up_samples,
+            "flaps": table.flaps + excluded.flaps,
+            "state_last": excluded.state_last,
+            # LEAST/GREATEST do PostgreSQL ignoram NULL
+            "prefixes_min": func.least(table.prefixes_min, excluded.prefixes_min),
+            "prefixes_max": func.greatest(table.prefixes_max, excluded.prefixes_max),
+            "prefixes_last": excluded.prefixes_last,
+            "advertised_last": excluded.advertised_last,
+        },
+    )
+
+
+# Instância global do histórico BGP
+bgp_history = BGPHistoryService()
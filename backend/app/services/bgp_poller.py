@@ -0,0 +1,306 @@
+"""
+Coleta periódica do estado BGP de todos os roteadores ativos
+
+Um summary por roteador a cada BGP_POLL_INTERVAL segundos, com os roteadores
+espalhados ao longo do intervalo (não todos de uma vez) e prioridade de
+segundo plano no agendador SSH. O último resultado de cada roteador fica em
+memória, indexado por roteador, por IP de peer e por id de peering, para que
+dashboard e consultas de status respondam sem abrir SSH.
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.future import select
+
+from app.core.config import (
+    SessionLocal,
+    BGP_POLL_ENABLED,
+    BGP_POLL_INTERVAL,
+    BGP_POLL_MAX_CONCURRENT,
+    BGP_POLL_TIMEOUT,
+)
+from app.models.peering import Peering
+from app.models.router import Router
+from app.services.bgp_summary import BGPPeerSummary, BGPSummary, fetch_bgp_summary, normalize_ip
+from app.services.bgp_history import bgp_history
+from app.services.router_health import RouterUnavailable
+from app.services.ssh_scheduler import Priority
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RouterSnapshot:
+    router_id: int
+    collected_at: Optional[datetime] = None
+    collected_monotonic: float = 0.0
+    duration_ms: Optional[float] = None
+    summary: Optional[BGPSummary] = None
+    # IP normalizado -> registro do peer
+    peers: Dict[str, BGPPeerSummary] = field(default_factory=dict)
+    error: Optional[str] = None
+    error_at: Optional[datetime] = None
+    # "ssh" (summary coletado) ou "bmp" (estado empurrado pelo coletor BMP)
+    source: str = "ssh"
+
+    @property
+    def age(self) -> Optional[float]:
+        return time.monotonic() - self.collected_monotonic if self.collected_at else None
+
+    def to_dict(self) -> dict:
+        return {
+            "router_id": self.router_id,
+            "collected_at": self.collected_at.isoformat() if self.collected_at else None,
+            "age_seconds": round(self.age, 1) if self.age is not None else None,
+            "duration_ms": self.duration_ms,
+            "peers": len(self.peers),
+            "established": self.summary.established if self.summary else 0,
+            "error": self.error,
+            "error_at": self.error_at.isoformat() if self.error_at else None,
+            "source": self.source,
+        }
+
+
+class BGPPoller:
+    def __init__(
+        self,
+        interval: float = BGP_POLL_INTERVAL,
+        max_concurrent: int = BGP_POLL_MAX_CONCURRENT,
+        timeout: int = BGP_POLL_TIMEOUT,
+    ):
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._snapshots: Dict[int, RouterSnapshot] = {}
+        # peering_id -> (router_id, IP normalizado) e router_id -> [(peering_id, IP)], atualizados a cada ciclo
+        self._peerings: Dict[int, Tuple[int, str]] = {}
+        self._router_peerings: Dict[int, List[Tuple[int, str]]] = {}
+        # Roteadores com estado empurrado (sessão BMP ativa): não são coletados via SSH
+        self._push_sources: Dict[int, str] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.cycles = 0
+        self.last_cycle_at: Optional[datetime] = None
+
+    # Ciclo de vida -------------------------------------------------------
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stop = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Coleta BGP iniciada (intervalo {self.interval}s, até {self.max_concurrent} roteadores simultâneos)")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await bgp_history.flush(include_open=True)
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Dorme até o tempo pedido ou até stop(); True se deve encerrar"""
+        if seconds > 0:
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+            except asyncio.TimeoutError:
+                pass
+        return self._stop.is_set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            cycle_start = loop.time()
+            try:
+                routers = await self._load()
+            except Exception as e:
+                logger.error(f"Coleta BGP: erro ao carregar roteadores: {e}")
+                routers = []
+            # Espalha os roteadores ao longo do intervalo
+            step = self.interval / len(routers) if routers else 0
+            tasks: List[asyncio.Task] = []
+            for i, router in enumerate(routers):
+                if await self._sleep(cycle_start + i * step - loop.time()):
+                    break
+                if router.id in self._push_sources:
+                    # Sem SSH: só amostra para o histórico o estado mantido pelo coletor
+                    self._sample_pushed(router.id)
+                    continue
+                tasks.append(loop.create_task(self.poll_router(router)))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await bgp_history.flush()
+            self.cycles += 1
+            self.last_cycle_at = datetime.now()
+            if await self._sleep(cycle_start + self.interval - loop.time()):
+                break
+
+    async def _load(self) -> List[Router]:
+        async with SessionLocal() as db:
+            routers = (await db.execute(select(Router).where(Router.is_active == True).order_by(Router.id))).scalars().all()
+            peerings = (await db.execute(select(Peering.id, Peering.router_id, Peering.ip))).all()
+        self._peerings = {peering_id: (router_id, normalize_ip(ip)) for peering_id, router_id, ip in peerings}
+        por_roteador: Dict[int, List[Tuple[int, str]]] = {}
+        for peering_id, (router_id, ip) in self._peerings.items():
+            por_roteador.setdefault(router_id, []).append((peering_id, ip))
+        self._router_peerings = por_roteador
+        bgp_history.forget(self._peerings)
+        # Roteadores removidos ou desativados saem do snapshot
+        active = {router.id for router in routers}
+        for router_id in list(self._snapshots):
+            if router_id not in active:
+                del self._snapshots[router_id]
+        return list(routers)
+
+    # Coleta --------------------------------------------------------------
+
+    async def poll_router(self, router: Router) -> RouterSnapshot:
+        async with self._semaphore:
+            start = time.perf_counter()
+            try:
+                summary = await fetch_bgp_summary(router, timeout=self.timeout, priority=Priority.BACKGROUND)
+            except RouterUnavailable as e:
+                return self._record_error(router.id, f"Roteador indisponível: {e}")
+            except Exception as e:
+                logger.warning(f"Coleta BGP falhou em {router.name}: {e}")
+                return self._record_error(router.id, str(e) or type(e).__name__)
+            snapshot = self.store(router.id, summary, duration_ms=round((time.perf_counter() - start) * 1000, 1))
+            bgp_history.observe(snapshot.collected_at, snapshot.peers, self._router_peerings.get(router.id, ()))
+            return snapshot
+
+    def store(self, router_id: int, summary: BGPSummary, duration_ms: Optional[float] = None) -> RouterSnapshot:
+        """Grava um summary completo do roteador (também usado por consultas ao vivo)"""
+        snapshot = RouterSnapshot(
+            router_id=router_id,
+            collected_at=datetime.now(),
+            collected_monotonic=time.monotonic(),
+            duration_ms=duration_ms,
+            summary=summary,
+            peers={normalize_ip(peer.peer_ip): peer for peer in summary.peers},
+        )
+        self._snapshots[router_id] = snapshot
+        return snapshot
+
+    # Estado empurrado (BMP) ---------------------------------------------
+
+    def set_push_source(self, router_id: int, source: Optional[str]):
+        """Marca (ou desmarca, com None) um roteador como alimentado por push; a coleta SSH o ignora"""
+        if source:
+            self._push_sources[router_id] = source
+        else:
+            self._push_sources.pop(router_id, None)
+
+    def push_peer(self, router_id: int, peer_ip: str, source: str = "bmp", **fields) -> BGPPeerSummary:
+        """
+        Atualiza (ou cria) o registro do peer no snapshot do roteador. O objeto
+        devolvido pode ser alterado diretamente depois (ex.: contagem de prefixos).
+        """
+        snapshot = self._snapshots.get(router_id)
+        if snapshot is None or snapshot.summary is None or snapshot.source != source:
+            snapshot = self._snapshots[router_id] = RouterSnapshot(router_id=router_id, summary=BGPSummary(), source=source)
+        key = normalize_ip(peer_ip)
+        peer = snapshot.peers.get(key)
+        if peer is None:
+            version = 6 if ":" in key else 4
+            peer = BGPPeerSummary(key, version, "ipv6 unicast" if version == 6 else "ipv4 unicast")
+            snapshot.peers[key] = peer
+            snapshot.summary.peers.append(peer)
+        for name, value in fields.items():
+            setattr(peer, name, value)
+        self.touch(router_id)
+        return peer
+
+    def touch(self, router_id: int):
+        """Renova o instante do snapshot empurrado (mantém is_fresh enquanto a sessão estiver viva)"""
+        snapshot = self._snapshots.get(router_id)
+        if snapshot is not None:
+            snapshot.collected_at = datetime.now()
+            snapshot.collected_monotonic = time.monotonic()
+
+    def _sample_pushed(self, router_id: int):
+        snapshot = self._snapshots.get(router_id)
+        if snapshot is not None and snapshot.collected_at is not None:
+            bgp_history.observe(datetime.now(), snapshot.peers, self._router_peerings.get(router_id, ()))
+
+    def peering_for(self, router_id: int, peer_ip: str) -> Optional[int]:
+        """Id do Peering cadastrado para o IP do peer no roteador"""
+        key = normalize_ip(peer_ip)
+        for peering_id, ip in self._router_peerings.get(router_id, ()):
+            if ip == key:
+                return peering_id
+        return None
+
+    def _record_error(self, router_id: int, error: str) -> RouterSnapshot:
+        # Mantém o último resultado bom; só marca o erro
+        snapshot = self._snapshots.get(router_id) or RouterSnapshot(router_id=router_id)
+        snapshot.error = error
+        snapshot.error_at = datetime.now()
+        self._snapshots[router_id] = snapshot
+        return snapshot
+
+    # Consultas -----------------------------------------------------------
+
+    def is_fresh(self, snapshot: Optional[RouterSnapshot]) -> bool:
+        """Resultado recente o bastante para dispensar SSH (até 3 ciclos)"""
+        return snapshot is not None and snapshot.age is not None and snapshot.age <= 3 * self.interval
+
+    def router_snapshot(self, router_id: int) -> Optional[RouterSnapshot]:
+        return self._snapshots.get(router_id)
+
+    def peer_state(self, router_id: int, peer_ip: str) -> Optional[BGPPeerSummary]:
+        snapshot = self._snapshots.get(router_id)
+        return snapshot.peers.get(normalize_ip(peer_ip)) if snapshot else None
+
+    def peering_state(self, peering_id: int) -> Optional[BGPPeerSummary]:
+        """Estado do peering; None se desconhecido ou se o snapshot do roteador não é recente"""
+        key = self._peerings.get(peering_id)
+        # Roteador inacessível mantém o último snapshot bom: sem isso os peers ficariam "up" para sempre
+        if not key or not self.is_fresh(self._snapshots.get(key[0])):
+            return None
+        return self.peer_state(*key)
+
+    def sessions(self, peering_ids: Optional[Iterable[int]] = None) -> dict:
+        """Contagem de sessões dos peerings cadastrados (todos ou os informados); snapshots velhos contam como unknown"""
+        up = down = unknown = 0
+        for peering_id in (self._peerings if peering_ids is None else peering_ids):
+            peer = self.peering_state(peering_id)
+            if peer is None:
+                unknown += 1
+            elif peer.established:
+                up += 1
+            else:
+                down += 1
+        collected = [s.collected_at for s in self._snapshots.values() if s.collected_at]
+        return {
+            "total": up + down,
+            "up": up,
+            "down": down,
+            "unknown": unknown,
+            "updated_at": max(collected).isoformat() if collected else None,
+        }
+
+    def stats(self) -> dict:
+        return {
+            "enabled": BGP_POLL_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "cycles": self.cycles,
+            "last_cycle_at": self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+            "push_sources": {str(router_id): source for router_id, source in self._push_sources.items()},
+            "routers": {str(router_id): s.to_dict() for router_id, s in self._snapshots.items()},
+        }
+
+
+# Instância global do coletor BGP
+bgp_poller = BGPPoller()
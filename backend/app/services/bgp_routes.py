@@ -0,0 +1,493 @@
+"""
+Rotas BGP anunciadas a um peer (ou recebidas dele), lidas em streaming
+
+Interpreta "display bgp [ipv6] routing-table peer X advertised-routes" (ou
+received-routes) linha a
+linha enquanto a saída chega pelo SSH, aplica filtros (prefixo, tamanho,
+AS-path) e paginação por cursor no servidor. Só a linha atual e a fila
+limitada do stream ficam em memória, qualquer que seja o tamanho da tabela.
+
+Formatos do VRP aceitos:
+- uma rota por linha (IPv4), com colunas alinhadas ao cabeçalho;
+- blocos "Network : ... PrefixLen : ..." em várias linhas (IPv6).
+"""
+import base64
+import ipaddress
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple, Union
+
+from app.services.ssh_pool import ssh_pool
+from app.services.ssh_stream import iter_ssh_lines
+from app.services.ssh_scheduler import Priority
+
+_STATUS_CHARS = frozenset("*>disxhaSVIN")
+_ORIGINS = frozenset("ie?")
+_TOKEN = re.compile(r"\S+")
+_HEADER_COLUMNS = ("MED", "LocPrf", "PrefVal")
+
+
+@dataclass(slots=True)
+class BGPRoute:
+    network: str
+    prefix_len: int
+    next_hop: Optional[str] = None
+    med: Optional[int] = None
+    local_pref: Optional[int] = None
+    pref_val: Optional[int] = None
+    as_path: str = ""
+    origin: Optional[str] = None
+    status: str = ""
+
+    @property
+    def prefix(self) -> str:
+        return f"{self.network}/{self.prefix_len}"
+
+    @property
+    def best(self) -> bool:
+        return ">" in self.status
+
+    def to_dict(self) -> Dict:
+        return {
+            "prefix": self.prefix,
+            "next_hop": self.next_hop,
+            "med": self.med,
+            "local_pref": self.local_pref,
+            "pref_val": self.pref_val,
+            "as_path": self.as_path,
+            "origin": self.origin,
+            "status": self.status,
+            "best": self.best,
+        }
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    return int(value) if value and value.isdigit() else None
+
+
+def _split_path(tokens: List[str]) -> Tuple[str, Optional[str]]:
+    """("64512 3356", "i") a partir de ["64512", "3356i"] ou ["64512", "i"]"""
+    if not tokens:
+        return "", None
+    last = tokens[-1]
+    origin = None
+    if last[-1] in _ORIGINS:
+        origin = last[-1]
+        last = last[:-1]
+        tokens = tokens[:-1] + ([last] if last else [])
+    return " ".join(tokens), origin
+
+
+class RouteTableParser:
+    """Parser incremental: feed(linha) devolve uma BGPRoute quando uma rota fica completa"""
+
+    def __init__(self):
+        self.total: Optional[int] = None
+        self.error: Optional[str] = None
+        self._columns: Optional[Dict[str, int]] = None
+        self._path_col: Optional[int] = None
+        self._block: Optional[BGPRoute] = None
+
+    def feed(self, line: str) -> Optional[BGPRoute]:
+        stripped = line.strip()
+        if not stripped:
+            return None
+        if self._block is not None or "Network  :" in line or stripped.startswith("Network :"):
+            return self._feed_block(line, stripped)
+        if stripped.startswith("Error:"):
+            # Ex.: "Error: The peer does not exist."
+            self.error = self.error or stripped
+            return None
+        if stripped.startswith("Total Number of Routes"):
+            self.total = _int(stripped.rsplit(":", 1)[-1].strip())
+            return None
+        if stripped.startswith("Network") and "NextHop" in stripped:
+            self._columns = {name: line.index(name) for name in _HEADER_COLUMNS if name in line}
+            self._path_col = line.index("Path/Ogn") if "Path/Ogn" in line else None
+            return None
+        return self._feed_row(line)
+
+    def _feed_row(self, line: str) -> Optional[BGPRoute]:
+        matches = list(_TOKEN.finditer(line))
+        if len(matches) < 3:
+            return None
+        status = matches[0].group()
+        if not _STATUS_CHARS.issuperset(status):
+            return None
+        network, _, length = matches[1].group().partition("/")
+        if not length.isdigit():
+            return None
+        route = BGPRoute(network=network, prefix_len=int(length), next_hop=matches[2].group(), status=status)
+        rest = matches[3:]
+        if self._path_col is not None:
+            middle = [m for m in rest if m.start() < self._path_col - 1]
+            path = [m.group() for m in rest if m.start() >= self._path_col - 1]
+        else:
+            # Sem cabeçalho: MED e PrefVal presentes, LocPrf vazio (caso mais comum)
+            middle, path = rest[:2], [m.group() for m in rest[2:]]
+        if self._columns and middle:
+            for m in middle:
+                column = min(self._columns, key=lambda name: abs(self._columns[name] - m.start()))
+                value = _int(m.group())
+                if column == "MED":
+                    route.med = value
+                elif column == "LocPrf":
+                    route.local_pref = value
+                else:
+                    route.pref_val = value
+        elif middle:
+            route.med = _int(middle[0].group())
+            route.pref_val = _int(middle[-1].group()) if len(middle) > 1 else None
+        route.as_path, route.origin = _split_path(path)
+        return route
+
+    def _feed_block(self, line: str, stripped: str) -> Optional[BGPRoute]:
+        """Formato IPv6 do VRP: uma rota em várias linhas "Campo : valor" """
+        fields = _block_fields(stripped)
+        if "Network" in fields:
+            status = stripped.split("Network", 1)[0].strip()
+            self._block = BGPRoute(
+                network=fields["Network"],
+                prefix_len=_int(fields.get("PrefixLen")) or 0,
+                status=status,
+            )
+            return None
+        route = self._block
+        if route is None:
+            return None
+        if "NextHop" in fields:
+            route.next_hop = fields["NextHop"] or None
+            route.local_pref = _int(fields.get("LocPrf"))
+        if "MED" in fields:
+            route.med = _int(fields["MED"])
+            route.pref_val = _int(fields.get("PrefVal"))
+        if "Path/Ogn" in fields:
+            route.as_path, route.origin = _split_path(fields["Path/Ogn"].split())
+            self._block = None
+            return route
+        return None
+
+
+_BLOCK_FIELD = re.compile(r"(Network|PrefixLen|NextHop|LocPrf|MED|PrefVal|Label|Path/Ogn)\s*: ?(.*?)(?=\s{2,}\S+\s*:|\s*$)")
+
+
+def _block_fields(text: str) -> Dict[str, str]:
+    return {name: value.strip() for name, value in _BLOCK_FIELD.findall(text)}
+
+
+# Filtros e cursor ----------------------------------------------------------
+
+# Nós do autômato das expressões de AS-path
+_EPS, _CHAR, _START, _END, _MATCH = range(5)
+_DIGITS = frozenset("0123456789")
+_SPACES = frozenset(" \t")
+_QUANTIFIERS = "*+?"
+_MAX_CACHED_STEPS = 10000
+
+
+class ASPathPattern:
+    """
+    Expressão de AS-path no estilo do roteador, executada por autômato (sem
+    backtracking): o tempo é linear no tamanho do AS-path, qualquer que seja a
+    expressão enviada pelo cliente. Gramática: dígitos, ".", classes de dígitos
+    ("[0-9]", "[^0]"), "_" (início, fim ou espaço), "^", "$", "|", grupos e os
+    quantificadores "*", "+" e "?". Os estados determinísticos são montados sob
+    demanda e reaproveitados entre as rotas.
+    """
+
+    def __init__(self, expression: str):
+        if len(expression) > 200:
+            raise ValueError("Expressão de AS-path longa demais")
+        self.pattern = expression
+        self._kinds: List[int] = []
+        self._args: List[Optional[Tuple[bool, frozenset]]] = []
+        self._outs: List[List[int]] = []
+        self._position = 0
+        self._start, end = self._alternation()
+        if self._position < len(expression):
+            raise ValueError(f"')' sem '(' na posição {self._position}")
+        self._outs[end].append(self._node(_MATCH))
+        # (estados após o caractere anterior, no início?, caractere) -> próximos estados (True: casou)
+        self._steps: Dict[tuple, object] = {}
+
+    # Compilação (Thompson) ---------------------------------------------------
+
+    def _node(self, kind: int, arg: Optional[Tuple[bool, frozenset]] = None) -> int:
+        self._kinds.append(kind)
+        self._args.append(arg)
+        self._outs.append([])
+        return len(self._kinds) - 1
+
+    def _peek(self) -> Optional[str]:
+        return self.pattern[self._position] if self._position < len(self.pattern) else None
+
+    def _alternation(self) -> Tuple[int, int]:
+        branches = [self._sequence()]
+        while self._peek() == "|":
+            self._position += 1
+            branches.append(self._sequence())
+        if len(branches) == 1:
+            return branches[0]
+        start, end = self._node(_EPS), self._node(_EPS)
+        for branch_start, branch_end in branches:
+            self._outs[start].append(branch_start)
+            self._outs[branch_end].append(end)
+        return start, end
+
+    def _sequence(self) -> Tuple[int, int]:
+        start = end = self._node(_EPS)
+        while self._peek() not in (None, "|", ")"):
+            piece_start, piece_end = self._piece()
+            self._outs[end].append(piece_start)
+            end = piece_end
+        return start, end
+
+    def _piece(self) -> Tuple[int, int]:
+        start, end = self._atom()
+        quantifier = self._peek()
+        if quantifier is None or quantifier not in _QUANTIFIERS:
+            return start, end
+        self._position += 1
+        if self._peek() is not None and self._peek() in _QUANTIFIERS:
+            raise ValueError(f"Quantificadores seguidos na posição {self._position}")
+        split, after = self._node(_EPS), self._node(_EPS)
+        self._outs[split] += [start, after]
+        if quantifier == "?":
+            self._outs[end].append(after)
+            return split, after
+        self._outs[end].append(split)
+        return (split if quantifier == "*" else start), after
+
+    def _atom(self) -> Tuple[int, int]:
+        position = self._position
+        char = self.pattern[position]
+        self._position += 1
+        if char == "(":
+            start, end = self._alternation()
+            if self._peek() != ")":
+                raise ValueError(f"'(' sem ')' na posição {position}")
+            self._position += 1
+            return start, end
+        if char in _DIGITS:
+            return self._single(_CHAR, (False, frozenset(char)))
+        if char == ".":
+            return self._single(_CHAR, (True, frozenset()))
+        if char == "[":
+            return self._single(_CHAR, self._char_class(position))
+        if char == "^":
+            return self._single(_START)
+        if char == "$":
+            return self._single(_END)
+        if char == "_":
+            start, end = self._node(_EPS), self._node(_EPS)
+            for kind, arg in ((_START, None), (_END, None), (_CHAR, (False, _SPACES))):
+                node = self._node(kind, arg)
+                self._outs[start].append(node)
+                self._outs[node].append(end)
+            return start, end
+        if char in _QUANTIFIERS:
+            raise ValueError(f"Quantificador '{char}' sem o que repetir na posição {position}")
+        raise ValueError(f"Caractere não permitido '{char}' na posição {position}")
+
+    def _single(self, kind: int, arg: Optional[Tuple[bool, frozenset]] = None) -> Tuple[int, int]:
+        node, end = self._node(kind, arg), self._node(_EPS)
+        self._outs[node].append(end)
+        return node, end
+
+    def _char_class(self, position: int) -> Tuple[bool, frozenset]:
+        close = self.pattern.find("]", position)
+        body = self.pattern[position + 1:close] if close > 0 else ""
+        negate = body.startswith("^")
+        ranges = body[negate:].split("-")
+        if close < 0 or not all(ranges) or not set("".join(ranges)) <= _DIGITS:
+            raise ValueError(f"Classe inválida na posição {position} (só dígitos e intervalos)")
+        chars = set(ranges[0])
+        for previous, current in zip(ranges, ranges[1:]):
+            if previous[-1] > current[0]:
+                raise ValueError(f"Intervalo invertido na posição {position}")
+            chars.update(str(digit) for digit in range(int(previous[-1]), int(current[0]) + 1))
+            chars.update(current)
+        self._position = close + 1
+        return negate, frozenset(chars)
+
+    # Execução ----------------------------------------------------------------
+
+    def _closure(self, states: frozenset, at_start: bool, at_end: bool) -> frozenset:
+        """Estados alcançáveis sem consumir caractere (só os que consomem ou aceitam)"""
+        stack = list(states)
+        seen = set()
+        while stack:
+            state = stack.pop()
+            if state in seen:
+                continue
+            seen.add(state)
+            kind = self._kinds[state]
+            if kind == _EPS or (kind == _START and at_start) or (kind == _END and at_end):
+                stack.extend(self._outs[state])
+        return frozenset(state for state in seen if self._kinds[state] in (_CHAR, _MATCH))
+
+    def _step(self, states: frozenset, at_start: bool, char: Optional[str]):
+        # Busca em qualquer posição: o estado inicial entra a cada caractere
+        current = self._closure(states | {self._start}, at_start, char is None)
+        if any(self._kinds[state] == _MATCH for state in current):
+            return True
+        if char is None:
+            return False
+        following = []
+        for state in current:
+            if self._kinds[state] == _CHAR:
+                negate, chars = self._args[state]
+                if (char in chars) != negate:
+                    following.extend(self._outs[state])
+        return frozenset(following)
+
+    def search(self, text: str) -> bool:
+        """Verdadeiro se a expressão casa em algum ponto do AS-path"""
+        states = frozenset()
+        at_start = True
+        for char in (*text, None):
+            key = (states, at_start, char)
+            result = self._steps.get(key)
+            if result is None:
+                if len(self._steps) >= _MAX_CACHED_STEPS:
+                    self._steps.clear()
+                result = self._steps[key] = self._step(states, at_start, char)
+            if result is True or result is False:
+                return result
+            states = result
+            at_start = False
+        return False
+
+
+def compile_as_path(expression: str) -> ASPathPattern:
+    """Expressão de AS-path no estilo do roteador: "_" casa início, fim ou espaço"""
+    return ASPathPattern(expression)
+
+
+@dataclass
+class RouteFilter:
+    prefix: Optional[Union[ipaddress.IPv4Network, ipaddress.IPv6Network]] = None
+    exact: bool = False
+    min_length: Optional[int] = None
+    max_length: Optional[int] = None
+    as_path: Optional[ASPathPattern] = None
+
+    @property
+    def active(self) -> bool:
+        return any(v is not None for v in (self.prefix, self.min_length, self.max_length, self.as_path))
+
+    def matches(self, route: BGPRoute) -> bool:
+        if self.min_length is not None and route.prefix_len < self.min_length:
+            return False
+        if self.max_length is not None and route.prefix_len > self.max_length:
+            return False
+        if self.as_path is not None and not self.as_path.search(route.as_path):
+            return False
+        if self.prefix is not None:
+            # Comparação inteira: evita montar um ip_network por rota
+            try:
+                address = ipaddress.ip_address(route.network)
+            except ValueError:
+                return False
+            if address.version != self.prefix.version:
+                return False
+            if self.exact:
+                return route.prefix_len == self.prefix.prefixlen and int(address) == int(self.prefix.network_address)
+            return (
+                route.prefix_len >= self.prefix.prefixlen
+                and int(address) & int(self.prefix.netmask) == int(self.prefix.network_address)
+            )
+        return True
+
+
+def route_key(route: BGPRoute) -> Tuple[int, int]:
+    """Ordem do VRP na tabela: endereço de rede e depois tamanho do prefixo"""
+    return int(ipaddress.ip_address(route.network)), route.prefix_len
+
+
+def encode_cursor(route: BGPRoute) -> str:
+    return base64.urlsafe_b64encode(route.prefix.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """Chave de ordenação da última rota da página anterior; ValueError se inválido"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        network = ipaddress.ip_network(base64.urlsafe_b64decode(padded).decode(), strict=False)
+    except Exception:
+        raise ValueError("Cursor inválido")
+    return int(network.network_address), network.prefixlen
+
+
+# Execução -----------------------------------------------------------------
+
+DIRECTIONS = ("advertised", "received")
+
+
+def peer_routes_command(peer_ip: str, version: int, direction: str = "advertised") -> str:
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Direção inválida: {direction}")
+    family = "bgp ipv6" if version == 6 else "bgp"
+    return f"display {family} routing-table peer {peer_ip} {direction}-routes | no-more"
+
+
+def _exec_lines(credentials, command: str, yield_func: Callable[[List[str]], None], cancel_event=None):
+    # Um item da fila do stream por bloco recebido, não por linha
+    return ssh_pool.exec_lines(credentials, command, yield_func, timeout=60, cancel_event=cancel_event)
+
+
+async def iter_peer_routes(
+    router,
+    peer_ip: str,
+    version: int = 4,
+    route_filter: Optional[RouteFilter] = None,
+    after: Optional[Tuple[int, int]] = None,
+    limit: Optional[int] = None,
+    request=None,
+    direction: str = "advertised",
+    priority: Priority = Priority.INTERACTIVE,
+) -> AsyncIterator[Union[BGPRoute, dict]]:
+    """
+    Gera as rotas que passam no filtro, depois de `after` (cursor), até `limit`.
+    O último item é um dict com totais, o próximo cursor (None se acabou) e o
+    erro informado pelo roteador, se houver. Atingido o limite, a leitura SSH
+    é interrompida.
+    """
+    parser = RouteTableParser()
+    scanned = matched = 0
+    last: Optional[BGPRoute] = None
+    has_more = False
+    lines = iter_ssh_lines(
+        router, _exec_lines, peer_routes_command(peer_ip, version, direction),
+        request=request, priority=priority,
+    )
+    try:
+        async for batch in lines:
+            if batch is None:
+                continue
+            for line in batch:
+                route = parser.feed(line)
+                if route is None:
+                    continue
+                scanned += 1
+                if after is not None and route_key(route) <= after:
+                    continue
+                if route_filter is not None and not route_filter.matches(route):
+                    continue
+                if limit is not None and matched >= limit:
+                    has_more = True
+                    break
+                matched += 1
+                last = route
+                yield route
+            if has_more:
+                break
+    finally:
+        await lines.aclose()
+    yield {
+        "total": parser.total,
+        "scanned": scanned,
+        "returned": matched,
+        "next_cursor": encode_cursor(last) if has_more and last is not None else None,
+        "error": parser.error,
+    }
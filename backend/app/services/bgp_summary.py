@@ -0,0 +1,289 @@
+"""
+Parser da saída de "display bgp [all|ipv6] summary" (Huawei VRP)
+
+Transforma o texto do roteador em registros tipados por peer, tanto da saída
+completa (com cabeçalho e seções "Address Family") quanto de trechos filtrados
+por "| inc". Feito para ser rápido com milhares de peers: um único passe por
+linha, só split() e comparações de string, sem regex por linha nem ipaddress.
+"""
+import ipaddress
+import re
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Dict, Iterable, List, Optional
+
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_scheduler import Priority
+
+
+class BGPState(str, Enum):
+    IDLE = "Idle"
+    CONNECT = "Connect"
+    ACTIVE = "Active"
+    OPEN_SENT = "OpenSent"
+    OPEN_CONFIRM = "OpenConfirm"
+    ESTABLISHED = "Established"
+    UNKNOWN = "Unknown"
+
+
+_STATES = {state.value.lower(): state for state in BGPState}
+
+# Ordem das colunas quando não há cabeçalho (saída de "| inc")
+DEFAULT_COLUMNS = ("V", "AS", "MsgRcvd", "MsgSent", "OutQ", "Up/Down", "State", "PrefRcv")
+
+# Nomes de coluna aceitos para prefixos anunciados (variam entre versões do VRP)
+_ADVERTISED_COLUMNS = ("PrefAdv", "PrefSnd", "PrefSent", "PrefAdvertised")
+
+_UPTIME_PART = re.compile(r"(\d+)([wdhms])")
+_UPTIME_UNITS = {"w": 604800, "d": 86400, "h": 3600, "m": 60, "s": 1}
+_HEX = frozenset("0123456789abcdefABCDEF")
+
+
+@dataclass(slots=True)
+class BGPPeerSummary:
+    peer_ip: str
+    ip_version: int
+    address_family: str
+    remote_as: Optional[int] = None
+    state: BGPState = BGPState.UNKNOWN
+    admin_down: bool = False
+    uptime: Optional[str] = None
+    uptime_seconds: Optional[int] = None
+    msg_received: Optional[int] = None
+    msg_sent: Optional[int] = None
+    out_queue: Optional[int] = None
+    prefixes_received: Optional[int] = None
+    # O summary do VRP normalmente não traz anunciados; preenchido só se houver a coluna
+    prefixes_advertised: Optional[int] = None
+
+    @property
+    def established(self) -> bool:
+        return self.state is BGPState.ESTABLISHED
+
+    def to_dict(self) -> Dict:
+        # Montado à mão: dataclasses.asdict copia recursivamente e é lento com milhares de peers
+        data = {name: getattr(self, name) for name in self.__slots__}
+        data["state"] = self.state.value
+        data["established"] = self.established
+        return data
+
+
+@dataclass(slots=True)
+class BGPSummary:
+    local_router_id: Optional[str] = None
+    local_as: Optional[int] = None
+    peers: List[BGPPeerSummary] = field(default_factory=list)
+
+    @property
+    def established(self) -> int:
+        return sum(1 for peer in self.peers if peer.state is BGPState.ESTABLISHED)
+
+    def filter(self, peer_ips: Optional[Iterable[str]] = None, family: Optional[int] = None,
+               state: Optional[BGPState] = None) -> "BGPSummary":
+        """Nova instância só com os peers que atendem aos filtros (IPs comparados normalizados)"""
+        wanted = {normalize_ip(ip) for ip in peer_ips} if peer_ips else None
+        peers = [
+            peer for peer in self.peers
+            if (wanted is None or normalize_ip(peer.peer_ip) in wanted)
+            and (family is None or peer.ip_version == family)
+            and (state is None or peer.state is state)
+        ]
+        return BGPSummary(self.local_router_id, self.local_as, peers)
+
+    def to_dict(self) -> Dict:
+        return {
+            "local_router_id": self.local_router_id,
+            "local_as": self.local_as,
+            "total": len(self.peers),
+            "established": self.established,
+            "peers": [peer.to_dict() for peer in self.peers],
+        }
+
+
+def normalize_ip(ip: str) -> str:
+    """Forma canônica do IP (o VRP imprime IPv6 em maiúsculas); devolve o texto original se inválido"""
+    try:
+        return ipaddress.ip_address(ip.strip()).compressed
+    except ValueError:
+        return ip.strip().lower()
+
+
+def parse_asn(value: str) -> Optional[int]:
+    """ASN em asplain ("65001") ou asdot ("1.10")"""
+    if value.isdigit():
+        return int(value)
+    high, dot, low = value.partition(".")
+    if dot and high.isdigit() and low.isdigit():
+        return int(high) * 65536 + int(low)
+    return None
+
+
+def parse_uptime(value: str) -> Optional[int]:
+    """Up/Down do VRP em segundos: "00:10:12", "1d02h", "0012h34m", "2w3d" """
+    # Atalhos para os dois formatos mais comuns
+    if len(value) == 8:
+        if value[4] == "h" and value[7] == "m" and value[:4].isdigit() and value[5:7].isdigit():
+            return int(value[:4]) * 3600 + int(value[5:7]) * 60
+        if value[2] == ":" and value[5] == ":" and value[:2].isdigit() and value[3:5].isdigit() and value[6:].isdigit():
+            return int(value[:2]) * 3600 + int(value[3:5]) * 60 + int(value[6:])
+    if ":" in value:
+        parts = value.split(":")
+        if len(parts) <= 3 and all(p.isdigit() for p in parts):
+            seconds = 0
+            for part in parts:
+                seconds = seconds * 60 + int(part)
+            return seconds
+        return None
+    total = 0
+    matched = 0
+    for number, unit in _UPTIME_PART.findall(value):
+        total += int(number) * _UPTIME_UNITS[unit]
+        matched += len(number) + 1
+    return total if matched and matched == len(value) else None
+
+
+def parse_state(value: str):
+    """(BGPState, admin_down) a partir de "Established", "Idle(Admin)", "Idle(Ovlmt)"..."""
+    name, _, qualifier = value.partition("(")
+    return _STATES.get(name.lower(), BGPState.UNKNOWN), qualifier.lower().startswith("admin")
+
+
+def _looks_like_ip(token: str) -> bool:
+    return token[0] in _HEX and ("." in token or ":" in token) and token[-1] != ":"
+
+
+# Campos numéricos, na ordem de BGPPeerSummary após uptime/uptime_seconds
+_FIELDS = ("as", "msgrcvd", "msgsent", "outq", "up/down", "state", "prefrcv")
+
+
+class _Columns:
+    """Índices das colunas de dados (após o IP) segundo o cabeçalho vigente"""
+    __slots__ = ("count", "indexes")
+
+    def __init__(self, names):
+        index = {name.lower(): i for i, name in enumerate(names)}
+        self.count = len(names)
+        advertised = next((index[n.lower()] for n in _ADVERTISED_COLUMNS if n.lower() in index), None)
+        self.indexes = tuple(index.get(name) for name in _FIELDS) + (advertised,)
+
+
+_DEFAULT = _Columns(DEFAULT_COLUMNS)
+_EMPTY = _Columns(())
+
+
+class _Builder:
+    """
+    Monta os registros. Estados e uptimes se repetem muito entre peers, então
+    o resultado de parse_state/parse_uptime fica em cache durante o parse.
+    """
+
+    def __init__(self):
+        self.states: Dict[str, tuple] = {}
+        self.uptimes: Dict[str, Optional[int]] = {}
+
+    def build(self, ip: str, values: List[str], columns: _Columns, family: Optional[str]) -> BGPPeerSummary:
+        version = 6 if ":" in ip else 4
+        asn, rcvd, sent, outq, updown, state, pref_rcv, pref_adv = [
+            None if i is None else values[i] for i in columns.indexes
+        ]
+        if state is None:
+            bgp_state, admin_down = BGPState.UNKNOWN, False
+        else:
+            cached = self.states.get(state)
+            if cached is None:
+                cached = self.states[state] = parse_state(state)
+            bgp_state, admin_down = cached
+        uptime_seconds = None
+        if updown is not None:
+            uptime_seconds = self.uptimes.get(updown, -1)
+            if uptime_seconds == -1:
+                uptime_seconds = self.uptimes[updown] = parse_uptime(updown)
+        return BGPPeerSummary(
+            ip,
+            version,
+            family or ("ipv6 unicast" if version == 6 else "ipv4 unicast"),
+            None if asn is None else (int(asn) if asn.isdigit() else parse_asn(asn)),
+            bgp_state,
+            admin_down,
+            updown,
+            uptime_seconds,
+            int(rcvd) if rcvd and rcvd.isdigit() else None,
+            int(sent) if sent and sent.isdigit() else None,
+            int(outq) if outq and outq.isdigit() else None,
+            int(pref_rcv) if pref_rcv and pref_rcv.isdigit() else None,
+            int(pref_adv) if pref_adv and pref_adv.isdigit() else None,
+        )
+
+
+def parse_bgp_summary(output: str) -> BGPSummary:
+    """
+    Converte a saída do summary em BGPSummary.
+
+    Aceita IPv4 e IPv6, várias seções "Address Family", linhas em que o VRP
+    quebra endereços IPv6 longos (IP sozinho numa linha e os contadores na
+    seguinte) e saídas filtradas sem cabeçalho. Linhas irreconhecíveis são
+    ignoradas.
+    """
+    summary = BGPSummary()
+    peers = summary.peers
+    build = _Builder().build
+    columns = _DEFAULT
+    family: Optional[str] = None
+    pending_ip: Optional[str] = None
+
+    for line in output.splitlines():
+        parts = line.split()
+        if not parts:
+            continue
+        first = parts[0]
+
+        if pending_ip is not None:
+            # Continuação de um IPv6 quebrado: só os contadores
+            if len(parts) == columns.count and first.isdigit():
+                peers.append(build(pending_ip, parts, columns, family))
+                pending_ip = None
+                continue
+            # Só o IP chegou (ex.: "| inc" de um IPv6 quebrado)
+            peers.append(build(pending_ip, [], _EMPTY, family))
+            pending_ip = None
+
+        if _looks_like_ip(first):
+            if len(parts) == 1:
+                pending_ip = first
+            elif len(parts) == columns.count + 1:
+                peers.append(build(first, parts[1:], columns, family))
+            continue
+
+        if first == "Peer":
+            columns = _Columns(parts[1:])
+        elif first == "Address" and line.count(":"):
+            family = line.split(":", 1)[1].strip().lower()
+        elif first == "BGP" and "ID" in parts:
+            summary.local_router_id = parts[-1]
+        elif first == "Local" and parts[1:2] == ["AS"]:
+            summary.local_as = parse_asn(parts[-1])
+
+    if pending_ip is not None:
+        peers.append(build(pending_ip, [], _EMPTY, family))
+    return summary
+
+
+def summary_command(peer_ips: Optional[Iterable[str]] = None) -> str:
+    """
+    Comando do summary. Com peers só IPv4 usa "| inc" para reduzir a saída;
+    IPv6 longos são quebrados em duas linhas pelo VRP e o filtro perderia os
+    contadores, então nesse caso busca a saída completa e filtra no parser.
+    """
+    ips = list(peer_ips or [])
+    if ips and all(":" not in ip for ip in ips):
+        return "display bgp all summary | inc " + "|".join(ips)
+    return "display bgp all summary"
+
+
+async def fetch_bgp_summary(router, peer_ips: Optional[Iterable[str]] = None, timeout: int = 30,
+                            priority: Priority = Priority.INTERACTIVE) -> BGPSummary:
+    """Executa o summary no roteador e devolve os registros (filtrados por peer_ips, se informados)"""
+    ips = list(peer_ips or [])
+    saida, _, _ = await ssh_executor.exec_command(router, summary_command(ips), timeout=timeout, priority=priority)
+    summary = parse_bgp_summary(saida)
+    return summary.filter(ips) if ips else summary
@@ -0,0 +1,245 @@
+"""
+Decodificação de mensagens BGP no formato binário (RFC 4271, 4760)
+
+Compartilhado pelo coletor BMP (app.services.bmp) e pelo importador MRT
+(app.services.mrt). Prefixos viram (versão, chave inteira alinhada à
+esquerda, tamanho), o formato da RIB em memória, sem objetos de endereço.
+Atributos são devolvidos já internados: cada conjunto distinto é
+decodificado uma vez e depois reconhecido pelos bytes.
+
+Não depende do restante da aplicação (é importado pelos processos de
+parsing do importador MRT).
+"""
+import socket
+import struct
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Atributos BGP de caminho
+ATTR_ORIGIN = 1
+ATTR_AS_PATH = 2
+ATTR_NEXT_HOP = 3
+ATTR_MED = 4
+ATTR_LOCAL_PREF = 5
+ATTR_COMMUNITIES = 8
+ATTR_MP_REACH = 14
+ATTR_MP_UNREACH = 15
+ATTR_AS4_PATH = 17
+ATTR_LARGE_COMMUNITIES = 32
+
+BGP_HEADER_SIZE = 19  # marker (16) + tamanho (2) + tipo (1)
+BGP_UPDATE = 2
+AFI_IPV4, AFI_IPV6, SAFI_UNICAST = 1, 2, 1
+FAMILIES = {AFI_IPV4: (4, 32), AFI_IPV6: (6, 128)}
+
+_ORIGINS = ("i", "e", "?")
+_U16 = struct.Struct("!H")
+_U32 = struct.Struct("!I")
+_ATTR_CACHE_LIMIT = 200000
+
+Prefix = Tuple[int, int, int]  # (versão, chave, tamanho)
+
+
+class WireError(ValueError):
+    """Mensagem BGP malformada"""
+
+
+def decode_nlri(data, bits: int) -> List[Tuple[int, int]]:
+    """Prefixos (chave inteira alinhada à esquerda, tamanho) de um bloco NLRI"""
+    found = []
+    offset, end = 0, len(data)
+    while offset < end:
+        plen = data[offset]
+        size = (plen + 7) >> 3
+        if plen > bits or offset + 1 + size > end:
+            raise WireError("NLRI inválido")
+        value = int.from_bytes(data[offset + 1:offset + 1 + size], "big")
+        found.append((value << (bits - 8 * size), plen))
+        offset += 1 + size
+    return found
+
+
+def split_attributes(data) -> Tuple[List[Tuple[int, memoryview]], Optional[memoryview], Optional[memoryview]]:
+    """Atributos comuns (tipo, valor), MP_REACH e MP_UNREACH"""
+    others = []
+    reach = unreach = None
+    offset, end = 0, len(data)
+    while offset < end:
+        if offset + 3 > end:
+            raise WireError("Atributo truncado")
+        flags, kind = data[offset], data[offset + 1]
+        if flags & 0x10:
+            if offset + 4 > end:
+                raise WireError("Atributo truncado")
+            length = (data[offset + 2] << 8) | data[offset + 3]
+            start = offset + 4
+        else:
+            length = data[offset + 2]
+            start = offset + 3
+        if start + length > end:
+            raise WireError("Atributo truncado")
+        value = data[start:start + length]
+        if kind == ATTR_MP_REACH:
+            reach = value
+        elif kind == ATTR_MP_UNREACH:
+            unreach = value
+        else:
+            others.append((kind, value))
+        offset = start + length
+    return others, reach, unreach
+
+
+def decode_attributes(others: List[Tuple[int, memoryview]], four_byte_as: bool = True) -> dict:
+    """Campos dos atributos, no formato usado pela RIB (strings como no VRP)"""
+    result = {"next_hop": None, "as_path": "", "communities": "", "med": None, "local_pref": None, "origin": None}
+    communities: List[str] = []
+    as4_path = None
+    for kind, value in others:
+        if kind == ATTR_ORIGIN and value:
+            result["origin"] = _ORIGINS[value[0]] if value[0] < 3 else None
+        elif kind == ATTR_AS_PATH:
+            result["as_path"] = decode_as_path(value, 4 if four_byte_as else 2)
+        elif kind == ATTR_AS4_PATH and not four_byte_as:
+            as4_path = decode_as_path(value, 4)
+        elif kind == ATTR_NEXT_HOP and len(value) == 4:
+            result["next_hop"] = socket.inet_ntoa(value)
+        elif kind == ATTR_MED and len(value) == 4:
+            result["med"] = _U32.unpack(value)[0]
+        elif kind == ATTR_LOCAL_PREF and len(value) == 4:
+            result["local_pref"] = _U32.unpack(value)[0]
+        elif kind == ATTR_COMMUNITIES:
+            communities.extend(f"{high}:{low}" for high, low in struct.iter_unpack("!HH", value[:len(value) & ~3]))
+        elif kind == ATTR_LARGE_COMMUNITIES:
+            communities.extend(f"{a}:{b}:{c}" for a, b, c in struct.iter_unpack("!III", value[:len(value) // 12 * 12]))
+    if as4_path:
+        # Sessão de 2 bytes: AS_TRANS (23456) no AS_PATH, os ASNs reais no AS4_PATH (RFC 6793)
+        head = result["as_path"].split()
+        tail = as4_path.split()
+        result["as_path"] = " ".join(head[:max(0, len(head) - len(tail))] + tail)
+    result["communities"] = " ".join(communities)
+    return result
+
+
+def decode_as_path(data, size: int) -> str:
+    asns: List[str] = []
+    offset, end = 0, len(data)
+    fmt = "!%dI" if size == 4 else "!%dH"
+    while offset + 2 <= end:
+        segment, count = data[offset], data[offset + 1]
+        offset += 2
+        if offset + count * size > end:
+            raise WireError("AS_PATH truncado")
+        values = struct.unpack_from(fmt % count, data, offset)
+        offset += count * size
+        if segment == 1:  # AS_SET
+            asns.append("{" + ",".join(map(str, values)) + "}")
+        else:
+            asns.extend(map(str, values))
+    return " ".join(asns)
+
+
+def mp_next_hop(afi: int, data) -> Optional[str]:
+    if afi == AFI_IPV6 and len(data) >= 16:
+        return socket.inet_ntop(socket.AF_INET6, bytes(data[:16]))  # Global (o link-local, se houver, vem depois)
+    if afi == AFI_IPV4 and len(data) >= 4:
+        return socket.inet_ntoa(bytes(data[:4]))
+    return None
+
+
+class UpdateDecoder:
+    """
+    Decodifica UPDATEs BGP em (atributos internados, anunciados, retirados).
+    Conjuntos de atributos já vistos são reconhecidos pelos bytes e não são
+    decodificados de novo: numa tabela completa há ~10x menos conjuntos que rotas.
+    `intern(**campos)` devolve o id do conjunto (ex.: rib_store.intern).
+    """
+
+    def __init__(self, intern: Callable[..., int], cache_limit: int = _ATTR_CACHE_LIMIT):
+        self._intern = intern
+        self._cache: Dict[bytes, int] = {}
+        self._cache_limit = cache_limit
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, message, four_byte_as: bool = True) -> Tuple[Optional[int], List[Prefix], List[Prefix]]:
+        """
+        `message` é a mensagem BGP completa (com o cabeçalho de 19 bytes).
+        Devolve (id dos atributos ou None, [(versão, chave, tamanho)] anunciados, [...] retirados).
+        """
+        if len(message) < BGP_HEADER_SIZE + 4 or message[18] != BGP_UPDATE:
+            raise WireError("Mensagem BGP não é um UPDATE")
+        body = message[BGP_HEADER_SIZE:]
+        withdrawn_len = _U16.unpack_from(body, 0)[0]
+        attrs_offset = 2 + withdrawn_len
+        if attrs_offset + 2 > len(body):
+            raise WireError("UPDATE truncado")
+        attrs_len = _U16.unpack_from(body, attrs_offset)[0]
+        nlri_offset = attrs_offset + 2 + attrs_len
+        if nlri_offset > len(body):
+            raise WireError("UPDATE truncado")
+
+        withdrawn = [(4, key, plen) for key, plen in decode_nlri(body[2:attrs_offset], 32)]
+        announced = [(4, key, plen) for key, plen in decode_nlri(body[nlri_offset:], 32)]
+        raw = body[attrs_offset + 2:nlri_offset]
+        others, reach, unreach = split_attributes(raw)
+
+        next_hop = None
+        if unreach is not None and len(unreach) >= 3:
+            afi, safi = _U16.unpack_from(unreach, 0)[0], unreach[2]
+            if safi == SAFI_UNICAST and afi in FAMILIES:
+                version, bits = FAMILIES[afi]
+                withdrawn.extend((version, key, plen) for key, plen in decode_nlri(unreach[3:], bits))
+        if reach is not None and len(reach) >= 5:
+            afi, safi, nh_len = _U16.unpack_from(reach, 0)[0], reach[2], reach[3]
+            if safi == SAFI_UNICAST and afi in FAMILIES:
+                version, bits = FAMILIES[afi]
+                next_hop = (afi, reach[4:4 + nh_len])
+                announced.extend((version, key, plen) for key, plen in decode_nlri(reach[5 + nh_len:], bits))
+
+        if not announced:
+            return None, announced, withdrawn
+        if reach is None:
+            key = bytes(raw)
+        else:
+            # Atributos comuns + next-hop do MP_REACH (o NLRI fica de fora da chave)
+            key = b"".join(bytes(v) + bytes((k,)) for k, v in others) + (bytes(next_hop[1]) if next_hop else b"")
+        return self._attributes(key, others, next_hop, four_byte_as), announced, withdrawn
+
+    def attribute_refs(self) -> Iterable[int]:
+        """Ids guardados no cache (raízes para a compactação da RIB)"""
+        return self._cache.values()
+
+    def attributes(self, raw, four_byte_as: bool = True, abbreviated_mp: bool = False) -> int:
+        """
+        Id do conjunto de atributos de um bloco cru (ex.: entradas de RIB do MRT).
+        `abbreviated_mp`: MP_REACH só com o next-hop (TABLE_DUMP_V2, RFC 6396 4.3.4).
+        """
+        key = bytes(raw)
+        attr = self._cache.get(key if four_byte_as else key + b"\x02")
+        if attr is not None:
+            self.hits += 1
+            return attr
+        others, reach, _ = split_attributes(raw)
+        next_hop = None
+        if reach is not None and abbreviated_mp and len(reach) >= 1:
+            nh = reach[1:1 + reach[0]]
+            next_hop = (AFI_IPV6 if len(nh) >= 16 else AFI_IPV4, nh)
+        elif reach is not None and len(reach) >= 4:
+            next_hop = (_U16.unpack_from(reach, 0)[0], reach[4:4 + reach[3]])
+        return self._attributes(key, others, next_hop, four_byte_as)
+
+    def _attributes(self, key: bytes, others, next_hop, four_byte_as: bool) -> int:
+        if not four_byte_as:
+            key += b"\x02"
+        attr = self._cache.get(key)
+        if attr is None:
+            self.misses += 1
+            fields = decode_attributes(others, four_byte_as)
+            if next_hop is not None:
+                fields["next_hop"] = mp_next_hop(*next_hop) or fields["next_hop"]
+            attr = self._intern(**fields)
+            if len(self._cache) >= self._cache_limit:
+                self._cache.clear()
+            self._cache[key] = attr
+        else:
+            self.hits += 1
+        return attr
@@ -0,0 +1,464 @@
+"""
+Coletor BMP (BGP Monitoring Protocol, RFC 7854)
+
+Os roteadores abrem uma sessão TCP com o coletor e empurram o estado BGP:
+Peer Up/Down atualizam na hora o estado das sessões no snapshot do
+bgp_poller (dashboard, status dos peerings, histórico) e Route Monitoring
+(UPDATEs BGP) alimenta a RIB em memória do roteador, caminho a caminho.
+Enquanto a sessão BMP de um roteador está ativa o poller não o coleta por
+SSH; quando ela cai, a coleta volta no ciclo seguinte.
+
+O roteador é identificado só pelo IP de origem da conexão (Router.ip ou um
+IP extra de BMP_SOURCES); o sysName da Initiation é apenas informativo, já
+que qualquer cliente pode enviá-lo. Conexões de outros IPs são recusadas, e
+enquanto um roteador tem sessão ativa uma nova conexão dele também é
+recusada (não derruba a existente). Os peers são associados aos Peerings
+cadastrados pelo IP, como na coleta SSH.
+
+Decodificação pensada para tabela completa (app.services.bgp_wire): o NLRI
+vira inteiro direto, conjuntos de atributos repetidos são reconhecidos
+pelos bytes e internados uma vez, e cada conexão processa um
+número limitado de mensagens por volta do event loop, parando de ler do
+socket quando o buffer cresce demais.
+
+Suportado: IPv4/IPv6 unicast, AS de 2 ou 4 bytes e os atributos usados pela
+RIB. Não suportado: ADD-PATH, Route Mirroring e peers com Route Distinguisher
+(VRF) distintos com o mesmo IP.
+"""
+import asyncio
+import socket
+import struct
+import time
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.future import select
+
+from app.core.config import (
+    SessionLocal,
+    BMP_HOST,
+    BMP_SOURCES,
+    BMP_PORT,
+    BMP_MAX_BUFFER,
+    BMP_BATCH_MESSAGES,
+    BMP_POLICY,
+)
+from app.models.router import Router
+from app.services.bgp_poller import bgp_poller
+from app.services.bgp_wire import UpdateDecoder
+from app.services.bgp_summary import BGPState, normalize_ip
+from app.services.rib import rib_store
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Tipos de mensagem BMP (RFC 7854, seção 4.1)
+ROUTE_MONITORING = 0
+STATISTICS_REPORT = 1
+PEER_DOWN = 2
+PEER_UP = 3
+INITIATION = 4
+TERMINATION = 5
+ROUTE_MIRRORING = 6
+MESSAGE_TYPES = {
+    ROUTE_MONITORING: "route_monitoring",
+    STATISTICS_REPORT: "statistics_report",
+    PEER_DOWN: "peer_down",
+    PEER_UP: "peer_up",
+    INITIATION: "initiation",
+    TERMINATION: "termination",
+    ROUTE_MIRRORING: "route_mirroring",
+}
+
+# Flags do per-peer header
+PEER_FLAG_IPV6 = 0x80
+PEER_FLAG_POST_POLICY = 0x40
+PEER_FLAG_2BYTE_AS = 0x20
+
+COMMON_HEADER = struct.Struct("!BIB")  # versão, tamanho total, tipo
+PEER_HEADER = struct.Struct("!BB8s16sI4sII")  # tipo, flags, RD, endereço, AS, BGP ID, timestamp (s, µs)
+BMP_VERSION = 3
+
+
+class BMPError(Exception):
+    """Mensagem BMP/BGP malformada"""
+
+
+class PeerHeader:
+    __slots__ = ("peer_type", "flags", "address", "asn", "bgp_id", "timestamp")
+
+    def __init__(self, peer_type, flags, address, asn, bgp_id, timestamp):
+        self.peer_type = peer_type
+        self.flags = flags
+        self.address = address
+        self.asn = asn
+        self.bgp_id = bgp_id
+        self.timestamp = timestamp
+
+    @property
+    def post_policy(self) -> bool:
+        return bool(self.flags & PEER_FLAG_POST_POLICY)
+
+    @property
+    def four_byte_as(self) -> bool:
+        return not self.flags & PEER_FLAG_2BYTE_AS
+
+
+def decode_peer_header(data, offset: int = 0) -> PeerHeader:
+    if len(data) - offset < PEER_HEADER.size:
+        raise BMPError("Per-peer header truncado")
+    peer_type, flags, _rd, address, asn, bgp_id, seconds, micros = PEER_HEADER.unpack_from(data, offset)
+    if flags & PEER_FLAG_IPV6:
+        text = socket.inet_ntop(socket.AF_INET6, address)
+    else:
+        text = socket.inet_ntoa(address[12:])
+    return PeerHeader(peer_type, flags, text, asn, socket.inet_ntoa(bgp_id), seconds + micros / 1e6)
+
+
+def decode_information(data, offset: int) -> Dict[int, str]:
+    """TLVs de Initiation/Termination/Peer Up: tipo -> texto"""
+    fields: Dict[int, str] = {}
+    end = len(data)
+    while offset + 4 <= end:
+        kind, length = struct.unpack_from("!HH", data, offset)
+        value = bytes(data[offset + 4:offset + 4 + length])
+        fields[kind] = value.decode("utf-8", "replace")
+        offset += 4 + length
+    return fields
+
+
+def _format_uptime(seconds: float) -> str:
+    # Mesmo formato do "display bgp peer" do VRP
+    hours, minutes = int(seconds // 3600), int(seconds % 3600 // 60)
+    return f"{hours:04d}h{minutes:02d}m"
+
+
+class _Peer:
+    __slots__ = ("address", "peer_id", "summary", "post_policy", "up_since", "asn", "announced", "withdrawn")
+
+    def __init__(self, address: str, peer_id: int, summary, asn: int):
+        self.address = address
+        self.peer_id = peer_id
+        self.summary = summary
+        self.post_policy: Optional[bool] = None
+        self.up_since: Optional[float] = None
+        self.asn = asn
+        self.announced = 0
+        self.withdrawn = 0
+
+
+class BMPSession(asyncio.Protocol):
+    """Uma conexão BMP (um roteador)"""
+
+    def __init__(self, collector: "BMPCollector"):
+        self.collector = collector
+        self.transport: Optional[asyncio.Transport] = None
+        self.remote: Optional[str] = None
+        self.router_id: Optional[int] = None
+        self.router_name: Optional[str] = None
+        self.sys_name: Optional[str] = None
+        self.connected_at = datetime.now()
+        self.peers: Dict[str, _Peer] = {}
+        self.messages = 0
+        self.bytes = 0
+        self.errors = 0
+        self._buffer = bytearray()
+        self._scheduled = False
+        self._paused = False
+        self._closed = False
+
+    # asyncio.Protocol -----------------------------------------------------
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.remote = transport.get_extra_info("peername")[0]
+        if self.remote.startswith("::ffff:"):
+            self.remote = self.remote[7:]
+        router = self.collector.router_by_ip(self.remote)
+        if router is None:
+            self._reject(f"BMP: conexão recusada de {self.remote}: IP não é de um roteador cadastrado")
+            return
+        current = self.collector.by_router.get(router[0])
+        if current is not None and not current._closed:
+            self._reject(f"BMP: conexão recusada de {self.remote}: {router[1]} já tem sessão BMP ativa")
+            return
+        self.collector.sessions.add(self)
+        self._bind(*router)
+        logger.info(f"BMP: conexão de {self.remote} ({self.router_name})")
+
+    def _reject(self, message: str):
+        logger.warning(message)
+        self.collector.rejected += 1
+        self._closed = True
+        self.transport.close()
+
+    def data_received(self, data: bytes):
+        if self._closed:
+            return
+        self.bytes += len(data)
+        self._buffer += data
+        if len(self._buffer) > BMP_MAX_BUFFER and not self._paused:
+            # Backpressure: o TCP segura o roteador até o buffer esvaziar
+            self._paused = True
+            self.transport.pause_reading()
+        if not self._scheduled:
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._process)
+
+    def connection_lost(self, exc):
+        self._closed = True
+        self.collector.sessions.discard(self)
+        self._release()
+        logger.info(f"BMP: sessão de {self.router_name or self.remote} encerrada ({self.messages} mensagens)")
+
+    # Processamento ----------------------------------------------------------
+
+    def _process(self):
+        """Processa até BMP_BATCH_MESSAGES mensagens completas e devolve o loop"""
+        self._scheduled = False
+        if self._closed:
+            return
+        buffer = self._buffer
+        offset = processed = 0
+        try:
+            with memoryview(buffer) as view:
+                end = len(view)
+                while processed < BMP_BATCH_MESSAGES and end - offset >= COMMON_HEADER.size:
+                    version, length, kind = COMMON_HEADER.unpack_from(view, offset)
+                    if version != BMP_VERSION or length < COMMON_HEADER.size:
+                        raise BMPError(f"Cabeçalho BMP inválido (versão {version}, tamanho {length})")
+                    if end - offset < length:
+                        break
+                    self._dispatch(kind, view[offset + COMMON_HEADER.size:offset + length])
+                    offset += length
+                    processed += 1
+        except (BMPError, struct.error, ValueError, IndexError) as e:
+            logger.warning(f"BMP: {self.router_name or self.remote}: {e}; encerrando a sessão")
+            self.collector.errors += 1
+            self._closed = True
+            self._buffer = bytearray()
+            self.transport.close()
+            return
+        del buffer[:offset]
+        self.messages += processed
+        rib_store.maybe_compact()
+        if processed >= BMP_BATCH_MESSAGES:
+            # Ainda há mensagens: continua na próxima volta do loop
+            self._scheduled = True
+            asyncio.get_running_loop().call_soon(self._process)
+        elif self._paused and len(buffer) < BMP_MAX_BUFFER // 2:
+            self._paused = False
+            self.transport.resume_reading()
+
+    def _dispatch(self, kind: int, body: memoryview):
+        collector = self.collector
+        collector.message_counts[kind] = collector.message_counts.get(kind, 0) + 1
+        if kind == INITIATION:
+            # Só informativo: a identidade vem do IP de origem
+            self.sys_name = decode_information(body, 0).get(2)
+            return
+        if kind == TERMINATION:
+            self.transport.close()
+            return
+        if kind == ROUTE_MONITORING:
+            self._route_monitoring(body)
+        elif kind == PEER_UP:
+            self._peer_up(body)
+        elif kind == PEER_DOWN:
+            self._peer_down(body)
+
+    def _bind(self, router_id: int, name: str):
+        self.router_id, self.router_name = router_id, name
+        self.collector.by_router[router_id] = self
+        bgp_poller.set_push_source(router_id, "bmp")
+
+    def _peer(self, header: PeerHeader) -> _Peer:
+        peer = self.peers.get(header.address)
+        if peer is None:
+            rib = rib_store.rib(self.router_id)
+            peer_id = rib.peers.intern(header.address)
+            summary = bgp_poller.push_peer(self.router_id, header.address, remote_as=header.asn)
+            peer = self.peers[header.address] = _Peer(header.address, peer_id, summary, header.asn)
+        return peer
+
+    def _route_monitoring(self, body: memoryview):
+        header = decode_peer_header(body)
+        peer = self._peer(header)
+        # Pre- e post-policy do mesmo peer são duas visões da mesma tabela: fica uma só
+        wanted = {"pre": False, "post": True}.get(BMP_POLICY, peer.post_policy)
+        if wanted is None:
+            peer.post_policy = wanted = header.post_policy
+        if header.post_policy != wanted:
+            return
+        attr, announced, withdrawn = self.collector.decoder.decode(body[PEER_HEADER.size:], header.four_byte_as)
+        rib = rib_store.rib(self.router_id)
+        peer_id = peer.peer_id
+        set_key, withdraw_key = rib.set_key, rib.withdraw_key
+        for version, key, plen in withdrawn:
+            withdraw_key(version, key, plen, peer_id)
+        for version, key, plen in announced:
+            set_key(version, key, plen, peer_id, attr)
+        peer.announced += len(announced)
+        peer.withdrawn += len(withdrawn)
+        peer.summary.prefixes_received = rib.peer_path_count(peer_id)
+
+    def _peer_up(self, body: memoryview):
+        header = decode_peer_header(body)
+        peer = self._peer(header)
+        peer.up_since = header.timestamp or time.time()
+        uptime = max(0.0, time.time() - peer.up_since)
+        bgp_poller.push_peer(
+            self.router_id, header.address,
+            state=BGPState.ESTABLISHED, remote_as=header.asn,
+            uptime_seconds=int(uptime), uptime=_format_uptime(uptime),
+            prefixes_received=rib_store.rib(self.router_id).peer_path_count(peer.peer_id),
+        )
+
+    def _peer_down(self, body: memoryview):
+        header = decode_peer_header(body)
+        peer = self._peer(header)
+        peer.up_since = None
+        peer.post_policy = None
+        rib_store.rib(self.router_id).clear_peer(header.address)
+        bgp_poller.push_peer(
+            self.router_id, header.address,
+            state=BGPState.IDLE, uptime_seconds=0, uptime="0000h00m", prefixes_received=0,
+        )
+
+    # Manutenção -----------------------------------------------------------
+
+    def tick(self):
+        """Periódico: mantém o snapshot e os caminhos da RIB como recentes"""
+        if self.router_id is None:
+            return
+        now = time.time()
+        rib = rib_store.rib(self.router_id)
+        for peer in self.peers.values():
+            if peer.up_since is not None:
+                uptime = max(0.0, now - peer.up_since)
+                peer.summary.uptime_seconds = int(uptime)
+                peer.summary.uptime = _format_uptime(uptime)
+            rib.peer_updated[peer.peer_id] = now
+        bgp_poller.touch(self.router_id)
+
+    def _release(self):
+        # Sem a sessão o estado empurrado deixa de ser confiável: volta para o SSH
+        if self.router_id is None or self.collector.by_router.get(self.router_id) is not self:
+            return
+        del self.collector.by_router[self.router_id]
+        bgp_poller.set_push_source(self.router_id, None)
+        rib = rib_store.rib(self.router_id)
+        for peer in self.peers.values():
+            rib.clear_peer(peer.address)
+
+    def stats(self) -> dict:
+        return {
+            "router_id": self.router_id,
+            "router": self.router_name,
+            "remote": self.remote,
+            "sys_name": self.sys_name,
+            "connected_at": self.connected_at.isoformat(),
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "buffered_bytes": len(self._buffer),
+            "paused": self._paused,
+            "peers": {
+                address: {
+                    "peering_id": bgp_poller.peering_for(self.router_id, address) if self.router_id else None,
+                    "state": peer.summary.state.value,
+                    "remote_as": peer.asn,
+                    "policy": None if peer.post_policy is None else ("post" if peer.post_policy else "pre"),
+                    "prefixes": peer.summary.prefixes_received,
+                    "announced": peer.announced,
+                    "withdrawn": peer.withdrawn,
+                }
+                for address, peer in self.peers.items()
+            },
+        }
+
+
+class BMPCollector:
+    """Servidor TCP que recebe as sessões BMP dos roteadores"""
+
+    def __init__(self):
+        self.sessions = set()
+        self.by_router: Dict[int, BMPSession] = {}
+        self.decoder = UpdateDecoder(rib_store.intern)
+        rib_store.attributes.add_holder(self.decoder)
+        self.message_counts: Dict[int, int] = {}
+        self.errors = 0
+        self.rejected = 0
+        self._routers_by_ip: Dict[str, Tuple[int, str]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def router_by_ip(self, ip: str) -> Optional[Tuple[int, str]]:
+        return self._routers_by_ip.get(normalize_ip(ip))
+
+    async def load_routers(self):
+        async with SessionLocal() as db:
+            rows = (await db.execute(select(Router.id, Router.name, Router.ip).where(Router.is_active == True))).all()
+        by_ip = {normalize_ip(ip): (router_id, name) for router_id, name, ip in rows}
+        by_name = {name.strip().lower(): (router_id, name) for router_id, name, ip in rows}
+        for source, name in BMP_SOURCES:
+            router = by_name.get(name.strip().lower())
+            if router is None:
+                logger.warning(f"BMP_SOURCES: roteador {name.strip()!r} não cadastrado ou inativo")
+                continue
+            by_ip[normalize_ip(source.strip())] = router
+        self._routers_by_ip = by_ip
+
+    async def start(self, host: str = BMP_HOST, port: int = BMP_PORT):
+        if self._server is not None:
+            return
+        try:
+            await self.load_routers()
+        except Exception as e:
+            logger.warning(f"BMP: não foi possível carregar os roteadores: {e}")
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: BMPSession(self), host, port)
+        self._task = loop.create_task(self._maintain())
+        logger.info(f"Coletor BMP escutando em {host}:{port}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._server is not None:
+            self._server.close()
+            for session in list(self.sessions):
+                session.transport.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _maintain(self):
+        # Renova sessões a cada 5 s e o cadastro de roteadores a cada minuto
+        ticks = 0
+        while True:
+            await asyncio.sleep(5)
+            for session in list(self.sessions):
+                session.tick()
+            ticks += 1
+            if ticks % 12 == 0:
+                try:
+                    await self.load_routers()
+                except Exception as e:
+                    logger.warning(f"BMP: falha ao recarregar os roteadores: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "listening": self._server is not None,
+            "sessions": [session.stats() for session in self.sessions],
+            "messages": {MESSAGE_TYPES.get(kind, str(kind)): count for kind, count in self.message_counts.items()},
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "attribute_cache": {"hits": self.decoder.hits, "misses": self.decoder.misses},
+        }
+
+
+# Instância global do coletor BMP
+bmp_collector = BMPCollector()
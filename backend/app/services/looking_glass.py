@@ -1,24 +1,114 @@
 import asyncio
 import subprocess
+import threading
+import time
 import uuid
 import paramiko
-import base64
-from datetime import datetime
-from typing import List, Dict, Any
+from datetime import datetime, timedelta
+from collections import OrderedDict
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from app.schemas.looking_glass import QueryRequest, QueryResponse, LookingGlassQuery, RouterInfo, IpOrigem
+from app.schemas.looking_glass import (
+    QueryRequest, QueryResponse, LookingGlassQuery, RouterInfo, IpOrigem,
+    BatchQueryRequest, BatchQueryResponse, BatchQueryItem,
+)
 from app.models.router import Router
+from app.services.ssh_pool import SSHPoolExhausted
+from app.services.ssh_executor import ssh_executor
+from app.services.router_health import router_health
+from app.services.rib import rib_store
+from app.services.looking_glass_cache import QueryResultCache, QueryKey, query_key
+from app.services.looking_glass_store import QueryStore
+from app.services.looking_glass_channel import QueryChannel
+from app.services.looking_glass_state import query_state
+from app.services.looking_glass_summary import summarize, aggregate
+from app.services.rate_limit import rate_limiter, lg_admission, RateLimited
+from app.core.config import LG_BATCH_MAX_QUERIES, LG_BATCH_MAX_STORED, LG_BATCH_MAX_ADMISSION
 import logging
 
 logger = logging.getLogger(__name__)
 
+_ORIGIN_TEXT = {"i": "igp", "e": "egp", "?": "incomplete", None: "incomplete"}
+
+
+def format_rib_entry(entry: dict, as_path_only: bool = False) -> str:
+    """Saída no estilo do "display bgp routing-table" do VRP a partir de uma entrada da RIB"""
+    paths = entry["paths"]
+    oldest = max(path["age_seconds"] for path in paths)
+    lines = [f" Resposta da RIB em memória (dados de até {int(oldest)}s atrás)", ""]
+    if as_path_only:
+        lines += [
+            f" Total Number of Routes: {len(paths)}",
+            "      Network            NextHop                       In/Out Label   Path/Ogn",
+            "",
+        ]
+        for path in paths:
+            status = "*>" if path["best"] else "* "
+            lines.append(f" {status}   {entry['prefix']:<18} {path['next_hop'] or '':<29}                {path['as_path']}{path['origin'] or '?'}")
+        return "\n".join(lines) + "\n"
+    lines += [
+        f" Paths:   {len(paths)} available, 1 best",
+        f" BGP routing table entry information of {entry['prefix']}:",
+    ]
+    for path in paths:
+        attrs = [f"AS-path {path['as_path'] or 'Nil'}", f"origin {_ORIGIN_TEXT[path['origin']]}"]
+        if path["med"] is not None:
+            attrs.append(f"MED {path['med']}")
+        if path["local_pref"] is not None:
+            attrs.append(f"localpref {path['local_pref']}")
+        attrs.append("best" if path["best"] else "valid")
+        lines += [
+            f" From: {path['peer']}",
+            f" Original nexthop: {path['next_hop'] or '-'}",
+            " " + ", ".join(attrs),
+        ]
+        if path["communities"]:
+            lines.append(f" Community: {path['communities']}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+class _Flight:
+    """Execução em andamento: as consultas que aguardam o resultado e o canal da saída"""
+    __slots__ = ("queries", "channel", "stream_id")
+
+    def __init__(self, query: LookingGlassQuery):
+        self.queries = [query]
+        self.channel = QueryChannel()
+        self.stream_id = query.id  # Identifica a saída da execução no estado compartilhado
+
+
+class LookingGlassBatch:
+    """Consulta em lote: uma consulta por (roteador, destino), executadas em paralelo"""
+
+    def __init__(self, batch_id: str, query_type: str, items: List[BatchQueryItem]):
+        self.id = batch_id
+        self.type = query_type
+        self.items = items
+        self.timestamp = datetime.now()
+        self.started = time.monotonic()
+        self.elapsed: Optional[float] = None
+
+
 class LookingGlassService:
     def __init__(self):
-        # Cache para queries ativas
-        self.active_queries: Dict[str, LookingGlassQuery] = {}
+        # Consultas recentes (limitadas por idade, quantidade e bytes de saída)
+        self.queries = QueryStore()
         # Cache para tasks ativas para evitar garbage collection
         self.active_tasks: Dict[str, asyncio.Task] = {}
+        # Resultados recentes por (roteador, tipo, destino, opções)
+        self.result_cache = QueryResultCache()
+        # Execuções em andamento: consultas idênticas entram como assinantes da mesma execução
+        self.in_flight: Dict[QueryKey, _Flight] = {}
+        # Canal de saída de cada consulta em execução (os streams assinam por aqui)
+        self.channels: Dict[str, QueryChannel] = {}
+        self.joined = 0
+        # Lotes recentes (só referências às consultas, que ficam em self.queries).
+        # Ficam só neste worker: com vários, o balanceador fixa o cliente (README)
+        self.batches: "OrderedDict[str, LookingGlassBatch]" = OrderedDict()
+        # Estado visível aos outros workers (LG_STATE_BACKEND)
+        self.state = query_state
     
     async def get_available_routers(self, db: AsyncSession) -> List[RouterInfo]:
         """Retorna lista de roteadores disponíveis para Looking Glass"""
@@ -46,8 +136,10 @@ class LookingGlassService:
                     name=router.name,
                     hostname=router.ip,
                     location=router.note or "Não informado",
-                    status="online" if router.is_active else "offline",
-                    ip_origens=ip_origens_list
+                    # Ativo no cadastro e sem circuito aberto por falhas de conexão
+                    status="online" if router.is_active and router_health.is_available(router.id) else "offline",
+                    ip_origens=ip_origens_list,
+                    health=router_health.status(router.id)
                 )
                 router_list.append(router_info)
             
@@ -72,38 +164,18 @@ class LookingGlassService:
                     error="Roteador não encontrado"
                 )
             
-            # Criar objeto de query
-            query = LookingGlassQuery(
-                id=query_id,
-                type=request.type,
-                target=request.target,
-                router=router.name,
-                timestamp=datetime.now(),
-                status="pending"
-            )
-            
-            # Adicionar ao cache
-            self.active_queries[query_id] = query
-            
-            # Executar comando em background e manter referência da task
-            task = asyncio.create_task(self._execute_command(query, request, router))
-            self.active_tasks[query_id] = task
-            
-            # Adicionar callback para limpar a task quando terminar
-            def cleanup_task(task_ref):
-                try:
-                    if query_id in self.active_tasks:
-                        del self.active_tasks[query_id]
-                except Exception as e:
-                    logger.warning(f"Erro ao limpar task {query_id}: {e}")
-            
-            task.add_done_callback(cleanup_task)
+            self._start_query(request, router, query_id)
+            # Com estado compartilhado, o id só volta ao cliente quando os outros workers já veem a consulta
+            await self.state.flush()
             
             return QueryResponse(
                 id=query_id,
                 status="success"
             )
             
+        except RateLimited:
+            # Vira 429 com Retry-After (handler em app.main)
+            raise
         except Exception as e:
             logger.error(f"Error executing query: {e}")
             return QueryResponse(
@@ -112,56 +184,320 @@ class LookingGlassService:
                 error=str(e)
             )
     
-    async def _execute_command(self, query: LookingGlassQuery, request: QueryRequest, router: Router):
-        """Executa o comando específico baseado no tipo"""
+    async def execute_batch(self, request: BatchQueryRequest, db: AsyncSession) -> BatchQueryResponse:
+        """
+        Cria uma consulta por (roteador, destino) pelo mesmo caminho das consultas
+        individuais: cache, execução compartilhada e limite de sessões por roteador.
+        """
+        targets = list(dict.fromkeys(t.strip() for t in request.targets if t.strip()))
+        router_ids = list(dict.fromkeys(request.routerIds))
+        if not targets or not router_ids:
+            raise ValueError("Informe ao menos um roteador e um destino")
+        total = len(targets) * len(router_ids)
+        if total > LG_BATCH_MAX_QUERIES:
+            raise ValueError(f"Lote com {total} consultas excede o limite de {LG_BATCH_MAX_QUERIES}")
+        
+        result = await db.execute(select(Router).filter(Router.id.in_(router_ids)))
+        routers = {router.id: router for router in result.scalars().all()}
+        
+        items = []
+        started = 0  # Execuções novas (vagas de admissão) reservadas por este lote
+        for router_id in router_ids:
+            router = routers.get(router_id)
+            for target in targets:
+                if router is None:
+                    items.append(BatchQueryItem(routerId=router_id, target=target, error="Roteador não encontrado"))
+                    continue
+                try:
+                    flights = len(self.in_flight)
+                    query = self._start_query(
+                        QueryRequest(type=request.type, target=target, routerId=router_id, options=self._batch_options(request, router, target)),
+                        router,
+                        admit=started < LG_BATCH_MAX_ADMISSION,
+                    )
+                    started += len(self.in_flight) - flights
+                except RateLimited as e:
+                    # Roteador no limite ou Looking Glass sobrecarregado: o resto do lote segue
+                    items.append(BatchQueryItem(routerId=router_id, router=router.name, target=target, error=f"{e} (Retry-After {round(e.retry_after)}s)"))
+                    continue
+                items.append(BatchQueryItem(id=query.id, routerId=router_id, router=router.name, target=target))
+        
+        batch = LookingGlassBatch(str(uuid.uuid4()), request.type, items)
+        self.batches[batch.id] = batch
+        while len(self.batches) > LG_BATCH_MAX_STORED:
+            self.batches.popitem(last=False)
+        await self.state.flush()
+        logger.info(f"Lote Looking Glass {batch.id}: {request.type} para {len(targets)} destino(s) em {len(router_ids)} roteador(es)")
+        return BatchQueryResponse(id=batch.id, type=batch.type, queries=items)
+    
+    def _batch_options(self, request: BatchQueryRequest, router: Router, target: str) -> dict:
+        """Opções da consulta de um roteador do lote (o IP de origem é por roteador)"""
+        options = dict(request.options or {})
+        source_ips = options.pop("sourceIps", None) or {}
+        source_ip = source_ips.get(str(router.id), source_ips.get(router.id))
+        if source_ip is not None:
+            options["sourceIp"] = source_ip
+        elif request.type == "ping" and not options.get("sourceIp"):
+            # Ping exige IP de origem: usa o primeiro do roteador na família do destino
+            is_ipv6 = ":" in target
+            for ip_origem in router.ip_origens or []:
+                if (":" in (ip_origem.get("ip") or "")) == is_ipv6:
+                    options["sourceIp"] = ip_origem.get("id")
+                    break
+        return options
+    
+    def _batch_result(self, item: BatchQueryItem) -> dict:
+        result = {"query": item.id, "router_id": item.routerId, "router": item.router, "target": item.target}
+        query = self.queries.get(item.id) if item.id else None
+        if query is None:
+            result.update(status="error", error=item.error or "Consulta removida do armazenamento", summary=None)
+            return result
+        result.update(
+            status=query.status,
+            error=query.error,
+            cached=query.cached_at is not None,
+            summary=summarize(query.type, query.target, query.output) if query.status == "completed" else None,
+        )
+        return result
+    
+    def batch_summary(self, batch: LookingGlassBatch) -> dict:
+        """Situação de cada consulta do lote e o agregado por destino"""
+        results = [self._batch_result(item) for item in batch.items]
+        running = sum(1 for result in results if result["status"] in ("pending", "running"))
+        if not running and batch.elapsed is None:
+            # Tempo até o lote ser visto completo (stream ou GET)
+            batch.elapsed = time.monotonic() - batch.started
+        return {
+            "id": batch.id,
+            "type": batch.type,
+            "timestamp": batch.timestamp,
+            "status": "running" if running else "completed",
+            "elapsed_seconds": round(batch.elapsed, 2) if batch.elapsed is not None else None,
+            "results": results,
+            "targets": aggregate(batch.type, results),
+        }
+    
+    async def stream_batch(self, batch: LookingGlassBatch, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[dict]]:
+        """
+        Eventos do lote num único fluxo: linhas de saída marcadas com a consulta,
+        o resultado de cada consulta assim que termina e, por fim, o resumo.
+        None a cada `heartbeat` segundos sem eventos.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        
+        async def follow(item: BatchQueryItem):
+            tag = {"query": item.id, "router_id": item.routerId, "router": item.router, "target": item.target}
+            failure = None
+            try:
+                channel = self.channels.get(item.id)
+                if channel is not None:
+                    async for line in channel.subscribe():
+                        if line.strip():
+                            events.put_nowait({"type": "line", **tag, "line": line})
+                else:
+                    query = self.queries.get(item.id)
+                    for line in (query.output if query and query.output else "").split("\n"):
+                        if line.strip():
+                            events.put_nowait({"type": "line", **tag, "line": line})
+            except Exception as e:
+                failure = f"Erro ao acompanhar a consulta: {e}"
+                logger.warning(f"Lote {batch.id}, consulta {item.id}: {e}")
+            finally:
+                # Sempre um "result" por consulta: sem ele o stream esperaria para sempre
+                try:
+                    result = self._batch_result(item)
+                except Exception as e:
+                    result = {**tag, "status": "error", "error": str(e), "summary": None}
+                if failure and result["status"] in ("pending", "running"):
+                    result.update(status="error", error=failure)
+                events.put_nowait({"type": "result", **result})
+        
+        pending = [item for item in batch.items if item.id]
+        for item in batch.items:
+            if not item.id:
+                yield {"type": "result", **self._batch_result(item)}
+        for item in pending:
+            self.queries.pin(item.id)
+        tasks = [asyncio.create_task(follow(item)) for item in pending]
+        try:
+            remaining = len(tasks)
+            while remaining:
+                try:
+                    event = await asyncio.wait_for(events.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if event["type"] == "result":
+                    remaining -= 1
+                yield event
+            summary = self.batch_summary(batch)
+            # "type" do evento é "summary"; o tipo das consultas do lote vai em "query_type"
+            summary["query_type"] = summary.pop("type")
+            yield {"type": "summary", **summary}
+        finally:
+            for task in tasks:
+                task.cancel()
+            for item in pending:
+                self.queries.unpin(item.id)
+    
+    def _start_query(self, request: QueryRequest, router: Router, query_id: Optional[str] = None, admit: bool = True) -> LookingGlassQuery:
+        """
+        Cria a consulta e a resolve pelo cache, entrando numa execução idêntica
+        em andamento ou iniciando uma nova em segundo plano. Com admit=False
+        (lote que já usou suas vagas) só cache e execuções em andamento servem.
+        """
+        query_id = query_id or str(uuid.uuid4())
+        
+        # Criar objeto de query
+        query = LookingGlassQuery(
+            id=query_id,
+            type=request.type,
+            target=request.target,
+            router=router.name,
+            timestamp=datetime.now(),
+            status="pending"
+        )
+        
+        # Adicionar ao armazenamento de consultas
+        self.queries.add(query)
+        
+        key = query_key(router.id, request.type, request.target, request.options)
+        options = request.options or {}
+        
+        # Resultado idêntico recente: responde sem tocar no roteador ("refresh" força nova execução)
+        cached = None if options.get("refresh") else self.result_cache.get(key)
+        if cached is not None:
+            query.output = cached.output
+            query.status = "completed"
+            query.cached_at = datetime.now() - timedelta(seconds=time.monotonic() - cached.stored_at)
+            self.queries.update(query)
+            self.state.save(query, query_id)
+            return query
+        
+        # Mesma consulta já em execução: recebe a mesma saída, sem outra sessão SSH
+        flight = self.in_flight.get(key)
+        if flight is not None:
+            query.status = flight.queries[0].status
+            query.queue_position = flight.queries[0].queue_position
+            flight.queries.append(query)
+            self.channels[query_id] = flight.channel
+            self.joined += 1
+            self.state.save(query, flight.stream_id)
+            return query
+        
+        # Nova execução SSH: limite do roteador e vaga global antes de qualquer sessão
+        try:
+            if not admit:
+                raise RateLimited("Lote excede o limite de execuções simultâneas", lg_admission.retry_after(), "batch")
+            lg_admission.reserve()
+            try:
+                rate_limiter.acquire([("lg_router", router.id)])
+            except RateLimited:
+                lg_admission.release()
+                raise
+        except RateLimited:
+            self.queries.discard(query_id)
+            raise
+        flight = self.in_flight[key] = _Flight(query)
+        self.channels[query_id] = flight.channel
+        self.state.save(query, flight.stream_id)
+        
+        # Executar comando em background e manter referência da task
+        task = asyncio.create_task(self._execute_command(key, request, router))
+        self.active_tasks[query_id] = task
+        
+        # Adicionar callback para limpar a task quando terminar
+        def cleanup_task(task_ref):
+            try:
+                if query_id in self.active_tasks:
+                    del self.active_tasks[query_id]
+            except Exception as e:
+                logger.warning(f"Erro ao limpar task {query_id}: {e}")
+        
+        task.add_done_callback(cleanup_task)
+        return query
+    
+    async def _execute_command(self, key: QueryKey, request: QueryRequest, router: Router):
+        """Executa o comando específico baseado no tipo e entrega o resultado a todos os assinantes"""
+        flight = self.in_flight[key]
+        subscribers = flight.queries
+        streamed = False
+        
+        def update(**fields):
+            for query in subscribers:
+                for name, value in fields.items():
+                    setattr(query, name, value)
+                if "output" in fields or "error" in fields:
+                    self.queries.update(query)
+                if "status" in fields:
+                    self.state.save(query, flight.stream_id)
+        
+        def publish(lines: List[str]):
+            flight.channel.publish(lines)
+            self.state.publish(flight.stream_id, lines)
+        
+        def fail(error_msg: str):
+            logger.error(error_msg)
+            update(error=error_msg, status="error")
+        
         try:
-            query.status = "running"
+            update(status="running")
             logger.info(f"Executando comando {request.type} para {request.target} no roteador {router.name}")
             
-            # Pequeno delay para dar tempo ao frontend se conectar ao stream
-            await asyncio.sleep(0.5)
+            # Posição na fila de sessões SSH do roteador, exposta ao cliente pela query e pelo stream
+            def on_position(position: int):
+                if position and position != subscribers[0].queue_position:
+                    publish([f"Aguardando sessão SSH livre no roteador (posição {position} na fila)..."])
+                update(queue_position=position)
+            
+            # Linhas do roteador vão para o canal assim que chegam (replay para quem assinar depois)
+            def on_lines(lines: List[str]):
+                nonlocal streamed
+                streamed = True
+                publish(lines)
             
             # Adicionar timeout de segurança de 90 segundos para toda a operação
             async def execute_with_timeout():
                 if request.type == "ping":
-                    return await self._execute_ping_ssh(router, request.target, request.options)
+                    return await self._execute_ping_ssh(router, request.target, request.options, on_position, on_lines)
                 elif request.type == "traceroute":
-                    return await self._execute_traceroute_ssh(router, request.target, request.options)
+                    return await self._execute_traceroute_ssh(router, request.target, request.options, on_position, on_lines)
                 elif request.type == "bgp":
-                    return await self._execute_bgp_lookup_ssh(router, request.target, request.options)
+                    return await self._execute_bgp_lookup_ssh(router, request.target, request.options, on_position, on_lines)
                 elif request.type == "bgp-summary":
-                    return await self._execute_bgp_summary_ssh(router, request.target, request.options)
+                    return await self._execute_bgp_summary_ssh(router, request.target, request.options, on_position, on_lines)
                 else:
                     raise ValueError(f"Tipo de query não suportado: {request.type}")
             
-            # Executar com timeout de 90 segundos
-            output = await asyncio.wait_for(execute_with_timeout(), timeout=90.0)
-            
-            query.output = output
-            query.status = "completed"
-            logger.info(f"Comando {request.type} executado com sucesso para {request.target}")
+            # Vaga global de execução (reservada em _start_query), depois timeout de 90 segundos
+            async with lg_admission.slot():
+                output = await asyncio.wait_for(execute_with_timeout(), timeout=90.0)
+            
+            # Falhas de SSH/validação voltam como texto "Erro ...": não ficam no cache
+            if output and not output.startswith("Erro"):
+                self.result_cache.put(key, output)
+            if not streamed and output:
+                # Resposta sem SSH (RIB, validação): entregue de uma vez
+                publish(output.split("\n"))
+            update(output=output, status="completed")
+            logger.info(f"Comando {request.type} executado com sucesso para {request.target} ({len(subscribers)} assinante(s))")
             logger.info(f"Output length: {len(output) if output else 0} characters")
             
         except asyncio.TimeoutError:
-            error_msg = f"Timeout ao executar comando {request.type} no roteador {router.name} (limite: 90s)"
-            logger.error(error_msg)
-            query.error = error_msg
-            query.status = "error"
+            fail(f"Timeout ao executar comando {request.type} no roteador {router.name} (limite: 90s)")
         except paramiko.AuthenticationException as e:
-            error_msg = f"Erro de autenticação SSH no roteador {router.name}: {str(e)}"
-            logger.error(error_msg)
-            query.error = error_msg
-            query.status = "error"
+            fail(f"Erro de autenticação SSH no roteador {router.name}: {str(e)}")
         except paramiko.SSHException as e:
-            error_msg = f"Erro de conexão SSH no roteador {router.name}: {str(e)}"
-            logger.error(error_msg)
-            query.error = error_msg
-            query.status = "error"
+            fail(f"Erro de conexão SSH no roteador {router.name}: {str(e)}")
         except Exception as e:
-            error_msg = f"Erro ao executar comando {request.type}: {str(e)}"
-            logger.error(error_msg)
-            query.error = error_msg
-            query.status = "error"
+            fail(f"Erro ao executar comando {request.type}: {str(e)}")
+        finally:
+            # Sem await entre o estado final e o fechamento: quem abrir o stream depois lê query.output
+            self.in_flight.pop(key, None)
+            for query in subscribers:
+                self.channels.pop(query.id, None)
+            flight.channel.close()
+            self.state.close_stream(flight.stream_id)
     
     async def _execute_ping(self, target: str, options: dict) -> str:
         """Executa comando ping"""
@@ -232,7 +568,7 @@ Network          Next Hop            Metric LocPrf Weight Path
 
 Total de 2 rotas para {target}"""
 
-    async def _execute_ping_ssh(self, router: Router, target: str, options: dict) -> str:
+    async def _execute_ping_ssh(self, router: Router, target: str, options: dict, on_position=None, on_lines=None) -> str:
         """Executa comando ping via SSH no roteador - CORRIGIDO para roteadores que limitam canais SSH"""
         try:
             # Buscar o IP de origem pelo ID (obrigatório para ping)
@@ -275,29 +611,7 @@ Total de 2 rotas para {target}"""
             # Determinar se é IPv6
             is_ipv6 = ":" in target
             
-            import paramiko
-            import base64
-            
-            # Decodificar senha
-            try:
-                password = base64.b64decode(router.ssh_password.encode()).decode()
-            except:
-                # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-                password = router.ssh_password
-            
-            # CORREÇÃO: Usar uma nova conexão SSH para cada comando devido à limitação do roteador
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            
-            logger.info(f"Looking Glass: Conectando via SSH ao roteador {router.ip}:{router.ssh_port} para ping")
-            
-            client.connect(
-                hostname=router.ip,
-                port=router.ssh_port,
-                username=router.ssh_user,
-                password=password,
-                timeout=10
-            )
+            logger.info(f"Looking Glass: Usando conexão SSH persistente com {router.ip}:{router.ssh_port} para ping")
             
             # Comando ping com os parâmetros corretos:
             # ping -c 30 -m 1 -a <ip_de_origem> <ip_de_destino>
@@ -308,20 +622,8 @@ Total de 2 rotas para {target}"""
             
             logger.info(f"Looking Glass: Executando comando ping: {command}")
             
-            # Executar comando diretamente com timeout adequado
-            stdin, stdout, stderr = client.exec_command(command, timeout=90)
-            
-            # Configurar timeout nos canais para evitar travamento
-            stdout.channel.settimeout(90.0)
-            stderr.channel.settimeout(90.0)
-            
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
-            
-            # Aguardar o comando terminar para evitar problemas de conexão
-            exit_status = stdout.channel.recv_exit_status()
-            
-            client.close()
+            # Executar comando fora do event loop; as linhas seguem para o stream conforme chegam
+            output, error, exit_status = await self._exec_streaming(router, command, 90, on_position, on_lines)
             
             # Incluir erro na saída se houver - EXATAMENTE como no router.py
             if error:
@@ -331,14 +633,14 @@ Total de 2 rotas para {target}"""
             logger.info(f"Looking Glass: Comando ping executado com sucesso (exit: {exit_status})")
             return output
             
-        except paramiko.ChannelException as e:
+        except (paramiko.ChannelException, SSHPoolExhausted) as e:
             error_msg = f"Erro de canal SSH (roteador pode estar limitando sessões): {str(e)}"
             logger.error(error_msg)
             return error_msg
         except Exception as e:
             return f"Erro ao executar ping: {str(e)}"
 
-    async def _execute_traceroute_ssh(self, router: Router, target: str, options: dict) -> str:
+    async def _execute_traceroute_ssh(self, router: Router, target: str, options: dict, on_position=None, on_lines=None) -> str:
         """Executa comando traceroute via SSH no roteador - mesmo padrão do router.py"""
         try:
             # Buscar o IP de origem pelo ID ou pelo próprio IP (se fornecido)
@@ -368,27 +670,6 @@ Total de 2 rotas para {target}"""
             # Determinar se é IPv6
             is_ipv6 = ":" in target
             
-            import paramiko
-            import base64
-            
-            # Decodificar senha
-            try:
-                password = base64.b64decode(router.ssh_password.encode()).decode()
-            except:
-                # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-                password = router.ssh_password
-            
-            # Conectar via SSH - mesmo padrão do router.py
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(
-                hostname=router.ip,
-                port=router.ssh_port,
-                username=router.ssh_user,
-                password=password,
-                timeout=10
-            )
-            
             # Configurar comando traceroute com a sintaxe correta
             max_hops = options.get("maxHops", 30)
             
@@ -404,12 +685,8 @@ Total de 2 rotas para {target}"""
                 else:
                     command = f"tracert -as -w 1000 -q 1 -m {max_hops} {target}"
             
-            # Executar comando diretamente - mesmo padrão do router.py
-            stdin, stdout, stderr = client.exec_command(command, timeout=120)
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
-            
-            client.close()
+            # Executar comando fora do event loop; as linhas seguem para o stream conforme chegam
+            output, error, _ = await self._exec_streaming(router, command, 120, on_position, on_lines)
             
             # Incluir erro na saída se houver - mesmo padrão do router.py
             if error:
@@ -420,45 +697,71 @@ Total de 2 rotas para {target}"""
         except Exception as e:
             return f"Erro ao executar traceroute: {e}"
 
-    async def _execute_bgp_lookup_ssh(self, router: Router, target: str, options: dict) -> str:
+    async def _exec_streaming(self, router: Router, command: str, timeout: float, on_position=None, on_lines=None) -> Tuple[str, str, int]:
+        """
+        Como ssh_executor.exec_command, mas entrega as linhas a on_lines (no event
+        loop) conforme chegam do roteador. Retorna (stdout, stderr, exit_status).
+        """
+        loop = asyncio.get_running_loop()
+        lines: List[str] = []
+        errors: List[str] = []
+        cancel_event = threading.Event()
+        
+        def publish(batch: List[str]):
+            lines.extend(batch)
+            if on_lines is not None:
+                on_lines(batch)
+        
+        def deliver(batch: List[str]):
+            # Thread SSH: os lotes chegam ao event loop na ordem, antes do resultado da execução
+            loop.call_soon_threadsafe(publish, batch)
+        
+        try:
+            exit_status = await ssh_executor.exec_lines(
+                router, command, deliver, timeout=timeout, on_position=on_position,
+                cancel_event=cancel_event, on_stderr=errors.append,
+            )
+        finally:
+            # Timeout ou cancelamento: libera a thread SSH e a sessão VTY
+            cancel_event.set()
+        error = "".join(errors)
+        if error and on_lines is not None:
+            on_lines(error.rstrip("\n").split("\n"))
+        return "\n".join(lines), error, exit_status
+
+    def _lookup_rib(self, router: Router, target: str, options: dict, as_path_only: bool) -> Optional[str]:
+        """
+        Responde a consulta BGP pela RIB em memória, sem SSH. None quando não há
+        caminho recente para o destino (ou options["live"]): a consulta vai ao roteador.
+        """
+        if (options or {}).get("live"):
+            return None
+        try:
+            entry = rib_store.lookup(router.id, target.strip())
+        except (ValueError, OSError):
+            # Não é IP/prefixo (ex.: nome): só o roteador sabe responder
+            return None
+        if entry is None:
+            return None
+        return format_rib_entry(entry, as_path_only)
+
+    async def _execute_bgp_lookup_ssh(self, router: Router, target: str, options: dict, on_position=None, on_lines=None) -> str:
         """Executa BGP lookup via SSH no roteador - mesmo padrão do router.py"""
+        output = self._lookup_rib(router, target, options, as_path_only=False)
+        if output is not None:
+            return output
         try:
             # Determinar se é IPv6
             is_ipv6 = ":" in target
             
-            import paramiko
-            import base64
-            
-            # Decodificar senha
-            try:
-                password = base64.b64decode(router.ssh_password.encode()).decode()
-            except:
-                # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-                password = router.ssh_password
-            
-            # Conectar via SSH - mesmo padrão do router.py
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(
-                hostname=router.ip,
-                port=router.ssh_port,
-                username=router.ssh_user,
-                password=password,
-                timeout=10
-            )
-            
             # Montar comando BGP
             if is_ipv6:
                 command = f"display bgp ipv6 routing-table {target} | no-more"
             else:
                 command = f"display bgp routing-table {target} | no-more"
             
-            # Executar comando diretamente - mesmo padrão do router.py
-            stdin, stdout, stderr = client.exec_command(command, timeout=30)
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
-            
-            client.close()
+            # Executar comando fora do event loop; as linhas seguem para o stream conforme chegam
+            output, error, _ = await self._exec_streaming(router, command, 30, on_position, on_lines)
             
             # Incluir erro na saída se houver - mesmo padrão do router.py
             if error:
@@ -469,45 +772,23 @@ Total de 2 rotas para {target}"""
         except Exception as e:
             return f"Erro ao executar BGP lookup: {e}"
     
-    async def _execute_bgp_summary_ssh(self, router: Router, target: str, options: dict) -> str:
+    async def _execute_bgp_summary_ssh(self, router: Router, target: str, options: dict, on_position=None, on_lines=None) -> str:
         """Executa BGP lookup resumido (as-path) via SSH no roteador"""
+        output = self._lookup_rib(router, target, options, as_path_only=True)
+        if output is not None:
+            return output
         try:
             # Determinar se é IPv6
             is_ipv6 = ":" in target
             
-            import paramiko
-            import base64
-            
-            # Decodificar senha
-            try:
-                password = base64.b64decode(router.ssh_password.encode()).decode()
-            except:
-                # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-                password = router.ssh_password
-            
-            # Conectar via SSH - mesmo padrão do router.py
-            client = paramiko.SSHClient()
-            client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            client.connect(
-                hostname=router.ip,
-                port=router.ssh_port,
-                username=router.ssh_user,
-                password=password,
-                timeout=10
-            )
-            
             # Montar comando BGP resumido com as-path
             if is_ipv6:
                 command = f"display bgp ipv6 routing-table {target} as-path | no-more"
             else:
                 command = f"display bgp routing-table {target} as-path | no-more"
             
-            # Executar comando diretamente - mesmo padrão do router.py
-            stdin, stdout, stderr = client.exec_command(command, timeout=30)
-            output = stdout.read().decode('utf-8', errors='ignore')
-            error = stderr.read().decode('utf-8', errors='ignore')
-            
-            client.close()
+            # Executar comando fora do event loop; as linhas seguem para o stream conforme chegam
+            output, error, _ = await self._exec_streaming(router, command, 30, on_position, on_lines)
             
             # Incluir erro na saída se houver - mesmo padrão do router.py
             if error:
@@ -520,10 +801,32 @@ Total de 2 rotas para {target}"""
 
     def get_query(self, query_id: str) -> LookingGlassQuery:
         """Retorna uma query específica"""
-        if query_id in self.active_queries:
-            return self.active_queries[query_id]
+        query = self.queries.get(query_id)
+        if query is not None:
+            return query
         
         raise ValueError(f"Query {query_id} não encontrada")
 
+    async def find_query(self, query_id: str) -> LookingGlassQuery:
+        """Como get_query, incluindo consultas criadas em outros workers"""
+        query = self.queries.get(query_id)
+        if query is None:
+            query = await self.state.get_query(query_id)
+        if query is None:
+            raise ValueError(f"Query {query_id} não encontrada")
+        return query
+
+    def stats(self) -> dict:
+        return {
+            "queries": self.queries.stats(),
+            "in_flight": len(self.in_flight),
+            "stream_subscribers": sum(flight.channel.subscribers for flight in self.in_flight.values()),
+            "joined": self.joined,
+            "batches": len(self.batches),
+            "admission": lg_admission.stats(),
+            "cache": self.result_cache.stats(),
+            "state": self.state.stats(),
+        }
+
 # Instância global do serviço
 looking_glass_service = LookingGlassService()
@@ -0,0 +1,98 @@
+"""
+Cache de resultados do Looking Glass
+
+Durante incidentes várias pessoas consultam o mesmo prefixo no mesmo
+roteador ao mesmo tempo. Resultados concluídos ficam guardados por um TTL
+próprio de cada tipo de consulta (ping envelhece rápido, consultas BGP
+menos), e a chave é (roteador, tipo, destino, opções). O compartilhamento
+de execuções em andamento fica em LookingGlassService (app.services.looking_glass).
+"""
+import time
+from typing import Dict, Optional, Tuple
+from app.core.config import (
+    LG_CACHE_TTL_PING, LG_CACHE_TTL_TRACEROUTE, LG_CACHE_TTL_BGP, LG_CACHE_MAX_ENTRIES,
+)
+
+# Opções que mudam o comportamento da consulta mas não o resultado
+_IGNORED_OPTIONS = {"refresh"}
+
+QueryKey = Tuple[int, str, str, Tuple[Tuple[str, str], ...]]
+
+
+def query_key(router_id: int, query_type: str, target: str, options: Optional[dict]) -> QueryKey:
+    """Chave normalizada: "10.0.0.1 " e sourceIp 3/"3" caem na mesma entrada"""
+    normalized = tuple(sorted(
+        (name, str(value)) for name, value in (options or {}).items()
+        if name not in _IGNORED_OPTIONS and value is not None
+    ))
+    return router_id, query_type, target.strip().lower(), normalized
+
+
+class CachedResult:
+    __slots__ = ("output", "stored_at", "expires_at")
+
+    def __init__(self, output: str, stored_at: float, expires_at: float):
+        self.output = output
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+
+
+class QueryResultCache:
+    def __init__(
+        self,
+        ttls: Optional[Dict[str, float]] = None,
+        max_entries: int = LG_CACHE_MAX_ENTRIES,
+    ):
+        self.ttls = ttls if ttls is not None else {
+            "ping": LG_CACHE_TTL_PING,
+            "traceroute": LG_CACHE_TTL_TRACEROUTE,
+            "bgp": LG_CACHE_TTL_BGP,
+            "bgp-summary": LG_CACHE_TTL_BGP,
+        }
+        self.max_entries = max_entries
+        self._entries: Dict[QueryKey, CachedResult] = {}
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get(self, key: QueryKey) -> Optional[CachedResult]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            del self._entries[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key: QueryKey, output: str):
+        ttl = self.ttls.get(key[1], 0)
+        if ttl <= 0:
+            return
+        now = time.monotonic()
+        self._entries.pop(key, None)
+        self._entries[key] = CachedResult(output, now, now + ttl)
+        self.stores += 1
+        if len(self._entries) > self.max_entries:
+            self._evict(now)
+
+    def _evict(self, now: float):
+        # Primeiro os expirados; se não bastar, os mais antigos (ordem de inserção)
+        for key in [k for k, e in self._entries.items() if e.expires_at <= now]:
+            del self._entries[key]
+        while len(self._entries) > self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttls": self.ttls,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stores": self.stores,
+        }
@@ -0,0 +1,74 @@
+"""
+Canal de saída de uma execução do Looking Glass (pub/sub)
+
+A execução SSH publica as linhas assim que chegam do roteador; cada stream
+SSE assina o canal e recebe as linhas novas sem polling. Quem assina depois
+recebe primeiro o que já foi publicado (replay), limitado às últimas
+`max_replay` linhas. Consultas idênticas compartilham a mesma execução e,
+portanto, o mesmo canal.
+"""
+import asyncio
+from typing import AsyncIterator, List, Optional
+from app.core.config import LG_STREAM_REPLAY_LINES
+
+
+class QueryChannel:
+    def __init__(self, max_replay: int = LG_STREAM_REPLAY_LINES):
+        self.max_replay = max_replay
+        self._lines: List[str] = []
+        self._offset = 0  # Linhas já descartadas do início do replay
+        self._changed = asyncio.Event()
+        self.closed = False
+        self.subscribers = 0
+
+    @property
+    def published(self) -> int:
+        return self._offset + len(self._lines)
+
+    def publish(self, lines: List[str]):
+        """Chamado no event loop (a thread SSH usa loop.call_soon_threadsafe)"""
+        if self.closed or not lines:
+            return
+        self._lines.extend(lines)
+        if len(self._lines) > 2 * self.max_replay:
+            # Descarta em blocos para não mover a lista a cada linha
+            drop = len(self._lines) - self.max_replay
+            del self._lines[:drop]
+            self._offset += drop
+        self._wake()
+
+    def close(self):
+        self.closed = True
+        self._wake()
+
+    def _wake(self):
+        # Um Event por "geração": quem esperava acorda, quem chega depois espera o próximo
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def subscribe(self, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        """
+        Gera as linhas do replay e depois as novas até o canal fechar; None a
+        cada `heartbeat` segundos sem saída (para o SSE manter a conexão).
+        """
+        position = self._offset
+        self.subscribers += 1
+        try:
+            while True:
+                if position < self._offset:
+                    yield f"... {self._offset - position} linha(s) anteriores descartadas do buffer ..."
+                    position = self._offset
+                if position < self.published:
+                    batch = self._lines[position - self._offset:]
+                    position += len(batch)
+                    for line in batch:
+                        yield line
+                    continue
+                if self.closed:
+                    return
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            self.subscribers -= 1
@@ -0,0 +1,427 @@
+"""
+Estado das consultas do Looking Glass compartilhado entre workers
+
+Com mais de um worker (uvicorn --workers N ou vários nós atrás do
+balanceador), a consulta criada num processo pode ser lida ou assistida por
+stream em outro. O backend recebe do serviço o estado de cada consulta e as
+linhas de saída de cada execução, e as entrega aos outros processos.
+
+- "memory": nada é compartilhado (um único worker, o padrão)
+- "postgres": estado e saída em tabelas do banco da aplicação; as linhas
+  novas chegam aos outros workers por LISTEN/NOTIFY, sem polling
+
+O worker que executa a consulta continua sendo o dono dela: cache de
+resultados, execuções compartilhadas e limites de requisições são locais.
+As escritas saem do event loop por uma fila e vão ao banco em lotes, uma
+transação por lote; a execução SSH nunca espera o banco.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional
+
+import asyncpg
+
+from app.core.config import (
+    DATABASE_URL, LG_STATE_BACKEND, LG_STATE_MAX_PENDING, LG_STATE_STALE_AFTER, LG_QUERY_MAX_AGE,
+)
+from app.schemas.looking_glass import LookingGlassQuery
+from app.services.looking_glass_channel import QueryChannel
+
+logger = logging.getLogger(__name__)
+
+_NOTIFY_CHANNEL = "looking_glass"
+_MAX_PAYLOAD = 7000  # NOTIFY aceita até 8000 bytes; o resto é o envelope
+_MAX_LINE = 2000  # Linha maior que isso é cortada (só na cópia compartilhada)
+_WRITE_BATCH = 500
+_MAINTENANCE_INTERVAL = 10.0
+_CLEANUP_INTERVAL = 60.0
+_ACTIVE = ("pending", "running")
+
+_UPSERT_QUERY = """
+INSERT INTO looking_glass_queries
+    (id, stream_id, type, target, router, status, output, error, cached_at, created_at, updated_at, owner)
+VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+ON CONFLICT (id) DO UPDATE SET
+    status = EXCLUDED.status, output = EXCLUDED.output, error = EXCLUDED.error,
+    cached_at = EXCLUDED.cached_at, updated_at = EXCLUDED.updated_at
+"""
+_INSERT_LINES = """
+INSERT INTO looking_glass_query_lines (stream_id, seq, lines, created_at)
+VALUES ($1, $2, $3, $4) ON CONFLICT DO NOTHING
+"""
+_SELECT_QUERY = """
+SELECT id, stream_id, type, target, router, status, output, error, cached_at, created_at, updated_at
+FROM looking_glass_queries WHERE id = $1
+"""
+_SELECT_LINES = "SELECT seq, lines FROM looking_glass_query_lines WHERE stream_id = $1 AND seq >= $2 ORDER BY seq"
+_TOUCH = "UPDATE looking_glass_queries SET updated_at = $1 WHERE owner = $2 AND status IN ('pending', 'running')"
+
+
+def _dsn(url: str) -> str:
+    """DATABASE_URL do SQLAlchemy (postgresql+asyncpg://) no formato do asyncpg"""
+    return url.replace("+asyncpg", "", 1)
+
+
+def chunk_lines(lines: List[str], limit: int = _MAX_PAYLOAD) -> List[str]:
+    """Lista JSON de cada bloco de linhas que cabe num NOTIFY"""
+    chunks = []
+    encoded: List[str] = []
+    size = 0
+    for line in lines:
+        item = json.dumps(line)
+        if len(item) > _MAX_LINE:
+            item = json.dumps(line[:_MAX_LINE // 6] + " ...")
+        if encoded and size + len(item) + 1 > limit:
+            chunks.append("[" + ",".join(encoded) + "]")
+            encoded, size = [], 0
+        encoded.append(item)
+        size += len(item) + 1
+    if encoded:
+        chunks.append("[" + ",".join(encoded) + "]")
+    return chunks
+
+
+class MemoryStateBackend:
+    """Um único worker: o estado local do serviço já é tudo"""
+    name = "memory"
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    def save(self, query: LookingGlassQuery, stream_id: str):
+        pass
+
+    def publish(self, stream_id: str, lines: List[str]):
+        pass
+
+    def close_stream(self, stream_id: str):
+        pass
+
+    async def flush(self, timeout: float = 2.0):
+        pass
+
+    async def get_query(self, query_id: str) -> Optional[LookingGlassQuery]:
+        return None
+
+    async def follow(self, query_id: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        return
+        yield
+
+    def stats(self) -> dict:
+        return {"backend": self.name}
+
+
+class _RemoteStream:
+    """Saída de uma execução de outro worker, remontada na ordem dos blocos"""
+    __slots__ = ("channel", "next_seq", "pending", "loaded", "finished", "users")
+
+    def __init__(self):
+        self.channel = QueryChannel()
+        self.next_seq = 0
+        self.pending: Dict[int, List[str]] = {}  # Blocos fora de ordem (ou chegados durante o replay)
+        self.loaded = False
+        self.finished = False
+        self.users = 0
+
+
+class PostgresStateBackend:
+    """
+    Estado em looking_glass_queries e saída em looking_glass_query_lines
+    (replay), com cada bloco de linhas também enviado por NOTIFY na mesma
+    transação. Uma conexão dedicada faz LISTEN e alimenta um QueryChannel
+    local por execução remota assistida, compartilhado pelos streams deste
+    worker. Blocos numerados por execução: o que chega pelo NOTIFY e o que
+    vem do replay se encaixam sem duplicar.
+    """
+    name = "postgres"
+
+    def __init__(self, dsn: str, max_pending: int = LG_STATE_MAX_PENDING,
+                 stale_after: float = LG_STATE_STALE_AFTER, max_age: float = LG_QUERY_MAX_AGE):
+        self.dsn = dsn
+        self.max_pending = max_pending
+        self.stale_after = stale_after
+        self.max_age = max_age
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._pool: Optional[asyncpg.Pool] = None
+        self._listener: Optional[asyncpg.Connection] = None
+        self._ops: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._seq: Dict[str, int] = {}  # Próximo bloco de cada execução deste worker
+        self._remote: Dict[str, _RemoteStream] = {}
+        self._last_cleanup = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        self.notifications = 0
+
+    # Ciclo de vida -------------------------------------------------------
+
+    async def start(self):
+        self._ops = asyncio.Queue(maxsize=self.max_pending)
+        try:
+            await self._connect()
+        except Exception as e:
+            # Sem banco o worker segue atendendo as próprias consultas; a manutenção tenta de novo
+            logger.warning(f"Estado compartilhado do Looking Glass indisponível: {e}")
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._writer()), loop.create_task(self._maintenance())]
+        logger.info(f"Estado do Looking Glass compartilhado via PostgreSQL (worker {self.owner})")
+
+    async def stop(self):
+        # Dá um instante para o escritor esvaziar a fila (estado final das últimas consultas)
+        deadline = time.monotonic() + 5.0
+        while self._ops is not None and not self._ops.empty() and self._pool is not None and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+        for remote in self._remote.values():
+            remote.channel.close()
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _connect(self):
+        if self._pool is None:
+            self._pool = await asyncpg.create_pool(self.dsn, min_size=1, max_size=2)
+        if self._listener is None or self._listener.is_closed():
+            listener = await asyncpg.connect(self.dsn)
+            await listener.add_listener(_NOTIFY_CHANNEL, self._on_notify)
+            self._listener = listener
+            # Avisos perdidos enquanto não havia LISTEN: completa pelo banco
+            for stream_id, remote in list(self._remote.items()):
+                if remote.loaded and not remote.finished:
+                    await self._catch_up(stream_id, remote)
+
+    # Escrita (worker dono da execução) -----------------------------------
+
+    def save(self, query: LookingGlassQuery, stream_id: str):
+        """Estado atual da consulta; chamado no event loop a cada mudança de status/saída"""
+        self._put(("state", (
+            query.id, stream_id, query.type, query.target, query.router, query.status,
+            query.output, query.error, query.cached_at, query.timestamp, datetime.utcnow(), self.owner,
+        )))
+
+    def publish(self, stream_id: str, lines: List[str]):
+        """Linhas novas da execução (as mesmas entregues ao canal local)"""
+        for chunk in chunk_lines(lines):
+            seq = self._seq.get(stream_id, 0)
+            self._seq[stream_id] = seq + 1
+            self._put(("lines", (stream_id, seq, chunk)))
+
+    def close_stream(self, stream_id: str):
+        """Fim da execução: avisado depois do estado final das consultas"""
+        self._seq.pop(stream_id, None)
+        self._put(("done", stream_id))
+
+    async def flush(self, timeout: float = 2.0):
+        """Espera as escritas já enfileiradas chegarem ao banco (consulta visível aos outros workers)"""
+        if self._ops is None or self._pool is None:
+            return
+        done = asyncio.get_running_loop().create_future()
+        self._put(("sync", done))
+        try:
+            await asyncio.wait_for(asyncio.shield(done), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Estado do Looking Glass não gravado em {timeout}s; outros workers podem não ver a consulta ainda")
+
+    def _put(self, op):
+        if self._ops is None:
+            return
+        try:
+            self._ops.put_nowait(op)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Fila do estado compartilhado cheia ({self.max_pending}); escritas descartadas: {self.dropped}")
+
+    async def _writer(self):
+        while True:
+            batch = [await self._ops.get()]
+            while len(batch) < _WRITE_BATCH and not self._ops.empty():
+                batch.append(self._ops.get_nowait())
+            for attempt in range(3):
+                try:
+                    await self._write(batch)
+                    self.written += len(batch)
+                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.errors += 1
+                    logger.warning(f"Erro ao gravar estado do Looking Glass (tentativa {attempt + 1}): {e}")
+                    await asyncio.sleep(1.0)
+            else:
+                self.dropped += len(batch)
+            for kind, args in batch:
+                if kind == "sync" and not args.done():
+                    args.set_result(None)
+
+    async def _write(self, batch):
+        if self._pool is None:
+            raise ConnectionError("sem conexão com o banco")
+        now = datetime.utcnow()
+        async with self._pool.acquire() as conn:
+            # NOTIFY dentro da transação: só é entregue depois do commit, com as linhas já visíveis
+            async with conn.transaction():
+                for kind, args in batch:
+                    if kind == "state":
+                        await conn.execute(_UPSERT_QUERY, *args)
+                    elif kind == "lines":
+                        stream_id, seq, chunk = args
+                        await conn.execute(_INSERT_LINES, stream_id, seq, chunk, now)
+                        await conn.execute("SELECT pg_notify($1, $2)", _NOTIFY_CHANNEL,
+                                           f'{{"s":{json.dumps(stream_id)},"q":{seq},"l":{chunk}}}')
+                    elif kind == "done":
+                        await conn.execute("SELECT pg_notify($1, $2)", _NOTIFY_CHANNEL,
+                                           json.dumps({"s": args, "done": True}))
+
+    # Leitura (qualquer worker) --------------------------------------------
+
+    def _is_stale(self, row) -> bool:
+        return row["status"] in _ACTIVE and datetime.utcnow() - row["updated_at"] > timedelta(seconds=self.stale_after)
+
+    async def get_query(self, query_id: str) -> Optional[LookingGlassQuery]:
+        """Consulta criada em outro worker (None se não existe ou não há banco)"""
+        if self._pool is None:
+            return None
+        row = await self._pool.fetchrow(_SELECT_QUERY, query_id)
+        if row is None:
+            return None
+        query = LookingGlassQuery(
+            id=row["id"], type=row["type"], target=row["target"], router=row["router"],
+            timestamp=row["created_at"], status=row["status"], output=row["output"],
+            error=row["error"], cached_at=row["cached_at"],
+        )
+        if self._is_stale(row):
+            query.status = "error"
+            query.error = "Execução interrompida: o worker que executava a consulta parou de responder"
+        return query
+
+    async def follow(self, query_id: str, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[str]]:
+        """
+        Saída de uma execução de outro worker: replay do banco e depois as
+        linhas novas (NOTIFY), até o fim da execução. None a cada `heartbeat`.
+        """
+        if self._pool is None:
+            return
+        stream_id = await self._pool.fetchval("SELECT stream_id FROM looking_glass_queries WHERE id = $1", query_id)
+        if stream_id is None:
+            return
+        remote = self._remote.get(stream_id)
+        if remote is None:
+            # Registrado antes do replay: os avisos que chegarem durante a leitura ficam em pending
+            remote = self._remote[stream_id] = _RemoteStream()
+        remote.users += 1
+        try:
+            if not remote.loaded:
+                await self._catch_up(stream_id, remote)
+            async for line in remote.channel.subscribe(heartbeat=heartbeat):
+                yield line
+        finally:
+            remote.users -= 1
+            if remote.users == 0 and self._remote.get(stream_id) is remote:
+                del self._remote[stream_id]
+
+    async def _catch_up(self, stream_id: str, remote: _RemoteStream):
+        """Blocos ainda não entregues, lidos do banco; encerra se a execução já terminou"""
+        # Estado antes das linhas: se já terminou, todas as linhas já estão gravadas
+        row = await self._pool.fetchrow("SELECT status, updated_at FROM looking_glass_queries WHERE id = $1", stream_id)
+        finished = row is None or row["status"] not in _ACTIVE or self._is_stale(row)
+        for record in await self._pool.fetch(_SELECT_LINES, stream_id, remote.next_seq):
+            if record["seq"] >= remote.next_seq:
+                remote.pending.setdefault(record["seq"], json.loads(record["lines"]))
+        remote.loaded = True
+        remote.finished = remote.finished or finished
+        self._drain(remote)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self.notifications += 1
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        remote = self._remote.get(message.get("s"))
+        if remote is None:
+            return  # Ninguém neste worker assiste essa execução (inclusive as próprias)
+        if message.get("done"):
+            remote.finished = True
+        elif message.get("q", -1) >= remote.next_seq:
+            remote.pending[message["q"]] = message.get("l") or []
+        self._drain(remote)
+
+    def _drain(self, remote: _RemoteStream):
+        if not remote.loaded:
+            return
+        while remote.next_seq in remote.pending:
+            remote.channel.publish(remote.pending.pop(remote.next_seq))
+            remote.next_seq += 1
+        if remote.finished:
+            # Blocos descartados pelo dono deixam buracos: o que sobrou sai em ordem
+            for seq in sorted(remote.pending):
+                remote.channel.publish(remote.pending.pop(seq))
+            remote.channel.close()
+
+    # Manutenção -----------------------------------------------------------
+
+    async def _maintenance(self):
+        while True:
+            await asyncio.sleep(_MAINTENANCE_INTERVAL)
+            try:
+                await self._connect()
+                # Sinal de vida das execuções deste worker (sem ele os outros as dão como interrompidas)
+                await self._pool.execute(_TOUCH, datetime.utcnow(), self.owner)
+                # Aviso de fim perdido ou dono que parou: relê o banco
+                for stream_id, remote in list(self._remote.items()):
+                    if remote.loaded and not remote.finished:
+                        await self._catch_up(stream_id, remote)
+                if time.monotonic() - self._last_cleanup > _CLEANUP_INTERVAL:
+                    self._last_cleanup = time.monotonic()
+                    cutoff = datetime.utcnow() - timedelta(seconds=self.max_age)
+                    await self._pool.execute("DELETE FROM looking_glass_query_lines WHERE created_at < $1", cutoff)
+                    await self._pool.execute("DELETE FROM looking_glass_queries WHERE updated_at < $1", cutoff)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Erro na manutenção do estado do Looking Glass: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.name,
+            "owner": self.owner,
+            "connected": self._pool is not None and self._listener is not None and not self._listener.is_closed(),
+            "pending_writes": self._ops.qsize() if self._ops is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "notifications": self.notifications,
+            "remote_streams": len(self._remote),
+        }
+
+
+def create_state_backend(kind: str = LG_STATE_BACKEND):
+    if kind == "postgres":
+        return PostgresStateBackend(_dsn(DATABASE_URL))
+    if kind != "memory":
+        logger.warning(f"LG_STATE_BACKEND desconhecido: {kind}; usando memory")
+    return MemoryStateBackend()
+
+# Instância global (escolhida por LG_STATE_BACKEND)
+query_state = create_state_backend()
@@ -0,0 +1,124 @@
+"""
+Armazenamento das consultas do Looking Glass (limitado)
+
+Cada consulta guarda a saída completa enquanto o cliente pode buscá-la
+(GET /query/{id}) ou recebê-la pelo stream. Consultas concluídas saem pela
+idade desde o último acesso, pelo número de entradas ou pelo total de bytes
+de saída, sempre da menos usada para a mais usada (LRU). Consultas em
+execução e as que têm streams abertos (pin) nunca são removidas.
+"""
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from app.schemas.looking_glass import LookingGlassQuery
+from app.core.config import LG_QUERY_MAX_ENTRIES, LG_QUERY_MAX_BYTES, LG_QUERY_MAX_AGE
+
+_RUNNING = ("pending", "running")
+
+
+class QueryStore:
+    def __init__(
+        self,
+        max_entries: int = LG_QUERY_MAX_ENTRIES,
+        max_bytes: int = LG_QUERY_MAX_BYTES,
+        max_age: float = LG_QUERY_MAX_AGE,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        # id -> consulta, da menos para a mais recentemente usada
+        self._queries: "OrderedDict[str, LookingGlassQuery]" = OrderedDict()
+        self._accessed: Dict[str, float] = {}
+        self._pins: Dict[str, int] = {}
+        # Bytes contados por consulta; saídas compartilhadas (execução única ou cache)
+        # são o mesmo objeto str e entram uma vez só no total
+        self._sizes: Dict[str, tuple] = {}
+        self._outputs: Dict[int, list] = {}  # id(str) -> [bytes, referências]
+        self.bytes = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        return len(self._queries)
+
+    def __contains__(self, query_id: str) -> bool:
+        return query_id in self._queries
+
+    def add(self, query: LookingGlassQuery):
+        self._queries[query.id] = query
+        self._accessed[query.id] = time.monotonic()
+        self.update(query)
+        self._evict()
+
+    def get(self, query_id: str) -> Optional[LookingGlassQuery]:
+        query = self._queries.get(query_id)
+        if query is not None:
+            self._queries.move_to_end(query_id)
+            self._accessed[query_id] = time.monotonic()
+        return query
+
+    def discard(self, query_id: str):
+        """Remove uma consulta que não chegou a ser aceita"""
+        if self._queries.pop(query_id, None) is not None:
+            self._release(query_id)
+            del self._accessed[query_id]
+
+    def update(self, query: LookingGlassQuery):
+        """Recalcula os bytes da consulta depois de receber saída ou erro"""
+        if query.id not in self._queries:
+            return
+        self._release(query.id)
+        texts = tuple(text for text in (query.output, query.error) if text)
+        for text in texts:
+            entry = self._outputs.get(id(text))
+            if entry is None:
+                # len() em caracteres: aproximação (as saídas são quase só ASCII)
+                entry = self._outputs[id(text)] = [len(text), 0]
+                self.bytes += entry[0]
+            entry[1] += 1
+        self._sizes[query.id] = texts
+
+    def pin(self, query_id: str):
+        """Mantém a consulta enquanto um stream a estiver lendo"""
+        self._pins[query_id] = self._pins.get(query_id, 0) + 1
+
+    def unpin(self, query_id: str):
+        count = self._pins.get(query_id, 0) - 1
+        if count > 0:
+            self._pins[query_id] = count
+        else:
+            self._pins.pop(query_id, None)
+            # Limites podem ter sido ultrapassados enquanto a consulta estava presa
+            self._evict()
+
+    def _release(self, query_id: str):
+        for text in self._sizes.pop(query_id, ()):
+            entry = self._outputs[id(text)]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._outputs[id(text)]
+                self.bytes -= entry[0]
+
+    def _evict(self):
+        now = time.monotonic()
+        for query_id in list(self._queries):
+            over = len(self._queries) > self.max_entries or self.bytes > self.max_bytes
+            if not over and now - self._accessed[query_id] < self.max_age:
+                break
+            if query_id in self._pins or self._queries[query_id].status in _RUNNING:
+                continue
+            self._release(query_id)
+            del self._queries[query_id]
+            del self._accessed[query_id]
+            self.evicted += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._queries),
+            "max_entries": self.max_entries,
+            "output_bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "max_age": self.max_age,
+            "running": sum(1 for q in self._queries.values() if q.status in _RUNNING),
+            "pinned": len(self._pins),
+            "evicted": self.evicted,
+        }
@@ -0,0 +1,162 @@
+"""
+Resumo estruturado da saída de consultas do Looking Glass
+
+Usado pelas consultas em lote para agregar o resultado de vários roteadores:
+perda e RTT do ping, saltos do traceroute e melhor caminho das consultas
+BGP. Entende a saída do VRP e a gerada a partir da RIB em memória
+(format_rib_entry); campos que não aparecem na saída ficam None.
+"""
+import re
+from typing import Dict, List, Optional
+
+_PING_SENT = re.compile(r"(\d+) packet\(s\) transmitted")
+_PING_RECEIVED = re.compile(r"(\d+) packet\(s\) received")
+_PING_LOSS = re.compile(r"([\d.]+)% packet loss")
+_PING_RTT = re.compile(r"min/avg/max = ([\d.]+)/([\d.]+)/([\d.]+)")
+_HOP = re.compile(r"^\s*(\d+)\s+(\S+)(.*)$")
+_HOP_RTT = re.compile(r"([\d.]+) ms")
+_BGP_PREFIX = re.compile(r"routing table entry information of (\S+?):?\s*$")
+_BGP_PATHS = re.compile(r"Paths:\s+(\d+) available")
+_BGP_FROM = re.compile(r"^\s*From: (\S+)")
+_BGP_NEXT_HOP = re.compile(r"^\s*Original nexthop: (\S+)")
+_BGP_AS_PATH = re.compile(r"^\s*AS-path ([^,]*), origin (\w+)")
+_BGP_BEST_ROW = re.compile(r"^\s*\*>\S*\s+(\S+)\s+(\S+)\s+(.*?)\s*$")
+_NOT_FOUND = ("network does not exist", "Nenhuma rota BGP encontrada")
+
+
+def _number(value: str):
+    number = float(value)
+    return int(number) if number.is_integer() else number
+
+
+def origin_as(as_path: Optional[str]) -> Optional[int]:
+    """Último ASN do caminho (ignora AS_SET)"""
+    for token in reversed((as_path or "").split()):
+        if token.isdigit():
+            return int(token)
+    return None
+
+
+def summarize_ping(output: str) -> dict:
+    summary = {"sent": None, "received": None, "loss_percent": None, "rtt_min": None, "rtt_avg": None, "rtt_max": None}
+    for pattern, field in ((_PING_SENT, "sent"), (_PING_RECEIVED, "received"), (_PING_LOSS, "loss_percent")):
+        match = pattern.search(output)
+        if match:
+            summary[field] = _number(match.group(1))
+    match = _PING_RTT.search(output)
+    if match:
+        summary["rtt_min"], summary["rtt_avg"], summary["rtt_max"] = (_number(v) for v in match.groups())
+    return summary
+
+
+def summarize_traceroute(output: str, target: str) -> dict:
+    hops: List[dict] = []
+    for line in output.splitlines()[1:]:  # A primeira linha é o cabeçalho "traceroute to ..."
+        match = _HOP.match(line)
+        if not match:
+            continue
+        rtts = [float(v) for v in _HOP_RTT.findall(match.group(3))]
+        hops.append({"hop": int(match.group(1)), "address": match.group(2), "rtt_avg": round(sum(rtts) / len(rtts), 1) if rtts else None})
+    last = hops[-1] if hops else None
+    return {
+        "hops": len(hops),
+        "last_hop": last["address"] if last else None,
+        "reached": bool(last and last["address"] == target.strip()),
+        "rtt_avg": last["rtt_avg"] if last else None,
+    }
+
+
+def summarize_bgp(output: str) -> dict:
+    summary = {"found": False, "prefix": None, "paths": None, "best_from": None, "next_hop": None, "as_path": None, "origin_as": None}
+    if any(text in output for text in _NOT_FOUND):
+        return summary
+    peer = next_hop = None
+    for line in output.splitlines():
+        match = _BGP_PREFIX.search(line)
+        if match:
+            summary["prefix"] = match.group(1)
+            continue
+        match = _BGP_PATHS.search(line)
+        if match:
+            summary["paths"] = int(match.group(1))
+            continue
+        match = _BGP_FROM.match(line)
+        if match:
+            peer = match.group(1)
+            continue
+        match = _BGP_NEXT_HOP.match(line)
+        if match:
+            next_hop = match.group(1)
+            continue
+        match = _BGP_AS_PATH.match(line)
+        if match and " best" in line and summary["as_path"] is None:
+            as_path = "" if match.group(1) == "Nil" else match.group(1).strip()
+            summary.update(best_from=peer, next_hop=next_hop, as_path=as_path, origin_as=origin_as(as_path))
+    summary["found"] = summary["as_path"] is not None
+    return summary
+
+
+def summarize_bgp_as_path(output: str) -> dict:
+    summary = {"found": False, "prefix": None, "next_hop": None, "as_path": None, "origin": None, "origin_as": None}
+    if any(text in output for text in _NOT_FOUND):
+        return summary
+    for line in output.splitlines():
+        match = _BGP_BEST_ROW.match(line)
+        if not match:
+            continue
+        path = match.group(3)
+        origin = path[-1] if path and path[-1] in "ie?" else None
+        as_path = (path[:-1] if origin else path).strip()
+        summary.update(found=True, prefix=match.group(1), next_hop=match.group(2), as_path=as_path, origin=origin, origin_as=origin_as(as_path))
+        break
+    return summary
+
+
+def summarize(query_type: str, target: str, output: Optional[str]) -> dict:
+    output = output or ""
+    if query_type == "ping":
+        return summarize_ping(output)
+    if query_type == "traceroute":
+        return summarize_traceroute(output, target)
+    if query_type == "bgp":
+        return summarize_bgp(output)
+    if query_type == "bgp-summary":
+        return summarize_bgp_as_path(output)
+    return {}
+
+
+def aggregate(query_type: str, results: List[dict]) -> Dict[str, dict]:
+    """
+    Agregado por destino. `results` são os itens do lote com "target",
+    "status" e "summary"; só os concluídos entram nas métricas.
+    """
+    by_target: Dict[str, List[dict]] = {}
+    for item in results:
+        by_target.setdefault(item["target"], []).append(item)
+    aggregated = {}
+    for target, items in by_target.items():
+        done = [item["summary"] for item in items if item["status"] == "completed" and item.get("summary")]
+        entry = {"routers": len(items), "completed": len(done), "failed": len(items) - len(done)}
+        if query_type == "ping":
+            losses = [s["loss_percent"] for s in done if s["loss_percent"] is not None]
+            rtts = [s["rtt_avg"] for s in done if s["rtt_avg"] is not None]
+            entry.update(
+                loss_percent_max=max(losses) if losses else None,
+                rtt_avg_min=min(rtts) if rtts else None,
+                rtt_avg_max=max(rtts) if rtts else None,
+            )
+        elif query_type == "traceroute":
+            entry.update(
+                reached=sum(1 for s in done if s["reached"]),
+                hops_min=min((s["hops"] for s in done), default=None),
+                hops_max=max((s["hops"] for s in done), default=None),
+            )
+        else:
+            found = [s for s in done if s["found"]]
+            entry.update(
+                found=len(found),
+                as_paths=sorted({s["as_path"] for s in found}),
+                origin_as=sorted({s["origin_as"] for s in found if s["origin_as"] is not None}),
+            )
+        aggregated[target] = entry
+    return aggregated
@@ -0,0 +1,681 @@
+"""
+Importação de arquivos MRT (RFC 6396) para a RIB em memória
+
+Aceita dumps TABLE_DUMP_V2 (tabela completa de cada peer do coletor) e
+BGP4MP/BGP4MP_ET (UPDATEs e mudanças de estado), sem compressão ou em
+.gz/.bz2. Arquivos sem compressão são mapeados em memória (mmap) e
+divididos em blocos de registros inteiros; arquivos comprimidos são
+descomprimidos em streaming e cortados nos mesmos blocos. Cada bloco é
+interpretado num processo separado, que devolve só arrays compactos
+(prefixo em inteiro, peer e índice do conjunto de atributos); o processo
+principal aplica os resultados na RIB em ordem, em fatias, sem travar o
+event loop. No máximo um bloco por processo (+2) fica pendente: a memória
+não cresce com o tamanho do arquivo.
+
+Cada peer do arquivo é associado ao inventário pelo IP: um Router com esse
+IP (o roteador é o peer do coletor) ou um Peering com esse IP (o dump foi
+feito no próprio roteador). Com router_id informado, todos os peers vão
+para esse roteador. Peers sem correspondência são ignorados e listados no
+resultado. Opcionalmente a tabela de cada Peering é gravada também como
+snapshot de rotas recebidas (app.services.route_snapshots).
+"""
+import asyncio
+import bz2
+import gzip
+import mmap
+import multiprocessing
+import os
+import socket
+import struct
+import time
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from app.services.bgp_wire import FAMILIES, UpdateDecoder, WireError
+import logging
+
+logger = logging.getLogger(__name__)
+
+MRT_HEADER = struct.Struct("!IHHI")  # timestamp, tipo, subtipo, tamanho
+
+# Tipos e subtipos MRT usados
+TABLE_DUMP_V2 = 13
+BGP4MP = 16
+BGP4MP_ET = 17
+PEER_INDEX_TABLE = 1
+RIB_IPV4_UNICAST = 2
+RIB_IPV6_UNICAST = 4
+BGP4MP_STATE_CHANGE = 0
+BGP4MP_MESSAGE = 1
+BGP4MP_MESSAGE_AS4 = 4
+BGP4MP_STATE_CHANGE_AS4 = 5
+BGP4MP_MESSAGE_LOCAL = 6
+BGP4MP_MESSAGE_AS4_LOCAL = 7
+_MESSAGES = {BGP4MP_MESSAGE: False, BGP4MP_MESSAGE_LOCAL: False, BGP4MP_MESSAGE_AS4: True, BGP4MP_MESSAGE_AS4_LOCAL: True}
+_STATE_CHANGES = {BGP4MP_STATE_CHANGE: False, BGP4MP_STATE_CHANGE_AS4: True}
+_ESTABLISHED = 6
+
+_WORKER_CACHE_LIMIT = 1000000  # Conjuntos de atributos lembrados por processo de parsing
+_RIB_ENTRY = struct.Struct("!HIH")  # índice do peer, originated time, tamanho dos atributos
+_OPENERS = {".gz": lambda raw: gzip.GzipFile(fileobj=raw), ".bz2": bz2.BZ2File}
+
+# Operação "peer saiu de Established" nos arrays do resultado (versão 0)
+_PEER_DOWN = 0
+_WITHDRAW = -1
+
+
+class MRTError(Exception):
+    """Arquivo MRT inválido ou ilegível"""
+
+
+def parse_peer_index(body) -> List[str]:
+    """IPs dos peers da PEER_INDEX_TABLE, na ordem dos índices"""
+    view_len = struct.unpack_from("!H", body, 4)[0]
+    offset = 6 + view_len
+    count = struct.unpack_from("!H", body, offset)[0]
+    offset += 2
+    peers = []
+    for _ in range(count):
+        peer_type = body[offset]
+        offset += 5  # tipo + BGP ID
+        if peer_type & 1:
+            peers.append(socket.inet_ntop(socket.AF_INET6, bytes(body[offset:offset + 16])))
+            offset += 16
+        else:
+            peers.append(socket.inet_ntoa(bytes(body[offset:offset + 4])))
+            offset += 4
+        offset += 4 if peer_type & 2 else 2
+    return peers
+
+
+# Divisão em blocos (processo principal) ------------------------------------
+
+def _scan(view, start: int, limit: int, peers: Optional[List[str]]) -> Tuple[int, Optional[List[str]]]:
+    """
+    Avança por registros inteiros a partir de `start` até passar `limit` bytes.
+    Uma nova PEER_INDEX_TABLE fecha o bloco antes dela (vale para os registros seguintes).
+    """
+    position, end = start, len(view)
+    while position + 12 <= end and position - start < limit:
+        _, kind, subtype, length = MRT_HEADER.unpack_from(view, position)
+        if position + 12 + length > end:
+            break
+        if kind == TABLE_DUMP_V2 and subtype == PEER_INDEX_TABLE:
+            if position > start:
+                break
+            peers = parse_peer_index(view[position + 12:position + 12 + length])
+        position += 12 + length
+    return position, peers
+
+
+def iter_chunks(path: str, chunk_size: int, progress: Optional[Callable[[int], None]] = None) -> Iterator[tuple]:
+    """
+    Blocos de registros inteiros: (("range", caminho, início, fim), peers) para
+    arquivos sem compressão (lidos por mmap nos processos) ou (("data", bytes), peers)
+    para .gz/.bz2. `progress` recebe os bytes do arquivo já lidos.
+    """
+    opener = _OPENERS.get(os.path.splitext(path)[1].lower())
+    peers = None
+    with open(path, "rb") as raw:
+        if opener is None:
+            if os.fstat(raw.fileno()).st_size == 0:
+                return
+            with mmap.mmap(raw.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                view = memoryview(mapped)
+                try:
+                    start = 0
+                    while start < len(view):
+                        end, peers = _scan(view, start, chunk_size, peers)
+                        if end == start:
+                            raise MRTError(f"Registro MRT truncado na posição {start}")
+                        yield ("range", path, start, end), peers
+                        if progress:
+                            progress(end)
+                        start = end
+                finally:
+                    view.release()
+            return
+        buffer = bytearray()
+        with opener(raw) as stream:
+            while True:
+                block = stream.read(chunk_size)
+                buffer += block
+                while buffer:
+                    with memoryview(buffer) as view:
+                        end, next_peers = _scan(view, 0, chunk_size, peers)
+                    if end == 0:
+                        break  # Falta o resto do registro: lê mais
+                    data = bytes(buffer[:end])
+                    del buffer[:end]
+                    yield ("data", data), next_peers
+                    peers = next_peers
+                if progress:
+                    progress(raw.tell())
+                if not block:
+                    if buffer:
+                        raise MRTError("Arquivo termina no meio de um registro MRT")
+                    return
+
+
+# Interpretação de um bloco (processos de parsing) --------------------------
+
+class _WorkerAttributes:
+    """
+    Atributos internados pelo processo de parsing, mantidos entre blocos: cada
+    conjunto é decodificado e enviado ao processo principal uma vez só por
+    processo. Os ids são locais ao processo (o principal os mapeia pelo pid).
+    """
+
+    def __init__(self):
+        self.pid = os.getpid()
+        self.count = 0
+        self.new: List[tuple] = []
+        self.decoder = UpdateDecoder(self._intern, cache_limit=_WORKER_CACHE_LIMIT)
+
+    def _intern(self, next_hop=None, as_path="", communities="", med=None, local_pref=None, origin=None) -> int:
+        self.new.append((next_hop, as_path, communities, med, local_pref, origin))
+        self.count += 1
+        return self.count - 1
+
+    def take(self) -> Tuple[int, List[tuple]]:
+        """(id do primeiro conjunto novo, conjuntos novos desde a última chamada)"""
+        new, self.new = self.new, []
+        return self.count - len(new), new
+
+
+_worker: Optional[_WorkerAttributes] = None
+
+
+def _worker_attributes() -> _WorkerAttributes:
+    global _worker
+    # Depois de um fork o estado herdado pertence a outro processo
+    if _worker is None or _worker.pid != os.getpid():
+        _worker = _WorkerAttributes()
+    return _worker
+
+
+def parse_chunk(job: tuple) -> dict:
+    """
+    Interpreta os registros de um bloco. Devolve arrays paralelos, na ordem do
+    arquivo: versão (0 = peer saiu de Established), chave, tamanho, peer
+    (índice em "peers") e atributos (id do processo em "worker"; -1 = retirada).
+    """
+    source, index_peers = job
+    if source[0] == "range":
+        _, path, start, end = source
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)[start:end]
+            try:
+                return _ChunkParser(index_peers, _worker_attributes()).parse(view)
+            finally:
+                view.release()
+    return _ChunkParser(index_peers, _worker_attributes()).parse(memoryview(source[1]))
+
+
+class _ChunkParser:
+    def __init__(self, index_peers: Optional[List[str]], attributes: _WorkerAttributes):
+        self.index_peers = index_peers or []
+        self._index_ids: Optional[List[int]] = None
+        self.peers: List[str] = []
+        self._peer_ids: Dict[str, int] = {}
+        self.attributes = attributes
+        self.decoder = attributes.decoder
+        self.versions = array("B")
+        self.keys: List[int] = []
+        self.lengths = array("B")
+        self.peer_column = array("H")
+        self.attr_column = array("i")
+        self.records = 0
+        self.skipped = 0
+        self.errors = 0
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        self.tables = set()  # Peers com tabela completa (TABLE_DUMP_V2) neste bloco
+
+    def _peer(self, ip: str) -> int:
+        peer = self._peer_ids.get(ip)
+        if peer is None:
+            peer = self._peer_ids[ip] = len(self.peers)
+            self.peers.append(ip)
+        return peer
+
+    def _add(self, version: int, key: int, plen: int, peer: int, attr: int):
+        self.versions.append(version)
+        self.keys.append(key)
+        self.lengths.append(plen)
+        self.peer_column.append(peer)
+        self.attr_column.append(attr)
+
+    def parse(self, view) -> dict:
+        position, end = 0, len(view)
+        while position + 12 <= end:
+            timestamp, kind, subtype, length = MRT_HEADER.unpack_from(view, position)
+            body = view[position + 12:position + 12 + length]
+            position += 12 + length
+            self.records += 1
+            if self.first_ts is None:
+                self.first_ts = timestamp
+            self.last_ts = timestamp
+            try:
+                if kind == TABLE_DUMP_V2:
+                    if subtype == RIB_IPV4_UNICAST:
+                        self._rib(body, 4, 32)
+                    elif subtype == RIB_IPV6_UNICAST:
+                        self._rib(body, 6, 128)
+                    elif subtype != PEER_INDEX_TABLE:
+                        self.skipped += 1  # Multicast, genérico, ADD-PATH
+                elif kind in (BGP4MP, BGP4MP_ET):
+                    self._bgp4mp(body[4:] if kind == BGP4MP_ET else body, subtype)
+                else:
+                    self.skipped += 1
+            except (WireError, struct.error, IndexError, ValueError):
+                self.errors += 1
+        base, new = self.attributes.take()
+        return {
+            "worker": self.attributes.pid,
+            "attributes_base": base,
+            "attributes": new,
+            "peers": self.peers,
+            "versions": self.versions,
+            "keys": self.keys,
+            "lengths": self.lengths,
+            "peer_column": self.peer_column,
+            "attr_column": self.attr_column,
+            "tables": sorted(self.tables),
+            "records": self.records,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "first_ts": self.first_ts,
+            "last_ts": self.last_ts,
+        }
+
+    def _rib(self, body, version: int, bits: int):
+        plen = body[4]
+        size = (plen + 7) >> 3
+        if plen > bits:
+            raise WireError("Prefixo inválido")
+        key = int.from_bytes(body[5:5 + size], "big") << (bits - 8 * size)
+        offset = 5 + size
+        count = struct.unpack_from("!H", body, offset)[0]
+        offset += 2
+        if self._index_ids is None:
+            self._index_ids = [self._peer(ip) for ip in self.index_peers]
+        index_ids, tables, attributes, unpack = self._index_ids, self.tables, self.decoder.attributes, _RIB_ENTRY.unpack_from
+        versions, keys, lengths = self.versions.append, self.keys.append, self.lengths.append
+        peer_column, attr_column = self.peer_column.append, self.attr_column.append
+        for _ in range(count):
+            index, _, attr_len = unpack(body, offset)
+            offset += 8
+            end = offset + attr_len
+            attr = attributes(body[offset:end], True, True)
+            offset = end
+            peer = index_ids[index]
+            tables.add(peer)
+            versions(version)
+            keys(key)
+            lengths(plen)
+            peer_column(peer)
+            attr_column(attr)
+
+    def _bgp4mp(self, body, subtype: int):
+        if subtype in _MESSAGES:
+            four_byte_as = _MESSAGES[subtype]
+        elif subtype in _STATE_CHANGES:
+            four_byte_as = _STATE_CHANGES[subtype]
+        else:
+            self.skipped += 1
+            return
+        offset = 8 if four_byte_as else 4  # AS do peer e AS local
+        afi = struct.unpack_from("!H", body, offset + 2)[0]
+        offset += 4
+        if afi not in FAMILIES:
+            self.skipped += 1
+            return
+        size = 4 if afi == 1 else 16
+        address = bytes(body[offset:offset + size])
+        peer_ip = socket.inet_ntoa(address) if size == 4 else socket.inet_ntop(socket.AF_INET6, address)
+        offset += 2 * size
+        peer = self._peer(peer_ip)
+        if subtype in _STATE_CHANGES:
+            old, new = struct.unpack_from("!HH", body, offset)
+            if old == _ESTABLISHED and new != _ESTABLISHED:
+                self._add(_PEER_DOWN, 0, 0, peer, _WITHDRAW)
+            return
+        message = body[offset:]
+        if len(message) < 19 or message[18] != 2:
+            return  # OPEN, KEEPALIVE, NOTIFICATION
+        attr, announced, withdrawn = self.decoder.decode(message, four_byte_as)
+        for version, key, plen in withdrawn:
+            self._add(version, key, plen, peer, _WITHDRAW)
+        for version, key, plen in announced:
+            self._add(version, key, plen, peer, attr)
+
+
+# Importação (processo principal) ----------------------------------------------
+
+class _ImportRefs:
+    """Ids da RIB traduzidos dos processos de parsing durante uma importação"""
+
+    def __init__(self, workers: Dict[int, List[int]]):
+        self.workers = workers
+
+    def attribute_refs(self) -> Iterator[int]:
+        for attributes in self.workers.values():
+            yield from attributes
+
+
+class MRTImport:
+    """Estado de uma importação (exposto pela API enquanto roda)"""
+
+    def __init__(self, import_id: int, path: str, router_id: Optional[int], snapshots: bool):
+        self.id = import_id
+        self.path = path
+        self.router_id = router_id
+        self.snapshots = snapshots
+        self.status = "running"
+        self.error: Optional[str] = None
+        self.started_at = datetime.now()
+        self.finished_at: Optional[datetime] = None
+        self.size = os.path.getsize(path)
+        self.bytes_read = 0
+        self.records = 0
+        self.entries = 0
+        self.skipped = 0
+        self.errors = 0
+        self.first_ts: Optional[int] = None
+        self.last_ts: Optional[int] = None
+        # IP do peer no arquivo -> destino no inventário e contagens
+        self.peers: Dict[str, dict] = {}
+        self.unmatched: Dict[str, int] = {}
+        self.snapshot_ids: List[int] = []
+
+    def to_dict(self) -> dict:
+        elapsed = ((self.finished_at or datetime.now()) - self.started_at).total_seconds()
+        return {
+            "id": self.id,
+            "file": os.path.basename(self.path),
+            "router_id": self.router_id,
+            "status": self.status,
+            "error": self.error,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "elapsed_seconds": round(elapsed, 1),
+            "size": self.size,
+            "bytes_read": self.bytes_read,
+            "progress": round(self.bytes_read / self.size, 3) if self.size else 1.0,
+            "records": self.records,
+            "entries": self.entries,
+            "entries_per_second": round(self.entries / elapsed) if elapsed > 0 else None,
+            "skipped_records": self.skipped,
+            "invalid_records": self.errors,
+            "dump_start": datetime.fromtimestamp(self.first_ts).isoformat() if self.first_ts else None,
+            "dump_end": datetime.fromtimestamp(self.last_ts).isoformat() if self.last_ts else None,
+            "peers": self.peers,
+            "unmatched_peers": self.unmatched,
+            "snapshot_ids": self.snapshot_ids,
+        }
+
+
+# (router_id, peering_id) do peer no inventário, ou None
+Resolver = Callable[[str], Optional[Tuple[int, Optional[int]]]]
+
+
+class MRTImporter:
+    """Executa importações e guarda o histórico recente delas"""
+
+    def __init__(self, store=None):
+        self._store = store
+        self.imports: Dict[int, MRTImport] = {}
+        self._next_id = 1
+        self._tasks: Dict[int, asyncio.Task] = {}
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.services.rib import rib_store
+            self._store = rib_store
+        return self._store
+
+    @property
+    def running(self) -> bool:
+        return any(job.status == "running" for job in self.imports.values())
+
+    def start(self, path: str, router_id: Optional[int] = None, snapshots: bool = False) -> MRTImport:
+        """Importação em segundo plano (API)"""
+        job = self._new_job(path, router_id, snapshots)
+        task = asyncio.get_running_loop().create_task(self._run_job(job))
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+        return job
+
+    def _new_job(self, path: str, router_id: Optional[int], snapshots: bool) -> MRTImport:
+        job = MRTImport(self._next_id, path, router_id, snapshots)
+        self._next_id += 1
+        self.imports[job.id] = job
+        # Guarda só as importações mais recentes
+        for old in sorted(self.imports)[:-20]:
+            if self.imports[old].status != "running":
+                del self.imports[old]
+        return job
+
+    async def run(
+        self,
+        path: str,
+        router_id: Optional[int] = None,
+        snapshots: bool = False,
+        resolve: Optional[Resolver] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+    ) -> MRTImport:
+        """Importa e espera terminar (CLI e testes); `resolve` substitui a consulta ao inventário"""
+        job = self._new_job(path, router_id, snapshots)
+        await self._run_job(job, resolve, workers, chunk_size)
+        return job
+
+    async def _run_job(self, job: MRTImport, resolve: Optional[Resolver] = None, workers=None, chunk_size=None):
+        from app.core.config import MRT_IMPORT_WORKERS, MRT_IMPORT_CHUNK_MB
+        workers = workers or MRT_IMPORT_WORKERS
+        chunk_size = chunk_size or MRT_IMPORT_CHUNK_MB * 1024 * 1024
+        try:
+            if resolve is None:
+                resolve = await self._inventory_resolver(job.router_id)
+            await self._import(job, resolve, workers, chunk_size)
+            if job.snapshots:
+                await self._store_snapshots(job)
+            job.status = "done"
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            raise
+        except Exception as e:
+            job.status = "error"
+            job.error = str(e)
+            logger.error(f"Importação MRT {job.path}: {e}")
+        finally:
+            job.finished_at = datetime.now()
+        logger.info(
+            f"Importação MRT {os.path.basename(job.path)}: {job.entries} entradas de {job.records} registros "
+            f"em {(job.finished_at - job.started_at).total_seconds():.1f} s ({job.status})"
+        )
+
+    async def _inventory_resolver(self, router_id: Optional[int]) -> Resolver:
+        from sqlalchemy.future import select
+        from app.core.config import SessionLocal
+        from app.models.peering import Peering
+        from app.models.router import Router
+        from app.services.bgp_summary import normalize_ip
+
+        async with SessionLocal() as db:
+            routers = (await db.execute(select(Router.id, Router.ip))).all()
+            peerings = (await db.execute(select(Peering.id, Peering.router_id, Peering.ip))).all()
+        if router_id is not None and router_id not in {rid for rid, _ in routers}:
+            raise MRTError(f"Roteador {router_id} não encontrado")
+        by_router_ip = {normalize_ip(ip): rid for rid, ip in routers}
+        by_peering_ip: Dict[str, Tuple[int, int]] = {}
+        for peering_id, peering_router, ip in peerings:
+            if router_id is None or peering_router == router_id:
+                by_peering_ip.setdefault(normalize_ip(ip), (peering_router, peering_id))
+
+        def resolve(peer_ip: str) -> Optional[Tuple[int, Optional[int]]]:
+            key = normalize_ip(peer_ip)
+            if key in by_peering_ip:
+                return by_peering_ip[key]
+            if router_id is not None:
+                return router_id, None
+            if key in by_router_ip:
+                return by_router_ip[key], None
+            return None
+
+        return resolve
+
+    async def _import(self, job: MRTImport, resolve: Resolver, workers: int, chunk_size: int):
+        loop = asyncio.get_running_loop()
+
+        def progress(position: int):
+            job.bytes_read = position
+
+        chunks = iter_chunks(job.path, chunk_size, progress)
+        # Peer do arquivo -> (RouterRIB, id do peer) ou None; peers com tabela completa em carga
+        targets: Dict[str, Optional[tuple]] = {}
+        loading: Dict[str, list] = {}
+        interned: Dict[tuple, int] = {}
+        worker_attributes: Dict[int, List[int]] = {}
+        # Os ids traduzidos ficam fora da RIB até a carga terminar: não podem ser compactados
+        refs = _ImportRefs(worker_attributes)
+        self.store.attributes.add_holder(refs)
+        # forkserver: um fork do processo da API herdaria o event loop, threads e conexões abertas
+        pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("forkserver"))
+        pending = deque()
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(pending) < workers + 2:
+                    chunk = await asyncio.to_thread(next, chunks, None)
+                    if chunk is None:
+                        exhausted = True
+                        break
+                    pending.append(asyncio.wrap_future(pool.submit(parse_chunk, chunk)))
+                if not pending:
+                    break
+                result = await pending.popleft()
+                await self._apply(job, result, resolve, targets, loading, interned, worker_attributes)
+        finally:
+            for future in pending:
+                future.cancel()
+            try:
+                chunks.close()
+            except ValueError:
+                pass  # Cancelado enquanto a leitura rodava numa thread
+            await loop.run_in_executor(None, pool.shutdown)
+            self.store.attributes.remove_holder(refs)
+        for peer_ip, (rib, peer_id, count) in loading.items():
+            rib.finish_load(peer_id, count)
+            job.peers[peer_ip]["paths"] = rib.peer_path_count(peer_id)
+        self.store.maybe_compact()
+
+    async def _apply(self, job: MRTImport, result: dict, resolve: Resolver, targets: dict, loading: dict, interned: dict, workers: dict):
+        store = self.store
+        job.records += result["records"]
+        job.skipped += result["skipped"]
+        job.errors += result["errors"]
+        if result["first_ts"] is not None:
+            job.first_ts = job.first_ts or result["first_ts"]
+            job.last_ts = result["last_ts"]
+        # Ids locais do processo de parsing -> ids da RIB; o mesmo conjunto pode vir de vários processos
+        attributes = workers.setdefault(result["worker"], [])
+        if len(attributes) != result["attributes_base"]:
+            raise MRTError("Resultados de parsing fora de ordem")
+        for fields in result["attributes"]:
+            attr = interned.get(fields)
+            if attr is None:
+                attr = interned[fields] = store.intern(*fields)
+            attributes.append(attr)
+        tables = set(result["tables"])
+        peers = []
+        for index, peer_ip in enumerate(result["peers"]):
+            if peer_ip not in targets:
+                target = resolve(peer_ip)
+                if target is None:
+                    targets[peer_ip] = None
+                else:
+                    rib = store.rib(target[0])
+                    targets[peer_ip] = (rib, rib.peers.intern(peer_ip))
+                    job.peers[peer_ip] = {"router_id": target[0], "peering_id": target[1], "paths": 0}
+            target = targets[peer_ip]
+            if target is not None and index in tables and peer_ip not in loading:
+                # Tabela completa: o que o peer tinha antes e não vier no dump é removido no fim
+                rib = target[0]
+                loading[peer_ip] = [rib, rib.begin_load(peer_ip), 0]
+            peers.append(target)
+
+        versions, keys, lengths = result["versions"], result["keys"], result["lengths"]
+        peer_column, attr_column = result["peer_column"], result["attr_column"]
+        names = result["peers"]
+        loads = [loading.get(name) if target is not None else None for name, target in zip(names, peers)]
+        total = len(keys)
+        job.entries += total
+        step = 50000
+        for begin in range(0, total, step):
+            for i in range(begin, min(total, begin + step)):
+                peer = peer_column[i]
+                target = peers[peer]
+                if target is None:
+                    job.unmatched[names[peer]] = job.unmatched.get(names[peer], 0) + 1
+                    continue
+                rib, peer_id = target
+                version, attr = versions[i], attr_column[i]
+                if version == _PEER_DOWN:
+                    rib.clear_peer(names[peer])
+                elif attr == _WITHDRAW:
+                    rib.withdraw_key(version, keys[i], lengths[i], peer_id)
+                else:
+                    rib.set_key(version, keys[i], lengths[i], peer_id, attributes[attr])
+                    if loads[peer] is not None:
+                        loads[peer][2] += 1
+            # Devolve o event loop entre as fatias
+            await asyncio.sleep(0)
+        now = time.time()
+        for target in peers:
+            if target is not None:
+                target[0].peer_updated[target[1]] = now
+        for peer_ip, info in job.peers.items():
+            rib, peer_id = targets[peer_ip]
+            info["paths"] = rib.peer_path_count(peer_id)
+
+    async def _store_snapshots(self, job: MRTImport):
+        """Grava a tabela importada de cada Peering como snapshot de rotas recebidas"""
+        from app.core.config import SessionLocal
+        from app.models.peering import Peering
+        from app.services.route_snapshots import route_snapshots
+
+        # Horário do dump só como informação: o snapshot entra na cadeia com o horário da importação
+        source_time = datetime.utcfromtimestamp(job.last_ts) if job.last_ts else None
+        attributes = self.store.attributes
+        for peer_ip, info in job.peers.items():
+            if info["peering_id"] is None:
+                continue
+            async with SessionLocal() as db:
+                peering = await db.get(Peering, info["peering_id"])
+            if peering is None:
+                continue
+            rib = self.store.rib(info["router_id"])
+            table = {}
+            for prefix, attr in rib.peer_routes(peer_ip):
+                fields = attributes.get(attr)
+                # PrefVal não existe no MRT: store_table herda o da captura anterior
+                table[prefix] = (
+                    fields["next_hop"], fields["med"], fields["local_pref"], None, fields["as_path"], fields["origin"],
+                )
+            snapshot = await route_snapshots.store_table(
+                peering, info["router_id"], "received", table, "mrt", load_rib=False, source_time=source_time,
+            )
+            job.snapshot_ids.append(snapshot.id)
+
+    def stats(self) -> dict:
+        return {"imports": [job.to_dict() for job in sorted(self.imports.values(), key=lambda j: -j.id)]}
+
+
+# Instância global do importador MRT
+mrt_importer = MRTImporter()
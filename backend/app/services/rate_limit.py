@@ -0,0 +1,214 @@
+"""
+Controle de admissão das rotas que usam SSH
+
+- RateLimiter: token buckets por escopo e chave (IP do cliente, usuário,
+  roteador). Uma requisição só passa se todos os buckets envolvidos tiverem
+  fichas; caso contrário nada é consumido e RateLimited informa em quantos
+  segundos haverá ficha (Retry-After).
+- AdmissionControl: limite global de execuções simultâneas do Looking Glass
+  com fila de espera limitada. A vaga é reservada antes de abrir qualquer
+  sessão SSH; com a fila cheia a consulta é recusada na hora.
+
+As recusas viram 429 com Retry-After (handler em app.main), sem tocar no
+banco nem nos roteadores.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+
+from app.core.config import (
+    RATE_LIMIT_ENABLED, RATE_LIMIT_TRUST_PROXY,
+    LG_RATE_PER_IP, LG_BURST_PER_IP, LG_RATE_PER_USER, LG_BURST_PER_USER,
+    LG_RATE_PER_ROUTER, LG_BURST_PER_ROUTER,
+    LG_BATCH_RATE_PER_IP, LG_BATCH_BURST_PER_IP, LG_BATCH_RATE_PER_USER, LG_BATCH_BURST_PER_USER,
+    SSH_RATE_PER_IP, SSH_BURST_PER_IP, SSH_RATE_PER_USER, SSH_BURST_PER_USER,
+    LG_MAX_RUNNING, LG_MAX_WAITING,
+)
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Buckets cheios são equivalentes a um novo: removidos quando o dicionário cresce
+_MAX_BUCKETS = 50000
+
+
+class RateLimited(Exception):
+    def __init__(self, message: str, retry_after: float, scope: Optional[str] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.scope = scope
+
+
+class CostExceeded(ValueError):
+    """Custo maior que a rajada do bucket: nunca passaria, esperar não adianta"""
+    def __init__(self, message: str, capacity: float, scope: str):
+        super().__init__(message)
+        self.capacity = capacity
+        self.scope = scope
+
+
+def client_ip(request: Request) -> str:
+    """
+    IP do cliente; cabeçalhos de proxy só valem com RATE_LIMIT_TRUST_PROXY
+    (senão qualquer um os forja). Vale o X-Real-IP ($remote_addr do nginx) ou o
+    último item do X-Forwarded-For, o único acrescentado pelo proxy: os da
+    esquerda vêm do próprio cliente.
+    """
+    if RATE_LIMIT_TRUST_PROXY:
+        real_ip = request.headers.get("X-Real-IP")
+        if real_ip:
+            return real_ip.strip()
+        forwarded = request.headers.get("X-Forwarded-For")
+        if forwarded:
+            return forwarded.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate  # Fichas por segundo
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, cost: float) -> float:
+        return 0.0 if self.tokens >= cost else (cost - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, limits: Dict[str, Tuple[float, float]], enabled: bool = RATE_LIMIT_ENABLED):
+        # escopo -> (requisições por minuto, rajada); taxa 0 desliga o escopo
+        self.limits = limits
+        self.enabled = enabled
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self.allowed = 0
+        self.rejected: Dict[str, int] = {scope: 0 for scope in limits}
+
+    def acquire(self, keys: Iterable[Tuple[str, object]], cost: float = 1.0):
+        """
+        Consome `cost` fichas de cada (escopo, chave) ou lança RateLimited sem
+        consumir nada. Custo acima da capacidade de algum bucket lança CostExceeded.
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic()
+        buckets = []
+        worst, worst_scope = 0.0, None
+        for scope, key in keys:
+            per_minute, burst = self.limits.get(scope, (0, 0))
+            if per_minute <= 0:
+                continue
+            bucket = self._buckets.get((scope, str(key)))
+            if bucket is None:
+                bucket = self._buckets[(scope, str(key))] = TokenBucket(per_minute / 60.0, max(1.0, burst), now)
+            bucket.refill(now)
+            if cost > bucket.capacity:
+                raise CostExceeded(
+                    f"Requisição com custo {cost:g} excede o limite de {bucket.capacity:g} por cliente", bucket.capacity, scope,
+                )
+            wait = bucket.wait_time(cost)
+            if wait > worst:
+                worst, worst_scope = wait, scope
+            buckets.append(bucket)
+        if worst > 0:
+            self.rejected[worst_scope] = self.rejected.get(worst_scope, 0) + 1
+            raise RateLimited("Limite de requisições excedido, tente novamente em instantes", worst, worst_scope)
+        for bucket in buckets:
+            bucket.tokens -= cost
+        self.allowed += 1
+        if len(self._buckets) > _MAX_BUCKETS:
+            self._prune(now)
+
+    def _prune(self, now: float):
+        for key in [k for k, b in self._buckets.items() if b.tokens + (now - b.updated) * b.rate >= b.capacity]:
+            del self._buckets[key]
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "limits": {scope: {"per_minute": rate, "burst": burst} for scope, (rate, burst) in self.limits.items()},
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class AdmissionControl:
+    """Execuções simultâneas limitadas, com fila de espera limitada"""
+
+    def __init__(self, max_running: int = LG_MAX_RUNNING, max_waiting: int = LG_MAX_WAITING):
+        self.max_running = max_running
+        self.max_waiting = max_waiting
+        self._semaphore = asyncio.Semaphore(max_running)
+        self.reserved = 0  # Em execução + na fila
+        self.running = 0
+        self.rejected = 0
+        self._avg_seconds = 5.0  # Duração média das execuções (média móvel), base do Retry-After
+
+    def reserve(self):
+        """Reserva uma vaga (executando ou na fila) ou lança RateLimited; a vaga é usada por slot()"""
+        if self.reserved >= self.max_running + self.max_waiting:
+            self.rejected += 1
+            raise RateLimited("Looking Glass sobrecarregado, tente novamente em instantes", self.retry_after(), "global")
+        self.reserved += 1
+
+    def release(self):
+        """Devolve uma reserva que não chegou a executar"""
+        self.reserved -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """Espera a vez e executa; libera a reserva feita por reserve() ao sair"""
+        try:
+            async with self._semaphore:
+                self.running += 1
+                started = time.monotonic()
+                try:
+                    yield
+                finally:
+                    self.running -= 1
+                    self._avg_seconds = 0.8 * self._avg_seconds + 0.2 * (time.monotonic() - started)
+        finally:
+            self.reserved -= 1
+
+    def retry_after(self) -> float:
+        # Fila à frente dividida entre as execuções paralelas
+        waiting = max(0, self.reserved - self.running)
+        return max(1.0, self._avg_seconds * (waiting + 1) / self.max_running)
+
+    def stats(self) -> dict:
+        return {
+            "max_running": self.max_running,
+            "max_waiting": self.max_waiting,
+            "running": self.running,
+            "waiting": max(0, self.reserved - self.running),
+            "rejected": self.rejected,
+            "avg_seconds": round(self._avg_seconds, 2),
+        }
+
+
+def retry_after_header(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+# Instâncias globais
+rate_limiter = RateLimiter({
+    "lg_ip": (LG_RATE_PER_IP, LG_BURST_PER_IP),
+    "lg_user": (LG_RATE_PER_USER, LG_BURST_PER_USER),
+    "lg_router": (LG_RATE_PER_ROUTER, LG_BURST_PER_ROUTER),
+    "lg_batch_ip": (LG_BATCH_RATE_PER_IP, LG_BATCH_BURST_PER_IP),
+    "lg_batch_user": (LG_BATCH_RATE_PER_USER, LG_BATCH_BURST_PER_USER),
+    "ssh_ip": (SSH_RATE_PER_IP, SSH_BURST_PER_IP),
+    "ssh_user": (SSH_RATE_PER_USER, SSH_BURST_PER_USER),
+})
+lg_admission = AdmissionControl()
@@ -0,0 +1,835 @@
+"""
+RIB em memória por roteador, compacta, para consultas sem SSH
+
+Cada roteador tem uma árvore Patricia por família (IPv4/IPv6) guardada em
+arrays paralelos (chave, tamanho, filhos, valor): ~20 bytes por nó, sem um
+objeto Python por prefixo. Cada prefixo aponta para uma lista encadeada de
+caminhos (um por peer de origem), também em arrays. Os atributos (next-hop,
+AS-path, communities, MED, local-pref, origem) são internados uma vez e
+compartilhados entre prefixos e roteadores: um caminho ocupa só os índices
+do conjunto de atributos e do peer.
+
+Responde longest-prefix-match, prefixo exato, prefixos que cobrem um destino
+(menos específicos) e prefixos cobertos por ele (mais específicos). É
+alimentada pelos snapshots de rotas recebidas (app.services.route_snapshots)
+e por coletores, via update()/withdraw().
+"""
+import asyncio
+import socket
+import sys
+import time
+import weakref
+from array import array
+from datetime import timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core.config import RIB_ENABLED, RIB_MAX_AGE
+import logging
+
+logger = logging.getLogger(__name__)
+
+_NONE = 0xFFFFFFFF  # MED/local-pref ausente nos arrays de atributos; índice livre nas colunas
+# Compacta os atributos quando os conjuntos em uso dobram desde a última vez (e passam disto)
+_COMPACT_MIN = 65536
+_ORIGIN_CODES = {"i": 0, "e": 1, "?": 2, None: 3}
+_ORIGIN_NAMES = ["i", "e", "?", None]
+
+
+def parse_prefix(prefix: str) -> Tuple[int, int, int]:
+    """(versão, endereço como inteiro, tamanho); sem "/" vale como host (/32 ou /128)"""
+    address, _, length = prefix.partition("/")
+    if ":" in address:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big")
+        bits, version = 128, 6
+    else:
+        value = int.from_bytes(socket.inet_aton(address), "big")
+        bits, version = 32, 4
+        if address.count(".") != 3:
+            raise ValueError(f"Endereço inválido: {address}")
+    plen = int(length) if length else bits
+    if not 0 <= plen <= bits:
+        raise ValueError(f"Tamanho de prefixo inválido: {prefix}")
+    # Zera os bits de host (10.0.0.1/24 -> 10.0.0.0/24)
+    value &= ~((1 << (bits - plen)) - 1) & ((1 << bits) - 1)
+    return version, value, plen
+
+
+def format_prefix(version: int, value: int, plen: int) -> str:
+    if version == 6:
+        return f"{socket.inet_ntop(socket.AF_INET6, value.to_bytes(16, 'big'))}/{plen}"
+    return f"{socket.inet_ntoa(value.to_bytes(4, 'big'))}/{plen}"
+
+
+class Interner:
+    """
+    Valor -> índice estável; o mesmo valor é guardado uma única vez. Índices
+    liberados (release) são reaproveitados pelos próximos valores.
+    """
+
+    __slots__ = ("_ids", "values", "_free")
+
+    def __init__(self):
+        self._ids: Dict = {}
+        self.values: List = []
+        self._free: List[int] = []
+
+    def intern(self, value) -> int:
+        index = self._ids.get(value)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                self.values[index] = value
+            else:
+                index = len(self.values)
+                self.values.append(value)
+            self._ids[value] = index
+        return index
+
+    def get(self, value) -> Optional[int]:
+        return self._ids.get(value)
+
+    def release(self, index: int):
+        del self._ids[self.values[index]]
+        self.values[index] = None
+        self._free.append(index)
+
+    def release_unused(self, used: Set[int]) -> int:
+        """Libera os índices fora de `used`; devolve quantos"""
+        unused = set(range(len(self.values))) - used - set(self._free)
+        for index in unused:
+            self.release(index)
+        return len(unused)
+
+    def __len__(self) -> int:
+        return len(self.values) - len(self._free)
+
+    def memory(self) -> int:
+        return (
+            sys.getsizeof(self._ids) + sys.getsizeof(self.values) + sys.getsizeof(self._free)
+            + sum(sys.getsizeof(v) for v in self.values if v is not None)
+        )
+
+
+class AttributeStore:
+    """
+    Conjuntos de atributos de caminho internados em colunas de array.
+
+    Conjuntos sem uso são liberados por compactação (marcação e varredura): a
+    RIB informa os índices em uso e os "holders" registrados (caches de
+    decodificação, importações em andamento) os que guardam fora dela. Os
+    índices em uso não mudam; os liberados são reaproveitados.
+    """
+
+    def __init__(self):
+        self.next_hops = Interner()
+        self.as_paths = Interner()
+        self.communities = Interner()
+        self._ids: Dict[int, int] = {}
+        self._free: List[int] = []
+        # Objetos com attribute_refs(): índices guardados fora da RIB
+        self._holders: "weakref.WeakSet" = weakref.WeakSet()
+        self.released = 0
+        self._next_hop = array("I")
+        self._as_path = array("I")
+        self._communities = array("I")
+        self._med = array("I")
+        self._local_pref = array("I")
+        self._origin = array("B")
+
+    def intern(
+        self,
+        next_hop: Optional[str],
+        as_path: str = "",
+        communities: str = "",
+        med: Optional[int] = None,
+        local_pref: Optional[int] = None,
+        origin: Optional[str] = None,
+    ) -> int:
+        row = (
+            self.next_hops.intern(next_hop or ""),
+            self.as_paths.intern(as_path or ""),
+            self.communities.intern(communities or ""),
+            _NONE if med is None else med,
+            _NONE if local_pref is None else local_pref,
+            _ORIGIN_CODES.get(origin, 3),
+        )
+        key = _attribute_key(row)
+        index = self._ids.get(key)
+        if index is None:
+            if self._free:
+                index = self._free.pop()
+                (self._next_hop[index], self._as_path[index], self._communities[index],
+                 self._med[index], self._local_pref[index], self._origin[index]) = row
+            else:
+                index = len(self._next_hop)
+                self._next_hop.append(row[0])
+                self._as_path.append(row[1])
+                self._communities.append(row[2])
+                self._med.append(row[3])
+                self._local_pref.append(row[4])
+                self._origin.append(row[5])
+            self._ids[key] = index
+        return index
+
+    def get(self, index: int) -> dict:
+        med, local_pref = self._med[index], self._local_pref[index]
+        return {
+            "next_hop": self.next_hops.values[self._next_hop[index]] or None,
+            "as_path": self.as_paths.values[self._as_path[index]],
+            "communities": self.communities.values[self._communities[index]],
+            "med": None if med == _NONE else med,
+            "local_pref": None if local_pref == _NONE else local_pref,
+            "origin": _ORIGIN_NAMES[self._origin[index]],
+        }
+
+    def rank(self, index: int) -> tuple:
+        """Critério simplificado de melhor caminho: local-pref, AS-path, origem, MED"""
+        local_pref = self._local_pref[index]
+        path = self.as_paths.values[self._as_path[index]]
+        med = self._med[index]
+        return (
+            -(100 if local_pref == _NONE else local_pref),
+            path.count(" ") + 1 if path else 0,
+            self._origin[index],
+            0 if med == _NONE else med,
+        )
+
+    def add_holder(self, holder):
+        """Registra quem guarda índices fora da RIB (precisa de attribute_refs())"""
+        self._holders.add(holder)
+
+    def remove_holder(self, holder):
+        self._holders.discard(holder)
+
+    def compact(self, live: Set[int]) -> int:
+        """
+        Libera os conjuntos fora de `live` e dos holders e, depois, os valores
+        internados (next-hop, AS-path, communities) que ficaram sem uso.
+        Só pode rodar quando nenhum índice recém-internado está a caminho da
+        RIB (fora de intern/set_key). Devolve quantos conjuntos foram liberados.
+        """
+        live = set(live)
+        for holder in list(self._holders):
+            live.update(holder.attribute_refs())
+        unused = set(range(len(self._next_hop))) - live - set(self._free)
+        columns = (self._next_hop, self._as_path, self._communities)
+        for index in unused:
+            row = (self._next_hop[index], self._as_path[index], self._communities[index],
+                   self._med[index], self._local_pref[index], self._origin[index])
+            del self._ids[_attribute_key(row)]
+            for column in columns:
+                column[index] = _NONE
+            self._free.append(index)
+        if unused:
+            for interner, column in zip((self.next_hops, self.as_paths, self.communities), columns):
+                interner.release_unused(set(column))
+        self.released += len(unused)
+        return len(unused)
+
+    def __len__(self) -> int:
+        return len(self._next_hop) - len(self._free)
+
+    def memory(self) -> int:
+        columns = (self._next_hop, self._as_path, self._communities, self._med, self._local_pref, self._origin)
+        return (
+            sum(c.buffer_info()[1] * c.itemsize for c in columns)
+            + sys.getsizeof(self._ids) + sum(sys.getsizeof(k) for k in self._ids)
+            + self.next_hops.memory() + self.as_paths.memory() + self.communities.memory()
+        )
+
+
+def _attribute_key(row: tuple) -> int:
+    # Chave inteira (~40 bytes) em vez de tupla ou bytes
+    return row[0] | row[1] << 24 | row[2] << 48 | row[3] << 72 | row[4] << 104 | row[5] << 136
+
+
+class PrefixTrie:
+    """
+    Árvore Patricia (binária, com compressão de caminho) em arrays. Cada nó
+    tem prefixo, tamanho, filhos esquerdo/direito e um valor inteiro (-1 em
+    nós de junção, que só existem para ramificar).
+    """
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        self.root = -1
+        self.count = 0  # Nós com valor
+        if bits == 32:
+            self._hi = None
+            self._lo = array("I")
+        else:
+            self._hi = array("Q")
+            self._lo = array("Q")
+        self._len = array("B")
+        self._left = array("i")
+        self._right = array("i")
+        self._value = array("i")
+        # Caminho da raiz até o último nó devolvido por node()
+        self._finger: List[int] = []
+
+    def _key(self, node: int) -> int:
+        if self._hi is None:
+            return self._lo[node]
+        return (self._hi[node] << 64) | self._lo[node]
+
+    def _new(self, key: int, plen: int, value: int) -> int:
+        if self._hi is None:
+            self._lo.append(key)
+        else:
+            self._hi.append(key >> 64)
+            self._lo.append(key & 0xFFFFFFFFFFFFFFFF)
+        self._len.append(plen)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._value.append(value)
+        if value != -1:
+            self.count += 1
+        return len(self._len) - 1
+
+    def _common(self, a: int, b: int, limit: int) -> int:
+        diff = a ^ b
+        if not diff:
+            return limit
+        return min(self.bits - diff.bit_length(), limit)
+
+    def _bit(self, key: int, position: int) -> int:
+        return (key >> (self.bits - 1 - position)) & 1
+
+    def _replace_child(self, parent: int, old: int, new: int):
+        if parent == -1:
+            self.root = new
+        elif self._left[parent] == old:
+            self._left[parent] = new
+        else:
+            self._right[parent] = new
+
+    def _set_child(self, node: int, bit: int, child: int):
+        if bit:
+            self._right[node] = child
+        else:
+            self._left[node] = child
+
+    def node(self, key: int, plen: int) -> int:
+        """Nó do prefixo exato (criado se não existir, com valor -1)"""
+        if self.root == -1:
+            self.root = self._new(key, plen, -1)
+            self._finger = [self.root]
+            return self.root
+        # Laço quente da carga: atributos e cálculo de bits em variáveis locais
+        bits, hi, lo, lengths, left, right = self.bits, self._hi, self._lo, self._len, self._left, self._right
+        # Recomeça do caminho da inserção anterior: com prefixos em ordem
+        # (saída do roteador, snapshots) quase não há descida a partir da raiz
+        path = self._finger
+        while path:
+            node = path[-1]
+            node_len = lengths[node]
+            if node_len <= plen and not (node_len and (key ^ (lo[node] if hi is None else (hi[node] << 64) | lo[node])) >> (bits - node_len)):
+                break
+            path.pop()
+        node = path.pop() if path else self.root
+        parent = path[-1] if path else -1
+        while True:
+            node_key = lo[node] if hi is None else (hi[node] << 64) | lo[node]
+            node_len = lengths[node]
+            limit = plen if plen < node_len else node_len
+            diff = (key ^ node_key) >> (bits - limit) if limit else 0
+            common = limit - diff.bit_length() if diff else limit
+            if common < node_len:
+                if common == plen:
+                    # O novo prefixo fica acima do nó atual
+                    new = self._new(key, plen, -1)
+                    self._set_child(new, (node_key >> (bits - 1 - plen)) & 1, node)
+                    self._replace_child(parent, node, new)
+                    path.append(new)
+                    return new
+                # Divergem antes do fim dos dois: nó de junção com ambos como filhos
+                mask = ((1 << bits) - 1) ^ ((1 << (bits - common)) - 1)
+                glue = self._new(key & mask, common, -1)
+                new = self._new(key, plen, -1)
+                self._set_child(glue, (node_key >> (bits - 1 - common)) & 1, node)
+                self._set_child(glue, (key >> (bits - 1 - common)) & 1, new)
+                self._replace_child(parent, node, glue)
+                path.append(glue)
+                path.append(new)
+                return new
+            path.append(node)
+            if plen == node_len:
+                return node
+            if (key >> (bits - 1 - node_len)) & 1:
+                child = right[node]
+                if child == -1:
+                    new = right[node] = self._new(key, plen, -1)
+                    path.append(new)
+                    return new
+            else:
+                child = left[node]
+                if child == -1:
+                    new = left[node] = self._new(key, plen, -1)
+                    path.append(new)
+                    return new
+            parent, node = node, child
+
+    def _path(self, key: int, plen: int) -> List[int]:
+        """Nós no caminho da raiz até o prefixo cujos prefixos o contêm (com ou sem valor)"""
+        bits, hi, lo, lengths, left, right = self.bits, self._hi, self._lo, self._len, self._left, self._right
+        found = []
+        node = self.root
+        while node != -1:
+            node_len = lengths[node]
+            if node_len > plen:
+                break
+            node_key = lo[node] if hi is None else (hi[node] << 64) | lo[node]
+            if node_len and (key ^ node_key) >> (bits - node_len):
+                break
+            found.append(node)
+            if node_len == plen:
+                break
+            node = right[node] if (key >> (bits - 1 - node_len)) & 1 else left[node]
+        return found
+
+    def find(self, key: int, plen: int) -> int:
+        """Nó do prefixo exato ou -1"""
+        path = self._path(key, plen)
+        return path[-1] if path and self._len[path[-1]] == plen else -1
+
+    def get_value(self, node: int) -> int:
+        return self._value[node]
+
+    def set_value(self, node: int, value: int):
+        old = self._value[node]
+        if old == -1 and value != -1:
+            self.count += 1
+        elif old != -1 and value == -1:
+            self.count -= 1
+        self._value[node] = value
+
+    def covering(self, key: int, plen: int) -> List[int]:
+        """Nós com valor que contêm o prefixo, do menos ao mais específico (o último é o LPM)"""
+        value = self._value
+        return [node for node in self._path(key, plen) if value[node] != -1]
+
+    def longest_match(self, key: int, plen: Optional[int] = None) -> int:
+        found = self.covering(key, self.bits if plen is None else plen)
+        return found[-1] if found else -1
+
+    def covered(self, key: int, plen: int, limit: Optional[int] = None) -> List[int]:
+        """Nós com valor contidos no prefixo (inclusive ele mesmo), em ordem de endereço"""
+        node = self.root
+        while node != -1:
+            node_len = self._len[node]
+            if self._common(key, self._key(node), min(plen, node_len)) < min(plen, node_len):
+                return []
+            if node_len >= plen:
+                break
+            node = self._right[node] if self._bit(key, node_len) else self._left[node]
+        found: List[int] = []
+        stack = [node] if node != -1 else []
+        while stack:
+            node = stack.pop()
+            if self._value[node] != -1:
+                found.append(node)
+                if limit is not None and len(found) >= limit:
+                    break
+            for child in (self._right[node], self._left[node]):
+                if child != -1:
+                    stack.append(child)
+        return found
+
+    def prefix_of(self, node: int) -> Tuple[int, int]:
+        return self._key(node), self._len[node]
+
+    def nodes(self) -> int:
+        return len(self._len)
+
+    def memory(self) -> int:
+        arrays = [self._lo, self._len, self._left, self._right, self._value]
+        if self._hi is not None:
+            arrays.append(self._hi)
+        return sum(a.buffer_info()[1] * a.itemsize for a in arrays)
+
+
+class RouterRIB:
+    """Caminhos conhecidos de um roteador: prefixo -> lista de (peer, atributos)"""
+
+    def __init__(self, router_id: int, attributes: AttributeStore, peers: Interner):
+        self.router_id = router_id
+        self.attributes = attributes
+        self.peers = peers
+        self.tries = {4: PrefixTrie(32), 6: PrefixTrie(128)}
+        # Caminhos em arrays; o valor do nó na árvore é o primeiro caminho do prefixo
+        self._attr = array("I")
+        self._peer = array("H")  # Até 65535 peers distintos (somando todos os roteadores)
+        self._next = array("i")
+        self._generation = array("B")  # Só importa diferir da carga atual: pode dar a volta
+        self._free: List[int] = []
+        self.paths = 0
+        # Por peer: momento da última carga/atualização, caminhos e geração da última carga completa
+        self.peer_updated: Dict[int, float] = {}
+        self._peer_paths: Dict[int, int] = {}
+        self._peer_generation: Dict[int, int] = {}
+
+    def _alloc(self, attr: int, peer: int, next_path: int, generation: int) -> int:
+        self.paths += 1
+        self._peer_paths[peer] = self._peer_paths.get(peer, 0) + 1
+        if self._free:
+            index = self._free.pop()
+            self._attr[index], self._peer[index], self._next[index], self._generation[index] = attr, peer, next_path, generation
+            return index
+        self._attr.append(attr)
+        self._peer.append(peer)
+        self._next.append(next_path)
+        self._generation.append(generation)
+        return len(self._attr) - 1
+
+    def _release(self, index: int):
+        self.paths -= 1
+        self._peer_paths[self._peer[index]] -= 1
+        self._next[index] = -1
+        self._attr[index] = _NONE  # Fora da marcação de atributos em uso
+        self._free.append(index)
+
+    def attribute_refs(self) -> Set[int]:
+        """Conjuntos de atributos usados pelos caminhos"""
+        refs = set(self._attr)
+        refs.discard(_NONE)
+        return refs
+
+    # Escrita --------------------------------------------------------------
+
+    def update(self, prefix: str, peer: str, attr: int):
+        """Grava (ou substitui) o caminho do peer para o prefixo"""
+        peer_id = self.peers.intern(peer)
+        self._set(prefix, peer_id, attr, self._peer_generation.get(peer_id, 0))
+        self.peer_updated[peer_id] = time.time()
+
+    def _set(self, prefix: str, peer_id: int, attr: int, generation: int) -> bool:
+        version, key, plen = parse_prefix(prefix)
+        return self.set_key(version, key, plen, peer_id, attr, generation)
+
+    def set_key(self, version: int, key: int, plen: int, peer_id: int, attr: int, generation: Optional[int] = None) -> bool:
+        """
+        Grava o caminho com o prefixo já em inteiro (coletores decodificam o
+        NLRI direto para inteiro). True se o caminho não existia.
+        """
+        if generation is None:
+            generation = self._peer_generation.get(peer_id, 0)
+        trie = self.tries[version]
+        node = trie.node(key, plen)
+        path = trie.get_value(node)
+        while path != -1:
+            if self._peer[path] == peer_id:
+                self._attr[path] = attr
+                self._generation[path] = generation
+                return False
+            path = self._next[path]
+        trie.set_value(node, self._alloc(attr, peer_id, trie.get_value(node), generation))
+        return True
+
+    def withdraw(self, prefix: str, peer: str) -> bool:
+        version, key, plen = parse_prefix(prefix)
+        peer_id = self.peers.get(peer)
+        if peer_id is None:
+            return False
+        self.peer_updated[peer_id] = time.time()
+        return self.withdraw_key(version, key, plen, peer_id)
+
+    def withdraw_key(self, version: int, key: int, plen: int, peer_id: int) -> bool:
+        trie = self.tries[version]
+        node = trie.find(key, plen)
+        if node == -1:
+            return False
+        return self._unlink(trie, node, lambda path: self._peer[path] == peer_id) > 0
+
+    def clear_peer(self, peer: str) -> int:
+        """Remove todos os caminhos do peer (sessão caiu ou deixou de ser monitorada)"""
+        peer_id = self.peers.get(peer)
+        before = self._peer_paths.get(peer_id, 0) if peer_id is not None else 0
+        if before:
+            self.load_peer(peer, ())
+        return before
+
+    def peer_path_count(self, peer_id: int) -> int:
+        return self._peer_paths.get(peer_id, 0)
+
+    def peer_routes(self, peer: str) -> Iterator[Tuple[str, int]]:
+        """(prefixo, atributos internados) de todos os caminhos do peer"""
+        peer_id = self.peers.get(peer)
+        if peer_id is None or not self._peer_paths.get(peer_id):
+            return
+        for version, trie in self.tries.items():
+            for node in range(trie.nodes()):
+                path = trie.get_value(node)
+                while path != -1:
+                    if self._peer[path] == peer_id:
+                        yield format_prefix(version, *trie.prefix_of(node)), self._attr[path]
+                        break
+                    path = self._next[path]
+
+    def _unlink(self, trie: PrefixTrie, node: int, remove) -> int:
+        removed = 0
+        previous, path = -1, trie.get_value(node)
+        while path != -1:
+            following = self._next[path]
+            if remove(path):
+                if previous == -1:
+                    trie.set_value(node, following)
+                else:
+                    self._next[previous] = following
+                self._release(path)
+                removed += 1
+            else:
+                previous = path
+            path = following
+        return removed
+
+    def load_peer(self, peer: str, routes: Iterable[Tuple[str, int]]) -> int:
+        """
+        Substitui todos os caminhos do peer pela tabela informada
+        ((prefixo, atributos internados)). Caminhos que não vieram são removidos.
+        """
+        peer_id = self.begin_load(peer)
+        generation = self._peer_generation[peer_id]
+        count = 0
+        for prefix, attr in routes:
+            self._set(prefix, peer_id, attr, generation)
+            count += 1
+        self.finish_load(peer_id, count)
+        return count
+
+    def begin_load(self, peer: str) -> int:
+        """
+        Inicia a carga de uma tabela completa do peer (em partes, via set_key);
+        finish_load remove o que não veio. Devolve o id do peer.
+        """
+        peer_id = self.peers.intern(peer)
+        self._peer_generation[peer_id] = (self._peer_generation.get(peer_id, 0) + 1) % 256
+        return peer_id
+
+    def finish_load(self, peer_id: int, count: int):
+        """`count`: prefixos gravados desde begin_load"""
+        generation = self._peer_generation.get(peer_id, 0)
+        if self._peer_paths.get(peer_id, 0) > count:
+            # Sobraram caminhos da carga anterior: varre a árvore removendo-os
+            stale = lambda path: self._peer[path] == peer_id and self._generation[path] != generation
+            for trie in self.tries.values():
+                for node in range(trie.nodes()):
+                    if trie.get_value(node) != -1:
+                        self._unlink(trie, node, stale)
+        self.peer_updated[peer_id] = time.time()
+
+    # Consultas -----------------------------------------------------------
+
+    def _paths(self, node: int, trie: PrefixTrie, max_age: Optional[float]) -> List[dict]:
+        now = time.time()
+        found = []
+        path = trie.get_value(node)
+        while path != -1:
+            peer_id = self._peer[path]
+            if max_age is None or now - self.peer_updated.get(peer_id, 0) <= max_age:
+                found.append(path)
+            path = self._next[path]
+        found.sort(key=lambda p: self.attributes.rank(self._attr[p]))
+        return [
+            {
+                "peer": self.peers.values[self._peer[p]],
+                "best": i == 0,
+                "age_seconds": round(now - self.peer_updated.get(self._peer[p], now), 1),
+                **self.attributes.get(self._attr[p]),
+            }
+            for i, p in enumerate(found)
+        ]
+
+    def _entry(self, version: int, trie: PrefixTrie, node: int, max_age: Optional[float]) -> Optional[dict]:
+        paths = self._paths(node, trie, max_age)
+        if not paths:
+            return None
+        return {"prefix": format_prefix(version, *trie.prefix_of(node)), "paths": paths}
+
+    def lookup(self, target: str, max_age: Optional[float] = None) -> Optional[dict]:
+        """Endereço: longest-prefix-match; prefixo: correspondência exata"""
+        version, key, plen = parse_prefix(target)
+        trie = self.tries[version]
+        if "/" in target:
+            node = trie.find(key, plen)
+            return self._entry(version, trie, node, max_age) if node != -1 else None
+        for node in reversed(trie.covering(key, plen)):
+            entry = self._entry(version, trie, node, max_age)
+            if entry:
+                return entry
+        return None
+
+    def covering(self, target: str, max_age: Optional[float] = None) -> List[dict]:
+        version, key, plen = parse_prefix(target)
+        trie = self.tries[version]
+        return [e for e in (self._entry(version, trie, n, max_age) for n in trie.covering(key, plen)) if e]
+
+    def covered(self, target: str, limit: int = 1000, max_age: Optional[float] = None) -> List[dict]:
+        version, key, plen = parse_prefix(target)
+        trie = self.tries[version]
+        entries = (self._entry(version, trie, n, max_age) for n in trie.covered(key, plen))
+        result = []
+        for entry in entries:
+            if entry:
+                result.append(entry)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def stats(self) -> dict:
+        arrays = (self._attr, self._peer, self._next, self._generation)
+        return {
+            "prefixes_v4": self.tries[4].count,
+            "prefixes_v6": self.tries[6].count,
+            "paths": self.paths,
+            "nodes": sum(t.nodes() for t in self.tries.values()),
+            "peers": {self.peers.values[p]: round(time.time() - ts, 1) for p, ts in self.peer_updated.items()},
+            "memory_bytes": sum(t.memory() for t in self.tries.values()) + sum(a.buffer_info()[1] * a.itemsize for a in arrays),
+        }
+
+
+class RIBStore:
+    """RIBs de todos os roteadores, com atributos e peers internados em comum"""
+
+    def __init__(self, max_age: Optional[float] = RIB_MAX_AGE):
+        self.max_age = max_age or None
+        self.attributes = AttributeStore()
+        self.peers = Interner()
+        self._ribs: Dict[int, RouterRIB] = {}
+        self._load_task: Optional[asyncio.Task] = None
+        self._compact_at = _COMPACT_MIN
+        self.compactions = 0
+        self.lookups = 0
+        self.hits = 0
+
+    def rib(self, router_id: int) -> RouterRIB:
+        rib = self._ribs.get(router_id)
+        if rib is None:
+            rib = self._ribs[router_id] = RouterRIB(router_id, self.attributes, self.peers)
+        return rib
+
+    def has_router(self, router_id: int) -> bool:
+        return router_id in self._ribs
+
+    def forget_router(self, router_id: int):
+        self._ribs.pop(router_id, None)
+
+    def intern(self, next_hop=None, as_path="", communities="", med=None, local_pref=None, origin=None) -> int:
+        return self.attributes.intern(next_hop, as_path, communities, med, local_pref, origin)
+
+    def update(self, router_id: int, peer: str, prefix: str, **attrs):
+        self.rib(router_id).update(prefix, peer, self.intern(**attrs))
+        self.maybe_compact()
+
+    def withdraw(self, router_id: int, peer: str, prefix: str) -> bool:
+        rib = self._ribs.get(router_id)
+        return rib.withdraw(prefix, peer) if rib else False
+
+    def maybe_compact(self):
+        """
+        Ponto seguro para compactar (nenhum índice interno a caminho da RIB):
+        compacta quando os conjuntos em uso dobram desde a última vez, o que
+        mantém o custo amortizado constante por conjunto internado
+        """
+        if len(self.attributes) > self._compact_at:
+            self.compact()
+
+    def compact(self) -> int:
+        started = time.perf_counter()
+        live: Set[int] = set()
+        for rib in self._ribs.values():
+            live |= rib.attribute_refs()
+        released = self.attributes.compact(live)
+        self._compact_at = max(2 * len(self.attributes), _COMPACT_MIN)
+        self.compactions += 1
+        logger.info(
+            f"RIB: {released} conjuntos de atributos liberados, {len(self.attributes)} em uso "
+            f"({time.perf_counter() - started:.2f}s)"
+        )
+        return released
+
+    def load_peer_table(self, router_id: int, peer: str, table: Dict[str, tuple]) -> int:
+        """
+        Carrega uma tabela no formato dos snapshots
+        (prefixo -> (next_hop, med, local_pref, pref_val, as_path, origin)).
+        """
+        intern = self.attributes.intern
+        routes = (
+            (prefix, intern(next_hop, as_path, "", med, local_pref, origin))
+            for prefix, (next_hop, med, local_pref, _pref_val, as_path, origin) in table.items()
+        )
+        count = self.rib(router_id).load_peer(peer, routes)
+        self.maybe_compact()
+        return count
+
+    def lookup(self, router_id: int, target: str) -> Optional[dict]:
+        """Rota para o destino a partir da memória; None se não houver dado recente"""
+        self.lookups += 1
+        rib = self._ribs.get(router_id)
+        if rib is None:
+            return None
+        entry = rib.lookup(target, self.max_age)
+        if entry:
+            self.hits += 1
+        return entry
+
+    # Carga a partir dos snapshots -----------------------------------------
+
+    def start(self):
+        """Carrega, em segundo plano, o último snapshot de rotas recebidas de cada peering"""
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.get_running_loop().create_task(self._load_snapshots())
+
+    async def _load_snapshots(self):
+        from sqlalchemy import func
+        from sqlalchemy.future import select
+        from app.core.config import SessionLocal
+        from app.models.peering import Peering
+        from app.models.route_snapshot import RouteSnapshot
+        from app.services.route_snapshots import route_snapshots
+
+        start = time.perf_counter()
+        loaded = 0
+        try:
+            async with SessionLocal() as db:
+                latest = (
+                    select(func.max(RouteSnapshot.id))
+                    .where(RouteSnapshot.direction == "received")
+                    .group_by(RouteSnapshot.peering_id)
+                )
+                rows = (await db.execute(
+                    select(RouteSnapshot, Peering.router_id, Peering.ip)
+                    .join(Peering, Peering.id == RouteSnapshot.peering_id)
+                    .where(RouteSnapshot.id.in_(latest), Peering.is_active == True)
+                )).all()
+                for snapshot, router_id, peer_ip in rows:
+                    table = await route_snapshots.table_at(db, snapshot)
+                    self.load_peer_table(router_id, peer_ip, table)
+                    # A idade vale a partir da captura, não da carga
+                    rib = self.rib(router_id)
+                    rib.peer_updated[self.peers.intern(peer_ip)] = snapshot.taken_at.replace(tzinfo=timezone.utc).timestamp()
+                    loaded += 1
+                    await asyncio.sleep(0)
+        except Exception as e:
+            logger.error(f"RIB: erro ao carregar snapshots: {e}")
+        logger.info(f"RIB: {loaded} tabelas carregadas dos snapshots em {time.perf_counter() - start:.1f}s")
+
+    def stats(self) -> dict:
+        routers = {str(router_id): rib.stats() for router_id, rib in self._ribs.items()}
+        return {
+            "enabled": RIB_ENABLED,
+            "max_age": self.max_age,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "attribute_sets": len(self.attributes),
+            "attribute_sets_released": self.attributes.released,
+            "compactions": self.compactions,
+            "as_paths": len(self.attributes.as_paths),
+            "next_hops": len(self.attributes.next_hops),
+            "attributes_memory_bytes": self.attributes.memory(),
+            "memory_bytes": self.attributes.memory() + sum(r["memory_bytes"] for r in routers.values()),
+            "routers": routers,
+        }
+
+
+# Instância global das RIBs em memória
+rib_store = RIBStore()
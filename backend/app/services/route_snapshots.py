@@ -0,0 +1,520 @@
+"""
+Snapshots versionados das rotas de cada peering
+
+Captura as rotas anunciadas ao peer (ou recebidas dele) e grava só a diferença
+para o snapshot anterior: rotas novas ou com atributos alterados e prefixos
+retirados, em JSON comprimido. De tempos em tempos o snapshot também guarda a
+tabela completa (keyframe) — quando as diferenças acumuladas desde o último
+keyframe passam de ROUTE_SNAPSHOT_KEYFRAME_RATIO vezes o tamanho da tabela.
+Assim o espaço cresce com a quantidade de mudanças, não com o número de
+capturas, e reconstruir qualquer snapshot custa no máximo um keyframe e
+algumas diferenças.
+
+A comparação entre dois snapshots reconstrói só o mais antigo e aplica as
+diferenças seguintes, acompanhando os prefixos tocados: o custo extra é
+proporcional às mudanças no período.
+"""
+import asyncio
+import ipaddress
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.core.config import (
+    SessionLocal,
+    ROUTE_SNAPSHOT_ENABLED,
+    ROUTE_SNAPSHOT_INTERVAL,
+    ROUTE_SNAPSHOT_DIRECTIONS,
+    ROUTE_SNAPSHOT_MAX_CONCURRENT,
+    ROUTE_SNAPSHOT_KEYFRAME_RATIO,
+    ROUTE_SNAPSHOT_RETENTION_DAYS,
+    RIB_ENABLED,
+)
+from app.models.peering import Peering
+from app.models.router import Router
+from app.models.route_snapshot import RouteSnapshot
+from app.services.bgp_routes import BGPRoute, DIRECTIONS, iter_peer_routes
+from app.services.rib import rib_store
+from app.services.ssh_scheduler import Priority
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Atributos guardados por rota, na ordem das tuplas da tabela
+ATTR_FIELDS = ("next_hop", "med", "local_pref", "pref_val", "as_path", "origin")
+
+# prefixo -> (next_hop, med, local_pref, pref_val, as_path, origin)
+RouteTable = Dict[str, tuple]
+_PREF_VAL = ATTR_FIELDS.index("pref_val")
+
+# Primeira chave dos advisory locks da cadeia (somada ao índice da direção); a segunda é o peering
+_CHAIN_LOCK_BASE = 0x52530000
+
+
+class RouteSnapshotError(Exception):
+    """O roteador não devolveu a tabela (peer inexistente, comando recusado)"""
+
+
+def _pack(data) -> bytes:
+    return zlib.compress(json.dumps(data, separators=(",", ":")).encode(), 6)
+
+
+def _unpack(blob: bytes):
+    return json.loads(zlib.decompress(blob))
+
+
+def _attrs(route: BGPRoute) -> tuple:
+    return (route.next_hop, route.med, route.local_pref, route.pref_val, route.as_path, route.origin)
+
+
+def encode_table(table: RouteTable) -> bytes:
+    return _pack([[prefix, *attrs] for prefix, attrs in table.items()])
+
+
+def decode_table(blob: bytes) -> RouteTable:
+    return {row[0]: tuple(row[1:]) for row in _unpack(blob)}
+
+
+def fill_pref_val(table: RouteTable, previous: Optional[RouteTable]) -> RouteTable:
+    """
+    PrefVal é local ao roteador e não vem no MRT (nem em toda saída do VRP):
+    rota sem o valor herda o da tabela anterior, ou o padrão 0 do VRP, para
+    que capturas SSH e importações MRT na mesma cadeia não difiram só nele
+    """
+    if all(attrs[_PREF_VAL] is not None for attrs in table.values()):
+        return table
+    previous = previous or {}
+    filled = {}
+    for prefix, attrs in table.items():
+        if attrs[_PREF_VAL] is None:
+            known = previous.get(prefix)
+            value = known[_PREF_VAL] if known and known[_PREF_VAL] is not None else 0
+            attrs = attrs[:_PREF_VAL] + (value,) + attrs[_PREF_VAL + 1:]
+        filled[prefix] = attrs
+    return filled
+
+
+def compute_delta(old: RouteTable, new: RouteTable) -> Tuple[bytes, int, int, int]:
+    """(delta comprimido, adicionadas, retiradas, alteradas) de old para new"""
+    rows = []
+    added = changed = 0
+    for prefix, attrs in new.items():
+        before = old.get(prefix)
+        if before == attrs:
+            continue
+        if before is None:
+            added += 1
+        else:
+            changed += 1
+        rows.append([prefix, *attrs])
+    withdrawn = [prefix for prefix in old if prefix not in new]
+    return _pack({"set": rows, "del": withdrawn}), added, len(withdrawn), changed
+
+
+def apply_delta(table: RouteTable, blob: bytes, touched: Optional[Dict[str, Optional[tuple]]] = None):
+    """Aplica um delta na tabela; em touched guarda o valor anterior de cada prefixo alterado"""
+    data = _unpack(blob)
+    for row in data["set"]:
+        prefix = row[0]
+        if touched is not None and prefix not in touched:
+            touched[prefix] = table.get(prefix)
+        table[prefix] = tuple(row[1:])
+    for prefix in data["del"]:
+        if touched is not None and prefix not in touched:
+            touched[prefix] = table.get(prefix)
+        table.pop(prefix, None)
+
+
+def prefix_key(prefix: str):
+    network = ipaddress.ip_network(prefix, strict=False)
+    return network.version, int(network.network_address), network.prefixlen
+
+
+def route_dict(prefix: str, attrs: tuple) -> dict:
+    return {"prefix": prefix, **dict(zip(ATTR_FIELDS, attrs))}
+
+
+def snapshot_dict(snapshot: RouteSnapshot) -> dict:
+    return {
+        "id": snapshot.id,
+        "peering_id": snapshot.peering_id,
+        "direction": snapshot.direction,
+        "taken_at": snapshot.taken_at.isoformat() + "Z",
+        "trigger": snapshot.trigger,
+        "source_time": snapshot.source_time.isoformat() + "Z" if snapshot.source_time else None,
+        "route_count": snapshot.route_count,
+        "added": snapshot.added,
+        "withdrawn": snapshot.withdrawn,
+        "changed": snapshot.changed,
+        "keyframe": snapshot.keyframe is not None,
+    }
+
+
+class RouteSnapshotService:
+    def __init__(
+        self,
+        interval: float = ROUTE_SNAPSHOT_INTERVAL,
+        max_concurrent: int = ROUTE_SNAPSHOT_MAX_CONCURRENT,
+        keyframe_ratio: float = ROUTE_SNAPSHOT_KEYFRAME_RATIO,
+    ):
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self.keyframe_ratio = keyframe_ratio
+        self.directions = [d for d in ROUTE_SNAPSHOT_DIRECTIONS if d in DIRECTIONS]
+        # Uma captura por vez para cada (peering, direção): o delta depende do anterior
+        self._locks: Dict[Tuple[int, str], asyncio.Lock] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._last_prune: Optional[datetime] = None
+        self.captures = 0
+        self.failures = 0
+        self.bytes_written = 0
+        self.last_cycle_at: Optional[datetime] = None
+
+    # Ciclo de vida -------------------------------------------------------
+
+    def start(self):
+        if self._task is not None and not self._task.done():
+            return
+        self._stop = asyncio.Event()
+        self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Snapshots de rotas iniciados (intervalo {self.interval}s, tabelas: {', '.join(self.directions)})")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._stop.set()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _sleep(self, seconds: float) -> bool:
+        """Dorme até o tempo pedido ou até stop(); True se deve encerrar"""
+        if seconds > 0:
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=seconds)
+            except asyncio.TimeoutError:
+                pass
+        return self._stop.is_set()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while not self._stop.is_set():
+            cycle_start = loop.time()
+            try:
+                async with SessionLocal() as db:
+                    pairs = (await db.execute(
+                        select(Peering, Router)
+                        .join(Router, Peering.router_id == Router.id)
+                        .where(Peering.is_active == True, Router.is_active == True)
+                        .order_by(Peering.id)
+                    )).all()
+            except Exception as e:
+                logger.error(f"Snapshots de rotas: erro ao carregar peerings: {e}")
+                pairs = []
+            # Espalha as capturas ao longo do intervalo, como o coletor BGP
+            step = self.interval / len(pairs) if pairs else 0
+            tasks: List[asyncio.Task] = []
+            for i, (peering, router) in enumerate(pairs):
+                if await self._sleep(cycle_start + i * step - loop.time()):
+                    break
+                tasks.append(loop.create_task(self._capture_scheduled(peering, router)))
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+            await self.prune()
+            self.last_cycle_at = datetime.now()
+            if await self._sleep(cycle_start + self.interval - loop.time()):
+                break
+
+    async def _capture_scheduled(self, peering: Peering, router: Router):
+        async with self._semaphore:
+            for direction in self.directions:
+                try:
+                    await self.capture(peering, router, direction, trigger="scheduled", priority=Priority.BACKGROUND)
+                except Exception as e:
+                    logger.warning(f"Snapshot de rotas ({direction}) do peering {peering.name} falhou: {e}")
+
+    # Captura -------------------------------------------------------------
+
+    async def fetch_table(self, peering: Peering, router: Router, direction: str, priority: Priority = Priority.INTERACTIVE) -> RouteTable:
+        version = 6 if peering.type == "IPv6" or ":" in peering.ip else 4
+        table: RouteTable = {}
+        stats: dict = {}
+        async for item in iter_peer_routes(router, peering.ip, version, direction=direction, priority=priority):
+            if isinstance(item, dict):
+                stats = item
+            else:
+                table[item.prefix] = _attrs(item)
+        if stats.get("error"):
+            raise RouteSnapshotError(stats["error"])
+        return table
+
+    async def capture(
+        self,
+        peering: Peering,
+        router: Router,
+        direction: str,
+        trigger: str = "manual",
+        priority: Priority = Priority.INTERACTIVE,
+    ) -> RouteSnapshot:
+        """Lê a tabela atual do roteador e grava o snapshot como diferença do anterior"""
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Direção inválida: {direction}")
+        try:
+            table = await self.fetch_table(peering, router, direction, priority)
+        except Exception:
+            self.failures += 1
+            raise
+        return await self.store_table(peering, router.id, direction, table, trigger)
+
+    async def store_table(
+        self,
+        peering: Peering,
+        router_id: int,
+        direction: str,
+        table: RouteTable,
+        trigger: str,
+        load_rib: bool = True,
+        source_time: Optional[datetime] = None,
+    ) -> RouteSnapshot:
+        """
+        Grava uma tabela já obtida (SSH, importação MRT...) como diferença do
+        snapshot anterior. taken_at é sempre o horário da gravação: a cadeia de
+        diferenças e a limpeza seguem a ordem dos ids, e um horário antigo (de
+        um dump MRT, por exemplo) faria a limpeza apagar snapshots mais novos.
+        O horário de origem da tabela fica em source_time.
+        """
+        lock = self._locks.setdefault((peering.id, direction), asyncio.Lock())
+        async with lock:
+            async with SessionLocal() as db:
+                await self._lock_chain(db, peering.id, direction)
+                previous, churn = await self._latest_table(db, peering.id, direction)
+                table = fill_pref_val(table, previous)
+                if previous is None:
+                    delta, added, withdrawn, changed = compute_delta({}, table)
+                    keyframe = encode_table(table)
+                else:
+                    delta, added, withdrawn, changed = compute_delta(previous, table)
+                    churn += added + withdrawn + changed
+                    # Reconstruir passaria a custar mais que ler uma cópia completa
+                    keyframe = encode_table(table) if churn > self.keyframe_ratio * max(len(table), 1) else None
+                snapshot = RouteSnapshot(
+                    peering_id=peering.id,
+                    direction=direction,
+                    taken_at=datetime.utcnow(),
+                    trigger=trigger,
+                    source_time=source_time,
+                    route_count=len(table),
+                    added=added,
+                    withdrawn=withdrawn,
+                    changed=changed,
+                    delta=delta,
+                    keyframe=keyframe,
+                )
+                db.add(snapshot)
+                await db.commit()
+                await db.refresh(snapshot)
+            self.captures += 1
+            self.bytes_written += len(delta) + (len(keyframe) if keyframe else 0)
+            if direction == "received" and RIB_ENABLED and load_rib:
+                # Mantém a RIB em memória do roteador com a tabela recém-lida
+                rib_store.load_peer_table(router_id, peering.ip, table)
+            return snapshot
+
+    async def _lock_chain(self, db: AsyncSession, peering_id: int, direction: str):
+        """
+        Serializa a cadeia (peering, direção) entre workers até o fim da
+        transação: dois deltas calculados sobre o mesmo anterior deixariam
+        prefixos retirados na tabela reconstruída. O asyncio.Lock só vale
+        dentro do processo.
+        """
+        if db.bind.dialect.name == "postgresql":
+            await db.execute(
+                text("SELECT pg_advisory_xact_lock(:chain, :peering_id)"),
+                {"chain": _CHAIN_LOCK_BASE + DIRECTIONS.index(direction), "peering_id": peering_id},
+            )
+
+    async def _latest_table(self, db: AsyncSession, peering_id: int, direction: str) -> Tuple[Optional[RouteTable], int]:
+        """Tabela do último snapshot e as mudanças acumuladas desde o último keyframe"""
+        base = (await db.execute(
+            select(RouteSnapshot.id, RouteSnapshot.keyframe)
+            .where(
+                RouteSnapshot.peering_id == peering_id,
+                RouteSnapshot.direction == direction,
+                RouteSnapshot.keyframe.isnot(None),
+            )
+            .order_by(RouteSnapshot.id.desc())
+            .limit(1)
+        )).first()
+        if base is None:
+            return None, 0
+        table = decode_table(base.keyframe)
+        churn = 0
+        rows = await db.stream(
+            select(RouteSnapshot.delta, RouteSnapshot.added, RouteSnapshot.withdrawn, RouteSnapshot.changed)
+            .where(
+                RouteSnapshot.peering_id == peering_id,
+                RouteSnapshot.direction == direction,
+                RouteSnapshot.id > base.id,
+            )
+            .order_by(RouteSnapshot.id)
+        )
+        async for row in rows:
+            apply_delta(table, row.delta)
+            churn += row.added + row.withdrawn + row.changed
+        return table, churn
+
+    # Consultas -----------------------------------------------------------
+
+    async def table_at(self, db: AsyncSession, snapshot: RouteSnapshot) -> RouteTable:
+        """Reconstrói a tabela do snapshot: keyframe anterior mais as diferenças até ele"""
+        if snapshot.keyframe is not None:
+            return decode_table(snapshot.keyframe)
+        base = (await db.execute(
+            select(RouteSnapshot.id, RouteSnapshot.keyframe)
+            .where(
+                RouteSnapshot.peering_id == snapshot.peering_id,
+                RouteSnapshot.direction == snapshot.direction,
+                RouteSnapshot.keyframe.isnot(None),
+                RouteSnapshot.id < snapshot.id,
+            )
+            .order_by(RouteSnapshot.id.desc())
+            .limit(1)
+        )).first()
+        if base is None:
+            # Não deveria acontecer: o primeiro snapshot e a consolidação sempre gravam keyframe
+            raise RouteSnapshotError(f"Snapshot {snapshot.id} sem keyframe anterior")
+        table = decode_table(base.keyframe)
+        await self._apply_range(db, snapshot.peering_id, snapshot.direction, base.id, snapshot.id, table)
+        return table
+
+    async def _apply_range(
+        self,
+        db: AsyncSession,
+        peering_id: int,
+        direction: str,
+        after_id: int,
+        until_id: int,
+        table: RouteTable,
+        touched: Optional[Dict[str, Optional[tuple]]] = None,
+    ):
+        rows = await db.stream(
+            select(RouteSnapshot.delta)
+            .where(
+                RouteSnapshot.peering_id == peering_id,
+                RouteSnapshot.direction == direction,
+                RouteSnapshot.id > after_id,
+                RouteSnapshot.id <= until_id,
+            )
+            .order_by(RouteSnapshot.id)
+        )
+        async for row in rows:
+            apply_delta(table, row.delta, touched)
+
+    async def diff(self, db: AsyncSession, older: RouteSnapshot, newer: RouteSnapshot, limit: Optional[int] = None) -> dict:
+        """
+        Diferenças de `older` para `newer` (mesmo peering e direção): prefixos
+        adicionados, retirados e com atributos alterados. Se `older` for o mais
+        recente, o resultado é invertido (o que mudaria voltando no tempo).
+        """
+        if older.peering_id != newer.peering_id or older.direction != newer.direction:
+            raise ValueError("Snapshots de peerings ou direções diferentes")
+        reverse = older.id > newer.id
+        first, last = (newer, older) if reverse else (older, newer)
+        table = await self.table_at(db, first)
+        touched: Dict[str, Optional[tuple]] = {}
+        await self._apply_range(db, first.peering_id, first.direction, first.id, last.id, table, touched)
+
+        added: List[dict] = []
+        withdrawn: List[dict] = []
+        changed: List[dict] = []
+        for prefix in sorted(touched, key=prefix_key):
+            before, after = touched[prefix], table.get(prefix)
+            if reverse:
+                before, after = after, before
+            if before == after:
+                continue
+            if before is None:
+                added.append(route_dict(prefix, after))
+            elif after is None:
+                withdrawn.append(route_dict(prefix, before))
+            else:
+                changed.append({
+                    "prefix": prefix,
+                    "fields": [name for name, a, b in zip(ATTR_FIELDS, before, after) if a != b],
+                    "before": dict(zip(ATTR_FIELDS, before)),
+                    "after": dict(zip(ATTR_FIELDS, after)),
+                })
+        counts = {"added": len(added), "withdrawn": len(withdrawn), "changed": len(changed)}
+        truncated = limit is not None and any(n > limit for n in counts.values())
+        if limit is not None:
+            added, withdrawn, changed = added[:limit], withdrawn[:limit], changed[:limit]
+        return {
+            "from": snapshot_dict(older),
+            "to": snapshot_dict(newer),
+            "summary": counts,
+            "truncated": truncated,
+            "added": added,
+            "withdrawn": withdrawn,
+            "changed": changed,
+        }
+
+    # Retenção ------------------------------------------------------------
+
+    async def prune(self, force: bool = False):
+        """
+        Remove snapshots além da retenção. O mais novo entre os antigos fica
+        como base consolidada (keyframe), para que os seguintes continuem
+        reconstruíveis e "desde X" tenha ponto de partida.
+        """
+        now = datetime.utcnow()
+        if not force and self._last_prune and now - self._last_prune < timedelta(hours=1):
+            return
+        self._last_prune = now
+        cutoff = now - timedelta(days=ROUTE_SNAPSHOT_RETENTION_DAYS)
+        try:
+            async with SessionLocal() as db:
+                bases = (await db.execute(
+                    select(RouteSnapshot.peering_id, RouteSnapshot.direction, func.max(RouteSnapshot.id))
+                    .where(RouteSnapshot.taken_at < cutoff)
+                    .group_by(RouteSnapshot.peering_id, RouteSnapshot.direction)
+                )).all()
+                for peering_id, direction, base_id in bases:
+                    await self._lock_chain(db, peering_id, direction)
+                    base = await db.get(RouteSnapshot, base_id)
+                    if base.keyframe is None:
+                        base.keyframe = encode_table(await self.table_at(db, base))
+                    await db.execute(delete(RouteSnapshot).where(
+                        RouteSnapshot.peering_id == peering_id,
+                        RouteSnapshot.direction == direction,
+                        RouteSnapshot.id < base_id,
+                    ))
+                    await db.commit()
+        except Exception as e:
+            logger.error(f"Snapshots de rotas: erro na limpeza: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": ROUTE_SNAPSHOT_ENABLED,
+            "running": self._task is not None and not self._task.done(),
+            "interval": self.interval,
+            "directions": self.directions,
+            "captures": self.captures,
+            "failures": self.failures,
+            "bytes_written": self.bytes_written,
+            "last_cycle_at": self.last_cycle_at.isoformat() if self.last_cycle_at else None,
+        }
+
+
+# Instância global dos snapshots de rotas
+route_snapshots = RouteSnapshotService()
@@ -0,0 +1,273 @@
+"""
+Saúde dos roteadores (circuit breaker)
+
+Classifica os erros SSH de cada roteador e, após falhas seguidas de conexão,
+abre o circuito: novas requisições falham na hora (sem esperar timeouts de
+connect/exec) enquanto um teste TCP em segundo plano verifica a volta do
+equipamento. Com o teste ok o circuito fica meio-aberto e uma única
+requisição de prova decide se ele fecha ou abre de novo.
+"""
+import asyncio
+import socket
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from enum import Enum
+from typing import Dict, Optional, Tuple, Union
+
+import paramiko
+
+from app.core.config import (
+    ROUTER_BREAKER_FAILURE_THRESHOLD,
+    ROUTER_BREAKER_OPEN_SECONDS,
+    ROUTER_BREAKER_MAX_OPEN_SECONDS,
+    ROUTER_PROBE_TIMEOUT,
+)
+from app.services.ssh_pool import SSHPoolExhausted, RouterCredentials
+from app.services.ssh_shell import ShellTimeout, ShellCancelled
+import logging
+
+logger = logging.getLogger(__name__)
+
+RouterKey = Union[int, Tuple[str, int]]
+
+
+class CircuitState(str, Enum):
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class ErrorKind(str, Enum):
+    UNREACHABLE = "unreachable"  # TCP/transporte SSH falhou
+    AUTH = "auth"                # Usuário/senha recusados
+    TIMEOUT = "timeout"          # Comando não terminou a tempo
+    BUSY = "busy"                # Sem VTY/sessão livre
+    ERROR = "error"              # Qualquer outro erro
+
+
+# Tipos de erro que contam para abrir o circuito
+BREAKER_ERRORS = {ErrorKind.UNREACHABLE, ErrorKind.AUTH}
+
+
+class RouterUnavailable(Exception):
+    """Roteador marcado como indisponível: a requisição falhou sem tentar SSH"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def classify_error(exc: BaseException, transport_alive: bool = False) -> Optional[ErrorKind]:
+    """Classifica uma exceção SSH; None para cancelamentos (não são erro do roteador)"""
+    if isinstance(exc, (ShellCancelled, asyncio.CancelledError)):
+        return None
+    if isinstance(exc, paramiko.AuthenticationException):
+        return ErrorKind.AUTH
+    if isinstance(exc, (paramiko.ChannelException, SSHPoolExhausted)):
+        return ErrorKind.BUSY
+    if isinstance(exc, ShellTimeout):
+        return ErrorKind.TIMEOUT
+    if isinstance(exc, (socket.timeout, TimeoutError)):
+        # Timeout com o transporte vivo é comando lento, não roteador fora
+        return ErrorKind.TIMEOUT if transport_alive else ErrorKind.UNREACHABLE
+    if isinstance(exc, (paramiko.SSHException, EOFError, OSError)):
+        return ErrorKind.UNREACHABLE
+    return ErrorKind.ERROR
+
+
+@dataclass
+class RouterHealth:
+    hostname: str
+    port: int
+    state: CircuitState = CircuitState.CLOSED
+    consecutive_failures: int = 0
+    last_error: Optional[str] = None
+    last_error_kind: Optional[ErrorKind] = None
+    last_failure_at: Optional[datetime] = None
+    last_success_at: Optional[datetime] = None
+    opened_until: float = 0.0
+    open_count: int = 0
+    trial_in_flight: bool = False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.opened_until - time.monotonic())
+
+    def to_dict(self) -> dict:
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "last_error": self.last_error,
+            "last_error_kind": self.last_error_kind.value if self.last_error_kind else None,
+            "last_failure_at": self.last_failure_at,
+            "last_success_at": self.last_success_at,
+            "retry_after": round(self.retry_after(), 1) if self.state == CircuitState.OPEN else None,
+        }
+
+
+class RouterHealthService:
+    """Estado de saúde por roteador; usado pelo ssh_executor antes e depois de cada operação"""
+
+    def __init__(
+        self,
+        failure_threshold: int = ROUTER_BREAKER_FAILURE_THRESHOLD,
+        open_seconds: float = ROUTER_BREAKER_OPEN_SECONDS,
+        max_open_seconds: float = ROUTER_BREAKER_MAX_OPEN_SECONDS,
+        probe_timeout: float = ROUTER_PROBE_TIMEOUT,
+    ):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.probe_timeout = probe_timeout
+        self._health: Dict[RouterKey, RouterHealth] = {}
+        self._probes: Dict[RouterKey, asyncio.Task] = {}
+
+    def _get(self, credentials: RouterCredentials) -> RouterHealth:
+        health = self._health.get(credentials.key)
+        if health is None or (health.hostname, health.port) != (credentials.hostname, credentials.port):
+            # Roteador novo ou endereço alterado: começa do zero
+            health = RouterHealth(hostname=credentials.hostname, port=credentials.port)
+            self._health[credentials.key] = health
+        return health
+
+    def status(self, router_id: int) -> Optional[dict]:
+        """Saúde conhecida do roteador (None se ainda não houve nenhuma operação)"""
+        health = self._health.get(router_id)
+        return health.to_dict() if health is not None else None
+
+    def is_available(self, router_id: int) -> bool:
+        health = self._health.get(router_id)
+        return health is None or health.state != CircuitState.OPEN
+
+    def before_request(self, credentials: RouterCredentials):
+        """Falha imediatamente se o circuito estiver aberto; no meio-aberto deixa passar uma prova"""
+        health = self._get(credentials)
+        if health.state == CircuitState.CLOSED:
+            return
+        if health.state == CircuitState.OPEN and health.retry_after() > 0:
+            raise RouterUnavailable(
+                f"Roteador {credentials.hostname} indisponível ({health.last_error}); "
+                f"nova tentativa em {health.retry_after():.0f}s",
+                health.retry_after(),
+            )
+        if health.trial_in_flight:
+            raise RouterUnavailable(
+                f"Roteador {credentials.hostname} em verificação após falhas; tente novamente em instantes",
+                1.0,
+            )
+        health.state = CircuitState.HALF_OPEN
+        health.trial_in_flight = True
+
+    def record_success(self, credentials: RouterCredentials):
+        health = self._get(credentials)
+        if health.state != CircuitState.CLOSED:
+            logger.info(f"Roteador {credentials.hostname} respondeu novamente, fechando o circuito")
+        health.state = CircuitState.CLOSED
+        health.consecutive_failures = 0
+        health.open_count = 0
+        health.trial_in_flight = False
+        health.last_success_at = datetime.now()
+        self._cancel_probe(credentials.key)
+
+    def record_failure(self, credentials: RouterCredentials, exc: BaseException, transport_alive: bool = False) -> Optional[ErrorKind]:
+        health = self._get(credentials)
+        kind = classify_error(exc, transport_alive)
+        health.trial_in_flight = False
+        if kind is None:
+            return None
+        health.last_error = str(exc) or exc.__class__.__name__
+        health.last_error_kind = kind
+        health.last_failure_at = datetime.now()
+        if kind not in BREAKER_ERRORS:
+            # Roteador respondeu (ocupado ou lento): não é sinal de queda
+            return kind
+        health.consecutive_failures += 1
+        if health.state == CircuitState.HALF_OPEN or health.consecutive_failures >= self.failure_threshold:
+            self._open(credentials, health)
+        return kind
+
+    def release(self, credentials: RouterCredentials):
+        """Operação terminou sem resultado (cancelada): libera a vaga de prova"""
+        self._get(credentials).trial_in_flight = False
+
+    def _extend_open(self, health: RouterHealth) -> float:
+        """Abre (ou mantém aberto) o circuito com backoff exponencial"""
+        duration = min(self.open_seconds * (2 ** health.open_count), self.max_open_seconds)
+        health.open_count += 1
+        health.state = CircuitState.OPEN
+        health.opened_until = time.monotonic() + duration
+        return duration
+
+    def _open(self, credentials: RouterCredentials, health: RouterHealth):
+        duration = self._extend_open(health)
+        logger.warning(
+            f"Circuito aberto para {credentials.hostname} por {duration:g}s após "
+            f"{health.consecutive_failures} falha(s): {health.last_error}"
+        )
+        self._start_probe(credentials)
+
+    def _start_probe(self, credentials: RouterCredentials):
+        task = self._probes.get(credentials.key)
+        if task is not None and not task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # Fora do event loop: a recuperação fica por conta do tempo de abertura
+            return
+        self._probes[credentials.key] = loop.create_task(self._probe_loop(credentials))
+
+    def _cancel_probe(self, key: RouterKey):
+        task = self._probes.pop(key, None)
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+
+    async def _probe_loop(self, credentials: RouterCredentials):
+        """Testa a porta SSH em segundo plano enquanto o circuito estiver aberto"""
+        try:
+            while True:
+                health = self._get(credentials)
+                if health.state != CircuitState.OPEN:
+                    return
+                await asyncio.sleep(health.retry_after())
+                if health.state != CircuitState.OPEN:
+                    return
+                if await self._tcp_probe(credentials):
+                    logger.info(f"Porta SSH de {credentials.hostname} respondeu, circuito meio-aberto")
+                    health.state = CircuitState.HALF_OPEN
+                    return
+                # Ainda fora: mantém aberto com backoff
+                self._extend_open(health)
+        finally:
+            if self._probes.get(credentials.key) is asyncio.current_task():
+                del self._probes[credentials.key]
+
+    async def _tcp_probe(self, credentials: RouterCredentials) -> bool:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(credentials.hostname, credentials.port),
+                timeout=self.probe_timeout,
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+    def shutdown(self):
+        for task in self._probes.values():
+            task.cancel()
+        self._probes.clear()
+
+    def stats(self) -> dict:
+        return {
+            str(key): {"router": health.hostname, **health.to_dict()}
+            for key, health in self._health.items()
+        }
+
+
+# Instância global do serviço de saúde
+router_health = RouterHealthService()
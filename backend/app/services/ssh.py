@@ -1,26 +1,75 @@
-import paramiko
-import base64
+import asyncio
+import threading
+from typing import AsyncIterator, List, Optional, Tuple
+
 from app.models.router import Router
+from app.services.ssh_pool import ssh_pool, RouterLike
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import InteractiveShell, ResultCallback
 
 def run_ssh_command(router: Router, command: str) -> str:
-    # Decodificar senha
-    try:
-        password = base64.b64decode(router.ssh_password.encode()).decode()
-    except:
-        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
-        password = router.ssh_password
-    
-    ssh = paramiko.SSHClient()
-    ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-    ssh.connect(
-        hostname=router.ip,
-        port=router.ssh_port,
-        username=router.ssh_user,
-        password=password,
-        look_for_keys=False,
-        allow_agent=False
-    )
-    stdin, stdout, stderr = ssh.exec_command(command)
-    output = stdout.read().decode()
-    ssh.close()
+    # Reutiliza o transporte persistente do roteador (ver app.services.ssh_pool)
+    output, _, _ = ssh_pool.exec_command(router, command)
     return output
+
+async def run_ssh_command_async(router: Router, command: str, priority: Priority = Priority.LOOKING_GLASS) -> str:
+    # Mesma operação, executada fora do event loop e respeitando a fila do roteador
+    output, _, _ = await ssh_executor.exec_command(router, command, priority=priority)
+    return output
+
+def run_pipelined_commands(
+    router: RouterLike,
+    commands: List[str],
+    on_result: Optional[ResultCallback] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> List[Tuple[str, str]]:
+    """Executa um lote de comandos de leitura em um único shell (ver InteractiveShell.run_pipelined)"""
+    with ssh_pool.shell(router) as channel:
+        shell = InteractiveShell(channel, cancel_event=cancel_event)
+        shell.read_until_prompt()
+        # Sem paginação ("---- More ----") durante o lote
+        shell.send_command("screen-length 0 temporary", raise_on_timeout=False)
+        return shell.run_pipelined(commands, on_result=on_result)
+
+async def run_ssh_commands_async(router: Router, commands: List[str], priority: Priority = Priority.LOOKING_GLASS) -> List[Tuple[str, str]]:
+    # Um lote inteiro custa uma sessão e uma vaga na fila do roteador
+    return await ssh_executor.run_on_router(router, run_pipelined_commands, commands, priority=priority)
+
+async def stream_ssh_commands(
+    router: RouterLike,
+    commands: List[str],
+    priority: Priority = Priority.LOOKING_GLASS,
+) -> AsyncIterator[Tuple[int, str, str]]:
+    """Gera (índice, comando, saída) de cada comando do lote assim que ele termina"""
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel_event = threading.Event()
+
+    def on_result(index: int, command: str, output: str):
+        loop.call_soon_threadsafe(queue.put_nowait, (index, command, output))
+
+    task = asyncio.ensure_future(
+        ssh_executor.run_on_router(
+            router, run_pipelined_commands, commands, on_result,
+            priority=priority, cancel_event=cancel_event,
+        )
+    )
+    received = 0
+    try:
+        while received < len(commands):
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+            if getter not in done:
+                getter.cancel()
+                if queue.empty():
+                    # Falhou antes de entregar todos os resultados
+                    await task
+                    break
+                continue
+            received += 1
+            yield getter.result()
+        await task
+    finally:
+        # Cliente saiu no meio do lote: libera a sessão
+        cancel_event.set()
@@ -0,0 +1,165 @@
+"""
+Execução SSH não bloqueante
+
+Todo código paramiko (bloqueante) roda em um pool limitado de threads, de
+forma que o event loop do uvicorn nunca fica parado esperando um roteador.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, Callable, List, Optional, Tuple
+
+import paramiko
+
+from app.core.config import SSH_EXECUTOR_MAX_WORKERS, SSH_CHANNEL_RETRIES
+from app.services.ssh_pool import ssh_pool, as_credentials, RouterLike
+from app.services.ssh_scheduler import ssh_scheduler, Priority, PositionCallback
+from app.services.router_health import router_health
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SSHExecutor:
+    """Pool de threads para operações SSH com métricas de fila"""
+
+    def __init__(self, max_workers: int = SSH_EXECUTOR_MAX_WORKERS):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ssh-worker")
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_wait = 0.0
+
+    def _submit(self, func: Callable, *args, **kwargs) -> Future:
+        submitted_at = time.monotonic()
+        started = threading.Event()
+
+        def call():
+            with self._lock:
+                self._queued -= 1
+                self._running += 1
+                self._max_wait = max(self._max_wait, time.monotonic() - submitted_at)
+            started.set()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+        def done(fut: Future):
+            with self._lock:
+                if fut.cancelled():
+                    # Cancelada ainda na fila: nunca chegou a executar
+                    if not started.is_set():
+                        self._queued -= 1
+                elif fut.exception() is not None:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+        with self._lock:
+            self._queued += 1
+        future = self._executor.submit(call)
+        future.add_done_callback(done)
+        return future
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Executa uma função bloqueante em uma thread SSH e aguarda o resultado"""
+        return await asyncio.wrap_future(self._submit(func, *args, **kwargs))
+
+    async def run_on_router(
+        self,
+        router: RouterLike,
+        func: Callable,
+        *args,
+        priority: Priority = Priority.LOOKING_GLASS,
+        on_position: Optional[PositionCallback] = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Executa func(credenciais, *args) em uma thread SSH depois de obter uma
+        sessão livre no roteador pelo escalonador.
+        """
+        # Captura as credenciais no event loop; o objeto ORM não deve ir para outra thread
+        credentials = as_credentials(router)
+        # Roteador sabidamente fora: falha na hora, sem ocupar fila nem thread
+        router_health.before_request(credentials)
+        try:
+            result = await self._run_in_slot(credentials, func, *args, priority=priority, on_position=on_position, **kwargs)
+        except Exception as e:
+            router_health.record_failure(credentials, e, ssh_pool.is_connected(credentials))
+            raise
+        except BaseException:
+            router_health.release(credentials)
+            raise
+        router_health.record_success(credentials)
+        return result
+
+    async def _run_in_slot(self, credentials, func: Callable, *args, priority: Priority, on_position: Optional[PositionCallback], **kwargs) -> Any:
+        async with ssh_scheduler.slot(credentials.key, priority=priority, on_position=on_position):
+            attempt = 0
+            while True:
+                try:
+                    return await self.run(func, credentials, *args, **kwargs)
+                except paramiko.ChannelException:
+                    # O roteador recusou o canal (VTYs ocupadas por outro sistema): aguarda e tenta de novo
+                    attempt += 1
+                    if attempt > SSH_CHANNEL_RETRIES:
+                        raise
+                    logger.info(f"Canal SSH recusado por {credentials.hostname}, nova tentativa ({attempt})")
+                    await asyncio.sleep(attempt)
+
+    async def exec_command(
+        self,
+        router: RouterLike,
+        command: str,
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.LOOKING_GLASS,
+        on_position: Optional[PositionCallback] = None,
+    ) -> Tuple[str, str, int]:
+        """Versão assíncrona de ssh_pool.exec_command: retorna (stdout, stderr, exit_status)"""
+        return await self.run_on_router(
+            router, ssh_pool.exec_command, command, timeout, priority=priority, on_position=on_position
+        )
+
+    async def exec_lines(
+        self,
+        router: RouterLike,
+        command: str,
+        on_lines: Callable[[List[str]], None],
+        timeout: Optional[float] = None,
+        priority: Priority = Priority.LOOKING_GLASS,
+        on_position: Optional[PositionCallback] = None,
+        cancel_event: Optional[threading.Event] = None,
+        on_stderr: Optional[Callable[[str], None]] = None,
+    ) -> int:
+        """
+        Versão assíncrona de ssh_pool.exec_lines: retorna o exit status.
+        on_lines e on_stderr são chamados na thread SSH.
+        """
+        return await self.run_on_router(
+            router, ssh_pool.exec_lines, command, on_lines, timeout, cancel_event,
+            priority=priority, on_position=on_position, on_stderr=on_stderr,
+        )
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_queue_wait_seconds": round(self._max_wait, 3),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instância global do executor
+ssh_executor = SSHExecutor()
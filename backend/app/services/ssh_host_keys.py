@@ -0,0 +1,200 @@
+"""
+Armazenamento de chaves de host SSH
+
+As chaves conhecidas ficam em memória (carregadas do banco uma vez, na
+inicialização) e são verificadas por uma política paramiko a cada conexão,
+sem ler ~/.ssh/known_hosts nem criar diretórios no caminho quente. Chaves
+novas são gravadas no banco de forma assíncrona, de modo que todos os
+workers compartilham o mesmo conjunto.
+"""
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+import paramiko
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.future import select
+
+from app.core.config import SessionLocal, SSH_STRICT_HOST_KEYS, SSH_KNOWN_HOSTS_FILE
+from app.models.ssh_host_key import SSHHostKey
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Espera máxima pela consulta ao banco quando a chave não está em memória
+DB_LOOKUP_TIMEOUT = 5.0
+
+
+def host_key_name(hostname: str, port: int) -> str:
+    """Nome usado pelo paramiko/known_hosts para o par host:porta"""
+    return hostname if port == 22 else f"[{hostname}]:{port}"
+
+
+def key_fingerprint(key: paramiko.PKey) -> str:
+    digest = hashlib.sha256(key.asbytes()).digest()
+    return "SHA256:" + base64.b64encode(digest).decode().rstrip("=")
+
+
+class StoreHostKeyPolicy(paramiko.MissingHostKeyPolicy):
+    """Política paramiko que consulta o HostKeyStore em vez de known_hosts"""
+
+    def __init__(self, store: "HostKeyStore"):
+        self.store = store
+
+    def missing_host_key(self, client, hostname, key):
+        self.store.verify(hostname, key)
+
+
+class HostKeyStore:
+    """Cache de chaves de host do processo, persistido na tabela ssh_host_keys"""
+
+    def __init__(self, strict: bool = SSH_STRICT_HOST_KEYS):
+        self.strict = strict
+        self._keys: Dict[Tuple[str, str], paramiko.PKey] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loaded = False
+        self.policy = StoreHostKeyPolicy(self)
+
+    def configure(self, client: paramiko.SSHClient) -> paramiko.SSHClient:
+        """Aplica a política do store a um SSHClient"""
+        client.set_missing_host_key_policy(self.policy)
+        return client
+
+    async def load(self, known_hosts_file: Optional[str] = SSH_KNOWN_HOSTS_FILE):
+        """Carrega as chaves do banco (e importa o known_hosts legado uma única vez)"""
+        self._loop = asyncio.get_running_loop()
+        try:
+            async with SessionLocal() as session:
+                rows = (await session.execute(select(SSHHostKey))).scalars().all()
+        except Exception as e:
+            logger.warning(f"Não foi possível carregar chaves de host do banco: {e}")
+            rows = []
+        with self._lock:
+            for row in rows:
+                key = self._decode(row.key_type, row.key_data)
+                if key is not None:
+                    self._keys[(row.hostname, row.key_type)] = key
+        imported = self._import_known_hosts(known_hosts_file) if known_hosts_file else []
+        for name, key in imported:
+            await self._persist(name, key)
+        self._loaded = True
+        logger.info(f"{len(self._keys)} chave(s) de host SSH carregada(s) ({len(imported)} importada(s) do known_hosts)")
+
+    def _import_known_hosts(self, path: str):
+        """Chaves do known_hosts que ainda não estão no banco (hosts com hash são ignorados)"""
+        if not os.path.isfile(path):
+            return []
+        try:
+            host_keys = paramiko.HostKeys(path)
+        except Exception as e:
+            logger.debug(f"Erro ao ler {path}: {e}")
+            return []
+        imported = []
+        with self._lock:
+            for name in host_keys.keys():
+                if name.startswith("|"):
+                    continue
+                for key_type, key in host_keys[name].items():
+                    if (name, key_type) not in self._keys:
+                        self._keys[(name, key_type)] = key
+                        imported.append((name, key))
+        return imported
+
+    def verify(self, name: str, key: paramiko.PKey):
+        """Aceita chave nova (trust on first use); chave diferente da conhecida é recusada ou substituída"""
+        key_type = key.get_name()
+        with self._lock:
+            known = self._keys.get((name, key_type))
+        if known is None:
+            # Outro worker pode já ter aprendido a chave
+            known = self._lookup_db(name, key_type)
+            if known is not None:
+                with self._lock:
+                    self._keys[(name, key_type)] = known
+        if known is not None and known.asbytes() == key.asbytes():
+            return
+        if known is not None:
+            if self.strict:
+                logger.error(f"Chave de host de {name} mudou ({key_fingerprint(known)} -> {key_fingerprint(key)}), conexão recusada")
+                raise paramiko.BadHostKeyException(name, key, known)
+            logger.warning(f"Chave de host de {name} mudou ({key_fingerprint(known)} -> {key_fingerprint(key)}), substituindo")
+        else:
+            logger.info(f"Nova chave de host para {name}: {key_type} {key_fingerprint(key)}")
+        with self._lock:
+            self._keys[(name, key_type)] = key
+        self._schedule_persist(name, key)
+
+    def _on_loop_thread(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _lookup_db(self, name: str, key_type: str) -> Optional[paramiko.PKey]:
+        if self._loop is None or self._loop.is_closed() or self._on_loop_thread():
+            return None
+        future = asyncio.run_coroutine_threadsafe(self._fetch(name, key_type), self._loop)
+        try:
+            return future.result(timeout=DB_LOOKUP_TIMEOUT)
+        except Exception as e:
+            future.cancel()
+            logger.debug(f"Consulta da chave de host de {name} falhou: {e}")
+            return None
+
+    async def _fetch(self, name: str, key_type: str) -> Optional[paramiko.PKey]:
+        async with SessionLocal() as session:
+            row = (await session.execute(
+                select(SSHHostKey).where(SSHHostKey.hostname == name, SSHHostKey.key_type == key_type)
+            )).scalars().first()
+        return self._decode(row.key_type, row.key_data) if row is not None else None
+
+    def _schedule_persist(self, name: str, key: paramiko.PKey):
+        if self._loop is None or self._loop.is_closed():
+            # Sem event loop (scripts): a chave fica só em memória
+            return
+        if self._on_loop_thread():
+            self._loop.create_task(self._persist(name, key))
+        else:
+            asyncio.run_coroutine_threadsafe(self._persist(name, key), self._loop)
+
+    async def _persist(self, name: str, key: paramiko.PKey):
+        key_type = key.get_name()
+        try:
+            async with SessionLocal() as session:
+                row = (await session.execute(
+                    select(SSHHostKey).where(SSHHostKey.hostname == name, SSHHostKey.key_type == key_type)
+                )).scalars().first()
+                if row is None:
+                    session.add(SSHHostKey(
+                        hostname=name, key_type=key_type,
+                        key_data=key.get_base64(), fingerprint=key_fingerprint(key),
+                    ))
+                else:
+                    row.key_data = key.get_base64()
+                    row.fingerprint = key_fingerprint(key)
+                await session.commit()
+        except IntegrityError:
+            # Outro worker gravou a mesma chave ao mesmo tempo
+            logger.debug(f"Chave de host de {name} já registrada por outro processo")
+        except Exception as e:
+            logger.warning(f"Erro ao gravar chave de host de {name}: {e}")
+
+    @staticmethod
+    def _decode(key_type: str, key_data: str) -> Optional[paramiko.PKey]:
+        try:
+            return paramiko.PKey.from_type_string(key_type, base64.b64decode(key_data))
+        except Exception as e:
+            logger.warning(f"Chave de host inválida no banco ({key_type}): {e}")
+            return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"loaded": self._loaded, "keys": len(self._keys), "strict": self.strict}
+
+
+# Instância global do armazenamento de chaves
+host_key_store = HostKeyStore()
@@ -0,0 +1,376 @@
+"""
+Pool de conexões SSH persistentes por roteador
+
+Mantém um transporte paramiko autenticado (keep-alive) por roteador e abre
+novos canais sobre ele, evitando TCP + key exchange + autenticação a cada
+comando.
+"""
+import base64
+import codecs
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import paramiko
+
+from app.core.config import (
+    SSH_CONNECT_TIMEOUT,
+    SSH_KEEPALIVE_INTERVAL,
+    SSH_POOL_MAX_SESSIONS,
+    SSH_POOL_IDLE_TIMEOUT,
+    SSH_POOL_ACQUIRE_TIMEOUT,
+)
+from app.models.router import Router
+from app.services.ssh_host_keys import host_key_store
+from app.services.ssh_shell import ShellCancelled
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Erros que indicam que o transporte morreu e a conexão deve ser refeita
+CONNECTION_ERRORS = (paramiko.SSHException, EOFError, socket.error)
+
+
+def decode_router_password(password: str) -> str:
+    """Decodifica a senha armazenada em base64 (ou retorna como está)"""
+    try:
+        return base64.b64decode(password.encode()).decode()
+    except Exception:
+        # Se falhar na decodificação, usar a senha como está (caso não esteja codificada)
+        return password
+
+
+class SSHPoolExhausted(Exception):
+    """Nenhuma sessão livre no roteador dentro do tempo limite"""
+
+
+@dataclass(frozen=True)
+class RouterCredentials:
+    """Dados de conexão de um roteador, desacoplados da sessão do banco"""
+    router_id: Optional[int]
+    hostname: str
+    port: int
+    username: str
+    password: str
+
+    @classmethod
+    def from_router(cls, router: Router) -> "RouterCredentials":
+        return cls(
+            router_id=router.id,
+            hostname=router.ip,
+            port=router.ssh_port,
+            username=router.ssh_user,
+            password=decode_router_password(router.ssh_password),
+        )
+
+    @property
+    def key(self) -> Union[int, Tuple[str, int]]:
+        return self.router_id if self.router_id is not None else (self.hostname, self.port)
+
+
+RouterLike = Union[Router, RouterCredentials]
+
+
+def as_credentials(router: RouterLike) -> RouterCredentials:
+    if isinstance(router, RouterCredentials):
+        return router
+    return RouterCredentials.from_router(router)
+
+
+class PooledConnection:
+    """Conexão persistente com um roteador e controle de suas sessões"""
+
+    def __init__(self, credentials: RouterCredentials, max_sessions: int):
+        self.credentials = credentials
+        self.client: Optional[paramiko.SSHClient] = None
+        self.lock = threading.Lock()
+        self.sessions = threading.BoundedSemaphore(max_sessions)
+        self.max_sessions = max_sessions
+        self.active_sessions = 0
+        self.reserved = 0  # Chamadores entre _get_connection e _acquire (protegido pelo lock do pool)
+        self.last_used = time.monotonic()
+        self.connects = 0
+        self.retired = False
+
+    def is_alive(self) -> bool:
+        if self.client is None:
+            return False
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active() and transport.is_authenticated()
+
+    def ensure_connected(self) -> paramiko.SSHClient:
+        with self.lock:
+            if not self.is_alive():
+                self._close_client()
+                self.client = self._connect()
+            return self.client
+
+    def _connect(self) -> paramiko.SSHClient:
+        creds = self.credentials
+        logger.info(f"Abrindo conexão SSH persistente com {creds.hostname}:{creds.port}")
+        client = host_key_store.configure(paramiko.SSHClient())
+        client.connect(
+            hostname=creds.hostname,
+            port=creds.port,
+            username=creds.username,
+            password=creds.password,
+            look_for_keys=False,
+            allow_agent=False,
+            timeout=SSH_CONNECT_TIMEOUT,
+            gss_auth=False,
+            gss_kex=False,
+        )
+        transport = client.get_transport()
+        if transport is not None and SSH_KEEPALIVE_INTERVAL > 0:
+            transport.set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        self.connects += 1
+        return client
+
+    def invalidate(self):
+        """Descarta o transporte atual; a próxima sessão reconecta"""
+        with self.lock:
+            self._close_client()
+
+    def _close_client(self):
+        if self.client is not None:
+            try:
+                self.client.close()
+            except Exception:
+                pass
+            self.client = None
+
+    def open_session(self, timeout: Optional[float] = None) -> paramiko.Channel:
+        """Abre um canal no transporte existente, reconectando uma vez se ele tiver morrido"""
+        for attempt in (1, 2):
+            client = self.ensure_connected()
+            try:
+                return client.get_transport().open_session(timeout=timeout)
+            except paramiko.ChannelException:
+                # Roteador recusou o canal (limite de VTY); não é falha do transporte
+                raise
+            except CONNECTION_ERRORS as e:
+                if attempt == 2:
+                    raise
+                logger.info(f"Transporte SSH com {self.credentials.hostname} inválido ({e}), reconectando")
+                self.invalidate()
+
+
+class SSHConnectionPool:
+    """Pool de transportes SSH keep-alive compartilhado por toda a aplicação"""
+
+    def __init__(
+        self,
+        max_sessions_per_router: int = SSH_POOL_MAX_SESSIONS,
+        idle_timeout: float = SSH_POOL_IDLE_TIMEOUT,
+        acquire_timeout: float = SSH_POOL_ACQUIRE_TIMEOUT,
+    ):
+        self.max_sessions_per_router = max_sessions_per_router
+        self.idle_timeout = idle_timeout
+        self.acquire_timeout = acquire_timeout
+        self._connections: Dict[Union[int, Tuple[str, int]], PooledConnection] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def _get_connection(self, credentials: RouterCredentials) -> PooledConnection:
+        with self._lock:
+            self._ensure_reaper()
+            conn = self._connections.get(credentials.key)
+            if conn is not None and conn.credentials != credentials:
+                # Dados do roteador mudaram (IP, porta, usuário ou senha): descartar a conexão antiga
+                conn.retired = True
+                if conn.active_sessions == 0 and conn.reserved == 0:
+                    conn.invalidate()
+                conn = None
+            if conn is None:
+                conn = PooledConnection(credentials, self.max_sessions_per_router)
+                self._connections[credentials.key] = conn
+            # Reservada ainda sob o lock: o reaper não a remove antes de _acquire contar a sessão
+            conn.reserved += 1
+            return conn
+
+    def _acquire(self, conn: PooledConnection, timeout: Optional[float]):
+        """Ocupa uma sessão da conexão obtida por _get_connection (consome a reserva)"""
+        wait = self.acquire_timeout if timeout is None else timeout
+        acquired = conn.sessions.acquire(timeout=wait)
+        if acquired:
+            with conn.lock:
+                conn.active_sessions += 1
+                conn.last_used = time.monotonic()
+        with self._lock:
+            conn.reserved -= 1
+            abandoned = conn.retired and conn.reserved == 0 and conn.active_sessions == 0
+        if not acquired:
+            if abandoned:
+                conn.invalidate()
+            raise SSHPoolExhausted(
+                f"Limite de {conn.max_sessions} sessões SSH simultâneas atingido em {conn.credentials.hostname}"
+            )
+
+    def _release(self, conn: PooledConnection):
+        with conn.lock:
+            conn.active_sessions -= 1
+            conn.last_used = time.monotonic()
+        with self._lock:
+            retired = conn.retired and conn.active_sessions == 0 and conn.reserved == 0
+        conn.sessions.release()
+        if retired:
+            conn.invalidate()
+
+    @contextmanager
+    def channel(self, router: RouterLike, timeout: Optional[float] = None):
+        """Abre um canal de sessão no transporte do roteador e o fecha ao final"""
+        conn = self._get_connection(as_credentials(router))
+        self._acquire(conn, timeout)
+        chan = None
+        try:
+            chan = conn.open_session(timeout=SSH_CONNECT_TIMEOUT)
+            yield chan
+        except CONNECTION_ERRORS as e:
+            if not isinstance(e, paramiko.ChannelException) and not conn.is_alive():
+                conn.invalidate()
+            raise
+        finally:
+            if chan is not None:
+                try:
+                    chan.close()
+                except Exception:
+                    pass
+            self._release(conn)
+
+    @contextmanager
+    def shell(self, router: RouterLike, timeout: Optional[float] = None, width: int = 200):
+        """Abre um shell interativo (com PTY) no transporte do roteador"""
+        with self.channel(router, timeout=timeout) as chan:
+            chan.get_pty(width=width)
+            chan.invoke_shell()
+            yield chan
+
+    def exec_command(self, router: RouterLike, command: str, timeout: Optional[float] = None) -> Tuple[str, str, int]:
+        """Executa um comando em um novo canal e retorna (stdout, stderr, exit_status)"""
+        with self.channel(router) as chan:
+            chan.settimeout(timeout)
+            chan.exec_command(command)
+            stdout = chan.makefile("r")
+            stderr = chan.makefile_stderr("r")
+            output = stdout.read().decode("utf-8", errors="ignore")
+            error = stderr.read().decode("utf-8", errors="ignore")
+            exit_status = chan.recv_exit_status()
+            return output, error, exit_status
+
+    def exec_lines(
+        self,
+        router: RouterLike,
+        command: str,
+        on_lines: Callable[[List[str]], None],
+        timeout: Optional[float] = None,
+        cancel_event: Optional[threading.Event] = None,
+        max_line: int = 64 * 1024,
+        on_stderr: Optional[Callable[[str], None]] = None,
+    ) -> int:
+        """
+        Executa um comando e entrega o stdout em lotes de linhas completas, um
+        lote por bloco recebido, sem acumular a saída inteira. on_lines pode
+        lançar exceção para interromper (o canal é fechado e o roteador para de
+        enviar). O stderr, se pedido, é entregue inteiro no fim a on_stderr.
+        Retorna o exit status.
+        """
+        with self.channel(router) as chan:
+            chan.exec_command(command)
+            # recv com timeout curto para verificar o cancelamento; timeout vale como tempo máximo sem dados
+            chan.settimeout(0.5)
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+            partial = ""
+            last_data = time.monotonic()
+            while True:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise ShellCancelled("Operação SSH cancelada")
+                try:
+                    data = chan.recv(32768)
+                except socket.timeout:
+                    if timeout is not None and time.monotonic() - last_data > timeout:
+                        raise
+                    continue
+                if not data:
+                    break
+                last_data = time.monotonic()
+                lines = (partial + decoder.decode(data)).split("\n")
+                partial = lines.pop()
+                if len(partial) > max_line:
+                    # Linha sem fim (saída binária?): entrega em pedaços
+                    lines.append(partial)
+                    partial = ""
+                if lines:
+                    on_lines([line.rstrip("\r") for line in lines])
+            partial += decoder.decode(b"", final=True)
+            if partial:
+                on_lines([partial.rstrip("\r")])
+            if on_stderr is not None:
+                error = chan.makefile_stderr("r").read().decode("utf-8", errors="ignore")
+                if error:
+                    on_stderr(error)
+            return chan.recv_exit_status()
+
+    def is_connected(self, router: RouterLike) -> bool:
+        """Indica se o roteador tem um transporte autenticado ativo no pool"""
+        credentials = as_credentials(router)
+        with self._lock:
+            conn = self._connections.get(credentials.key)
+        return conn is not None and conn.is_alive()
+
+    def evict_idle(self):
+        """Fecha conexões sem sessões ativas há mais de idle_timeout segundos"""
+        now = time.monotonic()
+        with self._lock:
+            for key, conn in list(self._connections.items()):
+                if conn.active_sessions == 0 and conn.reserved == 0 and now - conn.last_used > self.idle_timeout:
+                    logger.info(f"Fechando conexão SSH ociosa com {conn.credentials.hostname}")
+                    conn.invalidate()
+                    del self._connections[key]
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._stop.clear()
+            self._reaper = threading.Thread(target=self._reap_loop, name="ssh-pool-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1.0, self.idle_timeout / 2)
+        while not self._stop.wait(interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.warning(f"Erro ao limpar conexões SSH ociosas: {e}")
+
+    def close_all(self):
+        """Fecha todas as conexões (shutdown da aplicação)"""
+        self._stop.set()
+        with self._lock:
+            for conn in self._connections.values():
+                conn.invalidate()
+            self._connections.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "connections": len(self._connections),
+                "routers": [
+                    {
+                        "router": conn.credentials.hostname,
+                        "router_id": conn.credentials.router_id,
+                        "alive": conn.is_alive(),
+                        "active_sessions": conn.active_sessions,
+                        "max_sessions": conn.max_sessions,
+                        "connects": conn.connects,
+                        "idle_seconds": round(time.monotonic() - conn.last_used, 1),
+                    }
+                    for conn in self._connections.values()
+                ],
+            }
+
+
+# Instância global do pool
+ssh_pool = SSHConnectionPool()
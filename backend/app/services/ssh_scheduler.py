@@ -0,0 +1,211 @@
+"""
+Escalonador de sessões SSH por roteador
+
+Limita quantas sessões cada roteador recebe ao mesmo tempo (os Huawei limitam
+as VTYs) e organiza a espera em uma fila com classes de prioridade: operações
+interativas de BGP primeiro, Looking Glass depois e tarefas de fundo por
+último. Dentro da mesma classe a ordem é de chegada, e pedidos antigos sobem
+de classe com o tempo para não ficarem parados indefinidamente.
+"""
+import asyncio
+import itertools
+import time
+from contextlib import asynccontextmanager
+from enum import IntEnum
+from typing import Callable, Dict, Hashable, List, Optional
+
+from app.core.config import (
+    SSH_ROUTER_MAX_SLOTS,
+    SSH_ROUTER_SLOT_OVERRIDES,
+    SSH_SLOT_WAIT_TIMEOUT,
+    SSH_SLOT_AGING_SECONDS,
+)
+from app.services.ssh_pool import SSHPoolExhausted
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0    # Habilitar/desabilitar BGP
+    LOOKING_GLASS = 1  # Consultas de operadores e do Looking Glass
+    BACKGROUND = 2     # Coletas periódicas e operações em lote
+
+
+class SSHSlotTimeout(SSHPoolExhausted):
+    """Tempo de espera por uma sessão livre no roteador esgotado"""
+
+
+PositionCallback = Callable[[int], None]
+
+
+def parse_slot_overrides(value: str) -> Dict[int, int]:
+    """Converte "3:2,7:6" em {3: 2, 7: 6}"""
+    overrides = {}
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            router_id, slots = item.split(":")
+            overrides[int(router_id)] = max(1, int(slots))
+        except ValueError:
+            logger.warning(f"Ignorando entrada inválida em SSH_ROUTER_SLOT_OVERRIDES: {item!r}")
+    return overrides
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "enqueued_at", "future", "on_position", "position")
+
+    def __init__(self, priority: Priority, seq: int, future: asyncio.Future, on_position: Optional[PositionCallback]):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.future = future
+        self.on_position = on_position
+        self.position: Optional[int] = None
+
+    def effective_priority(self, now: float) -> int:
+        if SSH_SLOT_AGING_SECONDS <= 0:
+            return int(self.priority)
+        return int(self.priority) - int((now - self.enqueued_at) // SSH_SLOT_AGING_SECONDS)
+
+
+class _RouterSlots:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_use = 0
+        self.waiters: List[_Waiter] = []
+        self.granted = 0
+        self.timeouts = 0
+
+    def ordered(self) -> List[_Waiter]:
+        now = time.monotonic()
+        return sorted(self.waiters, key=lambda w: (w.effective_priority(now), w.seq))
+
+
+class SSHScheduler:
+    """Fila justa com prioridades na frente de todo trabalho SSH"""
+
+    def __init__(
+        self,
+        default_limit: int = SSH_ROUTER_MAX_SLOTS,
+        overrides: Optional[Dict[int, int]] = None,
+        wait_timeout: float = SSH_SLOT_WAIT_TIMEOUT,
+    ):
+        self.default_limit = max(1, default_limit)
+        self.overrides = overrides if overrides is not None else parse_slot_overrides(SSH_ROUTER_SLOT_OVERRIDES)
+        self.wait_timeout = wait_timeout
+        self._routers: Dict[Hashable, _RouterSlots] = {}
+        self._seq = itertools.count()
+
+    def limit_for(self, router_key: Hashable) -> int:
+        return self.overrides.get(router_key, self.default_limit)
+
+    def set_limit(self, router_key: Hashable, limit: int):
+        """Ajusta o limite de sessões de um roteador em tempo de execução"""
+        self.overrides[router_key] = max(1, limit)
+        slots = self._routers.get(router_key)
+        if slots is not None:
+            slots.limit = self.overrides[router_key]
+            self._dispatch(slots)
+
+    def _slots(self, router_key: Hashable) -> _RouterSlots:
+        slots = self._routers.get(router_key)
+        if slots is None:
+            slots = _RouterSlots(self.limit_for(router_key))
+            self._routers[router_key] = slots
+        return slots
+
+    def _dispatch(self, slots: _RouterSlots):
+        """Entrega sessões livres aos primeiros da fila e avisa os demais da nova posição"""
+        ordered = slots.ordered()
+        while slots.in_use < slots.limit and ordered:
+            waiter = ordered.pop(0)
+            slots.waiters.remove(waiter)
+            if waiter.future.done():
+                continue
+            slots.in_use += 1
+            slots.granted += 1
+            waiter.future.set_result(True)
+            if waiter.position is not None:
+                # Quem chegou a esperar é avisado de que saiu da fila (posição 0)
+                self._notify(waiter, 0)
+        for index, waiter in enumerate(ordered, start=1):
+            if waiter.position != index:
+                self._notify(waiter, index)
+
+    def _notify(self, waiter: _Waiter, position: int):
+        waiter.position = position
+        if waiter.on_position is not None:
+            try:
+                waiter.on_position(position)
+            except Exception as e:
+                logger.debug(f"Erro no callback de posição da fila SSH: {e}")
+
+    def queue_position(self, router_key: Hashable, priority: Priority = Priority.LOOKING_GLASS) -> int:
+        """Posição que um novo pedido com essa prioridade teria na fila (0 = sessão imediata)"""
+        slots = self._routers.get(router_key)
+        if slots is None or (slots.in_use < slots.limit and not slots.waiters):
+            return 0
+        now = time.monotonic()
+        ahead = sum(1 for w in slots.waiters if w.effective_priority(now) <= int(priority))
+        return ahead + 1
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        router_key: Hashable,
+        priority: Priority = Priority.LOOKING_GLASS,
+        on_position: Optional[PositionCallback] = None,
+        timeout: Optional[float] = None,
+    ):
+        """Reserva uma sessão no roteador, aguardando na fila se necessário"""
+        slots = self._slots(router_key)
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), loop.create_future(), on_position)
+        slots.waiters.append(waiter)
+        self._dispatch(slots)
+        wait = self.wait_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=wait)
+        except BaseException as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Sessão concedida no mesmo instante do cancelamento/timeout: devolver
+                slots.in_use -= 1
+            else:
+                waiter.future.cancel()
+                if waiter in slots.waiters:
+                    slots.waiters.remove(waiter)
+            self._dispatch(slots)
+            if isinstance(e, asyncio.TimeoutError):
+                slots.timeouts += 1
+                raise SSHSlotTimeout(
+                    f"Nenhuma sessão SSH livre no roteador após {wait:g}s "
+                    f"(limite de {slots.limit} sessões simultâneas)"
+                )
+            raise
+        try:
+            yield
+        finally:
+            slots.in_use -= 1
+            self._dispatch(slots)
+
+    def stats(self) -> dict:
+        result = {}
+        for router_key, slots in self._routers.items():
+            waiting = {p.name.lower(): 0 for p in Priority}
+            for waiter in slots.waiters:
+                waiting[waiter.priority.name.lower()] += 1
+            result[str(router_key)] = {
+                "limit": slots.limit,
+                "in_use": slots.in_use,
+                "waiting": waiting,
+                "granted": slots.granted,
+                "timeouts": slots.timeouts,
+            }
+        return result
+
+
+# Instância global do escalonador
+ssh_scheduler = SSHScheduler()
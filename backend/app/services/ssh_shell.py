@@ -0,0 +1,236 @@
+"""
+Motor interativo (estilo expect) para sessões invoke_shell
+
+Lê o canal assim que chegam bytes (select no canal, sem sleeps fixos), procura
+o prompt do equipamento no final do que já chegou e retorna imediatamente ao
+encontrá-lo. A saída é acumulada em blocos (sem concatenação quadrática de
+strings) e limitada por SSH_SHELL_MAX_BUFFER.
+"""
+import codecs
+import re
+import select
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Callable, List, Optional, Pattern, Tuple
+
+import paramiko
+
+from app.core.config import SSH_SHELL_COMMAND_TIMEOUT, SSH_SHELL_MAX_BUFFER, SSH_PIPELINE_WINDOW
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Prompts Huawei VRP: <HUAWEI>, [HUAWEI], [~HUAWEI-bgp], [*HUAWEI-bgp]
+VRP_PROMPT = rb"<[^<>\r\n]{1,80}>|\[[~*]?[^\[\]\r\n]{1,80}\]"
+# Prompts Cisco IOS/IOS-XR: router>, router#, router(config-router)#
+IOS_PROMPT = rb"[\w.:/@-]{1,80}(?:\([\w.:/-]{1,40}\))?[>#]"
+DEFAULT_PROMPT = re.compile(rb"(?:^|[\r\n])(?:" + VRP_PROMPT + rb"|" + IOS_PROMPT + rb")[ \t]*$")
+
+# Quantos bytes do final da saída são examinados a cada leitura
+PROMPT_WINDOW = 256
+
+LineCallback = Callable[[str], None]
+# (índice, comando, saída) de cada comando de um lote pipelined
+ResultCallback = Callable[[int, str, str], None]
+
+
+class ShellTimeout(paramiko.SSHException):
+    """O prompt não apareceu dentro do tempo limite do comando"""
+
+    def __init__(self, message: str, output: str = ""):
+        super().__init__(message)
+        self.output = output
+
+
+class ShellCancelled(Exception):
+    """A operação foi cancelada (ex.: cliente do stream desconectou)"""
+
+
+class InteractiveShell:
+    """Envia comandos em um canal de shell e aguarda o prompt por casamento de regex"""
+
+    def __init__(
+        self,
+        channel: paramiko.Channel,
+        prompt: Pattern[bytes] = DEFAULT_PROMPT,
+        on_line: Optional[LineCallback] = None,
+        max_buffer: int = SSH_SHELL_MAX_BUFFER,
+        timeout: float = SSH_SHELL_COMMAND_TIMEOUT,
+        cancel_event: Optional[threading.Event] = None,
+    ):
+        self.channel = channel
+        self.cancel_event = cancel_event
+        self.prompt = prompt
+        self.on_line = on_line
+        self.max_buffer = max_buffer
+        self.timeout = timeout
+        self._partial = b""
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+
+    def _emit_lines(self, data: bytes, flush: bool = False):
+        """Entrega ao callback as linhas completas recebidas até agora"""
+        if self.on_line is None:
+            return
+        self._partial += data
+        *lines, self._partial = self._partial.split(b"\n")
+        if flush and self._partial:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            self.on_line(self._decoder.decode(line).rstrip("\r"))
+
+    def _wait_readable(self, remaining: float) -> bool:
+        if self.channel.recv_ready():
+            return True
+        if self.cancel_event is not None:
+            # Acorda periodicamente para perceber cancelamentos
+            remaining = min(remaining, 0.5)
+        readable, _, _ = select.select([self.channel], [], [], max(0.0, remaining))
+        return bool(readable)
+
+    def read_until(self, pattern: Pattern[bytes], timeout: Optional[float] = None, raise_on_timeout: bool = True) -> str:
+        """Lê até o final da saída casar com pattern; retorna tudo que foi lido"""
+        limit = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + limit
+        chunks: deque = deque()
+        size = 0
+        truncated = False
+        tail = b""
+        while True:
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise ShellCancelled("Operação SSH cancelada")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._emit_lines(b"", flush=True)
+                output = self._join(chunks, truncated)
+                if raise_on_timeout:
+                    raise ShellTimeout(f"Prompt não recebido em {limit:g}s", output)
+                return output
+            if not self._wait_readable(remaining):
+                continue
+            data = self.channel.recv(65536)
+            if not data:
+                self._emit_lines(b"", flush=True)
+                raise EOFError("Sessão SSH encerrada pelo roteador")
+            chunks.append(data)
+            size += len(data)
+            while size > self.max_buffer and len(chunks) > 1:
+                size -= len(chunks.popleft())
+                truncated = True
+            tail = (tail + data)[-PROMPT_WINDOW:]
+            if pattern.search(tail):
+                self._emit_lines(data, flush=True)
+                return self._join(chunks, truncated)
+            self._emit_lines(data)
+
+    def read_until_prompt(self, timeout: Optional[float] = None, raise_on_timeout: bool = True) -> str:
+        return self.read_until(self.prompt, timeout, raise_on_timeout)
+
+    def send_command(self, command: str, timeout: Optional[float] = None, raise_on_timeout: bool = True) -> str:
+        """Envia um comando e retorna a saída (eco + resposta + prompt)"""
+        self.channel.sendall((command + "\n").encode())
+        return self.read_until_prompt(timeout, raise_on_timeout)
+
+    def run_commands(self, commands: List[str], timeout: Optional[float] = None) -> List[Tuple[str, str]]:
+        """Executa os comandos em sequência, cada um aguardando o prompt"""
+        return [(command, self.send_command(command, timeout)) for command in commands]
+
+    def run_pipelined(
+        self,
+        commands: List[str],
+        on_result: Optional[ResultCallback] = None,
+        timeout: Optional[float] = None,
+        window: int = SSH_PIPELINE_WINDOW,
+    ) -> List[Tuple[str, str]]:
+        """
+        Envia vários comandos de leitura sem esperar cada prompt, intercalados
+        com linhas marcadoras, e separa a saída combinada por comando.
+
+        O marcador é uma linha de comentário com um token único: o roteador
+        apenas ecoa (ou rejeita) a linha, o que basta para delimitar a saída.
+        No máximo `window` comandos ficam em trânsito; cada resultado é
+        entregue a on_result assim que o marcador seguinte chega.
+        """
+        limit = self.timeout if timeout is None else timeout
+        token = uuid.uuid4().hex[:12]
+        markers = [f"#BGPCTL-{token}-{index}" for index in range(len(commands))]
+        results: List[Tuple[str, str]] = []
+        pending = bytearray()
+        scan_from = 0
+        truncated = False
+        sent = 0
+
+        def send_next():
+            nonlocal sent
+            self.channel.sendall(f"{commands[sent]}\n{markers[sent]}\n".encode())
+            sent += 1
+
+        while sent < min(window, len(commands)):
+            send_next()
+
+        deadline = time.monotonic() + limit
+        while len(results) < len(commands):
+            index = len(results)
+            marker = markers[index].encode()
+            position = pending.find(marker, scan_from)
+            line_end = pending.find(b"\n", position) if position >= 0 else -1
+            if line_end >= 0:
+                line_start = pending.rfind(b"\n", 0, position) + 1
+                output = self._clean_result(commands[index], bytes(pending[:line_start]), truncated)
+                del pending[:line_end + 1]
+                scan_from = 0
+                truncated = False
+                results.append((commands[index], output))
+                if on_result is not None:
+                    on_result(index, commands[index], output)
+                if sent < len(commands):
+                    send_next()
+                deadline = time.monotonic() + limit
+                continue
+
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise ShellCancelled("Operação SSH cancelada")
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ShellTimeout(
+                    f"Saída do comando '{commands[index]}' não recebida em {limit:g}s",
+                    self._clean_result(commands[index], bytes(pending), truncated),
+                )
+            if not self._wait_readable(remaining):
+                continue
+            data = self.channel.recv(65536)
+            if not data:
+                raise EOFError("Sessão SSH encerrada pelo roteador")
+            # Recomeça a busca um pouco antes do bloco novo (marcador pode estar dividido);
+            # se o marcador já chegou sem o fim da linha, a busca volta a partir dele
+            scan_from = position if position >= 0 else max(0, len(pending) - len(marker))
+            pending += data
+            if len(pending) > self.max_buffer:
+                excess = len(pending) - self.max_buffer
+                del pending[:excess]
+                scan_from = max(0, scan_from - excess)
+                truncated = True
+        return results
+
+    def _clean_result(self, command: str, raw: bytes, truncated: bool) -> str:
+        """Remove o eco do comando (e o que veio antes dele) e o prompt final"""
+        lines = raw.decode("utf-8", errors="ignore").replace("\r", "").split("\n")
+        for index, line in enumerate(lines):
+            if line.rstrip().endswith(command):
+                lines = lines[index + 1:]
+                break
+        while lines and (not lines[-1].strip() or self.prompt.search(lines[-1].strip().encode())):
+            lines.pop()
+        output = "\n".join(lines)
+        if truncated:
+            output = "[... saída truncada ...]\n" + output
+        return output
+
+    @staticmethod
+    def _join(chunks: deque, truncated: bool) -> str:
+        output = b"".join(chunks).decode("utf-8", errors="ignore")
+        if truncated:
+            output = "[... saída truncada ...]\n" + output
+        return output
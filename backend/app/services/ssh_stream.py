@@ -0,0 +1,157 @@
+"""
+Streaming SSE da saída de comandos SSH
+
+A função SSH roda no executor (produtor) e entrega cada linha a uma fila
+limitada; o gerador SSE (consumidor) repassa as linhas ao cliente assim que
+chegam. Se o cliente for lento a fila enche e a thread SSH espera
+(backpressure); se o cliente desconectar a operação é cancelada e a sessão
+VTY é liberada.
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import AsyncIterator, Callable, Optional, Set
+
+from fastapi import Request
+
+from app.core.config import SSE_HEARTBEAT_INTERVAL, SSE_MAX_PENDING_LINES
+from app.services.ssh_executor import ssh_executor
+from app.services.ssh_pool import RouterLike
+from app.services.ssh_scheduler import Priority
+from app.services.ssh_shell import ShellCancelled
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cabeçalhos para que proxies (nginx) não segurem o stream em buffer
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+# Referências às tarefas SSH que ainda estão terminando após o cliente sair
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def sse_data(line: str) -> str:
+    return f"data: {line}\n\n"
+
+
+def sse_heartbeat() -> str:
+    return ": keep-alive\n\n"
+
+
+def _log_task_result(task: asyncio.Task):
+    _background_tasks.discard(task)
+    if task.cancelled():
+        return
+    exc = task.exception()
+    if exc is not None and not isinstance(exc, ShellCancelled):
+        logger.debug(f"Tarefa SSH do stream terminou com erro: {exc}")
+
+
+async def iter_ssh_lines(
+    router: RouterLike,
+    func: Callable,
+    *args,
+    request: Optional[Request] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    heartbeat: float = SSE_HEARTBEAT_INTERVAL,
+    max_pending: int = SSE_MAX_PENDING_LINES,
+    announce_position: bool = False,
+) -> AsyncIterator[Optional[str]]:
+    """
+    Executa func(credenciais, *args, yield_func, cancel_event=...) e gera cada
+    linha produzida; None a cada `heartbeat` segundos sem saída. O erro da
+    função SSH é relançado depois das linhas já recebidas. Encerrar o gerador
+    (cliente desconectou, página completa) cancela a operação SSH.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    cancel_event = threading.Event()
+
+    def yield_func(line: str):
+        # Chamado na thread SSH: bloqueia enquanto a fila estiver cheia
+        if cancel_event.is_set():
+            raise ShellCancelled("Cliente do stream desconectou")
+        future = asyncio.run_coroutine_threadsafe(queue.put(line), loop)
+        while True:
+            try:
+                future.result(timeout=0.5)
+                return
+            except concurrent.futures.TimeoutError:
+                if cancel_event.is_set():
+                    future.cancel()
+                    raise ShellCancelled("Cliente do stream desconectou")
+
+    def on_position(position: int):
+        if position:
+            message = f"Aguardando sessão SSH livre no roteador (posição {position} na fila)..."
+        else:
+            message = "Sessão SSH obtida, executando comandos..."
+        if not queue.full():
+            queue.put_nowait(message)
+
+    task = asyncio.create_task(
+        ssh_executor.run_on_router(
+            router, func, *args, yield_func,
+            priority=priority, on_position=on_position if announce_position else None, cancel_event=cancel_event,
+        )
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_log_task_result)
+
+    getter: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if getter is None:
+                getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait({getter, task}, timeout=heartbeat, return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                line = getter.result()
+                getter = None
+                yield line
+                continue
+            if task in done:
+                if queue.empty():
+                    break
+                continue
+            # Sem saída no intervalo: heartbeat e verificação de desconexão
+            if request is not None and await request.is_disconnected():
+                logger.info("Cliente do stream SSH desconectou, cancelando operação")
+                return
+            yield None
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    finally:
+        if getter is not None:
+            getter.cancel()
+        # Libera a thread SSH (e a sessão VTY) se ela ainda estiver rodando
+        cancel_event.set()
+
+
+async def stream_ssh_output(
+    router: RouterLike,
+    func: Callable,
+    *args,
+    request: Optional[Request] = None,
+    priority: Priority = Priority.INTERACTIVE,
+    heartbeat: float = SSE_HEARTBEAT_INTERVAL,
+    max_pending: int = SSE_MAX_PENDING_LINES,
+) -> AsyncIterator[str]:
+    """
+    Executa func(credenciais, *args, yield_func, cancel_event=...) e gera eventos
+    SSE com cada linha produzida, heartbeats e o erro final, se houver.
+    """
+    lines = iter_ssh_lines(
+        router, func, *args, request=request, priority=priority,
+        heartbeat=heartbeat, max_pending=max_pending, announce_position=True,
+    )
+    try:
+        async for line in lines:
+            yield sse_heartbeat() if line is None else sse_data(line)
+    except Exception as e:
+        yield sse_data(f"Erro SSH: {e}")
+    finally:
+        await lines.aclose()
@@ -0,0 +1,5 @@
+"""
+Benchmarks ponta a ponta da API (app FastAPI + PostgreSQL + roteadores simulados)
+
+Ver benchmarks/run.py e a seção "Benchmarks" do README.
+"""
@@ -0,0 +1,81 @@
+"""
+Benchmark do parser de "display bgp all summary"
+
+Mede o tempo de parse das fixtures reais (benchmarks/fixtures/) e de saídas
+geradas pelo simulador com milhares de peers, além da serialização para JSON.
+
+    python -m benchmarks.bgp_summary --peers 1000 5000 20000 --repeat 20
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures"
+
+# Quantidade esperada de peers em cada fixture (falha o benchmark se o parser regredir)
+FIXTURES = {
+    "vrp_bgp_all_summary.txt": 11,
+    "vrp_bgp_summary_inc.txt": 3,
+}
+
+
+def measure(func, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 3),
+        "min_ms": round(times[0] * 1000, 3),
+        "max_ms": round(times[-1] * 1000, 3),
+    }
+
+
+def generated_summary(peers: int, seed: int) -> str:
+    from simulator.vrp import VirtualRouter, VRPSession
+
+    router = VirtualRouter.generate(0, peers=peers, advertised_routes=1, seed=seed)
+    return VRPSession(router).bgp_summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do parser do summary BGP")
+    parser.add_argument("--peers", type=int, nargs="+", default=[1000, 5000, 20000], help="Tamanhos gerados pelo simulador")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.bgp_summary import parse_bgp_summary
+
+    results = []
+    inputs = [(name, (FIXTURES_DIR / name).read_text(), expected) for name, expected in FIXTURES.items()]
+    inputs += [(f"simulador {n} peers", generated_summary(n, args.seed), n) for n in args.peers]
+
+    print(f"{'entrada':<32} {'peers':>7} {'KB':>8} {'parse ms':>10} {'json ms':>10} {'µs/peer':>9}")
+    for name, text, expected in inputs:
+        summary = parse_bgp_summary(text)
+        if len(summary.peers) != expected:
+            raise SystemExit(f"{name}: esperado {expected} peers, parser encontrou {len(summary.peers)}")
+        parse = measure(lambda: parse_bgp_summary(text), args.repeat)
+        serialize = measure(lambda: json.dumps(summary.to_dict()), args.repeat)
+        per_peer = 1000 * parse["median_ms"] / max(expected, 1)
+        results.append({
+            "input": name, "peers": expected, "bytes": len(text),
+            "parse": parse, "to_json": serialize, "us_per_peer": round(per_peer, 3),
+        })
+        print(f"{name:<32} {expected:>7} {len(text) / 1024:>8.1f} {parse['median_ms']:>10} {serialize['median_ms']:>10} {per_peer:>9.2f}")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({"python": sys.version.split()[0], "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Coleta de métricas dos benchmarks: latência por endpoint e lag do event loop
+"""
+import asyncio
+import math
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Percentil por interpolação linear (valores já ordenados)"""
+    if not sorted_values:
+        return None
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    rank = (len(sorted_values) - 1) * pct / 100.0
+    low, high = math.floor(rank), math.ceil(rank)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (rank - low)
+
+
+def summarize(samples: List[float], duration: float) -> Dict:
+    values = sorted(samples)
+    return {
+        "count": len(values),
+        "throughput_rps": round(len(values) / duration, 2) if duration > 0 else None,
+        "mean_ms": round(1000 * sum(values) / len(values), 2) if values else None,
+        "p50_ms": _ms(percentile(values, 50)),
+        "p95_ms": _ms(percentile(values, 95)),
+        "p99_ms": _ms(percentile(values, 99)),
+        "max_ms": _ms(values[-1] if values else None),
+    }
+
+
+def _ms(value: Optional[float]) -> Optional[float]:
+    return round(value * 1000, 2) if value is not None else None
+
+
+class LatencyRecorder:
+    """Amostras de latência (s) e erros por operação"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.first_event: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.started_at = time.monotonic()
+        self.finished_at: Optional[float] = None
+
+    def record(self, name: str, elapsed: float, first_event: Optional[float] = None):
+        self.samples[name].append(elapsed)
+        if first_event is not None:
+            self.first_event[name].append(first_event)
+
+    def error(self, name: str, reason: str):
+        self.errors[name][reason] += 1
+
+    def finish(self):
+        self.finished_at = time.monotonic()
+
+    @property
+    def duration(self) -> float:
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    def summary(self) -> Dict:
+        endpoints = {}
+        for name in sorted(set(self.samples) | set(self.errors)):
+            result = summarize(self.samples.get(name, []), self.duration)
+            result["errors"] = dict(self.errors.get(name, {}))
+            if name in self.first_event:
+                # Streams: tempo até o primeiro evento SSE
+                first = summarize(self.first_event[name], self.duration)
+                result["first_event_p50_ms"] = first["p50_ms"]
+                result["first_event_p95_ms"] = first["p95_ms"]
+            endpoints[name] = result
+        all_samples = [s for values in self.samples.values() for s in values]
+        total = summarize(all_samples, self.duration)
+        total["errors"] = sum(sum(e.values()) for e in self.errors.values())
+        return {"duration_s": round(self.duration, 2), "total": total, "endpoints": endpoints}
+
+
+class LoopLagMonitor:
+    """Mede o atraso do event loop: quanto um sleep(interval) passa do previsto"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lags: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lags.append(max(0.0, loop.time() - start - self.interval))
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict:
+        values = sorted(self.lags)
+        return {
+            "samples": len(values),
+            "p50_ms": _ms(percentile(values, 50)),
+            "p95_ms": _ms(percentile(values, 95)),
+            "p99_ms": _ms(percentile(values, 99)),
+            "max_ms": _ms(values[-1] if values else None),
+        }
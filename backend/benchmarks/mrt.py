@@ -0,0 +1,158 @@
+"""
+Benchmark do importador MRT (app/services/mrt.py)
+
+Gera um dump TABLE_DUMP_V2 sintético (uma tabela completa por peer do
+coletor, opcionalmente .gz/.bz2) seguido de um arquivo BGP4MP com UPDATEs,
+importa os dois na RIB em memória e mede tempo, vazão e memória do processo.
+
+    python -m benchmarks.mrt --peers 10 --v4 900000 --v6 200000 --workers 4
+    python -m benchmarks.mrt --peers 4 --v4 200000 --v6 50000 --compress gz
+"""
+import argparse
+import asyncio
+import bz2
+import gzip
+import json
+import random
+import resource
+import struct
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def rss_mb() -> float:
+    # Pico de memória residente do processo (ru_maxrss em KB no Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _record(timestamp: int, kind: int, subtype: int, body: bytes) -> bytes:
+    return struct.pack("!IHHI", timestamp, kind, subtype, len(body)) + body
+
+
+def _attr(kind: int, value: bytes, flags: int = 0x40) -> bytes:
+    if len(value) > 255:
+        return struct.pack("!BBH", flags | 0x10, kind, len(value)) + value
+    return struct.pack("!BBB", flags, kind, len(value)) + value
+
+
+def _attributes(peer: int, as_path, med: int, version: int) -> bytes:
+    attrs = _attr(1, b"\0") + _attr(2, struct.pack(f"!BB{len(as_path)}I", 2, len(as_path), *as_path))
+    if version == 4:
+        attrs += _attr(3, bytes((10, 0, peer >> 8, peer & 0xFF)))
+    else:
+        # TABLE_DUMP_V2: MP_REACH abreviado, só com o next-hop (RFC 6396 4.3.4)
+        attrs += _attr(14, bytes((16,)) + (0x20010DB8 << 96 | peer).to_bytes(16, "big"), 0x80)
+    attrs += _attr(4, struct.pack("!I", med), 0x80)
+    attrs += _attr(8, struct.pack("!HH", 64500 + peer, 100), 0xC0)
+    return attrs
+
+
+def write_table_dump(path: Path, peers: int, v4: int, v6: int, paths: int, rng: random.Random, compress: str = None):
+    opener = {"gz": gzip.open, "bz2": bz2.open}.get(compress, open)
+    as_paths = [[64500 + p] + [rng.randint(1, 400000) for _ in range(rng.randint(1, 5))] for p in range(paths)]
+    attrs = {
+        version: [[_attributes(peer, as_paths[(i * 7 + peer) % paths], i % 3 * 10, version) for i in range(paths)] for peer in range(peers)]
+        for version in (4, 6)
+    }
+    now = int(time.time())
+    with opener(path, "wb") as f:
+        index = struct.pack("!4sH", bytes((10, 255, 0, 1)), 0) + struct.pack("!H", peers)
+        for peer in range(peers):
+            index += struct.pack("!B4s4sI", 2, bytes((10, 0, peer >> 8, peer & 0xFF)), bytes((10, 0, peer >> 8, peer & 0xFF)), 64500 + peer)
+        f.write(_record(now, 13, 1, index))
+        keys4 = sorted({rng.getrandbits(24) for _ in range(v4)})
+        keys6 = sorted({rng.getrandbits(32) for _ in range(v6)})
+        sequence = 0
+        out = []
+        for version, keys, size, plen in ((4, keys4, 3, 24), (6, keys6, 6, 48)):
+            subtype = 2 if version == 4 else 4
+            for n, key in enumerate(keys):
+                prefix = (key if version == 4 else (0x2000 << 32 | key)).to_bytes(size, "big")
+                entries = b"".join(
+                    struct.pack("!HIH", peer, now, len(a)) + a
+                    for peer in range(peers)
+                    for a in (attrs[version][peer][n % paths],)
+                )
+                out.append(_record(now, 13, subtype, struct.pack("!IB", sequence, plen) + prefix + struct.pack("!H", peers) + entries))
+                sequence += 1
+                if len(out) >= 10000:
+                    f.write(b"".join(out))
+                    out.clear()
+        f.write(b"".join(out))
+    return len(keys4) + len(keys6)
+
+
+def write_updates(path: Path, peers: int, updates: int, rng: random.Random):
+    """BGP4MP_MESSAGE_AS4 com anúncios e retiradas IPv4 de /24 aleatórios"""
+    now = int(time.time())
+    with open(path, "wb") as f:
+        out = []
+        for n in range(updates):
+            peer = n % peers
+            prefixes = b"".join(bytes((24,)) + rng.getrandbits(24).to_bytes(3, "big") for _ in range(rng.randint(1, 8)))
+            if n % 4 == 3:
+                body = struct.pack("!H", len(prefixes)) + prefixes + struct.pack("!H", 0)
+            else:
+                as_path = [64500 + peer, rng.randint(1, 400000)]
+                attrs = _attr(1, b"\0") + _attr(2, struct.pack("!BB2I", 2, 2, *as_path)) + _attr(3, bytes((10, 0, 0, peer)))
+                body = struct.pack("!HH", 0, len(attrs)) + attrs + prefixes
+            message = b"\xff" * 16 + struct.pack("!HB", 19 + len(body), 2) + body
+            header = struct.pack("!IIHH", 64500 + peer, 64499, 0, 1) + bytes((10, 0, peer >> 8, peer & 0xFF)) + bytes((10, 255, 0, 1))
+            out.append(_record(now, 16, 4, header + message))
+            if len(out) >= 10000:
+                f.write(b"".join(out))
+                out.clear()
+        f.write(b"".join(out))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do importador MRT")
+    parser.add_argument("--peers", type=int, default=10, help="Peers do coletor (uma tabela completa cada)")
+    parser.add_argument("--v4", type=int, default=900000)
+    parser.add_argument("--v6", type=int, default=200000)
+    parser.add_argument("--paths", type=int, default=50000, help="Conjuntos de atributos distintos por peer")
+    parser.add_argument("--updates", type=int, default=200000, help="Mensagens do arquivo BGP4MP")
+    parser.add_argument("--compress", choices=["gz", "bz2"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--dir", default="/tmp", help="Onde gravar os arquivos gerados (reaproveitados se existirem)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.mrt import MRTImporter
+    from app.services.rib import RIBStore
+
+    rng = random.Random(args.seed)
+    suffix = f".{args.compress}" if args.compress else ""
+    dump = Path(args.dir) / f"bench-rib-{args.peers}x{args.v4}+{args.v6}.mrt{suffix}"
+    updates = Path(args.dir) / f"bench-updates-{args.peers}x{args.updates}.mrt"
+    if not dump.exists():
+        start = time.perf_counter()
+        write_table_dump(dump, args.peers, args.v4, args.v6, args.paths, rng, args.compress)
+        print(f"gerado {dump} ({dump.stat().st_size / 1e6:.0f} MB) em {time.perf_counter() - start:.0f} s")
+    if not updates.exists():
+        write_updates(updates, args.peers, args.updates, rng)
+
+    importer = MRTImporter(store=RIBStore(max_age=None))
+    baseline = rss_mb()
+    results = []
+    for path in (dump, updates):
+        job = asyncio.run(importer.run(str(path), resolve=lambda ip: (1, None), workers=args.workers))
+        info = job.to_dict()
+        if job.status != "done":
+            raise SystemExit(f"{path}: {job.error}")
+        print(f"{path.name}: {info['size'] / 1e6:.0f} MB, {info['entries']} entradas em {info['elapsed_seconds']} s "
+              f"({info['entries_per_second']}/s), RSS adicional {rss_mb() - baseline:.0f} MB")
+        results.append({k: info[k] for k in ("file", "size", "records", "entries", "elapsed_seconds", "entries_per_second")})
+    stats = importer.store.stats()
+    print(f"RIB: {stats['routers']['1']['paths']} caminhos, memória estimada {stats['memory_bytes'] / 1e6:.0f} MB")
+    if args.output:
+        Path(args.output).write_text(json.dumps({"python": sys.version.split()[0], "imports": results, "rss_mb": round(rss_mb() - baseline)}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark da RIB em memória (app/services/rib.py)
+
+Carrega tabelas sintéticas do tamanho de uma tabela completa (prefixos IPv4
+/24 e IPv6 /48 em ordem, como vêm dos snapshots) em alguns roteadores e mede
+tempo de carga, memória do processo e latência de longest-prefix-match.
+
+    python -m benchmarks.rib --routers 3 --v4 900000 --v6 200000 --paths 100000
+"""
+import argparse
+import json
+import random
+import resource
+import socket
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def rss_mb() -> float:
+    # Pico de memória residente do processo (ru_maxrss em KB no Linux)
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def synthetic_table(v4: int, v6: int, paths: int, rng: random.Random):
+    """(prefixo, AS-path) em ordem de endereço, com `paths` AS-paths distintos"""
+    as_paths = [" ".join(str(rng.randint(1, 400000)) for _ in range(rng.randint(2, 6))) for _ in range(paths)]
+    keys4 = sorted({rng.getrandbits(24) << 8 for _ in range(v4)})
+    keys6 = sorted({(0x2000 << 112) | (rng.getrandbits(32) << 80) for _ in range(v6)})
+    table = [(f"{socket.inet_ntoa(k.to_bytes(4, 'big'))}/24", as_paths[i % paths]) for i, k in enumerate(keys4)]
+    table += [(f"{socket.inet_ntop(socket.AF_INET6, k.to_bytes(16, 'big'))}/48", as_paths[i % paths]) for i, k in enumerate(keys6)]
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da RIB em memória")
+    parser.add_argument("--routers", type=int, default=3, help="Tabelas completas carregadas (uma por roteador)")
+    parser.add_argument("--v4", type=int, default=900000, help="Prefixos IPv4 por tabela")
+    parser.add_argument("--v6", type=int, default=200000, help="Prefixos IPv6 por tabela")
+    parser.add_argument("--paths", type=int, default=100000, help="AS-paths distintos por tabela")
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="Grava o resultado em JSON")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(BACKEND_DIR))
+    from app.services.rib import RIBStore
+
+    rng = random.Random(args.seed)
+    table = synthetic_table(args.v4, args.v6, args.paths, rng)
+    baseline = rss_mb()
+    store = RIBStore(max_age=None)
+
+    loads = []
+    print(f"{'roteador':<10} {'rotas':>9} {'carga s':>8} {'µs/rota':>8} {'RSS MB':>8}")
+    for router_id in range(args.routers):
+        next_hop = f"10.0.{router_id}.1"
+        routes = ((prefix, store.intern(next_hop, path, "", 0, None, "i")) for prefix, path in table)
+        start = time.perf_counter()
+        count = store.rib(router_id).load_peer(next_hop, routes)
+        elapsed = time.perf_counter() - start
+        loads.append({"routes": count, "seconds": round(elapsed, 2), "rss_mb": round(rss_mb() - baseline, 1)})
+        print(f"{router_id:<10} {count:>9} {elapsed:>8.1f} {elapsed / count * 1e6:>8.2f} {rss_mb() - baseline:>8.0f}")
+
+    targets = [socket.inet_ntoa(rng.getrandbits(32).to_bytes(4, "big")) for _ in range(args.lookups)]
+    times = []
+    hits = 0
+    for target in targets:
+        start = time.perf_counter()
+        hits += store.lookup(0, target) is not None
+        times.append(time.perf_counter() - start)
+    times.sort()
+    lookup = {
+        "median_us": round(statistics.median(times) * 1e6, 2),
+        "p99_us": round(times[int(len(times) * 0.99)] * 1e6, 2),
+        "hit_ratio": round(hits / len(targets), 3),
+    }
+    stats = store.stats()
+    print(f"lookup: mediana {lookup['median_us']} µs, p99 {lookup['p99_us']} µs, acertos {lookup['hit_ratio']:.1%}")
+    print(f"memória estimada {stats['memory_bytes'] / 1e6:.0f} MB, atributos {stats['attributes_memory_bytes'] / 1e6:.0f} MB, "
+          f"RSS adicional {rss_mb() - baseline:.0f} MB")
+
+    if args.output:
+        Path(args.output).write_text(json.dumps({
+            "python": sys.version.split()[0],
+            "loads": loads,
+            "lookup": lookup,
+            "memory_bytes": stats["memory_bytes"],
+        }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark ponta a ponta da API
+
+Sobe a frota de roteadores simulados (python -m simulator, em outro
+processo), recria e popula um banco PostgreSQL descartável, inicia o app
+FastAPI com uvicorn neste processo e dispara tráfego concorrente de acordo
+com um perfil. Ao final grava p50/p95/p99, vazão e lag do event loop por
+endpoint em JSON e, se houver baseline, mostra a variação.
+
+    python -m benchmarks.run --database-url postgresql+asyncpg://u:s@localhost/bgpcontrol_bench \\
+        --reset --mix default --routers 20 --concurrency 50 --duration 60 \\
+        --output benchmarks/results/atual.json --baseline benchmarks/results/baseline.json
+
+ATENÇÃO: --reset apaga todas as tabelas do banco informado.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Tuple
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do BGPControl")
+    parser.add_argument("--database-url", default=os.getenv("BENCH_DATABASE_URL"), help="Banco PostgreSQL descartável (ou BENCH_DATABASE_URL)")
+    parser.add_argument("--reset", action="store_true", help="Confirma que o banco pode ser apagado e recriado")
+    parser.add_argument("--mix", default="default", help="Perfil de tráfego (default, ssh, crud, login)")
+    parser.add_argument("--concurrency", type=int, default=20, help="Clientes simultâneos")
+    parser.add_argument("--duration", type=float, default=30, help="Duração da medição (s)")
+    parser.add_argument("--warmup", type=float, default=5, help="Aquecimento antes da medição (s)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--routers", type=int, default=10, help="Roteadores simulados")
+    parser.add_argument("--peers", type=int, default=20, help="Peerings cadastrados por roteador")
+    parser.add_argument("--groups", type=int, default=2, help="Grupos de peering por roteador")
+    parser.add_argument("--sim-host", default="127.0.1.1", help="Primeiro IP de loopback da frota")
+    parser.add_argument("--sim-port", type=int, default=2222)
+    parser.add_argument("--sim-latency", type=float, default=0.05, help="Latência por comando no simulador (s)")
+    parser.add_argument("--sim-args", default="", help="Argumentos extras para python -m simulator")
+    parser.add_argument("--sim-manifest", help="Usar uma frota já em execução (manifesto JSON) em vez de iniciar uma")
+    parser.add_argument("--output", help="Arquivo JSON de resultado")
+    parser.add_argument("--baseline", help="Resultado anterior para comparação")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Variação de p95 (%%) considerada regressão")
+    return parser.parse_args()
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_simulator(args) -> Tuple[subprocess.Popen, Dict]:
+    manifest_path = Path(tempfile.mkdtemp(prefix="bgpcontrol-bench-")) / "fleet.json"
+    command = [
+        sys.executable, "-m", "simulator",
+        "--count", str(args.routers), "--spread-hosts", "--host", args.sim_host,
+        "--base-port", str(args.sim_port), "--peers", str(max(args.peers, 2)),
+        "--latency", str(args.sim_latency), "--seed", str(args.seed),
+        "--manifest", str(manifest_path),
+    ] + args.sim_args.split()
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, stdout=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while not manifest_path.exists():
+        if process.poll() is not None or time.monotonic() > deadline:
+            process.kill()
+            raise SystemExit("Simulador não iniciou (veja python -m simulator --help)")
+        time.sleep(0.1)
+    time.sleep(0.2)
+    return process, json.loads(manifest_path.read_text())
+
+
+async def run_load(base_url: str, seed_info, args) -> Dict:
+    import httpx
+    from benchmarks.metrics import LatencyRecorder, LoopLagMonitor
+    from benchmarks.scenarios import MIXES, Context, login, pick
+
+    mix = MIXES[args.mix]
+    limits = httpx.Limits(max_connections=args.concurrency * 2, max_keepalive_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, timeout=180, limits=limits) as client:
+        contexts = []
+        warmup_recorder = LatencyRecorder()
+        for worker in range(args.concurrency):
+            ctx = Context(seed=seed_info, recorder=warmup_recorder, rng=random.Random(args.seed * 1000 + worker))
+            ctx.counter = worker * 1_000_000
+            await login(client, ctx)
+            if ctx.token is None:
+                raise SystemExit("Login do usuário de benchmark falhou")
+            contexts.append(ctx)
+
+        async def worker_loop(ctx: Context, until: float):
+            while time.monotonic() < until:
+                await pick(mix, ctx.rng)(client, ctx)
+
+        # Aquecimento: conexões SSH, pools e caches; descartado
+        if args.warmup > 0:
+            until = time.monotonic() + args.warmup
+            await asyncio.gather(*(worker_loop(ctx, until) for ctx in contexts))
+
+        recorder = LatencyRecorder()
+        lag = LoopLagMonitor()
+        for ctx in contexts:
+            ctx.recorder = recorder
+        lag.start()
+        until = time.monotonic() + args.duration
+        await asyncio.gather(*(worker_loop(ctx, until) for ctx in contexts))
+        recorder.finish()
+        await lag.stop()
+
+    result = recorder.summary()
+    result["event_loop_lag"] = lag.summary()
+    return result
+
+
+def compare(result: Dict, baseline: Dict, threshold: float) -> bool:
+    """Imprime a variação por endpoint; True se alguma p95 piorou além do limite"""
+    regression = False
+    print(f"\n{'endpoint':<48} {'p95 base':>10} {'p95 atual':>10} {'var %':>8} {'rps var %':>10}")
+    base_endpoints = baseline["results"]["endpoints"]
+    for name, current in result["endpoints"].items():
+        base = base_endpoints.get(name)
+        if not base or not base.get("p95_ms") or not current.get("p95_ms"):
+            continue
+        delta = 100.0 * (current["p95_ms"] - base["p95_ms"]) / base["p95_ms"]
+        rps_delta = 100.0 * (current["throughput_rps"] - base["throughput_rps"]) / base["throughput_rps"] if base["throughput_rps"] else 0.0
+        flag = "  <-- regressão" if delta > threshold else ""
+        regression |= delta > threshold
+        print(f"{name:<48} {base['p95_ms']:>10} {current['p95_ms']:>10} {delta:>8.1f} {rps_delta:>10.1f}{flag}")
+    return regression
+
+
+def print_result(result: Dict):
+    print(f"\n{'endpoint':<48} {'n':>6} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'erros':>6}")
+    for name, data in result["endpoints"].items():
+        errors = sum(data["errors"].values())
+        print(f"{name:<48} {data['count']:>6} {data['throughput_rps'] or 0:>8} {data['p50_ms'] or '-':>9} "
+              f"{data['p95_ms'] or '-':>9} {data['p99_ms'] or '-':>9} {errors:>6}")
+    total, lag = result["total"], result["event_loop_lag"]
+    print(f"\nTotal: {total['count']} requisições, {total['throughput_rps']} req/s, {total['errors']} erros")
+    print(f"Lag do event loop: p50 {lag['p50_ms']} ms, p99 {lag['p99_ms']} ms, máx {lag['max_ms']} ms")
+
+
+async def main_async(args) -> int:
+    # O app lê DATABASE_URL na importação de app.core.config
+    os.environ["DATABASE_URL"] = args.database_url
+    sys.path.insert(0, str(BACKEND_DIR))
+
+    import uvicorn
+    from app.core.config import engine
+    from app.main import app
+    from benchmarks.seed import reset_and_seed
+
+    # echo=True do engine gera uma linha de log por SQL e distorce a medição
+    engine.echo = False
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.WARNING)
+
+    simulator = None
+    if args.sim_manifest:
+        manifest = json.loads(Path(args.sim_manifest).read_text())
+    else:
+        simulator, manifest = start_simulator(args)
+    try:
+        seed_info = await reset_and_seed(engine, manifest, args.peers, args.groups)
+        port = free_port()
+        server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", loop="asyncio"))
+        server_task = asyncio.create_task(server.serve())
+        while not server.started:
+            await asyncio.sleep(0.05)
+        try:
+            result = await run_load(f"http://127.0.0.1:{port}", seed_info, args)
+        finally:
+            server.should_exit = True
+            await server_task
+    finally:
+        if simulator is not None:
+            simulator.terminate()
+            simulator.wait(timeout=10)
+
+    print_result(result)
+    output = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True).stdout.strip() or None,
+        "python": platform.python_version(),
+        "parameters": {
+            key: value for key, value in vars(args).items()
+            if key not in ("database_url", "output", "baseline", "reset")
+        },
+        "results": result,
+    }
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(json.dumps(output, indent=2))
+        print(f"\nResultado gravado em {args.output}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        if compare(result, baseline, args.threshold):
+            return 1
+    return 0
+
+
+def main():
+    args = parse_args()
+    if not args.database_url:
+        raise SystemExit("Informe --database-url (ou BENCH_DATABASE_URL) apontando para um banco descartável")
+    if not args.reset:
+        raise SystemExit("O benchmark apaga e recria as tabelas do banco; confirme com --reset")
+    from benchmarks.scenarios import MIXES
+    if args.mix not in MIXES:
+        raise SystemExit(f"Perfil desconhecido: {args.mix} (opções: {', '.join(MIXES)})")
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Operações de tráfego e perfis (mixes) usados pelo benchmark
+
+Cada operação é uma corrotina (client, ctx) que faz uma ou mais requisições e
+registra a latência sob um nome estável (usado para comparar com baselines).
+"""
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.metrics import LatencyRecorder
+from benchmarks.seed import SeedInfo
+
+
+@dataclass
+class Context:
+    seed: SeedInfo
+    recorder: LatencyRecorder
+    rng: random.Random
+    token: Optional[str] = None
+    counter: int = 0
+    created_peerings: List[int] = field(default_factory=list)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+    def next_id(self) -> int:
+        self.counter += 1
+        return self.counter
+
+
+Operation = Callable[[httpx.AsyncClient, Context], Awaitable[None]]
+
+
+async def timed(ctx: Context, name: str, request: Awaitable[httpx.Response], ok=(200,)) -> Optional[httpx.Response]:
+    start = time.perf_counter()
+    try:
+        response = await request
+    except httpx.HTTPError as e:
+        ctx.recorder.error(name, type(e).__name__)
+        return None
+    elapsed = time.perf_counter() - start
+    if response.status_code not in ok:
+        ctx.recorder.error(name, f"HTTP {response.status_code}")
+        return response
+    ctx.recorder.record(name, elapsed)
+    return response
+
+
+async def login(client: httpx.AsyncClient, ctx: Context):
+    response = await timed(ctx, "POST /api/users/login/", client.post(
+        "/api/users/login/", data={"username": ctx.seed.username, "password": ctx.seed.password}
+    ))
+    if response is not None and response.status_code == 200:
+        ctx.token = response.json()["access_token"]
+
+
+async def dashboard_status(client, ctx):
+    await timed(ctx, "GET /api/dashboard/status/", client.get("/api/dashboard/status/", headers=ctx.headers))
+
+
+async def list_routers(client, ctx):
+    await timed(ctx, "GET /api/routers/", client.get("/api/routers/", headers=ctx.headers))
+
+
+async def list_peerings(client, ctx):
+    await timed(ctx, "GET /api/peerings/", client.get("/api/peerings/", headers=ctx.headers))
+
+
+async def list_groups(client, ctx):
+    await timed(ctx, "GET /api/peering-groups/", client.get("/api/peering-groups/", headers=ctx.headers))
+
+
+async def peering_crud(client, ctx):
+    router_id = ctx.rng.choice(ctx.seed.router_ids)
+    n = ctx.next_id()
+    body = {
+        "name": f"bench-crud-{n}", "ip": f"198.18.{n // 256 % 256}.{n % 256}", "type": "IPv4",
+        "remote_asn": 65000, "remote_asn_name": "BENCH", "router_id": router_id,
+    }
+    response = await timed(ctx, "POST /api/peerings/", client.post("/api/peerings/", json=body, headers=ctx.headers))
+    if response is None or response.status_code != 200:
+        return
+    peering_id = response.json()["id"]
+    await timed(ctx, "PUT /api/peerings/{id}", client.put(f"/api/peerings/{peering_id}", json={"note": "alterado"}, headers=ctx.headers))
+    await timed(ctx, "DELETE /api/peerings/{id}", client.delete(f"/api/peerings/{peering_id}", headers=ctx.headers))
+
+
+async def group_crud(client, ctx):
+    router_id = ctx.rng.choice(ctx.seed.router_ids)
+    members = [pid for pid, _ in ctx.seed.peerings_by_router[router_id][:3]]
+    body = {"name": f"bench-grupo-{ctx.next_id()}", "description": "bench", "router_id": router_id, "peering_ids": members}
+    response = await timed(ctx, "POST /api/peering-groups/", client.post("/api/peering-groups/", json=body, headers=ctx.headers))
+    if response is None or response.status_code != 200:
+        return
+    group_id = response.json()["id"]
+    await timed(ctx, "GET /api/peering-groups/{id}", client.get(f"/api/peering-groups/{group_id}", headers=ctx.headers))
+    await timed(ctx, "DELETE /api/peering-groups/{id}", client.delete(f"/api/peering-groups/{group_id}", headers=ctx.headers))
+
+
+async def bgp_status(client, ctx):
+    router_id = ctx.rng.choice(ctx.seed.router_ids)
+    _, ip = ctx.rng.choice(ctx.seed.peerings_by_router[router_id])
+    await timed(ctx, "GET /api/routers/{id}/bgp-status", client.get(
+        f"/api/routers/{router_id}/bgp-status", params={"peer_ip": ip}, headers=ctx.headers
+    ))
+
+
+async def looking_glass(client, ctx, query_type: str = "ping"):
+    """POST /query seguido do stream SSE até [FIM]"""
+    router_id = ctx.rng.choice(ctx.seed.router_ids)
+    target = f"192.0.2.{ctx.rng.randint(1, 254)}"
+    body = {"type": query_type, "target": target, "routerId": router_id, "options": {"sourceIp": "1"}}
+    name = f"LG {query_type} (query + SSE)"
+    start = time.perf_counter()
+    try:
+        response = await client.post("/api/looking-glass/query", json=body, headers=ctx.headers)
+        if response.status_code != 200:
+            ctx.recorder.error(name, f"HTTP {response.status_code}")
+            return
+        query_id = response.json()["id"]
+        first_event = None
+        async with client.stream("GET", f"/api/looking-glass/stream/{query_id}", headers=ctx.headers) as stream:
+            async for line in stream.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                if first_event is None:
+                    first_event = time.perf_counter() - start
+                if line == "data: [FIM]":
+                    break
+                if line.startswith("data: Erro"):
+                    ctx.recorder.error(name, "erro na consulta")
+                    return
+    except httpx.HTTPError as e:
+        ctx.recorder.error(name, type(e).__name__)
+        return
+    ctx.recorder.record(name, time.perf_counter() - start, first_event)
+
+
+async def looking_glass_ping(client, ctx):
+    await looking_glass(client, ctx, "ping")
+
+
+async def looking_glass_bgp_summary(client, ctx):
+    await looking_glass(client, ctx, "bgp-summary")
+
+
+async def group_bgp_toggle(client, ctx):
+    group_id = ctx.rng.choice(ctx.seed.group_ids)
+    action = ctx.rng.choice(["bgp-enable", "bgp-disable"])
+    await timed(ctx, f"POST /api/peering-groups/{{id}}/{action}", client.post(
+        f"/api/peering-groups/{group_id}/{action}", headers=ctx.headers
+    ))
+
+
+# Perfis de tráfego: operação -> peso
+MIXES: Dict[str, Dict[Operation, int]] = {
+    # Uso típico do painel: muita leitura, algumas consultas SSH
+    "default": {
+        dashboard_status: 20, list_routers: 10, list_peerings: 15, list_groups: 10,
+        peering_crud: 5, group_crud: 3, bgp_status: 15, looking_glass_ping: 8,
+        looking_glass_bgp_summary: 4, group_bgp_toggle: 2, login: 2,
+    },
+    # Só caminhos que abrem SSH
+    "ssh": {bgp_status: 50, looking_glass_ping: 20, looking_glass_bgp_summary: 15, group_bgp_toggle: 15},
+    # Só banco de dados
+    "crud": {dashboard_status: 25, list_routers: 15, list_peerings: 20, list_groups: 15, peering_crud: 15, group_crud: 10},
+    # Apenas autenticação (custo do bcrypt)
+    "login": {login: 1},
+}
+
+
+def pick(mix: Dict[Operation, int], rng: random.Random) -> Operation:
+    operations = list(mix)
+    return rng.choices(operations, weights=[mix[op] for op in operations])[0]
@@ -0,0 +1,98 @@
+"""
+Banco de benchmark: recria as tabelas e cadastra usuário, roteadores
+(a partir do manifesto do simulador), peerings e grupos
+"""
+import base64
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.orm import sessionmaker
+
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class SeedInfo:
+    username: str = BENCH_USERNAME
+    password: str = BENCH_PASSWORD
+    router_ids: List[int] = field(default_factory=list)
+    peering_ids: List[int] = field(default_factory=list)
+    group_ids: List[int] = field(default_factory=list)
+    # router_id -> [(peering_id, ip)]
+    peerings_by_router: Dict[int, List[tuple]] = field(default_factory=dict)
+
+
+async def reset_and_seed(engine: AsyncEngine, manifest: Dict, peers_per_router: int, groups_per_router: int) -> SeedInfo:
+    # Importa todos os modelos para que o metadata tenha todas as tabelas
+    import app.models  # noqa: F401
+    from app.models.user import Base, User
+    from app.models.router import Router
+    from app.models.peering import Peering
+    from app.models.peering_group import PeeringGroup
+    from app.core.security import get_password_hash
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    info = SeedInfo()
+    Session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    async with Session() as session:
+        session.add(User(
+            username=BENCH_USERNAME,
+            hashed_password=get_password_hash(BENCH_PASSWORD),
+            name="Benchmark",
+            profile="Administrador",
+            is_active=True,
+        ))
+        for spec in manifest["routers"]:
+            router = Router(
+                name=spec["name"],
+                # routers.ip é único: a frota precisa ser gerada com --spread-hosts
+                ip=spec["ip"],
+                ssh_port=spec["ssh_port"],
+                ssh_user=spec["ssh_user"],
+                # A API guarda a senha em base64
+                ssh_password=base64.b64encode(spec["ssh_password"].encode()).decode(),
+                asn=spec["asn"],
+                note="benchmark",
+                is_active=True,
+                ip_origens=[{"id": 1, "name": "Loopback", "type": "IPv4", "ip": "10.255.255.1"}],
+            )
+            session.add(router)
+            await session.flush()
+            info.router_ids.append(router.id)
+            peerings = []
+            for n, peer in enumerate(spec["peers"][:peers_per_router]):
+                peering = Peering(
+                    name=f"{spec['name']}-peer{n + 1}",
+                    ip=peer["ip"],
+                    type="IPv6" if ":" in peer["ip"] else "IPv4",
+                    remote_asn=peer["remote_asn"],
+                    remote_asn_name=f"AS{peer['remote_asn']}",
+                    router_id=router.id,
+                    is_active=True,
+                )
+                session.add(peering)
+                peerings.append(peering)
+            await session.flush()
+            info.peering_ids += [p.id for p in peerings]
+            info.peerings_by_router[router.id] = [(p.id, p.ip) for p in peerings]
+            for g in range(groups_per_router):
+                members = peerings[g::groups_per_router]
+                if not members:
+                    continue
+                group = PeeringGroup(
+                    name=f"{spec['name']}-grupo{g + 1}",
+                    description="benchmark",
+                    router_id=router.id,
+                    is_active=True,
+                    peerings=members,
+                )
+                session.add(group)
+                await session.flush()
+                info.group_ids.append(group.id)
+        await session.commit()
+    return info
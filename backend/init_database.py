@@ -21,6 +21,10 @@ try:
     from app.models.router import Router
     from app.models.peering import Peering
     from app.models.peering_group import PeeringGroup, peering_group_association
+    from app.models.ssh_host_key import SSHHostKey
+    from app.models.bgp_peer_history import BGPPeerHistory
+    from app.models.route_snapshot import RouteSnapshot
+    from app.models.looking_glass_query import LookingGlassQueryState, LookingGlassQueryLines
     from app.core.security import get_password_hash
     from sqlalchemy.ext.asyncio import AsyncSession
     from sqlalchemy.orm import sessionmaker
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Importa um arquivo MRT (TABLE_DUMP_V2 ou BGP4MP, opcionalmente .gz/.bz2)
+na RIB em memória e, com --snapshots, grava snapshots de rotas recebidas.
+
+A RIB é a do processo que executa o script: para alimentar a API em
+execução use POST /api/mrt/imports; o script serve para validar arquivos,
+medir tempo de importação e gravar snapshots a partir de dumps.
+
+    python mrt_import.py /var/lib/bgpcontrol/mrt/rib.20260101.0000.bz2 --router 3 --snapshots
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+# Adicionar o diretório do app ao path
+sys.path.append(os.path.dirname(__file__))
+
+from app.services.mrt import MRTImporter
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+)
+
+logger = logging.getLogger(__name__)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Importa um dump MRT na RIB em memória")
+    parser.add_argument("file")
+    parser.add_argument("--router", type=int, help="Roteador que recebe todos os peers do dump")
+    parser.add_argument("--workers", type=int, help="Processos de parsing (padrão MRT_IMPORT_WORKERS)")
+    parser.add_argument("--snapshots", action="store_true", help="Grava snapshots de rotas recebidas dos peerings")
+    parser.add_argument("--no-db", action="store_true", help="Não consulta o inventário (todos os peers no roteador 0)")
+    args = parser.parse_args()
+    if args.no_db and args.snapshots:
+        parser.error("--snapshots precisa do banco")
+
+    from app.services.rib import RIBStore
+    importer = MRTImporter(store=RIBStore(max_age=None))
+    resolve = (lambda ip: (args.router or 0, None)) if args.no_db else None
+    job = await importer.run(args.file, args.router, args.snapshots, resolve=resolve, workers=args.workers)
+    info = job.to_dict()
+    if job.status != "done":
+        logger.error(f"Importação falhou: {job.error}")
+        sys.exit(1)
+    logger.info(
+        f"{info['file']}: {info['entries']} entradas em {info['elapsed_seconds']} s "
+        f"({info['entries_per_second']}/s), {len(info['peers'])} peers associados, "
+        f"{len(info['unmatched_peers'])} sem correspondência"
+    )
+    print(json.dumps(info, indent=2, default=str))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,9 @@
+"""
+Simulador de roteadores Huawei VRP via SSH, para testes de carga e benchmarks
+
+    python -m simulator --count 200 --base-port 2200 --latency 0.05 --manifest /tmp/fleet.json
+"""
+from simulator.server import SimulatorConfig, SimulatorFleet
+from simulator.vrp import VirtualPeer, VirtualRouter, VRPSession
+
+__all__ = ["SimulatorConfig", "SimulatorFleet", "VirtualPeer", "VirtualRouter", "VRPSession"]
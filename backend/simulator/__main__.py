@@ -0,0 +1,62 @@
+"""
+Executa uma frota de roteadores simulados até Ctrl+C
+
+Exemplos:
+    python -m simulator --count 1 --base-port 2222
+    python -m simulator --count 300 --spread-hosts --host 127.0.1.1 --base-port 2222 --manifest fleet.json
+    python -m simulator --count 50 --latency 0.2 --fail-drop 0.01 --max-sessions 2
+"""
+import argparse
+import dataclasses
+import logging
+import resource
+import signal
+import threading
+
+from simulator.server import SimulatorConfig, SimulatorFleet
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Servidor SSH simulado (Huawei VRP) para o BGPControl")
+    for field in dataclasses.fields(SimulatorConfig):
+        flag = "--" + field.name.replace("_", "-")
+        if field.type in (bool, "bool"):
+            parser.add_argument(flag, action="store_true", default=field.default)
+        else:
+            kind = {"int": int, "float": float, "str": str}.get(field.type, field.type)
+            parser.add_argument(flag, type=kind, default=field.default)
+    parser.add_argument("--manifest", help="Grava a lista de roteadores (JSON) neste arquivo")
+    parser.add_argument("--stats-interval", type=float, default=0, help="Imprime estatísticas a cada N segundos")
+    args = vars(parser.parse_args())
+    manifest = args.pop("manifest")
+    stats_interval = args.pop("stats_interval")
+    return SimulatorConfig(**args), manifest, stats_interval
+
+
+def raise_fd_limit():
+    # Centenas de roteadores abrem muitos sockets
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    config, manifest, stats_interval = parse_args()
+    raise_fd_limit()
+    fleet = SimulatorFleet(config)
+    fleet.start()
+    if manifest:
+        fleet.write_manifest(manifest)
+    first, last = fleet.routers[0], fleet.routers[-1]
+    print(f"{config.count} roteador(es): {first.host}:{first.port} ... {last.host}:{last.port} (usuário {config.username})")
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *a: stop.set())
+    signal.signal(signal.SIGTERM, lambda *a: stop.set())
+    while not stop.wait(stats_interval or None):
+        print(fleet.stats())
+    fleet.stop()
+
+
+if __name__ == "__main__":
+    main()
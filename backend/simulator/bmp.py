@@ -0,0 +1,323 @@
+"""
+Replayer BMP: faz o papel de um roteador exportando BMP (RFC 7854)
+
+Gera a partir de um roteador simulado (mesmos peers e rotas recebidas do
+servidor SSH simulado) a sequência Initiation, Peer Up, Route Monitoring
+com a tabela de cada peer e, opcionalmente, churn periódico, Peer Down e
+Termination. Também grava a sequência em arquivo ou reenvia um arquivo
+gravado (inclusive capturas de roteadores reais, só as mensagens BMP).
+
+O coletor identifica o roteador só pelo IP de origem: use --source com o IP
+cadastrado no roteador (127.0.1.x no loopback do Linux) ou mapeie o IP de
+saída para o roteador em BMP_SOURCES.
+
+Exemplos:
+    python -m simulator.bmp --target 127.0.0.1:11019 --index 0 --peers 4 --routes 100000
+    python -m simulator.bmp --index 2 --source 127.0.1.3 --churn-interval 5 --duration 60
+    python -m simulator.bmp --index 0 --routes 900000 --record full-table.bmp --no-send
+    python -m simulator.bmp --replay full-table.bmp --rate 20000
+"""
+import argparse
+import ipaddress
+import socket
+import struct
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from simulator.vrp import VirtualPeer, VirtualRouter
+
+# Tipos de mensagem BMP
+ROUTE_MONITORING, PEER_DOWN, PEER_UP, INITIATION, TERMINATION = 0, 2, 3, 4, 5
+MAX_UPDATE = 4096  # Tamanho máximo de uma mensagem BGP sem extended messages
+
+
+def message(kind: int, body: bytes) -> bytes:
+    return struct.pack("!BIB", 3, 6 + len(body), kind) + body
+
+
+def _tlvs(fields: Iterable[Tuple[int, bytes]]) -> bytes:
+    return b"".join(struct.pack("!HH", kind, len(value)) + value for kind, value in fields)
+
+
+def peer_header(peer: VirtualPeer, post_policy: bool = False, timestamp: Optional[float] = None) -> bytes:
+    address = ipaddress.ip_address(peer.ip)
+    flags = (0x80 if address.version == 6 else 0) | (0x40 if post_policy else 0)
+    packed = address.packed.rjust(16, b"\0")
+    bgp_id = (int(address) & 0xFFFFFFFF).to_bytes(4, "big")
+    ts = time.time() if timestamp is None else timestamp
+    return struct.pack("!BB8s16sI4sII", 0, flags, b"\0" * 8, packed, peer.asn, bgp_id, int(ts), int(ts % 1 * 1e6))
+
+
+def bgp_message(kind: int, body: bytes) -> bytes:
+    return b"\xff" * 16 + struct.pack("!HB", 19 + len(body), kind) + body
+
+
+def bgp_open(asn: int, router_id: str) -> bytes:
+    return bgp_message(1, struct.pack("!BHH4sB", 4, asn if asn < 65536 else 23456, 180, socket.inet_aton(router_id), 0))
+
+
+def initiation(router: VirtualRouter) -> bytes:
+    return message(INITIATION, _tlvs([(1, b"BGPControl simulator"), (2, router.name.encode())]))
+
+
+def termination(reason: int = 0) -> bytes:
+    return message(TERMINATION, _tlvs([(1, struct.pack("!H", reason))]))
+
+
+def peer_up(router: VirtualRouter, peer: VirtualPeer, uptime_seconds: float = 0) -> bytes:
+    local = ipaddress.ip_address(router.router_id).packed.rjust(16, b"\0")
+    body = (
+        peer_header(peer, timestamp=time.time() - uptime_seconds)
+        + local + struct.pack("!HH", 179, 50000 + (int(ipaddress.ip_address(peer.ip)) & 0x3FFF))
+        + bgp_open(router.asn, router.router_id)
+        + bgp_open(peer.asn, router.router_id)
+    )
+    return message(PEER_UP, body)
+
+
+def peer_down(peer: VirtualPeer, reason: int = 4) -> bytes:
+    # 4: sessão fechada pelo peer sem NOTIFICATION
+    return message(PEER_DOWN, peer_header(peer) + bytes((reason,)))
+
+
+def _nlri(prefix: ipaddress._BaseNetwork) -> bytes:
+    size = (prefix.prefixlen + 7) // 8
+    return bytes((prefix.prefixlen,)) + prefix.network_address.packed[:size]
+
+
+def _attr(kind: int, value: bytes, flags: int = 0x40) -> bytes:
+    if len(value) > 255:
+        return struct.pack("!BBH", flags | 0x10, kind, len(value)) + value
+    return struct.pack("!BBB", flags, kind, len(value)) + value
+
+
+def path_attributes(as_path: List[int], med: Optional[int] = None, local_pref: Optional[int] = None,
+                    communities: Iterable[Tuple[int, int]] = (), next_hop: Optional[str] = None) -> bytes:
+    """ORIGIN IGP, AS_PATH (AS de 4 bytes), NEXT_HOP (IPv4), MED, LOCAL_PREF e COMMUNITIES"""
+    attrs = _attr(1, b"\0")
+    attrs += _attr(2, struct.pack(f"!BB{len(as_path)}I", 2, len(as_path), *as_path) if as_path else b"")
+    if next_hop is not None:
+        attrs += _attr(3, socket.inet_aton(next_hop))
+    if med is not None:
+        attrs += _attr(4, struct.pack("!I", med), 0x80)
+    if local_pref is not None:
+        attrs += _attr(5, struct.pack("!I", local_pref))
+    communities = list(communities)
+    if communities:
+        attrs += _attr(8, b"".join(struct.pack("!HH", a, b) for a, b in communities), 0xC0)
+    return attrs
+
+
+def updates(version: int, attrs: bytes, next_hop: str, announce: List[ipaddress._BaseNetwork] = (),
+            withdraw: List[ipaddress._BaseNetwork] = ()) -> Iterator[bytes]:
+    """UPDATEs BGP com até MAX_UPDATE bytes; IPv6 vai em MP_REACH/MP_UNREACH"""
+    budget = MAX_UPDATE - 19 - 4 - len(attrs) - 40
+    for batch in _chunks([_nlri(p) for p in withdraw], budget):
+        if version == 4:
+            yield bgp_message(2, struct.pack("!H", len(batch)) + batch + struct.pack("!H", 0))
+        else:
+            mp = _attr(15, struct.pack("!HB", 2, 1) + batch, 0x80)
+            yield bgp_message(2, struct.pack("!HH", 0, len(mp)) + mp)
+    for batch in _chunks([_nlri(p) for p in announce], budget):
+        if version == 4:
+            full = attrs + _attr(3, socket.inet_aton(next_hop))
+            yield bgp_message(2, struct.pack("!HH", 0, len(full)) + full + batch)
+        else:
+            nh = ipaddress.IPv6Address(next_hop).packed
+            mp = _attr(14, struct.pack("!HBB", 2, 1, 16) + nh + b"\0" + batch, 0x80)
+            full = mp + attrs
+            yield bgp_message(2, struct.pack("!HH", 0, len(full)) + full)
+
+
+def _chunks(items: List[bytes], budget: int) -> Iterator[bytes]:
+    batch, size = [], 0
+    for item in items:
+        if size + len(item) > budget and batch:
+            yield b"".join(batch)
+            batch, size = [], 0
+        batch.append(item)
+        size += len(item)
+    if batch:
+        yield b"".join(batch)
+
+
+def route_monitoring(peer: VirtualPeer, update: bytes, post_policy: bool = False) -> bytes:
+    return message(ROUTE_MONITORING, peer_header(peer, post_policy) + update)
+
+
+# Tabelas dos peers ---------------------------------------------------------
+
+def received_table(router: VirtualRouter, peer: VirtualPeer, routes: int, epoch: int = 0) -> Dict[Tuple[int, int], List]:
+    """
+    (MED, AS de origem) -> prefixos, como em VRPSession.received_routes: a cada
+    época ~2% dos prefixos somem e ~2% mudam de MED.
+    """
+    groups: Dict[Tuple[int, int], List] = {}
+    for n in range(routes):
+        churn = (n * 2654435761 + epoch * 40503 + peer.asn) % 100
+        if churn < 2:
+            continue
+        if peer.version == 6:
+            prefix = ipaddress.IPv6Network(((0x2a00 << 112) + ((peer.asn % 4096) << 100) + (n << 80), 48))
+        else:
+            prefix = ipaddress.IPv4Network((0x2D000000 + ((peer.asn % 64) << 18) + (n << 8), 24))
+        groups.setdefault((100 if churn < 4 else 0, 64000 + n % 500), []).append(prefix)
+    return groups
+
+
+def table_messages(peer: VirtualPeer, table: Dict[Tuple[int, int], List], withdraw: Iterable = ()) -> Iterator[bytes]:
+    next_hop = peer.ip
+    withdraw = list(withdraw)
+    if withdraw:
+        for update in updates(peer.version, b"", next_hop, withdraw=withdraw):
+            yield route_monitoring(peer, update)
+    for (med, origin_as), prefixes in table.items():
+        attrs = path_attributes([peer.asn, origin_as], med=med, communities=[(peer.asn & 0xFFFF, 100)])
+        for update in updates(peer.version, attrs, next_hop, announce=prefixes):
+            yield route_monitoring(peer, update)
+
+
+def _flatten(table: Dict[Tuple[int, int], List]) -> Dict:
+    return {prefix: attrs for attrs, prefixes in table.items() for prefix in prefixes}
+
+
+def churn_messages(router: VirtualRouter, peer: VirtualPeer, routes: int, epoch: int) -> Iterator[bytes]:
+    """Diferença entre as tabelas de duas épocas seguidas"""
+    old, new = _flatten(received_table(router, peer, routes, epoch - 1)), _flatten(received_table(router, peer, routes, epoch))
+    withdrawn = [prefix for prefix in old if prefix not in new]
+    changed: Dict[Tuple[int, int], List] = {}
+    for prefix, attrs in new.items():
+        if old.get(prefix) != attrs:
+            changed.setdefault(attrs, []).append(prefix)
+    yield from table_messages(peer, changed, withdrawn)
+
+
+def session_messages(router: VirtualRouter, routes: int) -> Iterator[bytes]:
+    """Início de sessão: Initiation, Peer Up e tabela completa de cada peer estabelecido"""
+    yield initiation(router)
+    established = [peer for peer in router.peers.values() if peer.state == "Established"]
+    for peer in established:
+        yield peer_up(router, peer, uptime_seconds=3600)
+    for peer in established:
+        yield from table_messages(peer, received_table(router, peer, routes))
+
+
+def iter_file(path: str) -> Iterator[bytes]:
+    """Mensagens BMP de um arquivo gravado (concatenação das mensagens)"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(6)
+            if len(header) < 6:
+                return
+            version, length, _ = struct.unpack("!BIB", header)
+            if version != 3 or length < 6:
+                raise SystemExit(f"{path}: cabeçalho BMP inválido")
+            yield header + f.read(length - 6)
+
+
+# Envio -------------------------------------------------------------------
+
+class Sender:
+    """Envia (ou grava) mensagens, opcionalmente limitando a taxa"""
+
+    def __init__(self, sock: Optional[socket.socket], record=None, rate: float = 0):
+        self.sock = sock
+        self.record = record
+        self.rate = rate
+        self.messages = 0
+        self.bytes = 0
+        self._pending: List[bytes] = []
+        self._start = time.monotonic()
+
+    def send(self, data: bytes):
+        self._pending.append(data)
+        self.messages += 1
+        self.bytes += len(data)
+        if len(self._pending) >= 256:
+            self.flush()
+        if self.rate and self.messages % 100 == 0:
+            delay = self._start + self.messages / self.rate - time.monotonic()
+            if delay > 0:
+                self.flush()
+                time.sleep(delay)
+
+    def flush(self):
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        self._pending.clear()
+        if self.sock is not None:
+            self.sock.sendall(data)
+        if self.record is not None:
+            self.record.write(data)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replayer BMP (RFC 7854) para testar o coletor do BGPControl")
+    parser.add_argument("--target", default="127.0.0.1:11019", help="host:porta do coletor")
+    parser.add_argument("--source", help="IP de origem da conexão (o IP cadastrado no roteador)")
+    parser.add_argument("--index", type=int, default=0, help="Roteador simulado (SIM-R<index+1>)")
+    parser.add_argument("--peers", type=int, default=4)
+    parser.add_argument("--routes", type=int, default=10000, help="Rotas recebidas de cada peer")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=0, help="Mensagens por segundo (0 = sem limite)")
+    parser.add_argument("--churn-interval", type=float, default=0, help="Segundos entre rodadas de churn (0 = sem churn)")
+    parser.add_argument("--duration", type=float, default=0, help="Segundos até encerrar depois da carga (0 = até Ctrl+C se houver churn)")
+    parser.add_argument("--flap", action="store_true", help="No fim, derruba os peers (Peer Down) antes da Termination")
+    parser.add_argument("--record", help="Grava as mensagens enviadas neste arquivo")
+    parser.add_argument("--replay", help="Envia as mensagens deste arquivo em vez de gerar")
+    parser.add_argument("--no-send", action="store_true", help="Só grava (--record), sem conectar")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    router = VirtualRouter.generate(args.index, args.peers, args.routes, seed=args.seed)
+    sock = None
+    if not args.no_send:
+        host, _, port = args.target.rpartition(":")
+        sock = socket.create_connection((host, int(port)), source_address=(args.source, 0) if args.source else None)
+    record = open(args.record, "wb") if args.record else None
+    sender = Sender(sock, record, args.rate)
+    start = time.monotonic()
+    try:
+        if args.replay:
+            for data in iter_file(args.replay):
+                sender.send(data)
+        else:
+            for data in session_messages(router, args.routes):
+                sender.send(data)
+            sender.flush()
+            elapsed = time.monotonic() - start
+            print(f"{router.name}: carga inicial com {sender.messages} mensagens ({sender.bytes / 1e6:.1f} MB) em {elapsed:.1f} s")
+            established = [peer for peer in router.peers.values() if peer.state == "Established"]
+            deadline = time.monotonic() + args.duration if args.duration else None
+            epoch = 0
+            while args.churn_interval and (deadline is None or time.monotonic() < deadline):
+                time.sleep(args.churn_interval)
+                epoch += 1
+                for peer in established:
+                    for data in churn_messages(router, peer, args.routes, epoch):
+                        sender.send(data)
+                sender.flush()
+                print(f"churn {epoch}: {sender.messages} mensagens no total")
+            if deadline is not None and not args.churn_interval:
+                time.sleep(max(0.0, deadline - time.monotonic()))
+            if args.flap:
+                for peer in established:
+                    sender.send(peer_down(peer))
+            sender.send(termination())
+        sender.flush()
+    except KeyboardInterrupt:
+        sender.flush()
+    finally:
+        if sock is not None:
+            sock.close()
+        if record is not None:
+            record.close()
+    print(f"{sender.messages} mensagens, {sender.bytes / 1e6:.1f} MB em {time.monotonic() - start:.1f} s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""
+Servidor SSH simulado (lado servidor do paramiko)
+
+Um SimulatorFleet escuta em vários endereços/portas com um único loop de
+accept (selectors); cada conexão aceita ganha um paramiko.Transport e cada
+canal (exec ou shell) é atendido por uma thread. Latência, vazão de saída,
+limite de sessões e injeção de falhas vêm do SimulatorConfig.
+"""
+import ipaddress
+import json
+import random
+import selectors
+import socket
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+import paramiko
+
+from simulator.vrp import VirtualRouter, VRPSession
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SimulatorConfig:
+    count: int = 1                  # Roteadores virtuais
+    host: str = "127.0.0.1"         # Endereço do primeiro roteador
+    base_port: int = 2200           # Porta do primeiro roteador
+    spread_hosts: bool = False      # True: um IP de loopback por roteador, todos na mesma porta
+    username: str = "admin"
+    password: str = "admin"
+    peers: int = 20                 # Peers BGP por roteador
+    advertised_routes: int = 100    # Rotas em "advertised-routes"
+    latency: float = 0.05           # Atraso (s) antes da resposta de cada comando
+    jitter: float = 0.0             # Variação aleatória (s) somada à latência
+    connect_delay: float = 0.0      # Atraso (s) antes do handshake (simula RTT/CPU do roteador)
+    output_bps: int = 0             # Vazão máxima da saída em bytes/s (0 = sem limite)
+    ping_latency_ms: float = 10.0   # RTT médio reportado por ping/tracert
+    ping_loss: float = 0.0          # Fração de pacotes perdidos no ping
+    max_sessions: int = 5           # Canais simultâneos por roteador (VTYs)
+    fail_connect: float = 0.0       # Probabilidade de derrubar o TCP antes do handshake
+    fail_auth: float = 0.0          # Probabilidade de recusar a senha correta
+    fail_channel: float = 0.0       # Probabilidade de recusar a abertura de canal
+    fail_drop: float = 0.0          # Probabilidade de fechar a conexão no meio de um comando
+    fail_hang: float = 0.0          # Probabilidade de nunca responder a um comando
+    seed: int = 0
+
+
+class _RouterState:
+    """Roteador virtual + contadores de sessão compartilhados entre conexões"""
+
+    def __init__(self, router: VirtualRouter, host: str, port: int):
+        self.router = router
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.active_channels = 0
+        self.connections = 0
+        self.commands = 0
+
+
+class _SimServer(paramiko.ServerInterface):
+    def __init__(self, fleet: "SimulatorFleet", state: _RouterState):
+        self.fleet = fleet
+        self.state = state
+        self.config = fleet.config
+        self.rng = fleet.rng
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        if self.rng.random() < self.config.fail_auth:
+            return paramiko.AUTH_FAILED
+        if username == self.config.username and password == self.config.password:
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind != "session":
+            return paramiko.OPEN_FAILED_UNKNOWN_CHANNEL_TYPE
+        with self.state.lock:
+            if self.state.active_channels >= self.config.max_sessions or self.rng.random() < self.config.fail_channel:
+                return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+            self.state.active_channels += 1
+        return paramiko.OPEN_SUCCEEDED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.fleet.start_thread(self.fleet.serve_shell, self.state, channel)
+        return True
+
+    def check_channel_exec_request(self, channel, command):
+        self.fleet.start_thread(self.fleet.serve_exec, self.state, channel, command.decode(errors="ignore"))
+        return True
+
+
+class SimulatorFleet:
+    """Conjunto de roteadores virtuais escutando em um mesmo processo"""
+
+    def __init__(self, config: SimulatorConfig, host_key: Optional[paramiko.PKey] = None):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        # ECDSA: geração instantânea, ao contrário de RSA
+        self.host_key = host_key or paramiko.ECDSAKey.generate()
+        self.routers: List[_RouterState] = []
+        for index in range(config.count):
+            if config.spread_hosts:
+                host, port = str(ipaddress.IPv4Address(config.host) + index), config.base_port
+            else:
+                host, port = config.host, config.base_port + index
+            router = VirtualRouter.generate(index, config.peers, config.advertised_routes, config.seed)
+            self.routers.append(_RouterState(router, host, port))
+        self._selector = selectors.DefaultSelector()
+        self._sockets: List[socket.socket] = []
+        self._transports: List[paramiko.Transport] = []
+        self._transports_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Ciclo de vida -------------------------------------------------------
+
+    def start(self):
+        for state in self.routers:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((state.host, state.port))
+            sock.listen(128)
+            sock.setblocking(False)
+            self._selector.register(sock, selectors.EVENT_READ, state)
+            self._sockets.append(sock)
+        self._thread = threading.Thread(target=self._accept_loop, name="sim-accept", daemon=True)
+        self._thread.start()
+        logger.info(f"{len(self.routers)} roteador(es) simulado(s) escutando")
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        for sock in self._sockets:
+            self._selector.unregister(sock)
+            sock.close()
+        self._sockets.clear()
+        with self._transports_lock:
+            transports, self._transports = self._transports, []
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _accept_loop(self):
+        while not self._stop.is_set():
+            # Descarta transportes de clientes que já desconectaram
+            with self._transports_lock:
+                self._transports = [t for t in self._transports if t.is_active()]
+            for key, _ in self._selector.select(timeout=0.5):
+                try:
+                    conn, _ = key.fileobj.accept()
+                except OSError:
+                    continue
+                self.start_thread(self._handle_connection, key.data, conn)
+
+    def _handle_connection(self, state: _RouterState, conn: socket.socket):
+        conn.setblocking(True)
+        if self.rng.random() < self.config.fail_connect:
+            conn.close()
+            return
+        if self.config.connect_delay:
+            time.sleep(self.config.connect_delay)
+        with state.lock:
+            state.connections += 1
+        transport = paramiko.Transport(conn)
+        transport.add_server_key(self.host_key)
+        with self._transports_lock:
+            self._transports.append(transport)
+        try:
+            transport.start_server(server=_SimServer(self, state))
+        except (paramiko.SSHException, EOFError, OSError):
+            # Removido da lista pelo loop de accept (is_active() falso)
+            transport.close()
+
+    @staticmethod
+    def start_thread(target, *args):
+        threading.Thread(target=target, args=args, daemon=True).start()
+
+    # Atendimento dos canais ---------------------------------------------
+
+    def _release(self, state: _RouterState, channel: paramiko.Channel):
+        with state.lock:
+            state.active_channels -= 1
+        try:
+            channel.close()
+        except Exception:
+            pass
+
+    def _command_delay(self) -> float:
+        jitter = self.rng.uniform(0, self.config.jitter) if self.config.jitter else 0.0
+        return self.config.latency + jitter
+
+    def _send(self, channel: paramiko.Channel, text: str):
+        data = text.encode()
+        bps = self.config.output_bps
+        if not bps:
+            channel.sendall(data)
+            return
+        # Envia em blocos respeitando a vazão configurada
+        block = max(1, bps // 20)
+        for start in range(0, len(data), block):
+            channel.sendall(data[start:start + block])
+            time.sleep(len(data[start:start + block]) / bps)
+
+    def _run_command(self, state: _RouterState, session: VRPSession, channel: paramiko.Channel, line: str) -> bool:
+        """Executa um comando enviando a saída ao canal; False se a conexão foi derrubada"""
+        with state.lock:
+            state.commands += 1
+        if self.rng.random() < self.config.fail_hang:
+            # Nunca responde: o cliente precisa de timeout
+            self._stop.wait()
+            return False
+        time.sleep(self._command_delay())
+        for delay, text in session.execute(line):
+            if delay:
+                time.sleep(delay)
+            if self.rng.random() < self.config.fail_drop:
+                channel.get_transport().close()
+                return False
+            self._send(channel, text)
+        return True
+
+    def serve_exec(self, state: _RouterState, channel: paramiko.Channel, command: str):
+        session = VRPSession(state.router, self.config.ping_latency_ms, self.config.ping_loss, random.Random(self.rng.random()))
+        try:
+            # O exec do VRP aceita várias linhas (ex.: configuração em um único comando)
+            for line in command.splitlines():
+                if not self._run_command(state, session, channel, line):
+                    return
+            channel.send_exit_status(0)
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            self._release(state, channel)
+
+    def serve_shell(self, state: _RouterState, channel: paramiko.Channel):
+        session = VRPSession(state.router, self.config.ping_latency_ms, self.config.ping_loss, random.Random(self.rng.random()))
+        try:
+            channel.sendall((session.banner() + session.prompt).encode())
+            buffer = b""
+            while True:
+                data = channel.recv(4096)
+                if not data:
+                    return
+                buffer += data
+                while b"\n" in buffer:
+                    raw, buffer = buffer.split(b"\n", 1)
+                    line = raw.decode(errors="ignore").rstrip("\r")
+                    # Eco do que foi digitado (PTY)
+                    channel.sendall((line + "\r\n").encode())
+                    if line.strip() in ("quit", "exit") and session.mode == "user":
+                        return
+                    if not self._run_command(state, session, channel, line):
+                        return
+                    channel.sendall(session.prompt.encode())
+        except (OSError, EOFError, paramiko.SSHException):
+            pass
+        finally:
+            self._release(state, channel)
+
+    # Informações ---------------------------------------------------------
+
+    def manifest(self) -> List[Dict]:
+        """Lista de roteadores (para cadastrar no banco de benchmarks)"""
+        return [
+            {
+                "name": state.router.name,
+                "ip": state.host,
+                "ssh_port": state.port,
+                "ssh_user": self.config.username,
+                "ssh_password": self.config.password,
+                "asn": state.router.asn,
+                "peers": [
+                    {"ip": peer.ip, "remote_asn": peer.asn, "state": peer.state}
+                    for peer in state.router.peers.values()
+                ],
+            }
+            for state in self.routers
+        ]
+
+    def write_manifest(self, path: str):
+        with open(path, "w") as f:
+            json.dump({"config": asdict(self.config), "routers": self.manifest()}, f, indent=2)
+
+    def stats(self) -> Dict:
+        return {
+            "routers": len(self.routers),
+            "transports": len(self._transports),
+            "active_channels": sum(s.active_channels for s in self.routers),
+            "connections": sum(s.connections for s in self.routers),
+            "commands": sum(s.commands for s in self.routers),
+        }
@@ -0,0 +1,383 @@
+"""
+Emulação dos comandos Huawei VRP usados pelo BGPControl
+
+Cada roteador virtual tem uma tabela de peers BGP gerada de forma
+determinística (a partir da semente) e responde aos mesmos comandos que o
+backend envia: display bgp, ping, tracert e a sequência de configuração
+system-view / bgp / [undo] peer ... ignore / commit / return. As saídas
+seguem o formato do VRP para que os parsers do backend funcionem sem ajuste.
+"""
+import ipaddress
+import random
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# (atraso em segundos antes do trecho, texto)
+OutputChunk = Tuple[float, str]
+
+UNRECOGNIZED = "Error: Unrecognized command found at '^' position."
+
+
+@dataclass
+class VirtualPeer:
+    ip: str
+    asn: int
+    state: str = "Established"
+    prefixes_received: int = 0
+    msg_received: int = 0
+    msg_sent: int = 0
+    uptime: str = "0012h34m"
+    ignored: bool = False
+
+    @property
+    def version(self) -> int:
+        return 6 if ":" in self.ip else 4
+
+    @property
+    def display_state(self) -> str:
+        return "Idle(Admin)" if self.ignored else self.state
+
+
+@dataclass
+class VirtualRouter:
+    """Estado de um roteador simulado (peers, rotas anunciadas e modo da CLI)"""
+    name: str
+    asn: int
+    router_id: str
+    peers: Dict[str, VirtualPeer] = field(default_factory=dict)
+    advertised_routes: int = 100
+
+    @classmethod
+    def generate(cls, index: int, peers: int, advertised_routes: int, seed: int = 0) -> "VirtualRouter":
+        rng = random.Random(seed * 100003 + index)
+        router = cls(
+            name=f"SIM-R{index + 1}",
+            asn=64512 + index,
+            router_id=f"10.255.{index // 256}.{index % 256}",
+            advertised_routes=advertised_routes,
+        )
+        for n in range(peers):
+            # Metade IPv4, metade IPv6; alguns peers fora do ar para variar a saída
+            if n % 2 == 0:
+                ip = str(ipaddress.IPv4Address(0x0A000000 + (index << 12) + n + 1))
+            else:
+                ip = str(ipaddress.IPv6Address((0x20010DB8 << 96) + (index << 16) + n + 1))
+            state = "Established" if rng.random() > 0.1 else rng.choice(["Active", "Idle", "Connect"])
+            router.peers[ip] = VirtualPeer(
+                ip=ip,
+                asn=rng.randint(1000, 65000),
+                state=state,
+                prefixes_received=rng.randint(1, 900000) if state == "Established" else 0,
+                msg_received=rng.randint(1000, 10 ** 7),
+                msg_sent=rng.randint(1000, 10 ** 7),
+                uptime=f"{rng.randint(0, 9999):04d}h{rng.randint(0, 59):02d}m",
+            )
+        return router
+
+    def advertised_prefixes(self, version: int) -> Iterator[str]:
+        for n in range(self.advertised_routes):
+            if version == 6:
+                yield str(ipaddress.IPv6Network(((0x2804 << 112) + (n << 80), 48)))
+            else:
+                yield str(ipaddress.IPv4Network((0x64400000 + (n << 8), 24)))
+
+
+class VRPSession:
+    """Interpreta comandos de uma sessão (shell ou exec) sobre um VirtualRouter"""
+
+    def __init__(self, router: VirtualRouter, ping_latency_ms: float = 10.0, ping_loss: float = 0.0, rng: Optional[random.Random] = None):
+        self.router = router
+        self.mode = "user"  # user, system, bgp
+        self.ping_latency_ms = ping_latency_ms
+        self.ping_loss = ping_loss
+        self.rng = rng or random.Random()
+        self._pending: List[Tuple[str, bool]] = []
+
+    @property
+    def prompt(self) -> str:
+        if self.mode == "bgp":
+            return f"[~{self.router.name}-bgp]"
+        if self.mode == "system":
+            return f"[~{self.router.name}]"
+        return f"<{self.router.name}>"
+
+    def banner(self) -> str:
+        return (
+            "\r\nInfo: The max number of VTY users is 5, the number of current VTY users online is 1.\r\n"
+            "      The current login time is 2026-01-01 00:00:00.\r\n"
+        )
+
+    def execute(self, line: str) -> Iterator[OutputChunk]:
+        """Executa uma linha de comando; gera trechos de saída (com atraso) sem o prompt final"""
+        command, filters = self._split_pipes(line.strip())
+        if not command:
+            return
+        handler = self._dispatch(command)
+        if handler is None:
+            yield 0.0, UNRECOGNIZED + "\r\n"
+            return
+        for delay, text in handler:
+            if filters:
+                text = self._apply_filters(text, filters)
+            yield delay, text
+
+    @staticmethod
+    def _split_pipes(line: str) -> Tuple[str, List[Tuple[str, str]]]:
+        parts = [p.strip() for p in line.split("|")]
+        filters = []
+        for part in parts[1:]:
+            name, _, arg = part.partition(" ")
+            if name in ("inc", "include", "i"):
+                filters.append(("include", arg.strip()))
+            elif name in ("exc", "exclude", "e"):
+                filters.append(("exclude", arg.strip()))
+            # no-more e demais pipes não alteram a saída
+        return parts[0], filters
+
+    @staticmethod
+    def _apply_filters(text: str, filters: List[Tuple[str, str]]) -> str:
+        lines = text.split("\r\n")
+        for kind, pattern in filters:
+            try:
+                regex = re.compile(pattern)
+            except re.error:
+                regex = re.compile(re.escape(pattern))
+            keep = (lambda l: regex.search(l)) if kind == "include" else (lambda l: not regex.search(l))
+            lines = [l for l in lines if keep(l)]
+        return "".join(l + "\r\n" for l in lines if l)
+
+    def _dispatch(self, command: str) -> Optional[Iterator[OutputChunk]]:
+        words = command.split()
+        lowered = [w.lower() for w in words]
+        if lowered[:3] == ["display", "bgp", "all"] or lowered[:3] == ["display", "bgp", "peer"]:
+            return iter([(0.0, self.bgp_summary())])
+        if lowered[:2] == ["display", "bgp"] and ("advertised-routes" in lowered or "received-routes" in lowered):
+            version = 6 if "ipv6" in lowered else 4
+            peer_ip = words[lowered.index("peer") + 1] if "peer" in lowered else ""
+            table = self.advertised_routes if "advertised-routes" in lowered else self.received_routes
+            return iter([(0.0, table(peer_ip, version))])
+        if lowered[:2] == ["display", "bgp"] and "routing-table" in lowered:
+            target = words[lowered.index("routing-table") + 1] if lowered.index("routing-table") + 1 < len(words) else ""
+            return iter([(0.0, self.route_lookup(target, "as-path" in lowered))])
+        if lowered[0] == "ping":
+            return self.ping(words[1:])
+        if lowered[0] == "tracert":
+            return self.tracert(words[1:])
+        if lowered[:2] == ["screen-length", "0"]:
+            return iter([(0.0, "Info: The configuration takes effect on the current user terminal interface only.\r\n")])
+        return self._config(lowered, words)
+
+    # Configuração -------------------------------------------------------
+
+    def _config(self, lowered: List[str], words: List[str]) -> Optional[Iterator[OutputChunk]]:
+        if lowered == ["system-view"] or lowered == ["configure", "terminal"]:
+            self.mode = "system"
+            return iter([(0.0, "Enter system view, return user view with return command.\r\n")])
+        if lowered[0] in ("bgp", "router") and self.mode != "user":
+            self.mode = "bgp"
+            return iter([])
+        if self.mode == "bgp" and "peer" in lowered and lowered[-1] == "ignore":
+            undo = lowered[0] == "undo"
+            self._pending.append((words[lowered.index("peer") + 1], not undo))
+            return iter([])
+        if self.mode == "bgp" and "neighbor" in lowered and lowered[-1] == "shutdown":
+            no = lowered[0] == "no"
+            self._pending.append((words[lowered.index("neighbor") + 1], not no))
+            self._commit()
+            return iter([])
+        if lowered == ["commit"]:
+            self._commit()
+            return iter([])
+        if lowered in (["return"], ["end"]):
+            self.mode = "user"
+            return iter([])
+        if lowered == ["quit"]:
+            self.mode = {"bgp": "system", "system": "user"}.get(self.mode, "user")
+            return iter([])
+        if lowered[:2] == ["write", "memory"] or lowered == ["save"]:
+            return iter([(0.0, "Info: Save the configuration successfully.\r\n")])
+        return None
+
+    def _commit(self):
+        for ip, ignored in self._pending:
+            peer = self.router.peers.get(ip)
+            if peer is not None:
+                peer.ignored = ignored
+        self._pending.clear()
+
+    # Saídas -------------------------------------------------------------
+
+    def bgp_summary(self) -> str:
+        router = self.router
+        out = [
+            "",
+            f" BGP local router ID : {router.router_id}",
+            f" Local AS number : {router.asn}",
+        ]
+        for family, version in (("Ipv4 Unicast", 4), ("Ipv6 Unicast", 6)):
+            peers = [p for p in router.peers.values() if p.version == version]
+            established = sum(1 for p in peers if p.display_state == "Established")
+            out += [
+                "",
+                f" Address Family:{family}",
+                " " + "-" * 79,
+                f" Total number of peers : {len(peers):<18}Peers in established state : {established}",
+                "",
+                "  Peer            V          AS  MsgRcvd  MsgSent  OutQ  Up/Down       State  PrefRcv",
+            ]
+            for p in peers:
+                counters = (
+                    f"4 {p.asn:>11} {p.msg_received:>8} {p.msg_sent:>8} {0:>5} "
+                    f"{p.uptime:>8} {p.display_state:>11} {p.prefixes_received if p.display_state == 'Established' else 0:>8}"
+                )
+                # Como no VRP, endereços maiores que a coluna vão sozinhos numa linha
+                if len(p.ip) > 15:
+                    out += [f"  {p.ip.upper()}", f"  {'':<15} {counters}"]
+                else:
+                    out.append(f"  {p.ip:<15} {counters}")
+        return "\r\n".join(out) + "\r\n"
+
+    def advertised_routes(self, peer_ip: str, version: int) -> str:
+        router = self.router
+        if peer_ip not in router.peers:
+            return "Error: The peer does not exist.\r\n"
+        next_hop = router.router_id if version == 4 else "::"
+        rows = ((prefix, next_hop, 0, str(router.asn)) for prefix in router.advertised_prefixes(version))
+        return self._route_table(version, router.advertised_routes, rows)
+
+    def received_routes(self, peer_ip: str, version: int) -> str:
+        """Rotas aprendidas do peer; a cada minuto ~2% somem e ~2% mudam de MED"""
+        router = self.router
+        peer = router.peers.get(peer_ip)
+        if peer is None:
+            return "Error: The peer does not exist.\r\n"
+        epoch = int(time.time() // 60)
+        rows = []
+        for n in range(router.advertised_routes):
+            churn = (n * 2654435761 + epoch * 40503 + peer.asn) % 100
+            if churn < 2:
+                continue
+            if version == 6:
+                prefix = str(ipaddress.IPv6Network(((0x2a00 << 112) + ((peer.asn % 4096) << 100) + (n << 80), 48)))
+            else:
+                prefix = str(ipaddress.IPv4Network((0x2D000000 + ((peer.asn % 64) << 18) + (n << 8), 24)))
+            med = 100 if churn < 4 else 0
+            rows.append((prefix, peer.ip, med, f"{peer.asn} {64000 + n % 500}"))
+        return self._route_table(version, len(rows), rows)
+
+    def _route_table(self, version: int, total: int, rows) -> str:
+        router = self.router
+        header = [
+            "",
+            f" BGP Local router ID is {router.router_id}",
+            " Status codes: * - valid, > - best, d - damped, x - best external, a - add path,",
+            "               h - history,  i - internal, s - suppressed, S - Stale",
+            "               Origin : i - IGP, e - EGP, ? - incomplete",
+            " RPKI validation codes: V - valid, I - invalid, N - not-found",
+            "",
+            f" Total Number of Routes: {total}",
+        ]
+        if version == 4:
+            lines = header + [
+                "        Network            NextHop                       MED        LocPrf    PrefVal Path/Ogn",
+                "",
+            ]
+            lines += [f" *>     {prefix:<18} {next_hop:<29} {med:<21} 0      {path}i" for prefix, next_hop, med, path in rows]
+            return "\r\n".join(lines) + "\r\n"
+        # IPv6: o VRP mostra cada rota em um bloco de várias linhas
+        lines = header
+        for prefix, next_hop, med, path in rows:
+            network, length = prefix.split("/")
+            lines += [
+                f" *>     Network  : {network:<40} PrefixLen : {length}",
+                f"        NextHop  : {next_hop:<40} LocPrf    :",
+                f"        MED      : {med:<40} PrefVal   : 0",
+                "        Label    :",
+                f"        Path/Ogn : {path} i",
+                "",
+            ]
+        return "\r\n".join(lines) + "\r\n"
+
+    def route_lookup(self, target: str, as_path_only: bool) -> str:
+        """Melhor caminho para um destino, aprendido de um peer escolhido pelo hash do alvo"""
+        router = self.router
+        established = [p for p in router.peers.values() if p.display_state == "Established"]
+        if not established or not target:
+            return "\r\n Info: The network does not exist.\r\n"
+        digest = sum(target.encode())
+        peer = established[digest % len(established)]
+        path = " ".join(str(asn) for asn in (peer.asn, 3356 + digest % 7, 15169 + digest % 3))
+        network = target if "/" in target else (f"{target}/128" if ":" in target else f"{target.rsplit('.', 1)[0]}.0/24")
+        if as_path_only:
+            return "\r\n".join([
+                "",
+                f" BGP Local router ID is {router.router_id}",
+                " Status codes: * - valid, > - best, d - damped, x - best external, a - add path,",
+                "               h - history,  i - internal, s - suppressed, S - Stale",
+                "               Origin : i - IGP, e - EGP, ? - incomplete",
+                "",
+                " Total Number of Routes: 1",
+                "      Network            NextHop                       In/Out Label   Path/Ogn",
+                "",
+                f" *>   {network:<18} {peer.ip:<29}                {path}i",
+            ]) + "\r\n"
+        return "\r\n".join([
+            "",
+            f" BGP local router ID : {router.router_id}",
+            f" Local AS number : {router.asn}",
+            " Paths:   1 available, 1 best, 1 select, 0 best-external, 0 add-path",
+            f" BGP routing table entry information of {network}:",
+            f" From: {peer.ip} ({peer.ip})",
+            f" Route Duration: {peer.uptime}",
+            f" Original nexthop: {peer.ip}",
+            f" AS-path {path}, origin igp, pref-val 0, valid, external, best, select, active, pre 255",
+            " Not advertised to any peer yet",
+        ]) + "\r\n"
+
+    def ping(self, args: List[str]) -> Iterator[OutputChunk]:
+        count, interval_ms, target = 5, 1000.0, args[-1] if args else ""
+        i = 0
+        while i < len(args) - 1:
+            if args[i] == "-c":
+                count = int(args[i + 1])
+                i += 1
+            elif args[i] == "-m":
+                interval_ms = float(args[i + 1])
+                i += 1
+            elif args[i] in ("-a", "-s", "-t"):
+                i += 1
+            i += 1
+        yield 0.0, f"  PING {target}: 56  data bytes, press CTRL_C to break\r\n"
+        times = []
+        for seq in range(1, count + 1):
+            delay = max(interval_ms, 0.0) / 1000.0 if seq > 1 else 0.0
+            if self.rng.random() < self.ping_loss:
+                yield delay, "    Request time out\r\n"
+                continue
+            rtt = max(1, int(self.rng.gauss(self.ping_latency_ms, self.ping_latency_ms * 0.1)))
+            times.append(rtt)
+            yield delay + rtt / 1000.0, f"    Reply from {target}: bytes=56 Sequence={seq} ttl=64 time={rtt} ms\r\n"
+        received = len(times)
+        loss = 100.0 * (count - received) / count if count else 0.0
+        summary = [
+            "",
+            f"  --- {target} ping statistics ---",
+            f"    {count} packet(s) transmitted",
+            f"    {received} packet(s) received",
+            f"    {loss:.2f}% packet loss",
+        ]
+        if times:
+            summary.append(f"    round-trip min/avg/max = {min(times)}/{sum(times) // len(times)}/{max(times)} ms")
+        yield 0.0, "\r\n".join(summary) + "\r\n"
+
+    def tracert(self, args: List[str]) -> Iterator[OutputChunk]:
+        target = args[-1] if args else ""
+        yield 0.0, f" traceroute to  {target}({target}), max hops: 30 ,packet length: 40,press CTRL_C to break\r\n"
+        hops = 3 + (sum(ord(c) for c in target) % 6)
+        for hop in range(1, hops + 1):
+            hop_ip = target if hop == hops else f"10.{hop}.0.1"
+            base = self.ping_latency_ms * hop / hops
+            rtts = [max(1, int(self.rng.gauss(base, base * 0.1 + 0.5))) for _ in range(3)]
+            yield sum(rtts) / 1000.0, f" {hop} {hop_ip} {rtts[0]} ms  {rtts[1]} ms  {rtts[2]} ms\r\n"
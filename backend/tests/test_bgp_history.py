@@ -0,0 +1,94 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.bgp_peer_history import BGPPeerHistory
+from app.models.peering import Peering
+from app.models.user import Base
+from app.services.bgp_history import HOUR, MINUTE, BGPHistoryService
+from app.services.bgp_summary import BGPPeerSummary, BGPState
+
+T0 = datetime(2026, 1, 1, 10, 0)  # Resumos gravados em UTC sem fuso, como no banco
+T0_UTC = T0.replace(tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'history.db'}")
+    session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[Peering.__table__, BGPPeerHistory.__table__])
+
+    asyncio.run(create())
+    yield session
+    asyncio.run(engine.dispose())
+
+
+def _row(resolution: int, bucket_start: datetime, samples: int, prefixes: int) -> BGPPeerHistory:
+    return BGPPeerHistory(
+        peering_id=1, resolution=resolution, bucket_start=bucket_start, samples=samples, up_samples=samples, flaps=0,
+        state_last="Established", prefixes_min=prefixes, prefixes_max=prefixes, prefixes_last=prefixes, advertised_last=10,
+    )
+
+
+def _series(database, service, since: datetime, until: datetime) -> dict:
+    async def run():
+        async with database() as db:
+            return await service.series(db, 1, MINUTE, since, until)
+
+    return asyncio.run(run())
+
+
+def test_minutes_repeat_after_restart_from_stored_rows(database):
+    """Sem amostras em memória (restart), os minutos estáveis gravados antes continuam preenchidos"""
+    async def store():
+        async with database() as db:
+            db.add_all([
+                _row(MINUTE, T0, 2, 100),
+                _row(MINUTE, T0 + timedelta(minutes=20), 2, 120),  # Minuto aberto gravado no desligamento
+                _row(HOUR, T0, 40, 120),
+            ])
+            await db.commit()
+
+    asyncio.run(store())
+    series = _series(database, BGPHistoryService(capacity=8), T0_UTC, T0_UTC + timedelta(hours=1, minutes=59))
+    prefixes = series["prefixes_last"]
+    assert prefixes[:20] == [100] * 20
+    assert prefixes[20] == 120
+    # Depois do último minuto gravado o coletor estava parado: nada é inventado
+    assert prefixes[21:] == [None] * (len(prefixes) - 21)
+
+
+def test_minutes_are_not_repeated_through_hours_without_collections(database):
+    async def store():
+        async with database() as db:
+            db.add_all([_row(MINUTE, T0, 2, 100), _row(HOUR, T0, 60, 100), _row(MINUTE, T0 + timedelta(hours=2), 2, 100)])
+            await db.commit()
+
+    asyncio.run(store())
+    prefixes = _series(database, BGPHistoryService(capacity=8), T0_UTC, T0_UTC + timedelta(hours=2))["prefixes_last"]
+    assert prefixes[:60] == [100] * 60
+    # Hora sem resumo: o coletor esteve fora
+    assert prefixes[60:120] == [None] * 60
+    assert prefixes[120] == 100
+
+
+def test_observe_skips_stable_minutes_and_counts_flaps():
+    service = BGPHistoryService(capacity=8)
+    peerings = [(1, "10.0.0.1")]
+    states = [BGPState.ESTABLISHED] * 4 + [BGPState.ACTIVE, BGPState.ESTABLISHED]
+    for minute, state in enumerate(states):
+        peer = BGPPeerSummary("10.0.0.1", 4, "ipv4 unicast", state=state, prefixes_received=100)
+        service.observe(T0_UTC + timedelta(minutes=minute), {"10.0.0.1": peer}, peerings)
+    minutes = [row for row in service._pending if row["resolution"] == MINUTE]
+    # Minutos 1 a 3 repetem o minuto 0; a queda (minuto 4) é gravada
+    assert [row["bucket_start"] for row in minutes] == [T0, T0 + timedelta(minutes=4)]
+    assert service.stats()["minutes_skipped"] == 3
+    raw = service.raw_series(1)
+    assert raw["flaps"] == [0, 0, 0, 0, 1, 0]
+    assert service.flaps_report(window_seconds=10 ** 9)[0]["flaps"] == 1
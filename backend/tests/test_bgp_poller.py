@@ -0,0 +1,85 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import bgp_poller as module
+from app.services.bgp_poller import BGPPoller
+from app.services.bgp_summary import BGPPeerSummary, BGPState, BGPSummary
+from app.services.router_health import RouterUnavailable
+
+ROUTER = SimpleNamespace(id=1, name="BORDA-01")
+
+
+@pytest.fixture
+def poller(monkeypatch):
+    """Coletor com relógio controlado, sem banco e sem histórico"""
+    clock = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock.value, perf_counter=time.perf_counter))
+    observed = []
+    monkeypatch.setattr(module, "bgp_history", SimpleNamespace(observe=lambda *args: observed.append(args)))
+    poller = BGPPoller(interval=60, max_concurrent=2, timeout=5)
+    poller._semaphore = asyncio.Semaphore(poller.max_concurrent)
+    poller._peerings = {10: (1, "10.0.0.1"), 11: (1, "2001:db8::1"), 12: (2, "10.0.0.9")}
+    poller._router_peerings = {1: [(10, "10.0.0.1"), (11, "2001:db8::1")], 2: [(12, "10.0.0.9")]}
+    poller.clock = clock
+    poller.observed = observed
+    return poller
+
+
+def _summary(*peers) -> BGPSummary:
+    return BGPSummary(peers=[
+        BGPPeerSummary(ip, 6 if ":" in ip else 4, "ipv4 unicast", remote_as=64500, state=state)
+        for ip, state in peers
+    ])
+
+
+def _poll(poller: BGPPoller, monkeypatch, result):
+    async def fetch(router, timeout, priority):
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(module, "fetch_bgp_summary", fetch)
+    return asyncio.run(poller.poll_router(ROUTER))
+
+
+def test_poll_indexes_peers_by_peering(poller, monkeypatch):
+    summary = _summary(("10.0.0.1", BGPState.ESTABLISHED), ("2001:DB8:0::1", BGPState.ACTIVE))
+    snapshot = _poll(poller, monkeypatch, summary)
+    assert snapshot.error is None and snapshot.duration_ms is not None
+    # IPv6 comparado normalizado
+    assert poller.peering_state(11).state is BGPState.ACTIVE
+    assert poller.peer_state(1, "10.0.0.1").established
+    assert poller.peering_for(1, "2001:db8:0:0::1") == 11
+    sessions = poller.sessions()
+    assert (sessions["up"], sessions["down"], sessions["unknown"]) == (1, 1, 1)
+    assert sessions["total"] == 2
+    # O histórico recebe os peers e os peerings do roteador
+    assert poller.observed[0][2] == poller._router_peerings[1]
+
+
+def test_failure_keeps_last_snapshot_until_stale(poller, monkeypatch):
+    _poll(poller, monkeypatch, _summary(("10.0.0.1", BGPState.ESTABLISHED)))
+    snapshot = _poll(poller, monkeypatch, RouterUnavailable("circuito aberto", 30))
+    assert snapshot.error.startswith("Roteador indisponível")
+    assert poller.peering_state(10).established
+    # Depois de 3 ciclos sem coleta o estado deixa de ser confiável
+    poller.clock.value += 3 * poller.interval + 1
+    assert poller.peering_state(10) is None
+    assert poller.sessions([10])["unknown"] == 1
+    assert len(poller.observed) == 1
+
+
+def test_pushed_peers_build_their_own_snapshot(poller, monkeypatch):
+    _poll(poller, monkeypatch, _summary(("10.0.0.1", BGPState.IDLE)))
+    poller.set_push_source(1, "bmp")
+    peer = poller.push_peer(1, "10.0.0.1", state=BGPState.ESTABLISHED)
+    peer.prefixes_received = 42
+    snapshot = poller.router_snapshot(1)
+    assert snapshot.source == "bmp" and list(snapshot.peers) == ["10.0.0.1"]
+    assert poller.peering_state(10).prefixes_received == 42
+    assert poller.stats()["push_sources"] == {"1": "bmp"}
+    poller.set_push_source(1, None)
+    assert poller.stats()["push_sources"] == {}
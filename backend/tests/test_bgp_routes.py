@@ -0,0 +1,130 @@
+import ipaddress
+import time
+
+import pytest
+
+from app.services.bgp_routes import (
+    RouteFilter, RouteTableParser, compile_as_path, decode_cursor, encode_cursor, peer_routes_command, route_key,
+)
+
+IPV4_TABLE = """
+ BGP Local router ID is 10.255.0.1
+ Status codes: * - valid, > - best, d - damped, x - best external, a - add path,
+               h - history,  i - internal, s - suppressed, S - Stale
+               Origin : i - IGP, e - EGP, ? - incomplete
+ RPKI validation codes: V - valid, I - invalid, N - not-found
+
+ Total Number of Routes: 3
+        Network            NextHop                       MED        LocPrf    PrefVal Path/Ogn
+
+ *>     45.0.0.0/24        10.255.0.1                    0                    0      64512i
+ *>     45.0.1.0/24        10.255.0.1                    100        200       0      64512 3356 {174,1299}?
+ *      45.0.2.0/23        10.255.0.1                                         0      64512 e
+"""
+
+IPV6_TABLE = """
+ BGP Local router ID is 10.255.0.1
+ Total Number of Routes: 2
+ *>     Network  : 2A00:0:1::                               PrefixLen : 48
+        NextHop  : ::                                       LocPrf    :
+        MED      : 0                                        PrefVal   : 0
+        Label    :
+        Path/Ogn : 64512 i
+
+ *>     Network  : 2A00:0:2::                               PrefixLen : 48
+        NextHop  : 2001:DB8::1                              LocPrf    : 150
+        MED      : 20                                       PrefVal   : 0
+        Label    :
+        Path/Ogn : 64512 3356 ?
+"""
+
+
+def _parse(text: str):
+    parser = RouteTableParser()
+    routes = [route for route in map(parser.feed, text.splitlines()) if route is not None]
+    return parser, routes
+
+
+def test_ipv4_rows():
+    parser, routes = _parse(IPV4_TABLE)
+    assert parser.total == 3
+    assert [r.prefix for r in routes] == ["45.0.0.0/24", "45.0.1.0/24", "45.0.2.0/23"]
+    first, second, third = routes
+    assert (first.med, first.local_pref, first.pref_val) == (0, None, 0)
+    assert (first.as_path, first.origin, first.best) == ("64512", "i", True)
+    assert (second.med, second.local_pref, second.pref_val) == (100, 200, 0)
+    assert (second.as_path, second.origin) == ("64512 3356 {174,1299}", "?")
+    assert (third.med, third.pref_val, third.best) == (None, 0, False)
+    assert (third.as_path, third.origin) == ("64512", "e")
+
+
+def test_ipv6_blocks():
+    parser, routes = _parse(IPV6_TABLE)
+    assert parser.total == 2
+    assert [r.prefix for r in routes] == ["2A00:0:1::/48", "2A00:0:2::/48"]
+    assert routes[0].to_dict()["next_hop"] == "::"
+    assert routes[0].local_pref is None
+    second = routes[1]
+    assert (second.next_hop, second.med, second.local_pref, second.pref_val) == ("2001:DB8::1", 20, 150, 0)
+    assert (second.as_path, second.origin) == ("64512 3356", "?")
+
+
+def test_peer_error():
+    parser, routes = _parse("Error: The peer does not exist.\r\n")
+    assert routes == []
+    assert parser.error == "Error: The peer does not exist."
+
+
+def test_filter():
+    _, routes = _parse(IPV4_TABLE)
+    within = RouteFilter(prefix=ipaddress.ip_network("45.0.0.0/23"))
+    assert [r.prefix for r in routes if within.matches(r)] == ["45.0.0.0/24", "45.0.1.0/24"]
+    exact = RouteFilter(prefix=ipaddress.ip_network("45.0.2.0/23"), exact=True)
+    assert [r.prefix for r in routes if exact.matches(r)] == ["45.0.2.0/23"]
+    transit = RouteFilter(as_path=compile_as_path("_3356_"))
+    assert [r.prefix for r in routes if transit.matches(r)] == ["45.0.1.0/24"]
+    assert [r.prefix for r in routes if RouteFilter(max_length=23).matches(r)] == ["45.0.2.0/23"]
+    assert not RouteFilter().active
+
+
+def test_as_path_expressions():
+    path = "64512 3356 {174,1299}"
+    cases = {
+        "_3356_": True, "^64512_": True, "^3356": False, "1299$": False, "^64512_[0-9]+_": True,
+        "_33[^0-4]6_": True, "_(174|3356)_": True, "^(645[0-9]+_)+3356": True, ".*": True, "^$": False,
+        "_35?56": False, "_3(3)*56_": True,
+    }
+    assert {expression: compile_as_path(expression).search(path) for expression in cases} == cases
+    assert compile_as_path("^$").search("") and not compile_as_path("_1_").search("")
+    for expression in ("1**", "*1", "(1", "1)", "1{2}", "a", "[a-z]", "[9-0]", r"\d", "1" * 201):
+        with pytest.raises(ValueError):
+            compile_as_path(expression)
+
+
+def test_as_path_without_backtracking():
+    """Expressões que fariam o re voltar atrás exponencialmente casam em tempo linear"""
+    path = " ".join(["4200000000"] * 200)
+    started = time.monotonic()
+    for expression in ("(.*)*_1_", ".*.*.*.*.*.*.*.*_1_", "([0-9]*)*[0-9]*_1$", "(4|42|420*)*_1"):
+        assert not compile_as_path(expression).search(path)
+    assert time.monotonic() - started < 5
+
+
+def test_cursor_round_trip():
+    _, routes = _parse(IPV4_TABLE + IPV6_TABLE)
+    for route in routes:
+        assert decode_cursor(encode_cursor(route)) == route_key(route)
+    keys = [route_key(r) for r in routes[:3]]
+    assert keys == sorted(keys)
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("não-é-cursor")
+
+
+def test_command():
+    assert peer_routes_command("10.0.0.1", 4) == "display bgp routing-table peer 10.0.0.1 advertised-routes | no-more"
+    assert peer_routes_command("2001:db8::1", 6, "received").startswith("display bgp ipv6 routing-table peer 2001:db8::1 received-routes")
+    with pytest.raises(ValueError):
+        peer_routes_command("10.0.0.1", 4, "both")
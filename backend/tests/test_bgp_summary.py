@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from app.services.bgp_summary import (
+    BGPState, normalize_ip, parse_asn, parse_bgp_summary, parse_state, parse_uptime,
+)
+
+FIXTURES = Path(__file__).resolve().parent.parent / "benchmarks" / "fixtures"
+
+
+def _summary(name: str):
+    return parse_bgp_summary((FIXTURES / name).read_text())
+
+
+def _peers(summary):
+    return {peer.peer_ip: peer for peer in summary.peers}
+
+
+def test_all_summary_header_and_peers():
+    summary = _summary("vrp_bgp_all_summary.txt")
+    assert summary.local_router_id == "192.0.2.1"
+    assert summary.local_as == 65010
+    assert len(summary.peers) == 11
+    assert sum(1 for p in summary.peers if p.ip_version == 4) == 7
+    assert sum(1 for p in summary.peers if p.ip_version == 6) == 4
+    assert sum(1 for p in summary.peers if p.state == BGPState.ESTABLISHED) == 6
+
+
+def test_all_summary_counters():
+    peers = _peers(_summary("vrp_bgp_all_summary.txt"))
+    peer = peers["10.10.0.1"]
+    assert peer.remote_as == 65001
+    assert peer.address_family == "ipv4 unicast"
+    assert peer.prefixes_received == 912345
+    assert peer.msg_received == 182734
+    assert peer.uptime_seconds == 1229 * 3600 + 41 * 60
+    assert peers["203.0.113.254"].out_queue == 2
+
+
+def test_all_summary_admin_down_and_asdot():
+    peer = _peers(_summary("vrp_bgp_all_summary.txt"))["10.10.0.9"]
+    assert peer.remote_as == 65546
+    assert peer.state == BGPState.IDLE
+    assert peer.admin_down is True
+
+
+def test_all_summary_wrapped_ipv6_line():
+    peer = _peers(_summary("vrp_bgp_all_summary.txt"))["2001:DB8:FFFF:1234::2"]
+    assert peer.ip_version == 6
+    assert peer.address_family == "ipv6 unicast"
+    assert peer.remote_as == 65002
+    assert peer.state == BGPState.ESTABLISHED
+    assert peer.prefixes_received == 20
+
+
+def test_inc_summary_keeps_peers_without_counters():
+    peers = _peers(_summary("vrp_bgp_summary_inc.txt"))
+    assert set(peers) == {"10.10.0.1", "10.10.0.9", "2001:DB8:FFFF:1234::2"}
+    assert peers["10.10.0.1"].prefixes_received == 912345
+    # O "| inc" corta a linha seguinte do IPv6 quebrado: só o IP chega
+    assert peers["2001:DB8:FFFF:1234::2"].state == BGPState.UNKNOWN
+
+
+def test_helpers():
+    assert parse_asn("1.10") == 65546
+    assert parse_asn("263075") == 263075
+    assert parse_state("Idle(Admin)") == (BGPState.IDLE, True)
+    assert parse_state("Established") == (BGPState.ESTABLISHED, False)
+    assert parse_uptime("00:37:12") == 2232
+    assert parse_uptime("2w3d") == 17 * 86400
+    assert parse_uptime("112d07h") == 112 * 86400 + 7 * 3600
+    assert normalize_ip("2001:db8:0::1") == normalize_ip("2001:DB8::1")
@@ -0,0 +1,103 @@
+import struct
+
+import pytest
+
+from app.services.bgp_wire import (
+    UpdateDecoder, WireError, decode_as_path, decode_attributes, decode_nlri, split_attributes,
+)
+from app.services.rib import RIBStore
+
+
+def _attr(kind: int, value: bytes, flags: int = 0x40) -> bytes:
+    if len(value) > 255:
+        return struct.pack("!BBH", flags | 0x10, kind, len(value)) + value
+    return struct.pack("!BBB", flags, kind, len(value)) + value
+
+
+def _update(withdrawn: bytes, attrs: bytes, nlri: bytes) -> bytes:
+    body = struct.pack("!H", len(withdrawn)) + withdrawn + struct.pack("!H", len(attrs)) + attrs + nlri
+    return b"\xff" * 16 + struct.pack("!HB", 19 + len(body), 2) + body
+
+
+ATTRS = (
+    _attr(1, b"\x00")
+    + _attr(2, struct.pack("!BB2I", 2, 2, 64500, 3356) + struct.pack("!BB2I", 1, 2, 174, 1299))
+    + _attr(3, bytes((10, 0, 0, 1)))
+    + _attr(4, struct.pack("!I", 50), 0x80)
+    + _attr(5, struct.pack("!I", 200))
+    + _attr(8, struct.pack("!HHHH", 64500, 100, 65535, 65281), 0xC0)
+    + _attr(32, struct.pack("!III", 64500, 1, 2), 0xC0)
+)
+
+
+def test_decode_nlri():
+    data = bytes((24, 192, 0, 2, 0, 17, 0x11, 0, 0))
+    assert decode_nlri(data, 32) == [(0xC0000200, 24), (0, 0), (0x11000000, 17)]
+    assert decode_nlri(bytes((32, 0x20, 0x01, 0x0D, 0xB8)), 128) == [(0x20010DB8 << 96, 32)]
+    with pytest.raises(WireError):
+        decode_nlri(bytes((24, 192, 0)), 32)
+    with pytest.raises(WireError):
+        decode_nlri(bytes((33, 1, 2, 3, 4, 5)), 32)
+
+
+def test_split_and_decode_attributes():
+    others, reach, unreach = split_attributes(ATTRS + _attr(14, b"x" * 300, 0x80))
+    assert [kind for kind, _ in others] == [1, 2, 3, 4, 5, 8, 32]
+    assert len(reach) == 300 and unreach is None
+    assert decode_attributes(others) == {
+        "next_hop": "10.0.0.1",
+        "as_path": "64500 3356 {174,1299}",
+        "communities": "64500:100 65535:65281 64500:1:2",
+        "med": 50,
+        "local_pref": 200,
+        "origin": "i",
+    }
+    with pytest.raises(WireError):
+        split_attributes(ATTRS[:-2])
+
+
+def test_as4_path_on_two_byte_session():
+    path = _attr(2, struct.pack("!BB3H", 2, 3, 64500, 23456, 23456))
+    as4 = _attr(17, struct.pack("!BB2I", 2, 2, 263075, 4200000000), 0xC0)
+    others, _, _ = split_attributes(path + as4)
+    assert decode_attributes(others, four_byte_as=False)["as_path"] == "64500 263075 4200000000"
+    # Em sessão de 4 bytes o AS4_PATH é ignorado
+    assert decode_as_path(struct.pack("!BB2I", 2, 2, 1, 2), 4) == "1 2"
+
+
+def test_update_decoder_ipv4():
+    store = RIBStore(max_age=None)
+    decoder = UpdateDecoder(store.intern)
+    message = _update(bytes((16, 10, 1)), ATTRS, bytes((24, 192, 0, 2, 8, 45)))
+    attr, announced, withdrawn = decoder.decode(message)
+    assert announced == [(4, 0xC0000200, 24), (4, 0x2D000000, 8)]
+    assert withdrawn == [(4, 0x0A010000, 16)]
+    assert store.attributes.get(attr)["as_path"] == "64500 3356 {174,1299}"
+    # Mesmos atributos: reconhecidos pelo cache, sem decodificar de novo
+    assert decoder.decode(message)[0] == attr
+    assert (decoder.misses, decoder.hits) == (1, 1)
+
+
+def test_update_decoder_mp_reach_and_unreach():
+    store = RIBStore(max_age=None)
+    decoder = UpdateDecoder(store.intern)
+    next_hop = (0x20010DB8 << 96 | 1).to_bytes(16, "big")
+    reach = struct.pack("!HBB", 2, 1, 16) + next_hop + b"\x00" + bytes((48, 0x2A, 0, 0, 0, 0, 1))
+    unreach = struct.pack("!HB", 2, 1) + bytes((32, 0x20, 0x01, 0x0D, 0xB8))
+    message = _update(b"", _attr(1, b"\x02") + _attr(14, reach, 0x80) + _attr(15, unreach, 0x80), b"")
+    attr, announced, withdrawn = decoder.decode(message)
+    assert announced == [(6, 0x2A000000000100 << 72, 48)]
+    assert withdrawn == [(6, 0x20010DB8 << 96, 32)]
+    fields = store.attributes.get(attr)
+    assert (fields["next_hop"], fields["origin"]) == ("2001:db8::1", "?")
+
+
+def test_update_decoder_withdraw_only_and_errors():
+    decoder = UpdateDecoder(RIBStore(max_age=None).intern)
+    assert decoder.decode(_update(bytes((24, 10, 0, 0)), b"", b"")) == (None, [], [(4, 0x0A000000, 24)])
+    keepalive = b"\xff" * 16 + struct.pack("!HB", 19, 4)
+    with pytest.raises(WireError):
+        decoder.decode(keepalive + b"\x00" * 4)
+    with pytest.raises(WireError):
+        decoder.decode(_update(b"", ATTRS, b"")[:30])
+
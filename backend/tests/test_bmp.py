@@ -0,0 +1,63 @@
+import struct
+
+import pytest
+
+from app.services.bgp_poller import bgp_poller
+from app.services.bmp import INITIATION, BMPCollector, BMPSession
+
+
+class FakeTransport:
+    def __init__(self, ip: str):
+        self.ip = ip
+        self.closed = False
+
+    def get_extra_info(self, name):
+        return (self.ip, 40000)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    monkeypatch.setattr(bgp_poller, "set_push_source", lambda router_id, source: None)
+    collector = BMPCollector()
+    collector._routers_by_ip = {"192.0.2.1": (1, "BORDA-01")}
+    return collector
+
+
+def _connect(collector, ip: str) -> BMPSession:
+    session = BMPSession(collector)
+    session.connection_made(FakeTransport(ip))
+    return session
+
+
+def _initiation(sys_name: str) -> bytes:
+    name = sys_name.encode()
+    body = struct.pack("!HH", 2, len(name)) + name
+    return struct.pack("!BIB", 3, 6 + len(body), INITIATION) + body
+
+
+def test_unknown_source_is_rejected_even_with_known_sys_name(collector):
+    session = _connect(collector, "203.0.113.9")
+    assert session.transport.closed and session.router_id is None
+    session.data_received(_initiation("BORDA-01"))
+    assert collector.by_router == {} and collector.rejected == 1
+
+
+def test_known_source_binds_and_sys_name_is_informative(collector):
+    session = _connect(collector, "::ffff:192.0.2.1")
+    assert (session.router_id, session.router_name) == (1, "BORDA-01")
+    session._dispatch(INITIATION, memoryview(_initiation("OUTRO")[6:]))
+    assert session.sys_name == "OUTRO" and session.router_id == 1
+
+
+def test_second_connection_does_not_evict_bound_session(collector):
+    first = _connect(collector, "192.0.2.1")
+    second = _connect(collector, "192.0.2.1")
+    assert not first.transport.closed and second.transport.closed
+    assert collector.by_router[1] is first
+    # Depois que a primeira cai, o roteador pode reconectar
+    first.connection_lost(None)
+    third = _connect(collector, "192.0.2.1")
+    assert collector.by_router[1] is third
@@ -0,0 +1,33 @@
+import asyncio
+from datetime import datetime
+
+from app.schemas.looking_glass import BatchQueryItem, LookingGlassQuery
+from app.services.looking_glass import LookingGlassBatch, LookingGlassService
+
+
+class BrokenChannel:
+    async def subscribe(self, heartbeat=None):
+        yield "PING 192.0.2.1"
+        raise RuntimeError("canal fechado")
+
+
+def _query(query_id: str, status: str, output: str = None) -> LookingGlassQuery:
+    return LookingGlassQuery(id=query_id, type="ping", target="192.0.2.1", router="BORDA-01", timestamp=datetime.now(), status=status, output=output)
+
+
+def test_stream_batch_ends_when_following_a_query_fails():
+    service = LookingGlassService()
+    service.queries.add(_query("a", "running"))
+    service.queries.add(_query("b", "completed", "5 packets transmitted, 5 received, 0% packet loss"))
+    service.channels["a"] = BrokenChannel()
+    items = [BatchQueryItem(id=query_id, routerId=n, router=f"BORDA-0{n}", target="192.0.2.1") for n, query_id in enumerate("ab", 1)]
+
+    async def run():
+        return [event async for event in service.stream_batch(LookingGlassBatch("lote", "ping", items), heartbeat=1)]
+
+    events = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    results = {event["query"]: event for event in events if event["type"] == "result"}
+    assert results["a"]["status"] == "error" and "canal fechado" in results["a"]["error"]
+    assert results["b"]["status"] == "completed"
+    assert events[-1]["type"] == "summary"
+    assert service.queries._pins == {}
@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import looking_glass_cache as module
+from app.services.looking_glass_cache import QueryResultCache, query_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock.value))
+    return clock
+
+
+def test_query_key_is_normalized():
+    assert query_key(1, "ping", " 10.0.0.1 ", {"sourceIp": 3, "refresh": True, "count": None}) == \
+        query_key(1, "ping", "10.0.0.1", {"sourceIp": "3"})
+    assert query_key(1, "ping", "10.0.0.1", None) != query_key(2, "ping", "10.0.0.1", None)
+
+
+def test_entries_expire_by_query_type(clock):
+    cache = QueryResultCache(ttls={"ping": 10, "bgp": 60, "traceroute": 0}, max_entries=10)
+    ping, bgp, trace = (query_key(1, kind, "192.0.2.0/24", None) for kind in ("ping", "bgp", "traceroute"))
+    cache.put(ping, "5 packets received")
+    cache.put(bgp, "BGP routing table entry")
+    cache.put(trace, "nunca guardado")
+    clock.value += 10
+    assert cache.get(ping) is None
+    assert cache.get(bgp).output == "BGP routing table entry"
+    assert cache.get(trace) is None
+    assert (cache.hits, cache.misses, cache.stores) == (1, 2, 2)
+
+
+def test_eviction_drops_expired_then_oldest(clock):
+    cache = QueryResultCache(ttls={"ping": 10, "bgp": 60}, max_entries=2)
+    old_ping = query_key(1, "ping", "a", None)
+    cache.put(old_ping, "ping")
+    cache.put(query_key(1, "bgp", "b", None), "b")
+    clock.value += 10
+    cache.put(query_key(1, "bgp", "c", None), "c")
+    # O ping expirado saiu; os dois BGP continuam
+    assert cache.stats()["entries"] == 2
+    assert cache.get(query_key(1, "bgp", "b", None)) is not None
+    cache.put(query_key(1, "bgp", "d", None), "d")
+    assert cache.get(query_key(1, "bgp", "b", None)) is None
+    assert cache.get(query_key(1, "bgp", "d", None)).output == "d"
@@ -0,0 +1,58 @@
+import asyncio
+
+from app.services.looking_glass_channel import QueryChannel
+
+
+async def _collect(channel: QueryChannel, heartbeat=None, limit=None):
+    lines = []
+    async for line in channel.subscribe(heartbeat=heartbeat):
+        lines.append(line)
+        if limit is not None and len(lines) >= limit:
+            break
+    return lines
+
+
+def test_late_subscriber_gets_replay_then_new_lines():
+    async def run():
+        channel = QueryChannel(max_replay=10)
+        channel.publish(["PING 192.0.2.1", "64 bytes from 192.0.2.1"])
+        early = asyncio.create_task(_collect(channel))
+        await asyncio.sleep(0)
+        late = asyncio.create_task(_collect(channel))
+        await asyncio.sleep(0)
+        assert channel.subscribers == 2
+        channel.publish(["5 packets transmitted"])
+        channel.close()
+        # Depois de fechado o canal não aceita mais linhas
+        channel.publish(["ignorada"])
+        results = await asyncio.gather(early, late)
+        assert channel.subscribers == 0
+        return results
+
+    early, late = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert early == late == ["PING 192.0.2.1", "64 bytes from 192.0.2.1", "5 packets transmitted"]
+
+
+def test_slow_subscriber_is_told_about_dropped_lines():
+    async def run():
+        channel = QueryChannel(max_replay=2)
+        channel.publish(["hop 1"])
+        subscriber = channel.subscribe()
+        first = await subscriber.__anext__()
+        # O assinante parou de ler enquanto chegavam mais linhas que o replay comporta
+        channel.publish([f"hop {n}" for n in range(2, 7)])
+        channel.close()
+        return [first] + [line async for line in subscriber]
+
+    lines = asyncio.run(asyncio.wait_for(run(), timeout=5))
+    assert lines == ["hop 1", "... 3 linha(s) anteriores descartadas do buffer ...", "hop 5", "hop 6"]
+
+
+def test_heartbeat_while_idle():
+    async def run():
+        channel = QueryChannel()
+        lines = await _collect(channel, heartbeat=0.01, limit=2)
+        channel.close()
+        return lines
+
+    assert asyncio.run(asyncio.wait_for(run(), timeout=5)) == [None, None]
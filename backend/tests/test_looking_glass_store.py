@@ -0,0 +1,72 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.schemas.looking_glass import LookingGlassQuery
+from app.services import looking_glass_store as module
+from app.services.looking_glass_store import QueryStore
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock.value))
+    return clock
+
+
+def _query(query_id: str, output: str = "ok", status: str = "completed") -> LookingGlassQuery:
+    return LookingGlassQuery(id=query_id, type="ping", target="192.0.2.1", router="BORDA-01", timestamp=datetime.now(), status=status, output=output)
+
+
+def test_least_recently_used_leaves_first(clock):
+    store = QueryStore(max_entries=2, max_bytes=10 ** 6, max_age=600)
+    store.add(_query("a"))
+    store.add(_query("b"))
+    store.get("a")
+    store.add(_query("c"))
+    assert "b" not in store and "a" in store and "c" in store
+    assert store.evicted == 1
+
+
+def test_shared_output_is_counted_once(clock):
+    store = QueryStore(max_entries=10, max_bytes=100, max_age=600)
+    output = "x" * 60
+    store.add(_query("a", output))
+    store.add(_query("b", output))
+    assert store.bytes == 60 and len(store) == 2
+    # Saída distinta estoura o limite: remover só "a" não libera a saída que "b" ainda usa
+    store.add(_query("c", "y" * 50))
+    assert ("a" in store, "b" in store, "c" in store) == (False, False, True)
+    assert store.bytes == 50 and store.evicted == 2
+
+
+def test_running_and_pinned_queries_stay(clock):
+    store = QueryStore(max_entries=1, max_bytes=10 ** 6, max_age=60)
+    streamed = _query("a", output=None, status="running")
+    store.add(streamed)
+    store.pin("a")
+    store.add(_query("b", output=None, status="running"))
+    streamed.status, streamed.output = "completed", "5 packets received"
+    store.update(streamed)
+    store.add(_query("c", output=None, status="running"))
+    assert len(store) == 3 and store.stats()["pinned"] == 1
+    # Ao soltar o último stream os limites voltam a valer
+    store.unpin("a")
+    assert "a" not in store
+    store.get("b").status = "completed"
+    clock.value += 60
+    store.add(_query("d", output=None, status="running"))
+    assert ("b" in store, "c" in store, "d" in store) == (False, True, True)
+    assert store.stats()["running"] == 2
+
+
+def test_discard_releases_bytes(clock):
+    store = QueryStore(max_entries=10, max_bytes=10 ** 6, max_age=600)
+    query = _query("a", "saida")
+    store.add(query)
+    query.error = "falhou"
+    store.update(query)
+    assert store.bytes == len("saida") + len("falhou")
+    store.discard("a")
+    assert (len(store), store.bytes) == (0, 0)
@@ -0,0 +1,94 @@
+import asyncio
+import random
+
+import pytest
+
+from app.services.mrt import MRTImporter, iter_chunks, parse_peer_index
+from app.services.rib import RIBStore
+from benchmarks.mrt import write_table_dump, write_updates
+
+PEERS = 2
+
+
+@pytest.fixture(scope="module")
+def dumps(tmp_path_factory):
+    """Tabela completa (sem compressão, .gz e .bz2, mesmo conteúdo) e um arquivo de UPDATEs"""
+    directory = tmp_path_factory.mktemp("mrt")
+    files = {}
+    for compress in (None, "gz", "bz2"):
+        path = directory / (f"rib.mrt.{compress}" if compress else "rib.mrt")
+        routes = write_table_dump(path, PEERS, 300, 100, 7, random.Random(1), compress)
+        files[compress] = path
+    updates = directory / "updates.mrt"
+    write_updates(updates, PEERS, 50, random.Random(2))
+    return files, routes, updates
+
+
+def _import(importer: MRTImporter, path, resolve=lambda ip: (1, None), chunk_size: int = 4096):
+    return asyncio.run(importer.run(str(path), resolve=resolve, workers=1, chunk_size=chunk_size))
+
+
+def test_chunks_hold_whole_records(dumps):
+    files, _, _ = dumps
+    path = files[None]
+    chunks = list(iter_chunks(str(path), 4096))
+    assert len(chunks) > 1
+    position = 0
+    for (kind, name, start, end), peers in chunks:
+        assert kind == "range" and start == position
+        assert peers == ["10.0.0.0", "10.0.0.1"]
+        position = end
+    assert position == path.stat().st_size
+
+
+def test_peer_index():
+    body = bytes((10, 255, 0, 1)) + b"\x00\x00" + b"\x00\x02"
+    body += bytes((0,)) + bytes((10, 0, 0, 9)) + bytes((10, 0, 0, 9)) + b"\xfd\xe8"
+    body += bytes((3,)) + bytes(4) + bytes.fromhex("20010db8000000000000000000000001") + (263075).to_bytes(4, "big")
+    assert parse_peer_index(body) == ["10.0.0.9", "2001:db8::1"]
+
+
+@pytest.mark.parametrize("compress", [None, "gz", "bz2"])
+def test_table_dump_loads_every_peer(dumps, compress):
+    files, routes, _ = dumps
+    importer = MRTImporter(store=RIBStore(max_age=None))
+    job = _import(importer, files[compress])
+    assert job.status == "done", job.error
+    assert job.entries == routes * PEERS
+    assert {ip: info["paths"] for ip, info in job.peers.items()} == {"10.0.0.0": routes, "10.0.0.1": routes}
+    rib = importer.store.rib(1)
+    prefix, attr = next(rib.peer_routes("10.0.0.1"))
+    entry = rib.lookup(prefix.split("/")[0])
+    path = next(p for p in entry["paths"] if p["peer"] == "10.0.0.1")
+    assert path["as_path"].split()[0] == "64501"
+    assert path["communities"] == "64501:100"
+    assert path["next_hop"] == ("10.0.0.1" if "." in prefix else "2001:db8::1")
+
+
+def test_unmatched_peers_are_counted(dumps):
+    files, routes, _ = dumps
+    importer = MRTImporter(store=RIBStore(max_age=None))
+    job = _import(importer, files[None], resolve=lambda ip: (1, None) if ip == "10.0.0.0" else None)
+    assert list(job.peers) == ["10.0.0.0"]
+    assert job.unmatched == {"10.0.0.1": routes}
+
+
+def test_updates_after_table_dump(dumps):
+    files, routes, updates = dumps
+    importer = MRTImporter(store=RIBStore(max_age=None))
+    _import(importer, files[None])
+    job = _import(importer, updates)
+    assert job.status == "done", job.error
+    assert job.records == 50
+    rib = importer.store.rib(1)
+    # Só anúncios para o peer 0 no arquivo gerado
+    assert rib.peer_path_count(rib.peers.intern("10.0.0.0")) > routes
+
+
+def test_truncated_file_fails(dumps, tmp_path):
+    files, _, _ = dumps
+    truncated = tmp_path / "truncated.mrt"
+    truncated.write_bytes(files[None].read_bytes()[:-5])
+    job = _import(MRTImporter(store=RIBStore(max_age=None)), truncated)
+    assert job.status == "error"
+    assert "truncado" in job.error
@@ -0,0 +1,164 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import rate_limit
+from app.services.rate_limit import AdmissionControl, CostExceeded, RateLimited, RateLimiter, retry_after_header
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio controlado pelo teste no lugar de time.monotonic"""
+    now = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(rate_limit, "time", SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def test_burst_then_refill(clock):
+    limiter = RateLimiter({"ip": (60, 3)}, enabled=True)
+    for _ in range(3):
+        limiter.acquire([("ip", "192.0.2.1")])
+    with pytest.raises(RateLimited) as error:
+        limiter.acquire([("ip", "192.0.2.1")])
+    assert error.value.scope == "ip"
+    assert error.value.retry_after == pytest.approx(1.0)
+    # Outro cliente tem o próprio bucket
+    limiter.acquire([("ip", "192.0.2.2")])
+    clock.value += 1
+    limiter.acquire([("ip", "192.0.2.1")])
+    assert limiter.allowed == 5
+    assert limiter.rejected == {"ip": 1}
+
+
+def test_rejection_consumes_nothing(clock):
+    limiter = RateLimiter({"ip": (60, 5), "router": (60, 2)}, enabled=True)
+    limiter.acquire([("ip", "a"), ("router", 1)], cost=2)
+    with pytest.raises(RateLimited) as error:
+        limiter.acquire([("ip", "a"), ("router", 1)], cost=2)
+    assert error.value.scope == "router"
+    # O bucket do IP não pagou pela recusa: ainda tem 3 fichas
+    limiter.acquire([("ip", "a"), ("router", 2)], cost=2)
+    limiter.acquire([("ip", "a")])
+    with pytest.raises(RateLimited):
+        limiter.acquire([("ip", "a")])
+
+
+def test_cost_above_capacity(clock):
+    limiter = RateLimiter({"ip": (60, 10)}, enabled=True)
+    with pytest.raises(CostExceeded) as error:
+        limiter.acquire([("ip", "a")], cost=11)
+    assert (error.value.capacity, error.value.scope) == (10, "ip")
+    # Nem espera nem consumo: a rajada inteira continua disponível
+    limiter.acquire([("ip", "a")], cost=10)
+
+
+def test_disabled_and_zero_rate(clock):
+    RateLimiter({"ip": (60, 1)}, enabled=False).acquire([("ip", "a")], cost=100)
+    limiter = RateLimiter({"ip": (0, 1)}, enabled=True)
+    for _ in range(10):
+        limiter.acquire([("ip", "a")])
+
+
+def test_full_buckets_are_pruned(clock, monkeypatch):
+    monkeypatch.setattr(rate_limit, "_MAX_BUCKETS", 3)
+    limiter = RateLimiter({"ip": (60, 2)}, enabled=True)
+    for n in range(3):
+        limiter.acquire([("ip", n)])
+    clock.value += 60
+    limiter.acquire([("ip", "new")])
+    assert limiter.stats()["buckets"] == 1
+
+
+def test_admission_queue_limit():
+    admission = AdmissionControl(max_running=1, max_waiting=1)
+    admission.reserve()
+    admission.reserve()
+    with pytest.raises(RateLimited) as error:
+        admission.reserve()
+    assert error.value.scope == "global"
+    assert admission.rejected == 1
+    admission.release()
+    admission.reserve()
+
+
+def test_admission_slots_run_one_at_a_time():
+    admission = AdmissionControl(max_running=1, max_waiting=2)
+    order = []
+
+    async def query(name: str):
+        async with admission.slot():
+            order.append((name, admission.running))
+            await asyncio.sleep(0)
+            order.append((name, admission.running))
+
+    async def run():
+        for _ in range(3):
+            admission.reserve()
+        await asyncio.gather(query("a"), query("b"), query("c"))
+
+    asyncio.run(run())
+    assert [name for name, _ in order] == ["a", "a", "b", "b", "c", "c"]
+    assert all(running == 1 for _, running in order)
+    assert admission.stats()["waiting"] == 0 and admission.reserved == 0
+
+
+def test_admission_slot_releases_on_error():
+    admission = AdmissionControl(max_running=1, max_waiting=0)
+
+    async def run():
+        admission.reserve()
+        with pytest.raises(RuntimeError):
+            async with admission.slot():
+                raise RuntimeError("SSH caiu")
+
+    asyncio.run(run())
+    assert (admission.reserved, admission.running) == (0, 0)
+    admission.reserve()
+
+
+def test_retry_after_header():
+    assert retry_after_header(0.2) == "1"
+    assert retry_after_header(2.1) == "3"
+    assert AdmissionControl(max_running=2, max_waiting=2).retry_after() >= 1.0
+
+
+def _request(headers: dict, host: str = "10.0.0.254"):
+    return SimpleNamespace(headers=headers, client=SimpleNamespace(host=host))
+
+
+def test_client_ip_behind_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_PROXY", True)
+    # O cliente forja o início do X-Forwarded-For; o nginx acrescenta o IP real no fim
+    spoofed = {"X-Forwarded-For": "1.2.3.4, 198.51.100.7"}
+    assert rate_limit.client_ip(_request(spoofed)) == "198.51.100.7"
+    assert rate_limit.client_ip(_request({"X-Forwarded-For": "1.2.3.4", "X-Real-IP": "198.51.100.7"})) == "198.51.100.7"
+    assert rate_limit.client_ip(_request({})) == "10.0.0.254"
+
+
+def test_client_ip_ignores_headers_without_trusted_proxy(monkeypatch):
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_TRUST_PROXY", False)
+    headers = {"X-Forwarded-For": "1.2.3.4", "X-Real-IP": "1.2.3.4"}
+    assert rate_limit.client_ip(_request(headers)) == "10.0.0.254"
+
+
+def test_full_batch_fits_the_batch_budget(clock, monkeypatch):
+    from fastapi import HTTPException
+    from app.core import deps
+    from app.core.config import LG_BATCH_MAX_QUERIES
+    from app.schemas.looking_glass import BatchQueryRequest
+
+    limiter = RateLimiter(rate_limit.rate_limiter.limits, enabled=True)
+    monkeypatch.setattr(deps, "rate_limiter", limiter)
+    http_request = _request({}, host="198.51.100.7")
+    http_request.query_params = {}
+    # Um prefixo em todos os PoPs: o lote cheio passa, mesmo acima da rajada das consultas avulsas
+    full = BatchQueryRequest(type="bgp", targets=["192.0.2.0/24"], routerIds=list(range(LG_BATCH_MAX_QUERIES)))
+    asyncio.run(deps.limit_looking_glass_batch(http_request, full, None))
+    assert limiter.limits["lg_ip"][1] < LG_BATCH_MAX_QUERIES
+    with pytest.raises(RateLimited):
+        asyncio.run(deps.limit_looking_glass_batch(http_request, full, None))
+    oversized = BatchQueryRequest(type="bgp", targets=["a", "b"], routerIds=list(range(LG_BATCH_MAX_QUERIES)))
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(deps.limit_looking_glass_batch(http_request, oversized, None))
+    assert error.value.status_code == 400
@@ -0,0 +1,125 @@
+import pytest
+
+from app.services.rib import PrefixTrie, RIBStore, format_prefix, parse_prefix
+
+
+@pytest.fixture
+def store():
+    store = RIBStore(max_age=None)
+    store.update(1, "10.0.0.1", "10.0.0.0/8", next_hop="10.0.0.1", as_path="64500 3356", med=10, origin="i")
+    store.update(1, "10.0.0.2", "10.1.0.0/16", next_hop="10.0.0.2", as_path="64501", origin="i")
+    store.update(1, "10.0.0.1", "10.1.0.0/16", next_hop="10.0.0.1", as_path="64500 1 2", origin="i")
+    store.update(1, "10.0.0.1", "10.1.2.0/24", next_hop="10.0.0.1", as_path="64500 174", origin="?")
+    store.update(1, "2001:db8::1", "2001:db8::/32", next_hop="2001:db8::1", as_path="64500", origin="i")
+    return store
+
+
+def test_parse_and_format_prefix():
+    version, key, plen = parse_prefix("10.1.2.0/24")
+    assert (version, plen) == (4, 24)
+    assert format_prefix(version, key, plen) == "10.1.2.0/24"
+    version, key, plen = parse_prefix("2001:db8::/32")
+    assert format_prefix(version, key, plen) == "2001:db8::/32"
+
+
+def test_longest_match(store):
+    assert store.lookup(1, "10.1.2.3")["prefix"] == "10.1.2.0/24"
+    assert store.lookup(1, "10.1.3.1")["prefix"] == "10.1.0.0/16"
+    assert store.lookup(1, "10.200.0.1")["prefix"] == "10.0.0.0/8"
+    assert store.lookup(1, "2001:db8:1::1")["prefix"] == "2001:db8::/32"
+    assert store.lookup(1, "192.0.2.1") is None
+    assert store.lookup(2, "10.1.2.3") is None
+
+
+def test_best_path_and_attributes(store):
+    entry = store.lookup(1, "10.1.3.1")
+    paths = {path["peer"]: path for path in entry["paths"]}
+    # AS-path mais curto vence
+    assert paths["10.0.0.2"]["best"] and not paths["10.0.0.1"]["best"]
+    assert entry["paths"][0]["peer"] == "10.0.0.2"
+    assert store.lookup(1, "10.200.0.1")["paths"][0]["med"] == 10
+
+
+def test_covering_and_covered(store):
+    rib = store.rib(1)
+    assert [e["prefix"] for e in rib.covering("10.1.2.0/24")] == ["10.0.0.0/8", "10.1.0.0/16", "10.1.2.0/24"]
+    assert [e["prefix"] for e in rib.covered("10.1.0.0/16")] == ["10.1.0.0/16", "10.1.2.0/24"]
+    assert [e["prefix"] for e in rib.covered("10.0.0.0/8", limit=1)] == ["10.0.0.0/8"]
+
+
+def test_withdraw_and_clear_peer(store):
+    rib = store.rib(1)
+    assert rib.withdraw("10.1.0.0/16", "10.0.0.2")
+    assert not rib.withdraw("10.1.0.0/16", "10.0.0.2")
+    assert [p["peer"] for p in store.lookup(1, "10.1.3.1")["paths"]] == ["10.0.0.1"]
+    assert rib.clear_peer("10.0.0.1") == 3
+    assert store.lookup(1, "10.1.3.1") is None
+    assert store.lookup(1, "2001:db8::1")["prefix"] == "2001:db8::/32"
+
+
+def test_load_peer_table_replaces_previous_routes(store):
+    store.load_peer_table(1, "10.0.0.1", {"192.0.2.0/24": ("10.0.0.1", None, 200, 0, "64500 65000", "i")})
+    assert store.lookup(1, "192.0.2.10")["paths"][0]["local_pref"] == 200
+    assert [p["peer"] for p in store.lookup(1, "10.1.3.1")["paths"]] == ["10.0.0.2"]
+    assert store.lookup(1, "10.1.2.3")["prefix"] == "10.1.0.0/16"
+    assert dict(store.rib(1).peer_routes("10.0.0.1")).keys() == {"192.0.2.0/24"}
+
+
+def test_trie_split_nodes():
+    trie = PrefixTrie(32)
+    keys = [(0x0A000000, 8), (0x0A010000, 16), (0x0A800000, 9), (0x0A010200, 24)]
+    for n, (key, plen) in enumerate(keys):
+        trie.set_value(trie.node(key, plen), n)
+    for n, (key, plen) in enumerate(keys):
+        assert trie.get_value(trie.find(key, plen)) == n
+    assert trie.prefix_of(trie.longest_match(0x0A010203)) == (0x0A010200, 24)
+    assert trie.prefix_of(trie.longest_match(0x0A810000)) == (0x0A800000, 9)
+    assert len(trie.covered(0x0A000000, 8)) == 4
+
+
+def test_compaction_releases_unused_attributes(store):
+    rib = store.rib(1)
+    live_before = store.lookup(1, "10.1.2.3")["paths"][0]
+    rib.clear_peer("10.0.0.1")
+    assert len(store.attributes) == 5
+    assert store.compact() == 3
+    assert len(store.attributes) == 2 and len(store.attributes.as_paths) == 2
+    # Os caminhos que restaram não mudam; os índices liberados são reaproveitados
+    assert store.lookup(1, "10.1.3.1")["paths"][0]["as_path"] == "64501"
+    store.update(1, "10.0.0.1", "10.1.2.0/24", **{k: live_before[k] for k in ("next_hop", "as_path", "med", "local_pref", "origin")})
+    assert store.lookup(1, "10.1.2.3")["paths"][0]["as_path"] == "64500 174"
+    assert store.attributes.memory() > 0
+
+
+def test_compaction_keeps_attributes_held_outside_the_rib():
+    store = RIBStore(max_age=None)
+
+    class Holder:
+        def __init__(self, refs):
+            self.refs = refs
+
+        def attribute_refs(self):
+            return self.refs
+
+    held = store.intern(next_hop="10.0.0.9", as_path="64500 65001", origin="i")
+    holder = Holder([held])
+    store.attributes.add_holder(holder)
+    store.intern(next_hop="10.0.0.9", as_path="64500 65002", origin="i")
+    assert store.compact() == 1
+    assert store.attributes.get(held)["as_path"] == "64500 65001"
+    store.attributes.remove_holder(holder)
+    assert store.compact() == 1 and len(store.attributes) == 0
+
+
+def test_compaction_is_amortized(monkeypatch):
+    from app.services import rib as module
+
+    monkeypatch.setattr(module, "_COMPACT_MIN", 4)
+    store = RIBStore(max_age=None)
+    store._compact_at = 4
+    for n in range(40):
+        # Cada anúncio substitui o anterior: só um conjunto fica em uso
+        store.update(1, "10.0.0.1", "192.0.2.0/24", next_hop="10.0.0.1", as_path=f"64500 {n}", origin="i")
+    assert len(store.attributes) <= 5
+    assert 0 < store.compactions < 40
+    assert store.lookup(1, "192.0.2.1")["paths"][0]["as_path"] == "64500 39"
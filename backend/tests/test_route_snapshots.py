@@ -0,0 +1,183 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.future import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import ROUTE_SNAPSHOT_RETENTION_DAYS
+from app.models.peering import Peering
+from app.models.route_snapshot import RouteSnapshot
+from app.models.router import Router
+from app.models.user import Base
+from app.services import route_snapshots as module
+from app.services.route_snapshots import (
+    RouteSnapshotService, apply_delta, compute_delta, decode_table, encode_table, prefix_key,
+)
+
+OLD = {
+    "45.0.0.0/24": ("10.0.0.1", 0, None, 0, "64512", "i"),
+    "45.0.1.0/24": ("10.0.0.1", 0, None, 0, "64512 3356", "i"),
+    "2a00::/48": ("::", 0, None, 0, "64512", "i"),
+}
+NEW = {
+    "45.0.0.0/24": ("10.0.0.1", 0, None, 0, "64512", "i"),
+    "45.0.1.0/24": ("10.0.0.1", 100, None, 0, "64512 3356", "i"),
+    "45.0.2.0/23": ("10.0.0.1", 0, None, 0, "64512", "?"),
+}
+
+
+def test_encode_decode_round_trip():
+    assert decode_table(encode_table(OLD)) == OLD
+    assert decode_table(encode_table({})) == {}
+
+
+def test_delta_round_trip():
+    delta, added, withdrawn, changed = compute_delta(OLD, NEW)
+    assert (added, withdrawn, changed) == (1, 1, 1)
+    table = dict(OLD)
+    touched = {}
+    apply_delta(table, delta, touched)
+    assert table == NEW
+    # Valor anterior de cada prefixo tocado, None para os que não existiam
+    assert touched == {"45.0.1.0/24": OLD["45.0.1.0/24"], "45.0.2.0/23": None, "2a00::/48": OLD["2a00::/48"]}
+
+
+def test_empty_delta():
+    delta, added, withdrawn, changed = compute_delta(NEW, dict(NEW))
+    assert (added, withdrawn, changed) == (0, 0, 0)
+    table = dict(NEW)
+    apply_delta(table, delta)
+    assert table == NEW
+
+
+def test_prefix_key_order():
+    prefixes = ["2a00::/48", "45.0.1.0/24", "45.0.0.0/23", "45.0.0.0/24"]
+    assert sorted(prefixes, key=prefix_key) == ["45.0.0.0/23", "45.0.0.0/24", "45.0.1.0/24", "2a00::/48"]
+
+
+# Gravação e limpeza, com SQLite no lugar do PostgreSQL -------------------------
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'snapshots.db'}")
+    session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=[Router.__table__, Peering.__table__, RouteSnapshot.__table__])
+
+    asyncio.run(create())
+    monkeypatch.setattr(module, "SessionLocal", session)
+    yield session
+    asyncio.run(engine.dispose())
+
+
+PEERING = Peering(id=1, name="Transit", ip="10.0.0.1", type="IPv4", remote_asn=3356, remote_asn_name="Lumen", router_id=1)
+
+
+async def _age(session, snapshot_ids, days: int):
+    async with session() as db:
+        await db.execute(
+            update(RouteSnapshot).where(RouteSnapshot.id.in_(snapshot_ids)).values(taken_at=datetime.utcnow() - timedelta(days=days))
+        )
+        await db.commit()
+
+
+async def _ids(session):
+    async with session() as db:
+        return list((await db.execute(select(RouteSnapshot.id).order_by(RouteSnapshot.id))).scalars())
+
+
+async def _table(session, service, snapshot_id):
+    async with session() as db:
+        return await service.table_at(db, await db.get(RouteSnapshot, snapshot_id))
+
+
+def test_store_and_diff(database):
+    service = RouteSnapshotService(keyframe_ratio=10)
+
+    async def run():
+        first = await service.store_table(PEERING, 1, "received", OLD, "manual", load_rib=False)
+        second = await service.store_table(PEERING, 1, "received", NEW, "manual", load_rib=False)
+        assert first.keyframe is not None and second.keyframe is None
+        assert await _table(database, service, second.id) == NEW
+        async with database() as db:
+            forward = await service.diff(db, first, second)
+            backward = await service.diff(db, second, first)
+        return forward, backward
+
+    forward, backward = asyncio.run(run())
+    assert forward["summary"] == {"added": 1, "withdrawn": 1, "changed": 1}
+    assert [r["prefix"] for r in forward["added"]] == ["45.0.2.0/23"]
+    assert forward["changed"][0]["fields"] == ["med"]
+    assert [r["prefix"] for r in backward["added"]] == ["2a00::/48"]
+
+
+def test_prune_consolidates_newest_old_snapshot(database):
+    service = RouteSnapshotService(keyframe_ratio=10)
+
+    async def run():
+        first = await service.store_table(PEERING, 1, "received", OLD, "scheduled", load_rib=False)
+        second = await service.store_table(PEERING, 1, "received", NEW, "scheduled", load_rib=False)
+        third = await service.store_table(PEERING, 1, "received", OLD, "scheduled", load_rib=False)
+        await _age(database, [first.id, second.id], ROUTE_SNAPSHOT_RETENTION_DAYS + 1)
+        await service.prune(force=True)
+        return [second.id, third.id], await _ids(database), await _table(database, service, third.id)
+
+    expected, remaining, table = asyncio.run(run())
+    assert remaining == expected
+    assert table == OLD
+
+
+def test_mrt_snapshot_does_not_prune_newer_snapshots(database):
+    """O horário de um dump MRT antigo não pode decidir a retenção da cadeia"""
+    service = RouteSnapshotService(keyframe_ratio=10)
+    dumped = datetime.utcnow() - timedelta(days=ROUTE_SNAPSHOT_RETENTION_DAYS + 30)
+
+    async def run():
+        ids = [(await service.store_table(PEERING, 1, "received", OLD, "scheduled", load_rib=False)).id]
+        ids.append((await service.store_table(PEERING, 1, "received", NEW, "scheduled", load_rib=False)).id)
+        imported = await service.store_table(PEERING, 1, "received", OLD, "mrt", load_rib=False, source_time=dumped)
+        ids.append(imported.id)
+        await service.prune(force=True)
+        return imported, ids, await _ids(database), await _table(database, service, imported.id)
+
+    imported, ids, remaining, table = asyncio.run(run())
+    assert imported.source_time == dumped
+    assert datetime.utcnow() - imported.taken_at < timedelta(minutes=1)
+    assert remaining == ids
+    assert table == OLD
+
+
+def test_mrt_table_without_pref_val_matches_ssh_capture(database):
+    """Tabela sem PrefVal (MRT) herda o valor da captura anterior: nenhuma rota aparece como alterada"""
+    service = RouteSnapshotService(keyframe_ratio=10)
+    captured = {prefix: attrs[:3] + (100,) + attrs[4:] for prefix, attrs in OLD.items()}
+    imported = {prefix: attrs[:3] + (None,) + attrs[4:] for prefix, attrs in OLD.items()}
+    imported["45.0.9.0/24"] = ("10.0.0.1", 0, None, None, "64512", "i")
+
+    async def run():
+        await service.store_table(PEERING, 1, "received", captured, "scheduled", load_rib=False)
+        snapshot = await service.store_table(PEERING, 1, "received", imported, "mrt", load_rib=False)
+        return snapshot, await _table(database, service, snapshot.id)
+
+    snapshot, table = asyncio.run(run())
+    assert (snapshot.added, snapshot.withdrawn, snapshot.changed) == (1, 0, 0)
+    assert table == {**captured, "45.0.9.0/24": ("10.0.0.1", 0, None, 0, "64512", "i")}
+
+
+def test_chain_lock_on_postgres():
+    """No PostgreSQL a cadeia é travada na transação (advisory lock), valendo entre workers"""
+    executed = []
+
+    class FakeSession:
+        bind = type("Bind", (), {"dialect": type("Dialect", (), {"name": "postgresql"})()})()
+
+        async def execute(self, statement, params=None):
+            executed.append((str(statement), params))
+
+    asyncio.run(RouteSnapshotService()._lock_chain(FakeSession(), 7, "received"))
+    assert executed == [("SELECT pg_advisory_xact_lock(:chain, :peering_id)", {"chain": module._CHAIN_LOCK_BASE + 1, "peering_id": 7})]
@@ -0,0 +1,81 @@
+import asyncio
+from types import SimpleNamespace
+
+import paramiko
+import pytest
+
+from app.services import router_health as module
+from app.services.router_health import CircuitState, ErrorKind, RouterHealthService, RouterUnavailable, classify_error
+from app.services.ssh_pool import RouterCredentials, SSHPoolExhausted
+from app.services.ssh_shell import ShellCancelled, ShellTimeout
+
+ROUTER = RouterCredentials(router_id=1, hostname="192.0.2.1", port=22, username="noc", password="segredo")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Relógio do módulo controlado pelo teste (sem event loop, não há sonda TCP)"""
+    clock = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock.value))
+    return clock
+
+
+def test_classify_error():
+    assert classify_error(paramiko.AuthenticationException()) == ErrorKind.AUTH
+    assert classify_error(SSHPoolExhausted("sem vaga")) == ErrorKind.BUSY
+    assert classify_error(ShellTimeout("lento")) == ErrorKind.TIMEOUT
+    assert classify_error(TimeoutError(), transport_alive=True) == ErrorKind.TIMEOUT
+    assert classify_error(TimeoutError()) == ErrorKind.UNREACHABLE
+    assert classify_error(ConnectionRefusedError()) == ErrorKind.UNREACHABLE
+    assert classify_error(ShellCancelled()) is None
+    assert classify_error(asyncio.CancelledError()) is None
+
+
+def test_opens_after_consecutive_unreachable_failures(clock):
+    service = RouterHealthService(failure_threshold=3, open_seconds=30, max_open_seconds=300)
+    for _ in range(2):
+        service.before_request(ROUTER)
+        service.record_failure(ROUTER, ConnectionRefusedError("recusado"))
+    # Roteador lento ou ocupado não conta para abrir
+    service.record_failure(ROUTER, ShellTimeout("lento"))
+    assert service.is_available(1)
+    service.record_failure(ROUTER, ConnectionRefusedError("recusado"))
+    assert not service.is_available(1)
+    with pytest.raises(RouterUnavailable) as error:
+        service.before_request(ROUTER)
+    assert error.value.retry_after == 30
+    assert service.status(1)["state"] == "open"
+
+
+def test_half_open_allows_a_single_trial(clock):
+    service = RouterHealthService(failure_threshold=1, open_seconds=30, max_open_seconds=300)
+    service.record_failure(ROUTER, ConnectionRefusedError("recusado"))
+    clock.value += 30
+    service.before_request(ROUTER)
+    assert service._health[1].state == CircuitState.HALF_OPEN
+    with pytest.raises(RouterUnavailable):
+        service.before_request(ROUTER)
+    # Prova cancelada devolve a vaga; a seguinte fecha o circuito
+    service.release(ROUTER)
+    service.before_request(ROUTER)
+    service.record_success(ROUTER)
+    assert service.status(1)["state"] == "closed"
+    assert service.status(1)["consecutive_failures"] == 0
+
+
+def test_failed_trial_reopens_with_backoff(clock):
+    service = RouterHealthService(failure_threshold=1, open_seconds=30, max_open_seconds=100)
+    service.record_failure(ROUTER, ConnectionRefusedError("recusado"))
+    for expected in (60, 100, 100):
+        clock.value += 300
+        service.before_request(ROUTER)
+        service.record_failure(ROUTER, paramiko.AuthenticationException("senha"))
+        assert service._health[1].retry_after() == expected
+
+
+def test_changed_address_starts_fresh(clock):
+    service = RouterHealthService(failure_threshold=1)
+    service.record_failure(ROUTER, ConnectionRefusedError("recusado"))
+    moved = RouterCredentials(router_id=1, hostname="192.0.2.9", port=22, username="noc", password="segredo")
+    service.before_request(moved)
+    assert service.is_available(1)
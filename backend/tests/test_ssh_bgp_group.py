@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.routers import ssh_bgp_group as module
+from app.routers.ssh_bgp_group import peer_result, run_neighbor_commands
+
+PEERINGS = [SimpleNamespace(id=n, ip=f"10.0.0.{n}") for n in (1, 2, 3)]
+
+
+class FakeShell:
+    """Sessão que cai ao receber o comando `fail_on`"""
+    fail_on = None
+
+    def __init__(self, channel):
+        self.sent = []
+
+    def read_until_prompt(self):
+        return "<BORDA-01>"
+
+    def send_command(self, command: str) -> str:
+        if command == self.fail_on:
+            raise TimeoutError(f"sem resposta a '{command}'")
+        self.sent.append(command)
+        return f"{command}\n<BORDA-01>"
+
+
+@pytest.fixture
+def shell(monkeypatch):
+    @contextmanager
+    def open_shell(router):
+        yield None
+
+    monkeypatch.setattr(module, "ssh_pool", SimpleNamespace(shell=open_shell))
+    monkeypatch.setattr(module, "InteractiveShell", FakeShell)
+    return FakeShell
+
+
+def _apply(action: str = "disable"):
+    progress = {"applied": {}, "current": None, "commit_started": False, "commit": None}
+    error = None
+    try:
+        run_neighbor_commands(None, 64512, [p.ip for p in PEERINGS], action, progress)
+    except Exception as e:
+        error = str(e)
+    return [peer_result(peering, progress, error) for peering in PEERINGS]
+
+
+def test_all_peers_applied_and_committed(shell):
+    results = _apply("enable")
+    assert [r["status"] for r in results] == ["applied"] * 3
+    assert all(r["committed"] and "error" not in r for r in results)
+    assert results[0]["output"].startswith("no neighbor 10.0.0.1 shutdown")
+
+
+def test_failure_reports_progress_per_peer(shell, monkeypatch):
+    monkeypatch.setattr(shell, "fail_on", "neighbor 10.0.0.2 shutdown")
+    results = _apply()
+    assert [r["status"] for r in results] == ["applied", "failed", "not_attempted"]
+    assert not any(r["commit_started"] or r["committed"] for r in results)
+    assert all("10.0.0.2" in r["error"] for r in results)
+
+
+def test_failure_on_commit(shell, monkeypatch):
+    monkeypatch.setattr(shell, "fail_on", "write memory")
+    results = _apply()
+    assert [r["status"] for r in results] == ["applied"] * 3
+    assert all(r["commit_started"] and not r["committed"] for r in results)
@@ -0,0 +1,88 @@
+import asyncio
+
+import paramiko
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models.ssh_host_key import SSHHostKey
+from app.services import ssh_host_keys as module
+from app.services.ssh_host_keys import HostKeyStore, host_key_name
+
+NAME = host_key_name("192.0.2.1", 2222)
+KEY = paramiko.RSAKey.generate(1024)
+OTHER_KEY = paramiko.RSAKey.generate(1024)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'keys.db'}")
+    session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create():
+        async with engine.begin() as conn:
+            await conn.run_sync(SSHHostKey.metadata.create_all, tables=[SSHHostKey.__table__])
+
+    asyncio.run(create())
+    monkeypatch.setattr(module, "SessionLocal", session)
+    yield session
+    asyncio.run(engine.dispose())
+
+
+def test_host_key_name():
+    assert host_key_name("192.0.2.1", 22) == "192.0.2.1"
+    assert NAME == "[192.0.2.1]:2222"
+
+
+def test_trust_on_first_use_in_memory():
+    """Sem event loop a chave fica só em memória; chave trocada é recusada no modo estrito"""
+    store = HostKeyStore(strict=True)
+    store.verify(NAME, KEY)
+    store.verify(NAME, KEY)
+    with pytest.raises(paramiko.BadHostKeyException):
+        store.verify(NAME, OTHER_KEY)
+
+    relaxed = HostKeyStore(strict=False)
+    relaxed.verify(NAME, KEY)
+    relaxed.verify(NAME, OTHER_KEY)
+    relaxed.verify(NAME, OTHER_KEY)
+    assert relaxed.stats() == {"loaded": False, "keys": 1, "strict": False}
+
+
+def test_keys_are_shared_between_workers_through_the_database(database):
+    async def run():
+        # Dois workers carregados antes de qualquer conexão
+        first, second = HostKeyStore(strict=True), HostKeyStore(strict=True)
+        await first.load(known_hosts_file=None)
+        await second.load(known_hosts_file=None)
+        # A verificação roda na thread do paramiko; a gravação vai para o event loop
+        await asyncio.to_thread(first.verify, NAME, KEY)
+        for _ in range(100):
+            async with database() as session:
+                if await session.get(SSHHostKey, 1) is not None:
+                    break
+            await asyncio.sleep(0.01)
+        # O segundo worker não tem a chave em memória: busca no banco e recusa a trocada
+        with pytest.raises(paramiko.BadHostKeyException):
+            await asyncio.to_thread(second.verify, NAME, OTHER_KEY)
+        # Um worker iniciado depois já carrega a chave
+        third = HostKeyStore(strict=True)
+        await third.load(known_hosts_file=None)
+        return third.stats()
+
+    assert asyncio.run(run()) == {"loaded": True, "keys": 1, "strict": True}
+
+
+def test_known_hosts_is_imported_once(database, tmp_path):
+    known_hosts = tmp_path / "known_hosts"
+    known_hosts.write_text(f"{NAME} {KEY.get_name()} {KEY.get_base64()}\n")
+
+    async def run():
+        await HostKeyStore().load(known_hosts_file=str(known_hosts))
+        await HostKeyStore().load(known_hosts_file=str(known_hosts))
+        async with database() as session:
+            return (await session.execute(select(SSHHostKey))).scalars().all()
+
+    rows = asyncio.run(run())
+    assert [(row.hostname, row.key_data) for row in rows] == [(NAME, KEY.get_base64())]
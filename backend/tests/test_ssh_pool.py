@@ -0,0 +1,76 @@
+import threading
+
+import pytest
+
+from app.services.ssh_pool import PooledConnection, RouterCredentials, SSHConnectionPool, SSHPoolExhausted
+
+ROUTER = RouterCredentials(router_id=1, hostname="192.0.2.1", port=22, username="noc", password="segredo")
+
+
+class FakeChannel:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """Pool sem rede: o canal é falso e o reaper não roda em thread"""
+    opened = []
+
+    def open_session(self, timeout=None):
+        opened.append(FakeChannel())
+        return opened[-1]
+
+    monkeypatch.setattr(PooledConnection, "open_session", open_session)
+    pool = SSHConnectionPool(max_sessions_per_router=2, idle_timeout=0, acquire_timeout=0.05)
+    monkeypatch.setattr(pool, "_ensure_reaper", lambda: None)
+    pool.opened = opened
+    return pool
+
+
+def test_channels_share_one_connection(pool):
+    with pool.channel(ROUTER) as first, pool.channel(ROUTER) as second:
+        assert first is not second
+        assert pool.stats()["routers"][0]["active_sessions"] == 2
+    assert all(channel.closed for channel in pool.opened)
+    assert len(pool._connections) == 1
+    conn = pool._connections[ROUTER.key]
+    assert (conn.active_sessions, conn.reserved) == (0, 0)
+
+
+def test_session_limit_and_reservation_rollback(pool):
+    with pool.channel(ROUTER), pool.channel(ROUTER):
+        with pytest.raises(SSHPoolExhausted):
+            with pool.channel(ROUTER):
+                pass
+        conn = pool._connections[ROUTER.key]
+        # A tentativa recusada devolveu a reserva
+        assert (conn.active_sessions, conn.reserved) == (2, 0)
+
+
+def test_reserved_connection_is_not_evicted(pool):
+    """Entre obter a conexão e ocupar a sessão, o reaper não pode fechá-la"""
+    conn = pool._get_connection(ROUTER)
+    conn.last_used -= 3600
+    pool.evict_idle()
+    assert pool._connections.get(ROUTER.key) is conn
+    pool._acquire(conn, timeout=0)
+    pool._release(conn)
+    conn.last_used -= 3600
+    pool.evict_idle()
+    assert ROUTER.key not in pool._connections
+
+
+def test_changed_credentials_retire_connection_after_last_session(pool, monkeypatch):
+    invalidated = threading.Event()
+    with pool.channel(ROUTER):
+        old = pool._connections[ROUTER.key]
+        monkeypatch.setattr(old, "invalidate", invalidated.set)
+        changed = RouterCredentials(router_id=1, hostname="192.0.2.1", port=22, username="noc", password="nova")
+        with pool.channel(changed):
+            assert pool._connections[ROUTER.key] is not old
+        assert old.retired and not invalidated.is_set()
+    assert invalidated.is_set()
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.services import ssh_scheduler as module
+from app.services.ssh_scheduler import Priority, SSHScheduler, SSHSlotTimeout, parse_slot_overrides
+
+
+def test_parse_slot_overrides():
+    assert parse_slot_overrides("3:2, 7:6,,x:1,9:0") == {3: 2, 7: 6, 9: 1}
+
+
+def _run_queue(scheduler: SSHScheduler, requests):
+    """Ocupa a única sessão, enfileira `requests` ((nome, prioridade)) e devolve a ordem de atendimento"""
+    order = []
+    positions = {}
+
+    async def request(name: str, priority: Priority):
+        async with scheduler.slot(1, priority, on_position=lambda p: positions.setdefault(name, []).append(p)):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def run():
+        async with scheduler.slot(1, Priority.INTERACTIVE):
+            tasks = []
+            for name, priority in requests:
+                tasks.append(asyncio.create_task(request(name, priority)))
+                await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(run())
+    return order, positions
+
+
+def test_priority_classes_then_arrival_order(monkeypatch):
+    monkeypatch.setattr(module, "SSH_SLOT_AGING_SECONDS", 0)
+    requests = [
+        ("coleta", Priority.BACKGROUND),
+        ("lg-1", Priority.LOOKING_GLASS),
+        ("bgp", Priority.INTERACTIVE),
+        ("lg-2", Priority.LOOKING_GLASS),
+    ]
+    order, positions = _run_queue(SSHScheduler(default_limit=1, overrides={}, wait_timeout=5), requests)
+    assert order == ["bgp", "lg-1", "lg-2", "coleta"]
+    # Quem esperou é avisado da posição e, ao ser atendido, de 0
+    assert positions["coleta"][0] == 1 and positions["coleta"][-1] == 0
+    assert positions["bgp"] == [1, 0]
+
+
+def test_aging_promotes_old_requests(monkeypatch):
+    monkeypatch.setattr(module, "SSH_SLOT_AGING_SECONDS", 10)
+    clock = SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(module, "time", SimpleNamespace(monotonic=lambda: clock.value))
+    scheduler = SSHScheduler(default_limit=1, overrides={}, wait_timeout=5)
+    order = []
+
+    async def request(name: str, priority: Priority):
+        async with scheduler.slot(1, priority):
+            order.append(name)
+
+    async def run():
+        async with scheduler.slot(1, Priority.INTERACTIVE):
+            old = asyncio.create_task(request("coleta", Priority.BACKGROUND))
+            await asyncio.sleep(0)
+            # Dois ciclos de envelhecimento: a coleta passa a valer como INTERACTIVE
+            clock.value += 20
+            new = asyncio.create_task(request("lg", Priority.LOOKING_GLASS))
+            await asyncio.sleep(0)
+            assert scheduler.queue_position(1, Priority.LOOKING_GLASS) == 3
+        await asyncio.gather(old, new)
+
+    asyncio.run(run())
+    assert order == ["coleta", "lg"]
+
+
+def test_timeout_leaves_the_queue():
+    scheduler = SSHScheduler(default_limit=1, overrides={}, wait_timeout=5)
+
+    async def run():
+        async with scheduler.slot(1):
+            with pytest.raises(SSHSlotTimeout):
+                async with scheduler.slot(1, timeout=0.01):
+                    pass
+        async with scheduler.slot(1, timeout=0.01):
+            pass
+
+    asyncio.run(run())
+    stats = scheduler.stats()["1"]
+    assert (stats["in_use"], stats["timeouts"], stats["granted"]) == (0, 1, 2)
+    assert sum(stats["waiting"].values()) == 0
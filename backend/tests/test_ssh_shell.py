@@ -0,0 +1,90 @@
+import select
+import socket
+
+import pytest
+
+from app.services.ssh_shell import InteractiveShell, ShellTimeout
+
+PROMPT = b"<BORDA-01>"
+
+
+class FakeChannel:
+    """Canal sobre um socketpair: o "roteador" ecoa cada linha, responde e mostra o prompt"""
+
+    def __init__(self, responses: dict, chunk: int = 7):
+        self.local, self.remote = socket.socketpair()
+        self.responses = responses
+        self.chunk = chunk
+        self.sent = []
+
+    def fileno(self):
+        return self.local.fileno()
+
+    def recv_ready(self) -> bool:
+        return bool(select.select([self.local], [], [], 0)[0])
+
+    def recv(self, size: int) -> bytes:
+        # Pedaços pequenos, como chegam da rede (prompt e marcadores divididos)
+        return self.local.recv(min(size, self.chunk))
+
+    def sendall(self, data: bytes):
+        for line in data.decode().splitlines():
+            self.sent.append(line)
+            if line in self.responses:
+                reply = f"{line}\r\n{self.responses[line]}\r\n".encode() + PROMPT
+            elif line.startswith("#"):
+                reply = f"{line}\r\n".encode() + PROMPT
+            else:
+                continue  # Roteador travado: não responde
+            self.remote.sendall(reply)
+
+    def close(self):
+        self.local.close()
+        self.remote.close()
+
+
+def test_send_command_returns_at_the_prompt():
+    channel = FakeChannel({"display version": "VRP (R) software, Version 8.180"})
+    lines = []
+    shell = InteractiveShell(channel, on_line=lines.append, timeout=2)
+    output = shell.send_command("display version")
+    assert output.replace("\r", "") == "display version\nVRP (R) software, Version 8.180\n<BORDA-01>"
+    assert lines == ["display version", "VRP (R) software, Version 8.180", "<BORDA-01>"]
+    channel.close()
+
+
+def test_timeout_keeps_partial_output():
+    channel = FakeChannel({})
+    channel.remote.sendall(b"saida parcial sem prompt")
+    shell = InteractiveShell(channel, timeout=0.05)
+    with pytest.raises(ShellTimeout) as error:
+        shell.send_command("display bgp peer")
+    assert error.value.output == "saida parcial sem prompt"
+    assert shell.send_command("display bgp peer", raise_on_timeout=False) == ""
+    channel.close()
+
+
+def test_output_is_bounded_by_max_buffer():
+    channel = FakeChannel({"display bgp routing-table": "x" * 5000}, chunk=100)
+    output = InteractiveShell(channel, max_buffer=1000, timeout=2).send_command("display bgp routing-table")
+    assert output.startswith("[... saída truncada ...]\n")
+    assert output.endswith("<BORDA-01>") and len(output) < 1200
+    channel.close()
+
+
+def test_pipelined_commands_are_split_by_marker():
+    channel = FakeChannel({
+        "display bgp peer": "10.0.0.1 Established",
+        "display ip routing-table 192.0.2.0": "192.0.2.0/24 BGP",
+        "display interface brief": "GE0/0/1 up",
+    })
+    delivered = []
+    shell = InteractiveShell(channel, timeout=2)
+    results = shell.run_pipelined(
+        list(channel.responses), on_result=lambda index, command, output: delivered.append(index), window=2,
+    )
+    assert results == [(command, output) for command, output in channel.responses.items()]
+    assert delivered == [0, 1, 2]
+    # Cada comando é seguido da sua linha marcadora
+    assert [line.startswith("#BGPCTL-") for line in channel.sent] == [False, True] * 3
+    channel.close()